@@ -0,0 +1,10 @@
+"""
+ASGI entry point.
+Serve the API from an ASGI server, e.g.:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+"""
+
+from src.smart_water_api.asgi import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,326 @@
+"""
+Benchmark suite for the Smart Water API.
+Seeds the store at several sizes and times the hot service and HTTP paths.
+
+Run from the project root:
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --full --backends segments --output full.json
+    python -m benchmarks.run_benchmarks --sizes 10000 --compare baseline.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.smart_water_api import __version__
+from src.smart_water_api.api import routes
+from src.smart_water_api.app_factory import create_app
+from src.smart_water_api.constants import COLLECTION_READINGS, SECONDS_PER_DAY, SEGMENT_ACTIVE_DAYS
+from src.smart_water_api.services import sensor_service as sensor_module
+from src.smart_water_api.services.alert_service import AlertService
+from src.smart_water_api.services.analytics_service import AnalyticsService
+from src.smart_water_api.services.sensor_service import MockFirebaseDB, SensorService
+from src.smart_water_api.storage.segments import SegmentStore
+from src.smart_water_api.utils.timeutils import format_epoch
+
+DEFAULT_SIZES = (10_000, 1_000_000)
+FULL_SIZES = (10_000, 1_000_000, 10_000_000)
+BACKENDS = ("memory", "segments")  # segments: history sealed to mmap files, see SEGMENTS_ENABLED
+SEED_TANKS = 20
+SEED_DAYS = 30  # Readings are spread evenly over this many days up to now
+SEED_BATCH = 100_000
+RANDOM_SEED = 42
+ALERT_SEED_COUNT = 1000
+MIN_ROUNDS = 3
+MAX_ROUNDS = 2000
+TIME_BUDGET_SECONDS = 1.0  # Per benchmark, once MIN_ROUNDS are done
+REGRESSION_RATIO = 1.25  # p50 slowdown that --compare reports as a regression
+
+
+# ============================================================================
+# Seeding
+# ============================================================================
+
+def seed_database(size: int, backend: str, rng: np.random.Generator) -> Tuple[MockFirebaseDB, Optional[str]]:
+    """
+    Build a database holding `size` readings of SEED_TANKS tanks.
+
+    Returns:
+        (database, segment directory to delete afterwards or None)
+    """
+    db = MockFirebaseDB(seed=False)
+    directory = None
+    if backend == "segments":
+        directory = tempfile.mkdtemp(prefix="bench-segments-")
+        db.attach_segments(SegmentStore(directory).open())
+        # Days outside the active window go straight to segments, as after a compaction
+        db.finish_sealing(int(time.time() // SECONDS_PER_DAY) - SEGMENT_ACTIVE_DAYS, [])
+
+    now = time.time()
+    epochs = np.linspace(now - SEED_DAYS * SECONDS_PER_DAY, now, size, endpoint=False)
+    levels = np.round(rng.uniform(10, 95, size), 2)
+    flows = np.round(rng.gamma(2.0, 2.5, size).clip(0, 100), 2)
+    for first in range(0, size, SEED_BATCH):
+        docs = [
+            {
+                "device_id": f"SENSOR-{index % SEED_TANKS:03d}",
+                "tank_id": f"TANK-{index % SEED_TANKS:03d}",
+                "water_level_percent": level,
+                "flow_rate_lpm": flow,
+                "timestamp": format_epoch(epoch),
+            }
+            for index, epoch, level, flow in zip(
+                range(first, first + SEED_BATCH),
+                epochs[first:first + SEED_BATCH].tolist(),
+                levels[first:first + SEED_BATCH].tolist(),
+                flows[first:first + SEED_BATCH].tolist(),
+            )
+        ]
+        db.add_many(COLLECTION_READINGS, docs)
+        # Bulk adds stamp the load time; make readings look like they arrived when taken
+        for doc in docs:
+            doc["created_at"] = doc["timestamp"][:-1]
+    return db, directory
+
+
+def _random_reading(rng: np.random.Generator, level: float = None) -> Dict[str, Any]:
+    tank = int(rng.integers(SEED_TANKS))
+    return {
+        "device_id": f"SENSOR-{tank:03d}",
+        "tank_id": f"TANK-{tank:03d}",
+        "water_level_percent": round(float(rng.uniform(10, 95)) if level is None else level, 2),
+        "flow_rate_lpm": round(float(rng.gamma(2.0, 2.5)), 2),
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+def _install(db: MockFirebaseDB) -> None:
+    """Make the API's service singletons use db."""
+    sensor_module._mock_db = db
+    for name in dir(routes):
+        if name.startswith("_") and name.endswith(("_service", "_monitor")):
+            setattr(routes, name, None)
+
+
+# ============================================================================
+# Timing
+# ============================================================================
+
+def measure(func: Callable[[], Any], budget_seconds: float = TIME_BUDGET_SECONDS) -> Dict[str, float]:
+    """
+    Time func repeatedly: at least MIN_ROUNDS calls, then until the budget is spent.
+
+    Returns:
+        Latency statistics in microseconds plus throughput
+    """
+    func()  # Warm caches and lazy initialization
+    samples: List[float] = []
+    started = time.perf_counter()
+    while len(samples) < MAX_ROUNDS:
+        begin = time.perf_counter_ns()
+        func()
+        samples.append((time.perf_counter_ns() - begin) / 1000)
+        if len(samples) >= MIN_ROUNDS and time.perf_counter() - started >= budget_seconds:
+            break
+    values = np.array(samples)
+    mean = float(values.mean())
+    return {
+        "rounds": len(samples),
+        "min_us": round(float(values.min()), 1),
+        "mean_us": round(mean, 1),
+        "p50_us": round(float(np.percentile(values, 50)), 1),
+        "p95_us": round(float(np.percentile(values, 95)), 1),
+        "p99_us": round(float(np.percentile(values, 99)), 1),
+        "ops_per_second": round(1e6 / mean, 1) if mean else 0.0,
+    }
+
+
+def build_benchmarks(db: MockFirebaseDB, rng: np.random.Generator) -> Dict[str, Callable[[], Any]]:
+    """The service and HTTP operations to time, by name."""
+    _install(db)
+    sensor_service = SensorService()
+    analytics_service = AnalyticsService(sensor_service)
+    alert_service = AlertService()
+    now = datetime.utcnow()
+
+    app = create_app({
+        "TESTING": True,
+        "LOG_LEVEL": "ERROR",
+        "SCHEDULER_ENABLED": False,
+        "COMPACTION_ENABLED": False,
+        "PERSISTENCE_ENABLED": False,
+        "SEGMENTS_ENABLED": False,
+    })
+    client = app.test_client()
+    with app.app_context():
+        routes.get_alert_service().analyze_batch(
+            [_random_reading(rng, level=97.0) for _ in range(ALERT_SEED_COUNT)]
+        )
+
+    def http(method: str, path: str, **kwargs) -> Callable[[], Any]:
+        def call():
+            response = client.open(path, method=method, **kwargs)
+            assert response.status_code < 400, f"{method} {path} returned {response.status_code}"
+        return call
+
+    return {
+        "ingest_reading": lambda: sensor_service.ingest_reading(_random_reading(rng)),
+        "get_latest": lambda: db.get_latest(COLLECTION_READINGS, 10),
+        "get_by_date_range_1d": lambda: db.get_by_date_range(
+            COLLECTION_READINGS, now - timedelta(days=1), now
+        ),
+        "get_daily_analytics": analytics_service.get_daily_analytics,
+        "get_hourly_pattern": analytics_service.get_hourly_pattern,
+        "analyze_reading": lambda: alert_service.analyze_reading(_random_reading(rng)),
+        "http_ingest": lambda: http(
+            "POST", "/api/v1/sensors/ingest", json=_random_reading(rng)
+        )(),
+        "http_dashboard_live": http("GET", "/api/v1/dashboard/live"),
+        "http_analytics_daily": http("GET", "/api/v1/analytics/daily"),
+        "http_alerts": http("GET", "/api/v1/alerts?limit=50"),
+    }
+
+
+# ============================================================================
+# Suite
+# ============================================================================
+
+def run_suite(
+    sizes=DEFAULT_SIZES,
+    backends=BACKENDS,
+    only: Optional[List[str]] = None,
+    progress: Callable[[str], None] = None,
+    budget_seconds: float = TIME_BUDGET_SECONDS,
+) -> Dict[str, Any]:
+    """
+    Seed every (backend, size) combination and time each benchmark.
+
+    Args:
+        sizes: Numbers of seeded readings
+        backends: Store configurations to seed
+        only: Optional subset of benchmark names
+        progress: Called with a line of text after each measurement
+        budget_seconds: Time spent per benchmark once MIN_ROUNDS are done
+
+    Returns:
+        JSON-serializable report with environment metadata and results
+    """
+    results = []
+    for backend in backends:
+        for size in sizes:
+            rng = np.random.default_rng(RANDOM_SEED)
+            started = time.perf_counter()
+            db, directory = seed_database(size, backend, rng)
+            seed_seconds = time.perf_counter() - started
+            try:
+                for name, func in build_benchmarks(db, rng).items():
+                    if only and name not in only:
+                        continue
+                    stats = measure(func, budget_seconds)
+                    results.append({
+                        "backend": backend,
+                        "size": size,
+                        "benchmark": name,
+                        "seed_seconds": round(seed_seconds, 2),
+                        **stats,
+                    })
+                    if progress is not None:
+                        progress(
+                            f"{backend:<9} {size:>11,} {name:<22} "
+                            f"p50 {stats['p50_us']:>12,.1f}us  p95 {stats['p95_us']:>12,.1f}us"
+                        )
+            finally:
+                _install(None)
+                if directory is not None:
+                    shutil.rmtree(directory, ignore_errors=True)
+    return {"meta": environment(), "results": results}
+
+
+def environment() -> Dict[str, Any]:
+    """Versions and host details recorded alongside the results."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "version": __version__,
+        "commit": commit,
+        "created_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = REGRESSION_RATIO) -> List[str]:
+    """
+    Compare p50 latencies of two reports.
+
+    Returns:
+        Descriptions of benchmarks that got slower than threshold allows
+    """
+    def key(result):
+        return result["backend"], result["size"], result["benchmark"]
+
+    before = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = before.get(key(result))
+        if old is None or not old["p50_us"]:
+            continue
+        ratio = result["p50_us"] / old["p50_us"]
+        line = (
+            f"{result['backend']:<9} {result['size']:>11,} {result['benchmark']:<22} "
+            f"{old['p50_us']:>12,.1f}us -> {result['p50_us']:>12,.1f}us  x{ratio:.2f}"
+        )
+        print(line)
+        if ratio > threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Smart Water API.")
+    parser.add_argument("--sizes", type=int, nargs="+", help="Seeded readings (default: 10^4 and 10^6)")
+    parser.add_argument("--full", action="store_true", help="Also seed 10^7 readings (needs several GB of RAM)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--only", nargs="+", help="Run only these benchmarks")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_RATIO, help="p50 ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)  # Alert warnings would swamp the output
+    sizes = args.sizes or (FULL_SIZES if args.full else DEFAULT_SIZES)
+    report = run_suite(sizes, args.backends, args.only, progress=print)
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Wrote {len(report['results'])} results to {args.output}")
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(json.load(handle), report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks regressed by more than x{args.threshold}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
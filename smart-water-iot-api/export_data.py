@@ -0,0 +1,73 @@
+"""
+Bulk export entry point.
+Writes stored readings to an NDJSON, CSV, Arrow IPC or Parquet file.
+
+Usage:
+    python export_data.py readings.parquet --start 2024-01-01 --end 2024-02-01
+"""
+
+import argparse
+import os
+import sys
+
+from src.smart_water_api.app_factory import create_app
+from src.smart_water_api.api.routes import get_export_service
+from src.smart_water_api.errors.exceptions import APIError
+from src.smart_water_api.extensions import persistence
+from src.smart_water_api.utils.validators import validate_time_param
+
+_EXTENSION_FORMATS = {
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+    ".arrow": "arrow",
+    ".arrows": "arrow",
+    ".parquet": "parquet",
+}
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Export stored sensor readings.")
+    parser.add_argument("output", help="File to write")
+    parser.add_argument(
+        "--format",
+        choices=("ndjson", "csv", "arrow", "parquet"),
+        help="Output format (default: by extension; arrow and parquet need pyarrow)",
+    )
+    parser.add_argument("--start", help="Window start (ISO timestamp or YYYY-MM-DD)")
+    parser.add_argument("--end", help="Window end (ISO timestamp or YYYY-MM-DD)")
+    parser.add_argument("--tank-id", help="Only export this tank")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    file_format = args.format or _EXTENSION_FORMATS.get(os.path.splitext(args.output)[1].lower())
+    if file_format is None:
+        print("error: cannot infer the format from the file name; pass --format", file=sys.stderr)
+        return 2
+
+    app = create_app({"SCHEDULER_ENABLED": False, "COMPACTION_ENABLED": False})
+    with app.app_context():
+        try:
+            start = validate_time_param(args.start, "start")
+            end = validate_time_param(args.end, "end")
+            size = get_export_service().write_file(
+                args.output,
+                file_format,
+                start=start if start is not None else 0.0,
+                end=end if end is not None else float("inf"),
+                tank_id=args.tank_id,
+            )
+        except APIError as e:
+            print(f"error: {e.message}", file=sys.stderr)
+            return 1
+        finally:
+            persistence.close()
+
+    print(f"Wrote {size:,} bytes of {file_format} to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
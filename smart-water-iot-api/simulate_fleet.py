@@ -0,0 +1,127 @@
+"""
+Fleet simulator entry point.
+Generates synthetic multi-tank load, either written straight into the data
+store or sent to a running API at a target rate.
+
+Usage:
+    python simulate_fleet.py store --tanks 1000 --days 30
+    python simulate_fleet.py http --url http://localhost:5000 --tanks 200 --rate 500 --duration 60 --workers 4
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from src.smart_water_api.app_factory import create_app
+from src.smart_water_api.api.routes import get_alert_service, get_sensor_service
+from src.smart_water_api.constants import (
+    IMPORT_CHUNK_SIZE,
+    SECONDS_PER_DAY,
+    SIM_DEVICES_PER_TANK,
+    SIM_INTERVAL_SECONDS,
+    SIM_LEAK_FRACTION,
+    SIM_OVERFLOW_FRACTION,
+    SIM_PEAK_FLOW_LPM,
+    SIM_RANDOM_SEED,
+    SIM_TANKS,
+)
+from src.smart_water_api.extensions import compactor, persistence
+from src.smart_water_api.services.simulator import FleetProfile, FleetSimulator, drive_http, write_fleet
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate synthetic sensor load for a fleet of tanks.")
+    parser.add_argument("--tanks", type=int, default=SIM_TANKS, help="Number of tanks")
+    parser.add_argument("--devices-per-tank", type=int, default=SIM_DEVICES_PER_TANK, help="Sensors reporting per tank")
+    parser.add_argument("--interval", type=float, default=SIM_INTERVAL_SECONDS, help="Simulated seconds between readings")
+    parser.add_argument("--peak-flow", type=float, default=SIM_PEAK_FLOW_LPM, help="Usage at the busiest hour (L/min)")
+    parser.add_argument("--leak-fraction", type=float, default=SIM_LEAK_FRACTION, help="Share of tanks with a leak")
+    parser.add_argument("--overflow-fraction", type=float, default=SIM_OVERFLOW_FRACTION, help="Share of tanks that overfill")
+    parser.add_argument("--seed", type=int, default=SIM_RANDOM_SEED, help="Random seed (same seed, same fleet)")
+    targets = parser.add_subparsers(dest="target", required=True)
+
+    store = targets.add_parser("store", help="Write readings straight into the data store")
+    store.add_argument("--days", type=float, default=7, help="Days of history to generate, ending now")
+    store.add_argument("--batch-size", type=int, default=IMPORT_CHUNK_SIZE, help="Readings per bulk write")
+    store.add_argument("--alerts", action="store_true", help="Also run the readings through the alert rules")
+
+    http = targets.add_parser("http", help="Send readings to a running API")
+    http.add_argument("--url", default="http://localhost:5000", help="API root")
+    http.add_argument("--rate", type=float, default=100, help="Target requests per second (0 = as fast as possible)")
+    http.add_argument("--duration", type=float, default=60, help="Seconds to send")
+    http.add_argument("--workers", type=int, default=1, help="Sender processes (0 = send from this process)")
+    return parser.parse_args(argv)
+
+
+def _report(stats):
+    print(
+        f"\r{stats['readings_written']:>12,} readings  {stats['rows_per_second']:>12,.0f} rows/s  "
+        f"{stats['seconds']:>8.1f}s",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def _simulate_store(args, profile) -> int:
+    # The simulator writes history itself; keep seeding and background jobs out of the way
+    app = create_app({"SCHEDULER_ENABLED": False, "COMPACTION_ENABLED": False, "SEED_MODE": "none"})
+    if not persistence.is_open:
+        print("warning: PERSISTENCE_ENABLED is off; simulated readings only live in this process", file=sys.stderr)
+
+    steps = int(args.days * SECONDS_PER_DAY / profile.interval_seconds)
+    simulator = FleetSimulator(profile, start=time.time() - steps * profile.interval_seconds)
+    with app.app_context():
+        db = get_sensor_service().db
+        # Move the seal boundary first so older days go straight to segments
+        compactor.seal()
+        try:
+            stats = write_fleet(
+                db,
+                simulator,
+                steps,
+                alert_service=get_alert_service() if args.alerts else None,
+                batch_size=args.batch_size,
+                progress=_report,
+            )
+        finally:
+            persistence.close()
+
+    print(file=sys.stderr)
+    print(
+        f"Wrote {stats['readings_written']:,} readings of {stats['tanks']:,} tanks ({stats['devices']:,} devices) "
+        f"in {stats['seconds']:.1f}s ({stats['rows_per_second']:,.0f} rows/s); "
+        f"{stats['alerts_raised']:,} alerts raised"
+    )
+    print(f"  leaking: {', '.join(stats['leaking_tanks']) or '-'}")
+    print(f"  overfilling: {', '.join(stats['overfilling_tanks']) or '-'}")
+    return 0
+
+
+def _simulate_http(args, profile) -> int:
+    rate = f"{args.rate:g} req/s" if args.rate > 0 else "as fast as possible"
+    print(f"Sending {rate} for {args.duration:g}s to {args.url} from {max(1, args.workers)} worker(s)", file=sys.stderr)
+    stats = drive_http(args.url, profile, args.rate, args.duration, workers=args.workers)
+    print(json.dumps(stats, indent=2))
+    return 0 if stats["sent"] and not stats["errors"] else 1
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    profile = FleetProfile(
+        tanks=args.tanks,
+        devices_per_tank=args.devices_per_tank,
+        interval_seconds=args.interval,
+        peak_flow_lpm=args.peak_flow,
+        leak_fraction=args.leak_fraction,
+        overflow_fraction=args.overflow_fraction,
+        seed=args.seed,
+    )
+    if args.target == "store":
+        return _simulate_store(args, profile)
+    return _simulate_http(args, profile)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
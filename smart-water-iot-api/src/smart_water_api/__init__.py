@@ -3,5 +3,9 @@ Smart Water Conservation System - IoT API
 A Flask-based REST API for water monitoring and conservation.
 """
 
+import time as _time
+
+_import_started = _time.perf_counter()  # For the "imports" phase of the startup report
+
 __version__ = "1.0.0"
 __author__ = "Smart Water Team"
@@ -0,0 +1,90 @@
+"""
+Async service interfaces.
+Awaitable wrappers around the service singletons; every call runs in a
+thread pool so the event loop never waits on store locks or aggregation.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from flask import Flask
+
+from ..constants import ASGI_WORKER_THREADS, DEFAULT_ANALYTICS_DAYS
+from ..services.alert_models import serialize_alerts
+from ..services.prediction_service import WATER_SHORTAGE
+from ..utils.validators import validate_sensor_data
+from .routes import (
+    build_live_dashboard,
+    get_alert_service,
+    get_analytics_service,
+    get_prediction_service,
+    get_sensor_service,
+    process_reading,
+)
+
+
+class AsyncServices:
+    """
+    Awaitable facade over the API's services.
+
+    Work goes to threads rather than processes: the store, rollups and
+    alert windows live in this process, and the column scans and rollup
+    folds behind analytics spend their time in numpy, which releases the
+    GIL. Calls run inside an app context, so services can read the config.
+    """
+
+    def __init__(self, app: Flask, max_workers: int = ASGI_WORKER_THREADS):
+        """
+        Initialize the pool.
+
+        Args:
+            app: Flask app whose context calls run in
+            max_workers: Pool threads (bounds concurrent service calls)
+        """
+        self._app = app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asgi-worker")
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Await func(*args) run in the pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._call, func, args)
+
+    def dashboard_version(self) -> Tuple[int, int]:
+        """
+        Key that changes whenever the live dashboard would.
+
+        Combines the store version (bumped by every write) with the number of
+        active alerts (changed by acknowledgements). Cheap enough to poll
+        from the event loop.
+        """
+        with self._app.app_context():
+            return get_sensor_service().data_version, get_alert_service().alert_counts()["active"]
+
+    async def ingest(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate, store and analyze one reading (as POST /sensors/ingest)."""
+        return await self.run(lambda: process_reading(validate_sensor_data(data)))
+
+    async def live_dashboard(self) -> Dict[str, Any]:
+        """Live dashboard payload (as GET /dashboard/live)."""
+        return await self.run(build_live_dashboard)
+
+    async def daily_analytics(self, days: int = DEFAULT_ANALYTICS_DAYS) -> Dict[str, Any]:
+        """Daily usage aggregation (as GET /analytics/daily)."""
+        return await self.run(get_analytics_service().get_daily_analytics, days)
+
+    async def active_alerts(self) -> List[Dict[str, Any]]:
+        """Unacknowledged alerts, serialized."""
+        return await self.run(lambda: serialize_alerts(get_alert_service().get_active_alerts()))
+
+    async def water_shortage(self) -> Dict[str, Any]:
+        """Materialized water shortage prediction."""
+        return await self.run(get_prediction_service().get, WATER_SHORTAGE)
+
+    def close(self) -> None:
+        """Stop the pool once running calls finish."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _call(self, func: Callable[..., Any], args) -> Any:
+        with self._app.app_context():
+            return func(*args)
@@ -4,52 +4,179 @@ Organized using Flask Blueprint for modularity.
 """
 
 import logging
+import threading
 from datetime import datetime
-from flask import Blueprint, request, jsonify
-
-from ..constants import API_PREFIX, HTTP_OK, HTTP_CREATED, STATUS_NORMAL
-from ..services.sensor_service import SensorService
-from ..services.analytics_service import AnalyticsService
-from ..services.alert_service import AlertService
-from ..utils.validators import validate_sensor_data
+from typing import TYPE_CHECKING, Any, Dict
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+
+from ..constants import (
+    API_PREFIX,
+    HTTP_OK,
+    HTTP_CREATED,
+    STATUS_NORMAL,
+    FORECAST_HORIZON_HOURS,
+    CONSERVATION_PERIODS,
+    SERIES_DEFAULT_POINTS,
+    SERIES_MAX_POINTS,
+    SERIES_METHODS,
+    EXPORT_FORMATS,
+)
+from ..services.alert_models import serialize_alerts
+from ..services.offline_monitor import OfflineMonitor
+from ..utils.validators import (
+    validate_sensor_data,
+    validate_tank_metadata,
+    validate_date_range,
+    validate_time_param,
+)
+from ..utils.singleflight import SingleFlight
+from ..utils.tracing import span
 from ..errors.exceptions import ValidationError
+from .. import extensions
 from .. import __version__
 
+if TYPE_CHECKING:
+    from ..services.sensor_service import SensorService
+    from ..services.analytics_service import AnalyticsService
+    from ..services.alert_service import AlertService
+    from ..services.forecast_service import ForecastService
+    from ..services.conservation_service import ConservationService
+    from ..services.series_service import SeriesService
+    from ..services.export_service import ExportService
+    from ..services.prediction_service import PredictionService
+
 logger = logging.getLogger(__name__)
 
 # Create Blueprint with API prefix
 api_bp = Blueprint("api", __name__, url_prefix=API_PREFIX)
 
-# Service instances (singleton pattern for simplicity)
+# Service instances (singleton pattern for simplicity). Service modules are
+# imported by their accessors, so only the services a process uses are loaded.
 _sensor_service = None
 _analytics_service = None
 _alert_service = None
+_offline_monitor = None
+_forecast_service = None
+_conservation_service = None
+_prediction_service = None
+_series_service = None
+_export_service = None
+_services_lock = threading.RLock()  # Accessors may race from request and background threads
+
+# Coalesces concurrent dashboard builds (see build_live_dashboard)
+dashboard_flights = SingleFlight()
+
 
+def get_offline_monitor() -> OfflineMonitor:
+    """Get or create the shared sensor last-seen tracker."""
+    global _offline_monitor
+    if _offline_monitor is None:
+        with _services_lock:
+            if _offline_monitor is None:
+                _offline_monitor = OfflineMonitor()
+    return _offline_monitor
 
-def get_sensor_service() -> SensorService:
+
+def get_sensor_service() -> "SensorService":
     """Get or create sensor service instance."""
     global _sensor_service
     if _sensor_service is None:
-        _sensor_service = SensorService(use_mock=True)
+        from ..services.sensor_service import SensorService
+        with _services_lock:
+            if _sensor_service is None:
+                _sensor_service = SensorService(use_mock=True, offline_monitor=get_offline_monitor())
     return _sensor_service
 
 
-def get_analytics_service() -> AnalyticsService:
+def get_analytics_service() -> "AnalyticsService":
     """Get or create analytics service instance."""
     global _analytics_service
     if _analytics_service is None:
-        _analytics_service = AnalyticsService(get_sensor_service())
+        from ..services.analytics_service import AnalyticsService
+        with _services_lock:
+            if _analytics_service is None:
+                _analytics_service = AnalyticsService(get_sensor_service(), pool=extensions.analytics_pool)
     return _analytics_service
 
 
-def get_alert_service() -> AlertService:
-    """Get or create alert service instance."""
+def get_alert_service() -> "AlertService":
+    """Get or create alert service instance (needs an app context for the rules path)."""
     global _alert_service
     if _alert_service is None:
-        _alert_service = AlertService()
+        from ..services.alert_service import AlertService
+        from ..services.rule_engine import RuleEngine
+        with _services_lock:
+            if _alert_service is None:
+                rules_path = current_app.config.get("ALERT_RULES_PATH")
+                rule_engine = RuleEngine.from_file(rules_path) if rules_path else None
+                _alert_service = AlertService(
+                    rule_engine=rule_engine,
+                    offline_monitor=get_offline_monitor(),
+                )
     return _alert_service
 
 
+def get_forecast_service() -> "ForecastService":
+    """Get or create forecast service instance."""
+    global _forecast_service
+    if _forecast_service is None:
+        from ..services.forecast_service import ForecastService
+        with _services_lock:
+            if _forecast_service is None:
+                _forecast_service = ForecastService(get_sensor_service(), pool=extensions.analytics_pool)
+    return _forecast_service
+
+
+def get_conservation_service() -> "ConservationService":
+    """Get or create conservation service instance."""
+    global _conservation_service
+    if _conservation_service is None:
+        from ..services.conservation_service import ConservationService
+        with _services_lock:
+            if _conservation_service is None:
+                _conservation_service = ConservationService(get_sensor_service())
+    return _conservation_service
+
+
+def get_prediction_service() -> "PredictionService":
+    """Get or create prediction service instance."""
+    global _prediction_service
+    if _prediction_service is None:
+        from ..services.prediction_service import PredictionService
+        with _services_lock:
+            if _prediction_service is None:
+                _prediction_service = PredictionService(
+                    get_sensor_service(),
+                    get_analytics_service(),
+                    get_forecast_service(),
+                    get_conservation_service(),
+                    scheduler=extensions.scheduler,
+                )
+    return _prediction_service
+
+
+def get_series_service() -> "SeriesService":
+    """Get or create series service instance."""
+    global _series_service
+    if _series_service is None:
+        from ..services.series_service import SeriesService
+        with _services_lock:
+            if _series_service is None:
+                _series_service = SeriesService(get_sensor_service())
+    return _series_service
+
+
+def get_export_service() -> "ExportService":
+    """Get or create export service instance."""
+    global _export_service
+    if _export_service is None:
+        from ..services.export_service import ExportService
+        with _services_lock:
+            if _export_service is None:
+                _export_service = ExportService(get_sensor_service())
+    return _export_service
+
+
 # ============================================================================
 # Health Check Endpoint
 # ============================================================================
@@ -107,29 +234,81 @@ def ingest_sensor_data():
         raise ValidationError("Request body must be valid JSON")
     
     # Validate input data
-    validated_data = validate_sensor_data(data)
+    with span("validation"):
+        validated_data = validate_sensor_data(data)
     
+    response = process_reading(validated_data)
+    
+    with span("serialization"):
+        body = jsonify(response)
+    return body, HTTP_CREATED
+
+
+def process_reading(validated_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Store a validated reading and analyze it for alerts.
+    
+    Returns:
+        Ingestion result with the alert analysis
+    """
     # Ingest the reading
     sensor_service = get_sensor_service()
     result = sensor_service.ingest_reading(validated_data)
+    extensions.scheduler.notify()
     
     # Analyze for alerts
     alert_service = get_alert_service()
     analysis = alert_service.analyze_reading(validated_data)
     
-    response = {
+    return {
         **result,
         "analysis": {
             "status": analysis["status"],
             "status_message": analysis["status_message"],
             "alerts_count": analysis["alerts_count"],
-            "alerts": analysis["alerts"],
+            "alerts": serialize_alerts(analysis["alerts"]),
         }
     }
+
+
+@api_bp.route("/sensors/series", methods=["GET"])
+def get_sensor_series():
+    """
+    Get a downsampled reading series for charts.
+    
+    Query Parameters:
+        - tank_id: Tank to query (required)
+        - start, end: Window bounds (ISO timestamps; default: last 24 hours)
+        - max_points: Maximum points to return (default: 300, max: 2000)
+        - method: 'buckets' for min/max/avg per bucket, or 'lttb'
+    
+    Returns:
+        JSON with the chosen bucket size and at most max_points points
+    """
+    tank_id = request.args.get("tank_id")
+    if not tank_id:
+        raise ValidationError("tank_id is required", field="tank_id")
+    
+    start = validate_time_param(request.args.get("start"), "start")
+    end = validate_time_param(request.args.get("end"), "end")
+    if start is not None and end is not None and end <= start:
+        raise ValidationError("end must be after start", field="end")
+    
+    method = request.args.get("method", "buckets")
+    if method not in SERIES_METHODS:
+        raise ValidationError(f"method must be one of: {', '.join(SERIES_METHODS)}", field="method")
+    
+    max_points_param = request.args.get("max_points", str(SERIES_DEFAULT_POINTS))
+    try:
+        max_points = int(max_points_param)
+        max_points = max(2, min(SERIES_MAX_POINTS, max_points))
+    except ValueError:
+        max_points = SERIES_DEFAULT_POINTS
     
-    logger.info(f"Ingested sensor data from {validated_data['device_id']}")
+    series_service = get_series_service()
+    series = series_service.get_series(tank_id, start, end, max_points=max_points, method=method)
     
-    return jsonify(response), HTTP_CREATED
+    return jsonify(series), HTTP_OK
 
 
 # ============================================================================
@@ -147,6 +326,24 @@ def get_live_dashboard():
     Returns:
         JSON with latest reading, status, and alerts
     """
+    return jsonify(build_live_dashboard()), HTTP_OK
+
+
+def build_live_dashboard() -> Dict[str, Any]:
+    """
+    Build the live dashboard payload.
+    
+    Shared by the dashboard route and the ASGI dashboard stream, which
+    builds it once per data change for all connected clients. Requests
+    arriving while a build is in progress wait for it and share the result.
+    
+    Returns:
+        Latest reading, status, and active alerts
+    """
+    return dashboard_flights.do("live_dashboard", _build_live_dashboard)
+
+
+def _build_live_dashboard() -> Dict[str, Any]:
     sensor_service = get_sensor_service()
     alert_service = get_alert_service()
     
@@ -155,7 +352,7 @@ def get_live_dashboard():
     
     if not latest_readings:
         # Return default state if no readings
-        return jsonify({
+        return {
             "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
             "latest_reading": None,
             "status": STATUS_NORMAL,
@@ -167,7 +364,7 @@ def get_live_dashboard():
                 "is_filling": False,
                 "is_draining": False,
             },
-        }), HTTP_OK
+        }
     
     latest = latest_readings[0]
     
@@ -186,7 +383,7 @@ def get_live_dashboard():
         "latest_reading": latest,
         "status": analysis["status"],
         "status_message": analysis["status_message"],
-        "alerts": active_alerts[:5],  # Limit to 5 most recent
+        "alerts": serialize_alerts(active_alerts[:5]),  # Limit to 5 most recent
         "alerts_count": len(active_alerts),
         "tank_status": {
             "water_level_percent": water_level,
@@ -197,7 +394,7 @@ def get_live_dashboard():
         },
     }
     
-    return jsonify(response), HTTP_OK
+    return response
 
 
 def _get_level_status(water_level: float) -> str:
@@ -241,7 +438,9 @@ def get_daily_analytics():
     analytics_service = get_analytics_service()
     analytics = analytics_service.get_daily_analytics(days=days)
     
-    return jsonify(analytics), HTTP_OK
+    with span("serialization"):
+        body = jsonify(analytics)
+    return body, HTTP_OK
 
 
 @api_bp.route("/analytics/weekly", methods=["GET"])
@@ -306,10 +505,22 @@ def get_alerts():
     
     return jsonify({
         "count": len(alerts),
-        "alerts": alerts,
+        "alerts": serialize_alerts(alerts),
     }), HTTP_OK
 
 
+@api_bp.route("/alerts/<int:alert_id>/acknowledge", methods=["POST"])
+def acknowledge_alert(alert_id: int):
+    """
+    Acknowledge an alert so it no longer counts as active.
+
+    Returns:
+        JSON with the acknowledged alert
+    """
+    alert = get_alert_service().acknowledge(alert_id)
+    return jsonify({"success": True, "alert": alert.to_dict()}), HTTP_OK
+
+
 # ============================================================================
 # Prediction Endpoints
 # ============================================================================
@@ -319,86 +530,83 @@ def predict_water_shortage():
     """
     Predict water shortage based on current usage patterns.
     
+    The prediction is refreshed in the background; the latest result is
+    served together with its age.
+    
     Returns:
         JSON with prediction data including hours remaining and usage comparison
     """
-    sensor_service = get_sensor_service()
-    analytics_service = get_analytics_service()
+    from ..services.prediction_service import WATER_SHORTAGE
     
-    # Get current water level
-    latest = sensor_service.get_latest_readings(limit=1)
-    if not latest:
-        return jsonify({
-            "error": "No sensor data available",
-            "hours_remaining": 0,
-            "usage_status": "unknown"
-        }), HTTP_OK
-    
-    current_level = latest[0].get("water_level_percent", 50)
-    current_flow = latest[0].get("flow_rate_lpm", 0)
+    prediction_service = get_prediction_service()
+    return jsonify(prediction_service.get(WATER_SHORTAGE)), HTTP_OK
+
+
+@api_bp.route("/predictions/fleet", methods=["GET"])
+def predict_fleet():
+    """
+    Project time-to-empty and time-to-overflow for every tank.
     
-    # Get historical average usage (last 7 days)
-    analytics = analytics_service.get_daily_analytics(days=7)
-    avg_daily_flow = analytics["summary"]["total_water_flow_liters"] / 7
+    Query Parameters:
+        - horizon_hours: How far ahead to project (default: 168, max: 672)
     
-    # Get today's usage
-    today_analytics = analytics_service.get_daily_analytics(days=1)
-    today_flow = today_analytics["summary"]["total_water_flow_liters"]
+    Returns:
+        JSON with one projection per tank
+    """
+    horizon_param = request.args.get("horizon_hours", str(FORECAST_HORIZON_HOURS))
     
-    # Simple prediction logic
-    # Assume tank capacity is 1000L (10L per 1%)
-    tank_capacity_liters = 1000
-    current_water_liters = (current_level / 100) * tank_capacity_liters
+    try:
+        horizon_hours = int(horizon_param)
+        horizon_hours = max(1, min(4 * FORECAST_HORIZON_HOURS, horizon_hours))
+    except ValueError:
+        horizon_hours = FORECAST_HORIZON_HOURS
     
-    # Calculate hours remaining based on current flow rate
-    if current_flow > 0:
-        hours_remaining = current_water_liters / (current_flow * 60)  # Convert L/min to L/hour
-    else:
-        # Use average daily consumption
-        avg_hourly_consumption = avg_daily_flow / 24
-        if avg_hourly_consumption > 0:
-            hours_remaining = current_water_liters / avg_hourly_consumption
-        else:
-            hours_remaining = 999  # Essentially infinite
-    
-    # Compare today's usage with average
-    usage_diff_percent = 0
-    if avg_daily_flow > 0:
-        usage_diff_percent = ((today_flow - avg_daily_flow) / avg_daily_flow) * 100
-    
-    # Determine usage status
-    if usage_diff_percent > 20:
-        usage_status = "high"
-        usage_message = f"Today's usage is {abs(usage_diff_percent):.1f}% above normal"
-    elif usage_diff_percent < -20:
-        usage_status = "low"
-        usage_message = f"Today's usage is {abs(usage_diff_percent):.1f}% below normal"
-    else:
-        usage_status = "normal"
-        usage_message = "Today's usage is within normal range"
-    
-    # Determine warning level
-    if hours_remaining < 6:
-        warning_level = "critical"
-    elif hours_remaining < 12:
-        warning_level = "warning"
-    elif hours_remaining < 24:
-        warning_level = "caution"
+    if horizon_hours == FORECAST_HORIZON_HOURS:
+        from ..services.prediction_service import FLEET_FORECAST
+        forecast = get_prediction_service().get(FLEET_FORECAST)
     else:
-        warning_level = "normal"
+        forecast = get_forecast_service().forecast_fleet(horizon_hours=horizon_hours)
     
-    return jsonify({
-        "hours_remaining": round(hours_remaining, 1),
-        "current_level_percent": round(current_level, 1),
-        "current_water_liters": round(current_water_liters, 1),
-        "usage_status": usage_status,
-        "usage_message": usage_message,
-        "usage_diff_percent": round(usage_diff_percent, 1),
-        "warning_level": warning_level,
-        "avg_daily_consumption": round(avg_daily_flow, 1),
-        "today_consumption": round(today_flow, 1),
-        "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
-    }), HTTP_OK
+    return jsonify(forecast), HTTP_OK
+
+
+# ============================================================================
+# Tank Metadata Endpoints
+# ============================================================================
+
+@api_bp.route("/tanks/<tank_id>", methods=["GET"])
+def get_tank(tank_id: str):
+    """
+    Get tank metadata.
+    
+    Returns:
+        JSON with tank capacity (defaults apply to unregistered tanks)
+    """
+    forecast_service = get_forecast_service()
+    return jsonify(forecast_service.get_tank(tank_id)), HTTP_OK
+
+
+@api_bp.route("/tanks/<tank_id>", methods=["PUT"])
+def update_tank(tank_id: str):
+    """
+    Store tank metadata.
+    
+    Body:
+        {"capacity_liters": 1500}
+    
+    Returns:
+        JSON with the stored tank metadata
+    """
+    data = request.get_json()
+    if not data:
+        raise ValidationError("Request body must be valid JSON")
+    
+    metadata = validate_tank_metadata(data)
+    
+    forecast_service = get_forecast_service()
+    tank = forecast_service.set_tank_capacity(tank_id, metadata["capacity_liters"])
+    
+    return jsonify(tank), HTTP_OK
 
 
 # ============================================================================
@@ -446,7 +654,7 @@ def control_pump(pump_id: str):
     
     if control_key in _control_state:
         _control_state[control_key] = state
-        logger.info(f"Pump {pump_id} set to {'ON' if state else 'OFF'}")
+        logger.info("Pump set", extra={"fields": {"pump_id": pump_id, "state": "ON" if state else "OFF"}})
         
         return jsonify({
             "success": True,
@@ -478,7 +686,7 @@ def control_valve(valve_id: str):
     
     if control_key in _control_state:
         _control_state[control_key] = state
-        logger.info(f"Valve {valve_id} set to {'OPEN' if state else 'CLOSED'}")
+        logger.info("Valve set", extra={"fields": {"valve_id": valve_id, "state": "OPEN" if state else "CLOSED"}})
         
         return jsonify({
             "success": True,
@@ -507,7 +715,7 @@ def control_auto_mode():
     
     state = bool(data["state"])
     _control_state["auto_mode"] = state
-    logger.info(f"Auto mode set to {'ON' if state else 'OFF'}")
+    logger.info("Auto mode set", extra={"fields": {"state": "ON" if state else "OFF"}})
     
     return jsonify({
         "success": True,
@@ -527,70 +735,64 @@ def get_conservation_report():
     Get water conservation report.
     
     Query Parameters:
-        - period: 'daily' or 'weekly' (default: 'weekly')
+        - period: 'daily', 'weekly', 'monthly' or 'custom' (default: 'weekly')
+        - start, end: Inclusive YYYY-MM-DD range (required for 'custom')
+        - tank_id: Optional tank to restrict the report to
     
     Returns:
         JSON with conservation metrics and explanations
     """
     period = request.args.get("period", "weekly")
-    
-    analytics_service = get_analytics_service()
-    
-    # Get analytics for the period
-    days = 7 if period == "weekly" else 1
-    analytics = analytics_service.get_daily_analytics(days=days)
-    
-    # Calculate conservation metrics
-    total_usage = analytics["summary"]["total_water_flow_liters"]
-    avg_daily = total_usage / days
-    
-    # Baseline: assume 15% higher usage without conservation
-    baseline_usage = total_usage * 1.15
-    water_saved = baseline_usage - total_usage
-    savings_percent = (water_saved / baseline_usage) * 100
-    
-    # Calculate efficiency based on water level stability
-    avg_level = analytics["summary"]["average_daily_level"]
-    if avg_level >= 60:
-        efficiency = 85 + (avg_level - 60) / 4  # 85-95%
-    elif avg_level >= 40:
-        efficiency = 70 + (avg_level - 40) / 2  # 70-85%
-    else:
-        efficiency = 50 + avg_level / 2  # 50-70%
-    
-    efficiency = min(95, max(50, efficiency))
-    
-    # Generate insights
-    insights = []
-    
-    if efficiency >= 80:
-        insights.append("Excellent water management! System is operating efficiently.")
-    elif efficiency >= 70:
-        insights.append("Good water usage patterns. Minor optimizations possible.")
+    tank_id = request.args.get("tank_id")
+    
+    if period == "custom":
+        start_day, end_day = validate_date_range(request.args.get("start"), request.args.get("end"))
+        report = get_conservation_service().get_report(period, start_day, end_day, tank_id=tank_id)
+    elif period not in CONSERVATION_PERIODS:
+        raise ValidationError(
+            f"period must be one of: {', '.join(CONSERVATION_PERIODS)}, custom",
+            field="period"
+        )
+    elif tank_id:
+        report = get_conservation_service().get_report(period, tank_id=tank_id)
     else:
-        insights.append("Water usage can be optimized. Consider reviewing consumption patterns.")
+        # Fleet-wide reports for standard periods are materialized
+        from ..services.prediction_service import conservation_key
+        report = get_prediction_service().get(conservation_key(period))
     
-    if water_saved > 100:
-        insights.append(f"You've saved {water_saved:.0f}L compared to baseline usage.")
+    return jsonify(report), HTTP_OK
+
+
+# ============================================================================
+# Export Endpoints
+# ============================================================================
+
+@api_bp.route("/export/readings", methods=["GET"])
+def export_readings():
+    """
+    Stream raw readings for offline analysis.
     
-    if avg_daily < 500:
-        insights.append("Daily consumption is below average. Great conservation effort!")
-    elif avg_daily > 800:
-        insights.append("Daily consumption is high. Look for ways to reduce usage.")
+    Query Parameters:
+        - start, end: Optional window bounds (ISO timestamps; default: everything)
+        - tank_id: Optional tank to restrict the export to
+        - format: 'ndjson' (default) or 'csv'
     
-    return jsonify({
-        "period": period,
-        "days": days,
-        "total_usage_liters": round(total_usage, 1),
-        "average_daily_liters": round(avg_daily, 1),
-        "water_saved_liters": round(water_saved, 1),
-        "savings_percent": round(savings_percent, 1),
-        "efficiency_percent": round(efficiency, 1),
-        "insights": insights,
-        "explanation": {
-            "efficiency": "Calculated based on water level stability and usage patterns",
-            "savings": "Compared to baseline usage without conservation measures",
-            "method": "Simple comparison with 15% higher baseline consumption",
-        },
-        "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
-    }), HTTP_OK
+    Returns:
+        Chunked NDJSON or CSV body with one reading per line, in time order
+    """
+    start = validate_time_param(request.args.get("start"), "start")
+    end = validate_time_param(request.args.get("end"), "end")
+    if start is not None and end is not None and end < start:
+        raise ValidationError("end must not be before start", field="end")
+    
+    file_format = request.args.get("format", "ndjson")
+    chunks = get_export_service().stream(
+        file_format,
+        start=start if start is not None else 0.0,
+        end=end if end is not None else float("inf"),
+        tank_id=request.args.get("tank_id"),
+    )
+    
+    response = Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[file_format])
+    response.headers["Content-Disposition"] = f"attachment; filename=readings.{file_format}"
+    return response
@@ -4,62 +4,138 @@ Uses factory pattern for flexibility and testing.
 """
 
 import logging
+import os
+import time
+from typing import TYPE_CHECKING
 from flask import Flask
 
 from .config import get_config
-from .extensions import cors
+from .constants import (
+    ANALYTICS_POOL_WORKERS,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_PER_SECOND,
+    OFFLINE_POLL_SECONDS,
+    SEED_MODE_NONE,
+    SEED_MODE_SAMPLE,
+    SEED_SAMPLE_DAYS,
+    SEED_SAMPLE_TANKS,
+    SNAPSHOT_FILENAME,
+)
+from .logging_config import LOG_FORMATS, Lazy, configure_logging
+from .extensions import cors, compressor, metrics, profiler
 from .errors.handlers import register_error_handlers
-from .api.routes import api_bp, register_health_route
+from .services.seeding import configure_seeding
+from .api.routes import (
+    api_bp,
+    dashboard_flights,
+    register_health_route,
+    get_analytics_service,
+    get_prediction_service,
+    get_sensor_service,
+    get_alert_service,
+)
+from .utils.startup import StartupReport
+from . import _import_started
+
+if TYPE_CHECKING:
+    from .services.store_metrics import StoreMetrics
+
+_imports_done = time.perf_counter()
+_first_app = True  # Only the first app's report includes the import phase
 
 
 def create_app(config_override: dict = None) -> Flask:
     """
     Create and configure the Flask application.
     
+    The time taken by each startup phase is kept in
+    app.extensions["startup"] (a StartupReport) and logged.
+    
     Args:
         config_override: Optional dictionary of config values to override
         
     Returns:
         Configured Flask application instance
     """
-    app = Flask(__name__)
-    
-    # Load configuration
-    config = get_config()
-    app.config.from_object(config)
+    global _first_app
+    report = StartupReport()
+    if _first_app:
+        report.add("imports", _imports_done - _import_started)
+        _first_app = False
     
-    # Apply any overrides
-    if config_override:
-        app.config.update(config_override)
+    with report.phase("config"):
+        app = Flask(__name__)
+        app.extensions["startup"] = report
+        
+        # Load configuration
+        config = get_config()
+        app.config.from_object(config)
+        
+        # Apply any overrides
+        if config_override:
+            app.config.update(config_override)
     
     # Configure logging
-    _configure_logging(app)
+    with report.phase("logging"):
+        _configure_logging(app)
     
-    # Initialize extensions
-    _init_extensions(app)
+    with report.phase("extensions"):
+        # Initialize extensions
+        _init_extensions(app)
+        
+        # Register blueprints
+        _register_blueprints(app)
+        
+        # Register error handlers
+        register_error_handlers(app)
+        
+        # Register root-level health check
+        register_health_route(app)
     
-    # Register blueprints
-    _register_blueprints(app)
+    # Create the store before any service touches it
+    with report.phase("seed"):
+        _init_seed(app)
     
-    # Register error handlers
-    register_error_handlers(app)
+    # Restore the store from disk before anything reads it
+    with report.phase("segments"):
+        _init_segments(app)
+    with report.phase("persistence"):
+        _init_persistence(app)
     
-    # Register root-level health check
-    register_health_route(app)
+    with report.phase("background"):
+        # Keep predictions materialized off the request path
+        _init_scheduler(app)
+        
+        # Enforce data retention in the background
+        _init_compactor(app)
+        
+        # Accept line-protocol readings over TCP/UDP
+        _init_ingest_listener(app)
+        
+        # Export store, queue and cache gauges on /metrics
+        _init_metrics(app)
     
-    app.logger.info(f"Smart Water API initialized in {app.config.get('ENV', 'development')} mode")
+    app.logger.info(
+        "Smart Water API initialized",
+        extra={"fields": {"env": app.config.get("ENV", "development"), "startup": Lazy(report.summary)}},
+    )
     
     return app
 
 
 def _configure_logging(app: Flask) -> None:
-    """Configure application logging."""
+    """Configure application logging (written off the request path by default)."""
     log_level = app.config.get("LOG_LEVEL", "INFO")
     
-    logging.basicConfig(
-        level=getattr(logging, log_level, logging.INFO),
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
+    log_format = app.config.get("LOG_FORMAT", "text")
+    if log_format not in LOG_FORMATS:
+        log_format = "text"
+    configure_logging(
+        level=log_level,
+        log_format=log_format,
+        asynchronous=app.config.get("LOG_ASYNC", True),
+        queue_size=app.config.get("LOG_QUEUE_SIZE", LOG_QUEUE_SIZE),
+        sample_per_second=app.config.get("LOG_SAMPLE_PER_SECOND", LOG_SAMPLE_PER_SECOND),
     )
     
     # Set Flask's logger
@@ -76,8 +152,143 @@ def _init_extensions(app: Flask) -> None:
         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         supports_credentials=True
     )
+    
+    # Time requests; registered before the compressor so its hook runs last
+    metrics.init_app(app)
+    
+    # Trace sampled requests (opt-in via PROFILING_ENABLED)
+    profiler.init_app(app)
+    
+    # Compress large JSON payloads for mobile clients
+    compressor.init_app(app)
+    
+    # Fork the analytics workers now, before the store is loaded (the pool
+    # is only used while running, so there is nothing to set up otherwise)
+    if _runs_in_background(app, "ANALYTICS_POOL_WORKERS", ANALYTICS_POOL_WORKERS):
+        from .extensions import analytics_pool
+        analytics_pool.init_app(app)
 
 
 def _register_blueprints(app: Flask) -> None:
     """Register application blueprints."""
     app.register_blueprint(api_bp)
+
+
+def _init_seed(app: Flask) -> None:
+    """Choose how the mock database is seeded when it is first used."""
+    mode = app.config.get("SEED_MODE", SEED_MODE_SAMPLE)
+    data_dir = app.config.get("DATA_DIR", "")
+    if app.config.get("PERSISTENCE_ENABLED", False) and os.path.exists(os.path.join(data_dir, SNAPSHOT_FILENAME)):
+        mode = SEED_MODE_NONE  # Recovery replaces whatever was seeded
+    configure_seeding(
+        mode=mode,
+        days=app.config.get("SEED_DAYS", SEED_SAMPLE_DAYS),
+        tanks=app.config.get("SEED_TANKS", SEED_SAMPLE_TANKS),
+        snapshot_path=app.config.get("SEED_SNAPSHOT_PATH"),
+    )
+
+
+def _init_segments(app: Flask) -> None:
+    """Keep sealed reading history in memory-mapped segments, if enabled."""
+    if app.config.get("SEGMENTS_ENABLED", False):
+        from .storage.segments import SegmentStore
+        
+        segments = SegmentStore(app.config["SEGMENTS_DIR"]).open()
+        get_sensor_service().db.attach_segments(segments)
+
+
+def _init_persistence(app: Flask) -> None:
+    """Recover the database and alerts from disk and journal later writes."""
+    if not app.config.get("PERSISTENCE_ENABLED", False):
+        return
+    from .extensions import persistence
+    
+    persistence.init_app(app, db=get_sensor_service().db, alert_service=_alert_service(app))
+
+
+def _init_scheduler(app: Flask) -> None:
+    """Bind the background refresh scheduler to predictions and offline detection."""
+    from .extensions import scheduler
+    
+    # Services are resolved on the scheduler thread, not during startup
+    scheduler.init_app(
+        app,
+        job=lambda: get_prediction_service().refresh(),
+        version=lambda: get_sensor_service().data_version,
+        ticks=[(
+            lambda: _alert_service(app).poll_offline(),
+            app.config.get("OFFLINE_POLL_SECONDS", OFFLINE_POLL_SECONDS),
+        )],
+    )
+
+
+def _init_compactor(app: Flask) -> None:
+    """Bind the retention compactor to the stores it expires."""
+    from .extensions import compactor
+    
+    background = _runs_in_background(app, "COMPACTION_ENABLED", True)
+    # Resolved by the compactor's first cycle (or seal()), not during startup
+    compactor.init_app(
+        app,
+        stores=lambda: (get_sensor_service().db, _alert_service(app) if background else None),
+    )
+
+
+def _init_ingest_listener(app: Flask) -> None:
+    """Bind the TCP/UDP ingest listener to the sensor and alert services, if it runs."""
+    if not _runs_in_background(app, "INGEST_LISTENER_ENABLED", False):
+        return
+    from .extensions import ingest_listener, scheduler
+    
+    ingest_listener.init_app(
+        app,
+        sensor_service=get_sensor_service(),
+        alert_service=_alert_service(app),
+        on_ingest=scheduler.notify,
+    )
+
+
+def _init_metrics(app: Flask) -> None:
+    """Register the store collector with the /metrics endpoint (built on first scrape)."""
+    store_metrics = []
+    
+    def collect():
+        if not store_metrics:
+            store_metrics.append(_build_store_metrics(app))
+        return store_metrics[0].collect()
+    
+    metrics.register_collector(collect)
+
+
+def _build_store_metrics(app: Flask) -> "StoreMetrics":
+    """Create the store collector over the services' stores and caches."""
+    from .services.store_metrics import StoreMetrics
+    
+    persistence = app.extensions.get("persistence")
+    prediction_service = get_prediction_service()
+    sensor_flights = get_sensor_service().flights
+    analytics_flights = get_analytics_service().flights
+    return StoreMetrics(
+        get_sensor_service().db,
+        alert_service=_alert_service(app),
+        persistence=persistence if persistence is not None and persistence.is_open else None,
+        caches={
+            "compression": lambda: (compressor.cache.hits, compressor.cache.misses),
+            "predictions": lambda: (prediction_service.hits, prediction_service.misses),
+            # Single-flight: calls that shared another's result count as hits
+            "flight_dashboard": lambda: (dashboard_flights.shared, dashboard_flights.executions),
+            "flight_latest_readings": lambda: (sensor_flights.shared, sensor_flights.executions),
+            "flight_daily_analytics": lambda: (analytics_flights.shared, analytics_flights.executions),
+        },
+    )
+
+
+def _alert_service(app: Flask):
+    """Get the alert service, which reads its rules path from the app config."""
+    with app.app_context():
+        return get_alert_service()
+
+
+def _runs_in_background(app: Flask, flag: str, default: bool) -> bool:
+    """Whether an extension's thread will be started (never under testing)."""
+    return bool(app.config.get(flag, default)) and not app.testing
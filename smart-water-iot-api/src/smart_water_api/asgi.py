@@ -0,0 +1,393 @@
+"""
+ASGI entry point.
+Serves the API to an ASGI server (e.g. uvicorn). Regular requests run the
+Flask views in a thread pool; dashboard streams and long polls are served on
+the event loop, so a waiting client holds a coroutine instead of a thread.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import sys
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from flask import Flask
+
+from .api.async_services import AsyncServices
+from .app_factory import create_app
+from .constants import (
+    API_PREFIX,
+    ASGI_LONG_POLL_MAX_SECONDS,
+    ASGI_MAX_BODY_BYTES,
+    ASGI_MAX_STREAMS,
+    ASGI_STREAM_KEEPALIVE_SECONDS,
+    ASGI_STREAM_POLL_SECONDS,
+    ASGI_WORKER_THREADS,
+    HTTP_OK,
+    HTTP_PAYLOAD_TOO_LARGE,
+    HTTP_SERVICE_UNAVAILABLE,
+)
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = f"{API_PREFIX}/dashboard/stream"
+LIVE_PATH = f"{API_PREFIX}/dashboard/live"
+VERSION_HEADER = "X-Dashboard-Version"
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class DashboardFeed:
+    """
+    One live dashboard payload shared by every streaming client.
+
+    A single task polls a cheap change key; when it moves, the payload is
+    built once in the pool, encoded once, and every waiting client is woken.
+    The cost of a change is one build plus one send per client, so it grows
+    with the number of clients only in the sends.
+    """
+
+    def __init__(self, services: AsyncServices, poll_seconds: float = ASGI_STREAM_POLL_SECONDS):
+        self._services = services
+        self.poll_seconds = poll_seconds
+        self.version = 0  # Bumped with every new payload (0 = none built yet)
+        self.payload = b""
+        self._key = None
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start polling (idempotent; needs a running event loop)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop polling."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """
+        Wait for a payload newer than version.
+
+        Args:
+            version: Last version the client has seen (0 = none)
+            timeout: Seconds to wait at most
+
+        Returns:
+            True if a newer payload is available, False on timeout
+        """
+        self.start()
+        if self.version and self.version != version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._refresh()
+            except Exception:
+                logger.exception("Dashboard feed refresh failed")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _refresh(self) -> None:
+        key = self._services.dashboard_version()
+        if key == self._key:
+            return
+        payload = await self._services.live_dashboard()
+        self._key = key
+        self.payload = json.dumps(payload, default=str).encode()
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class AsgiApp:
+    """
+    ASGI application serving the Flask API.
+
+    Every api_bp route (ingest, dashboard, analytics, alerts, predictions,
+    controls, ...) runs unchanged through a WSGI bridge on the service
+    pool, with the app's metrics, compression and error handling; a
+    connection waiting for its turn costs no thread. Two dashboard modes
+    run on the event loop instead:
+
+      * GET /dashboard/stream - Server-Sent Events, one 'dashboard' event
+        per change (resumable with Last-Event-ID), comments as keepalive
+      * GET /dashboard/live?wait=N[&version=V] - long poll: answers when the
+        dashboard moves past version V or after N seconds
+
+    Both are limited to ASGI_MAX_STREAMS concurrent clients.
+    """
+
+    def __init__(self, flask_app: Flask, services: Optional[AsyncServices] = None):
+        """
+        Wrap a Flask app.
+
+        Args:
+            flask_app: App created by create_app()
+            services: Async service facade (default: one over flask_app)
+        """
+        config = flask_app.config
+        self.flask_app = flask_app
+        self.services = services or AsyncServices(
+            flask_app, config.get("ASGI_WORKER_THREADS", ASGI_WORKER_THREADS)
+        )
+        self.feed = DashboardFeed(self.services, config.get("ASGI_STREAM_POLL_SECONDS", ASGI_STREAM_POLL_SECONDS))
+        self.max_streams = config.get("ASGI_MAX_STREAMS", ASGI_MAX_STREAMS)
+        self.keepalive_seconds = config.get("ASGI_STREAM_KEEPALIVE_SECONDS", ASGI_STREAM_KEEPALIVE_SECONDS)
+        self.streams = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        kind = scope["type"]
+        if kind == "lifespan":
+            await self._lifespan(receive, send)
+        elif kind != "http":
+            await send({"type": "websocket.close", "code": 1000})
+        elif scope["method"] == "GET" and scope["path"] == STREAM_PATH:
+            await self._stream(scope, receive, send)
+        elif scope["method"] == "GET" and scope["path"] == LIVE_PATH and b"wait=" in scope.get("query_string", b""):
+            await self._long_poll(scope, send)
+        else:
+            await self._call_flask(scope, receive, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.feed.start()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.feed.stop()
+                self.services.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ========================================================================
+    # Dashboard streams (event loop)
+    # ========================================================================
+
+    async def _stream(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.streams >= self.max_streams:
+            await self._send_unavailable(send)
+            return
+        self.streams += 1
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": HTTP_OK,
+                "headers": self._headers([
+                    ("content-type", "text/event-stream"),
+                    ("cache-control", "no-cache"),
+                    ("x-accel-buffering", "no"),  # Don't let proxies buffer the stream
+                ]),
+            })
+            version = _int(_header(scope, b"last-event-id"))
+            while not disconnected.done():
+                changed = await self.feed.wait(version, self.keepalive_seconds)
+                if disconnected.done():
+                    break
+                if changed:
+                    version = self.feed.version
+                    event = b"id: %d\nevent: dashboard\ndata: %s\n\n" % (version, self.feed.payload)
+                else:
+                    event = b": keepalive\n\n"
+                await send({"type": "http.response.body", "body": event, "more_body": True})
+        finally:
+            self.streams -= 1
+            disconnected.cancel()
+
+    async def _long_poll(self, scope: Scope, send: Send) -> None:
+        if self.streams >= self.max_streams:
+            await self._send_unavailable(send)
+            return
+        query = parse_qs(scope["query_string"].decode("latin-1"))
+        wait = min(max(_float(query.get("wait", [""])[0]), 0.0), ASGI_LONG_POLL_MAX_SECONDS)
+        self.streams += 1
+        try:
+            await self.feed.wait(_int(query.get("version", [""])[0]), wait)
+        finally:
+            self.streams -= 1
+        if not self.feed.version:
+            await self._send(send, HTTP_SERVICE_UNAVAILABLE, _error("UNAVAILABLE", "Dashboard not ready yet"))
+            return
+        await self._send(send, HTTP_OK, self.feed.payload, [(VERSION_HEADER, str(self.feed.version))])
+
+    # ========================================================================
+    # Flask views (service pool)
+    # ========================================================================
+
+    async def _call_flask(self, scope: Scope, receive: Receive, send: Send) -> None:
+        body = await _read_body(receive, ASGI_MAX_BODY_BYTES)
+        if body is None:
+            await self._send(send, HTTP_PAYLOAD_TOO_LARGE, _error("PAYLOAD_TOO_LARGE", "Request body too large"))
+            return
+
+        loop = asyncio.get_running_loop()
+        executor = self.services.executor
+        response: Dict[str, Any] = {}
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = headers
+            return _no_write
+
+        # Streamed bodies (exports) are pulled one chunk per pool hop
+        iterable = await loop.run_in_executor(executor, self.flask_app, _build_environ(scope, body), start_response)
+        chunks = iter(iterable)
+        try:
+            chunk = await loop.run_in_executor(executor, next, chunks, None)
+            await send({
+                "type": "http.response.start",
+                "status": response["status"],
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in response["headers"]],
+            })
+            while chunk is not None:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(executor, next, chunks, None)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                await loop.run_in_executor(executor, close)
+
+    # ========================================================================
+    # Helpers
+    # ========================================================================
+
+    def _headers(self, headers: Iterable[Tuple[str, str]]) -> List[Tuple[bytes, bytes]]:
+        # Same CORS policy as the Flask app (see _init_extensions)
+        headers = [*headers, ("access-control-allow-origin", "*")]
+        return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+    async def _send(self, send: Send, status: int, body: bytes, headers: Iterable[Tuple[str, str]] = ()) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": self._headers([("content-type", "application/json"), ("content-length", str(len(body))), *headers]),
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _send_unavailable(self, send: Send) -> None:
+        await self._send(
+            send,
+            HTTP_SERVICE_UNAVAILABLE,
+            _error("TOO_MANY_STREAMS", f"At most {self.max_streams} dashboard streams per process"),
+            [("retry-after", "5")],
+        )
+
+
+def create_asgi_app(config_override: dict = None) -> AsgiApp:
+    """
+    Create the ASGI application.
+
+    Args:
+        config_override: Optional dictionary of config values to override
+
+    Returns:
+        ASGI callable serving the API
+    """
+    return AsgiApp(create_app(config_override))
+
+
+def _build_environ(scope: Scope, body: bytes) -> Dict[str, Any]:
+    """WSGI environ for an ASGI HTTP request (PEP 3333 strings are latin-1)."""
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_LENGTH":
+            continue  # Set from the body actually received
+        key = name if name == "CONTENT_TYPE" else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive: Receive, limit: int) -> Optional[bytes]:
+    """The full request body, or None if it exceeds limit bytes."""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return b"".join(chunks)
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _wait_for_disconnect(receive: Receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def _header(scope: Scope, name: bytes) -> str:
+    for key, value in scope.get("headers", []):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def _float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 0.0
+
+
+def _error(code: str, message: str) -> bytes:
+    return json.dumps({"error": {"code": code, "message": message}}).encode()
+
+
+def _no_write(data: bytes) -> None:
+    raise RuntimeError("The WSGI write() callable is not supported")
@@ -6,6 +6,46 @@ Handles environment-specific settings.
 import os
 from typing import Optional
 
+from .constants import (
+    COMPRESSION_MIN_SIZE_BYTES,
+    COMPRESSION_LEVEL_DEFAULT,
+    COMPRESSION_CACHE_MAX_ENTRIES,
+    SCHEDULER_REFRESH_SECONDS,
+    SCHEDULER_MIN_REFRESH_SECONDS,
+    OFFLINE_POLL_SECONDS,
+    RETENTION_RAW_DAYS,
+    RETENTION_HOURLY_DAYS,
+    RETENTION_DAILY_DAYS,
+    RETENTION_ALERT_DAYS,
+    COMPACTION_INTERVAL_SECONDS,
+    PERSISTENCE_DATA_DIR,
+    WAL_COMMIT_INTERVAL_MS,
+    SNAPSHOT_INTERVAL_SECONDS,
+    SEGMENT_ACTIVE_DAYS,
+    SEGMENTS_DIR,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_BUFFER_SIZE,
+    LOG_QUEUE_SIZE,
+    LOG_SAMPLE_PER_SECOND,
+    SEED_MODE_SAMPLE,
+    SEED_SAMPLE_DAYS,
+    SEED_SAMPLE_TANKS,
+    ASGI_WORKER_THREADS,
+    ASGI_MAX_STREAMS,
+    ASGI_STREAM_POLL_SECONDS,
+    ASGI_STREAM_KEEPALIVE_SECONDS,
+    ANALYTICS_POOL_WORKERS,
+    ANALYTICS_POOL_MAX_PENDING,
+    ANALYTICS_POOL_TIMEOUT_SECONDS,
+    INGEST_LISTENER_HOST,
+    INGEST_TCP_PORT,
+    INGEST_UDP_PORT,
+    INGEST_BATCH_SIZE,
+    INGEST_FLUSH_MS,
+    INGEST_MAX_CONNECTIONS,
+    INGEST_MAX_PENDING_BATCHES,
+)
+
 
 class BaseConfig:
     """Base configuration with default values."""
@@ -24,8 +64,91 @@ class BaseConfig:
     # API Settings
     JSON_SORT_KEYS: bool = False
     
+    # Seeding of the mock database: 'sample', 'none' or 'snapshot'
+    SEED_MODE: str = os.getenv("SEED_MODE", SEED_MODE_SAMPLE).lower()
+    SEED_DAYS: int = int(os.getenv("SEED_DAYS", SEED_SAMPLE_DAYS))
+    SEED_TANKS: int = int(os.getenv("SEED_TANKS", SEED_SAMPLE_TANKS))
+    SEED_SNAPSHOT_PATH: Optional[str] = os.getenv("SEED_SNAPSHOT_PATH")
+    
+    # Alert rules (JSON file with "rules" and per-tank "overrides")
+    ALERT_RULES_PATH: Optional[str] = os.getenv("ALERT_RULES_PATH")
+    
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text").lower()  # 'text' or 'json'
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "true").lower() == "true"
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", LOG_QUEUE_SIZE))
+    LOG_SAMPLE_PER_SECOND: float = float(os.getenv("LOG_SAMPLE_PER_SECOND", LOG_SAMPLE_PER_SECOND))
+    
+    # Response Compression
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", COMPRESSION_MIN_SIZE_BYTES))
+    COMPRESSION_LEVEL: int = int(os.getenv("COMPRESSION_LEVEL", COMPRESSION_LEVEL_DEFAULT))
+    COMPRESSION_CACHE_ENTRIES: int = COMPRESSION_CACHE_MAX_ENTRIES
+    
+    # Prometheus metrics on /metrics
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    
+    # Sampled request profiling on /debug/profiles (off by default)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_SAMPLE_RATE: int = int(os.getenv("PROFILING_SAMPLE_RATE", PROFILING_SAMPLE_RATE))
+    PROFILING_CPROFILE: bool = os.getenv("PROFILING_CPROFILE", "true").lower() == "true"
+    PROFILING_BUFFER_SIZE: int = int(os.getenv("PROFILING_BUFFER_SIZE", PROFILING_BUFFER_SIZE))
+    
+    # Background refresh of predictions and conservation reports
+    SCHEDULER_ENABLED: bool = os.getenv("SCHEDULER_ENABLED", "true").lower() == "true"
+    SCHEDULER_REFRESH_SECONDS: float = float(os.getenv("SCHEDULER_REFRESH_SECONDS", SCHEDULER_REFRESH_SECONDS))
+    SCHEDULER_MIN_REFRESH_SECONDS: float = float(
+        os.getenv("SCHEDULER_MIN_REFRESH_SECONDS", SCHEDULER_MIN_REFRESH_SECONDS)
+    )
+    OFFLINE_POLL_SECONDS: float = float(os.getenv("OFFLINE_POLL_SECONDS", OFFLINE_POLL_SECONDS))
+    
+    # Data retention (days; 0 keeps a tier forever)
+    RETENTION_RAW_DAYS: float = float(os.getenv("RETENTION_RAW_DAYS", RETENTION_RAW_DAYS))
+    RETENTION_HOURLY_DAYS: float = float(os.getenv("RETENTION_HOURLY_DAYS", RETENTION_HOURLY_DAYS))
+    RETENTION_DAILY_DAYS: float = float(os.getenv("RETENTION_DAILY_DAYS", RETENTION_DAILY_DAYS))
+    RETENTION_ALERT_DAYS: float = float(os.getenv("RETENTION_ALERT_DAYS", RETENTION_ALERT_DAYS))
+    COMPACTION_ENABLED: bool = os.getenv("COMPACTION_ENABLED", "true").lower() == "true"
+    COMPACTION_INTERVAL_SECONDS: float = float(
+        os.getenv("COMPACTION_INTERVAL_SECONDS", COMPACTION_INTERVAL_SECONDS)
+    )
+    
+    # Sealed history: older readings move to memory-mapped day segments
+    SEGMENTS_ENABLED: bool = os.getenv("SEGMENTS_ENABLED", "false").lower() == "true"
+    SEGMENTS_DIR: str = os.getenv("SEGMENTS_DIR", SEGMENTS_DIR)
+    SEGMENT_ACTIVE_DAYS: float = float(os.getenv("SEGMENT_ACTIVE_DAYS", SEGMENT_ACTIVE_DAYS))
+    
+    # Persistence: write-ahead log + periodic snapshots in DATA_DIR
+    PERSISTENCE_ENABLED: bool = os.getenv("PERSISTENCE_ENABLED", "false").lower() == "true"
+    DATA_DIR: str = os.getenv("DATA_DIR", PERSISTENCE_DATA_DIR)
+    WAL_SYNC_MODE: str = os.getenv("WAL_SYNC_MODE", "group").lower()
+    WAL_COMMIT_INTERVAL_MS: float = float(os.getenv("WAL_COMMIT_INTERVAL_MS", WAL_COMMIT_INTERVAL_MS))
+    SNAPSHOT_INTERVAL_SECONDS: float = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", SNAPSHOT_INTERVAL_SECONDS))
+    
+    # ASGI entry point (asgi.py): view threads and dashboard streams
+    ASGI_WORKER_THREADS: int = int(os.getenv("ASGI_WORKER_THREADS", ASGI_WORKER_THREADS))
+    ASGI_MAX_STREAMS: int = int(os.getenv("ASGI_MAX_STREAMS", ASGI_MAX_STREAMS))
+    ASGI_STREAM_POLL_SECONDS: float = float(os.getenv("ASGI_STREAM_POLL_SECONDS", ASGI_STREAM_POLL_SECONDS))
+    ASGI_STREAM_KEEPALIVE_SECONDS: float = float(
+        os.getenv("ASGI_STREAM_KEEPALIVE_SECONDS", ASGI_STREAM_KEEPALIVE_SECONDS)
+    )
+    
+    # Worker processes for long-window analytics (0 computes in the request thread)
+    ANALYTICS_POOL_WORKERS: int = int(os.getenv("ANALYTICS_POOL_WORKERS", ANALYTICS_POOL_WORKERS))
+    ANALYTICS_POOL_MAX_PENDING: int = int(os.getenv("ANALYTICS_POOL_MAX_PENDING", ANALYTICS_POOL_MAX_PENDING))
+    ANALYTICS_POOL_TIMEOUT_SECONDS: float = float(
+        os.getenv("ANALYTICS_POOL_TIMEOUT_SECONDS", ANALYTICS_POOL_TIMEOUT_SECONDS)
+    )
+    
+    # Line-protocol ingest over TCP/UDP (a port of 0 disables that transport)
+    INGEST_LISTENER_ENABLED: bool = os.getenv("INGEST_LISTENER_ENABLED", "false").lower() == "true"
+    INGEST_LISTENER_HOST: str = os.getenv("INGEST_LISTENER_HOST", INGEST_LISTENER_HOST)
+    INGEST_TCP_PORT: int = int(os.getenv("INGEST_TCP_PORT", INGEST_TCP_PORT))
+    INGEST_UDP_PORT: int = int(os.getenv("INGEST_UDP_PORT", INGEST_UDP_PORT))
+    INGEST_BATCH_SIZE: int = int(os.getenv("INGEST_BATCH_SIZE", INGEST_BATCH_SIZE))
+    INGEST_FLUSH_MS: float = float(os.getenv("INGEST_FLUSH_MS", INGEST_FLUSH_MS))
+    INGEST_MAX_CONNECTIONS: int = int(os.getenv("INGEST_MAX_CONNECTIONS", INGEST_MAX_CONNECTIONS))
+    INGEST_MAX_PENDING_BATCHES: int = int(os.getenv("INGEST_MAX_PENDING_BATCHES", INGEST_MAX_PENDING_BATCHES))
 
 
 class DevelopmentConfig(BaseConfig):
@@ -46,6 +169,10 @@ class TestingConfig(BaseConfig):
     
     # Always use mock Firebase in tests
     USE_MOCK_FIREBASE: bool = True
+    
+    # Tests drive refreshes and compaction explicitly
+    SCHEDULER_ENABLED: bool = False
+    COMPACTION_ENABLED: bool = False
 
 
 class ProductionConfig(BaseConfig):
@@ -22,8 +22,94 @@ FLOW_RATE_NORMAL_MAX = 15.0
 FLOW_RATE_LEAKAGE_THRESHOLD = 0.5  # Flow when tank should be stable
 FLOW_RATE_HIGH_USAGE = 20.0
 
+# Tank Defaults
+TANK_CAPACITY_DEFAULT_LITERS = 1000.0
+TANK_CAPACITY_MAX_LITERS = 10_000_000.0
+
+# Forecasting
+FORECAST_HORIZON_HOURS = 168  # Project one week ahead
+PROFILE_MAX_GAP_SECONDS = 7200  # Larger gaps don't contribute level-change rates
+FORECAST_CRITICAL_HOURS = 6
+FORECAST_WARNING_HOURS = 12
+FORECAST_CAUTION_HOURS = 24
+
+# Background Refresh (materialized predictions)
+SCHEDULER_REFRESH_SECONDS = 60  # Periodic refresh cadence
+SCHEDULER_MIN_REFRESH_SECONDS = 5  # Data changes trigger refreshes no more often than this
+SCHEDULER_JITTER_RATIO = 0.1  # Spread refreshes by up to +/-10% of the cadence
+
+# Chart Series (downsampled range queries)
+SERIES_DEFAULT_POINTS = 300
+SERIES_MAX_POINTS = 2000
+SERIES_DEFAULT_WINDOW_SECONDS = 86400  # Last 24 hours
+SERIES_BUCKET_STEPS_SECONDS = (
+    60, 300, 900, 1800,  # Raw-column buckets
+    3600, 7200, 10800, 21600, 43200,  # Hourly rollups
+    86400, 172800, 604800,  # Daily rollups
+)
+SERIES_LTTB_OVERSAMPLE = 4  # LTTB input buckets per output point
+SERIES_METHODS = ("buckets", "lttb")
+
+# Bulk Export (streamed reading dumps)
+EXPORT_FORMATS = {  # Format -> mimetype
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",  # Needs the optional pyarrow package
+}
+EXPORT_BATCH_ROWS = 1000  # Rows serialized per streamed chunk
+EXPORT_COLUMNS = ("timestamp", "device_id", "tank_id", "water_level_percent", "flow_rate_lpm")
+
+# Data Retention (0 days = keep forever)
+RETENTION_RAW_DAYS = 14
+RETENTION_HOURLY_DAYS = 365
+RETENTION_DAILY_DAYS = 0
+RETENTION_ALERT_DAYS = 30
+COMPACTION_INTERVAL_SECONDS = 300  # Pause between compaction cycles
+COMPACTION_SLICE_SECONDS = 0.005  # Work per slice, so requests never wait long for the GIL
+COMPACTION_PAUSE_SECONDS = 0.05  # Pause between slices of one cycle
+COMPACTION_CHUNK_SIZE = 500  # Items expired per step
+SEGMENT_ACTIVE_DAYS = 2  # Days of readings kept in memory before sealing to segments
+SEGMENTS_DIR = "data/segments"
+
+# Persistence (write-ahead log + snapshots)
+PERSISTENCE_DATA_DIR = "data"
+WAL_SYNC_MODES = ("group", "async")  # group: writers wait for fsync; async: background fsync
+WAL_COMMIT_INTERVAL_MS = 2  # How long the writer lingers to batch records into one fsync
+SNAPSHOT_INTERVAL_SECONDS = 600
+SNAPSHOT_FILENAME = "snapshot.npz"
+
+# Bulk Import
+IMPORT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}  # By file extension
+IMPORT_CHUNK_SIZE = 5000  # Lines parsed and stored per batch
+IMPORT_ERROR_SAMPLES = 20  # Rejected lines kept for the report
+
+# Conservation Reports
+CONSERVATION_PERIODS = ("daily", "weekly", "monthly")  # Materialized report periods
+CONSERVATION_PERIOD_DAYS = {"daily": 1, "weekly": 7, "monthly": 30}
+CONSERVATION_MAX_RANGE_DAYS = 366
+CONSERVATION_TRAILING_BASELINE_DAYS = 28  # Fallback baseline: trailing 4 weeks
+CONSERVATION_BASELINE_MIN_COVERAGE = 0.5  # Share of baseline days that must have data
+DAYS_PER_YEAR = 365
+
+# Leakage Detection (sliding window per tank)
+LEAK_WINDOW_SIZE = 16  # Readings kept per tank
+LEAK_IDLE_START_HOUR = 1  # Idle window start (UTC hour, inclusive)
+LEAK_IDLE_END_HOUR = 5  # Idle window end (UTC hour, exclusive)
+LEAK_PERSISTENCE_SECONDS = 1800  # Flow must persist this long while idle
+LEAK_FLOW_STABILITY_RATIO = 0.1  # Leaks are steady; usage fluctuates more than this
+LEAK_MIN_WINDOW_SECONDS = 600  # Minimum span before comparing level vs outflow
+LEAK_MAX_GAP_SECONDS = 7200  # Larger gaps between readings reset the window
+LEAK_MIN_UNEXPLAINED_LITERS = 20.0
+LEAK_UNEXPLAINED_RATIO = 0.3  # Share of the level drop not covered by metered flow
+LEAK_ALERT_COOLDOWN_SECONDS = 3600
+
 # Time Constants (in seconds)
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+HOURS_PER_WEEK = 168
 SENSOR_DATA_EXPIRY = 300  # 5 minutes
+OFFLINE_WHEEL_RESOLUTION_SECONDS = 1  # Offline timer wheel tick
+OFFLINE_POLL_SECONDS = 1  # How often the scheduler advances the offline wheel
 ANALYTICS_CACHE_TTL = 60  # 1 minute
 
 # Status Codes
@@ -51,7 +137,10 @@ HTTP_OK = 200
 HTTP_CREATED = 201
 HTTP_BAD_REQUEST = 400
 HTTP_NOT_FOUND = 404
+HTTP_PAYLOAD_TOO_LARGE = 413
 HTTP_INTERNAL_ERROR = 500
+HTTP_NOT_IMPLEMENTED = 501
+HTTP_SERVICE_UNAVAILABLE = 503
 
 # Validation Limits
 DEVICE_ID_MAX_LENGTH = 50
@@ -63,8 +152,100 @@ COLLECTION_SENSORS = "sensors"
 COLLECTION_READINGS = "sensor_readings"
 COLLECTION_ALERTS = "alerts"
 COLLECTION_ANALYTICS = "analytics"
+COLLECTION_TANKS = "tanks"
 
 # Default Values
 DEFAULT_PAGE_SIZE = 20
 MAX_PAGE_SIZE = 100
 DEFAULT_ANALYTICS_DAYS = 7
+
+# Response Compression
+COMPRESSION_MIN_SIZE_BYTES = 1024  # Below this, compression isn't worth it
+COMPRESSION_LEVEL_DEFAULT = 6
+COMPRESSION_CACHE_MAX_ENTRIES = 256
+COMPRESSION_CACHE_MAX_BYTES = 16 * 1024 * 1024  # 16 MB
+COMPRESSIBLE_MIMETYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/plain",
+)
+
+# Metrics (Prometheus text exposition)
+METRICS_PATH = "/metrics"
+METRICS_PREFIX = "smart_water"
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_LATENCY_BUCKETS_SECONDS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+METRICS_GC_BUCKETS_SECONDS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+# Request Profiling (opt-in)
+PROFILING_PATH = "/debug/profiles"
+PROFILING_HEADER = "X-Profile"  # Any non-empty value traces the request
+PROFILING_SAMPLE_RATE = 100  # Trace 1 in N requests (0 = header only)
+PROFILING_BUFFER_SIZE = 200  # Profiles kept in the ring buffer
+PROFILING_TOP_FUNCTIONS = 20  # cProfile functions kept per profile
+
+# Logging
+LOG_TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+LOG_QUEUE_SIZE = 10000  # Records buffered for the writer thread before dropping
+LOG_SAMPLE_PER_SECOND = 10  # Per-reading log lines let through per second and call site
+LOG_SAMPLE_BURST = 20
+
+# Startup Seeding of the mock database
+SEED_MODE_SAMPLE = "sample"  # Generated hourly readings
+SEED_MODE_NONE = "none"  # Start empty
+SEED_MODE_SNAPSHOT = "snapshot"  # Load a prebuilt persistence snapshot
+SEED_MODES = (SEED_MODE_SAMPLE, SEED_MODE_NONE, SEED_MODE_SNAPSHOT)
+SEED_SAMPLE_DAYS = 7
+SEED_SAMPLE_TANKS = 1
+
+# Fleet Simulator (synthetic load)
+SIM_TANKS = 10
+SIM_DEVICES_PER_TANK = 1
+SIM_INTERVAL_SECONDS = 60  # Simulated time between readings of a device
+SIM_CAPACITIES_LITERS = (1000.0, 2000.0, 5000.0)  # Tank sizes drawn per tank
+SIM_PEAK_FLOW_LPM = 10.0  # Usage at the busiest hour of an average tank
+# Share of peak usage per UTC hour: morning and evening peaks, near-zero at night
+SIM_DIURNAL_PROFILE = (
+    0.03, 0.02, 0.02, 0.02, 0.03, 0.15, 0.6, 1.0, 0.9, 0.5, 0.35, 0.3,
+    0.35, 0.3, 0.25, 0.25, 0.3, 0.5, 0.8, 0.9, 0.7, 0.45, 0.25, 0.1,
+)
+SIM_FLOW_NOISE = 0.1  # Relative standard deviation of usage
+SIM_REFILL_BELOW_PERCENT = 30.0  # Pump starts below this level
+SIM_REFILL_TO_PERCENT = 80.0  # ... and stops at this level (below the high-level warning)
+SIM_OVERFILL_TO_PERCENT = 99.0  # Stop level of tanks with a faulty float switch
+SIM_REFILL_LPM = 40.0
+SIM_LEAK_FRACTION = 0.05  # Share of tanks with a steady leak
+SIM_LEAK_LPM = 1.5
+SIM_OVERFLOW_FRACTION = 0.05  # Share of tanks that overfill
+SIM_HTTP_TIMEOUT_SECONDS = 10
+SIM_RANDOM_SEED = 42
+
+# ASGI entry point (async dashboard streams)
+ASGI_WORKER_THREADS = 32  # Threads running Flask views and service calls
+ASGI_MAX_STREAMS = 10000  # Concurrent dashboard streams / long polls per process
+ASGI_STREAM_POLL_SECONDS = 0.25  # How often the dashboard feed checks for new data
+ASGI_STREAM_KEEPALIVE_SECONDS = 15  # Comment sent on idle SSE streams
+ASGI_LONG_POLL_MAX_SECONDS = 60
+ASGI_MAX_BODY_BYTES = 16 * 1024 * 1024  # Larger request bodies are refused with 413
+
+# Analytics Process Pool (long-window computations off the request threads)
+ANALYTICS_POOL_WORKERS = 2  # Worker processes (0 = compute in the calling thread)
+ANALYTICS_POOL_MAX_PENDING = 16  # Distinct computations queued or running before callers are refused
+ANALYTICS_POOL_TIMEOUT_SECONDS = 30  # Callers give up (503) after this long
+ANALYTICS_OFFLOAD_MIN_DAYS = 14  # Daily analytics over at least this many days run in the pool
+ANALYTICS_OFFLOAD_MIN_TANKS = 1000  # Fleet forecasts over at least this many tanks run in the pool
+
+# Line-protocol Ingest Listener (TCP/UDP alternative to POST /sensors/ingest)
+INGEST_LISTENER_HOST = "0.0.0.0"
+INGEST_TCP_PORT = 7070  # 0 disables the TCP listener
+INGEST_UDP_PORT = 7071  # 0 disables the UDP listener
+INGEST_BATCH_SIZE = 5000  # Readings validated and written per bulk write
+INGEST_FLUSH_MS = 50  # Longest a received reading waits for its batch
+INGEST_MAX_LINE_BYTES = 512  # Longer lines are discarded
+INGEST_MAX_CONNECTIONS = 20000  # Concurrent device connections; more are closed
+INGEST_MAX_PENDING_BATCHES = 4  # Batches waiting for the writer before sockets stop being read
+INGEST_ERROR_SAMPLES = 20  # Recent rejected lines kept for inspection
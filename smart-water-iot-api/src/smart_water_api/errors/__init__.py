@@ -6,6 +6,8 @@ from .exceptions import (
     NotFoundError,
     SensorDataError,
     FirebaseError,
+    FeatureUnavailableError,
+    AnalyticsUnavailableError,
 )
 from .handlers import register_error_handlers
 
@@ -15,5 +17,7 @@ __all__ = [
     "NotFoundError",
     "SensorDataError",
     "FirebaseError",
+    "FeatureUnavailableError",
+    "AnalyticsUnavailableError",
     "register_error_handlers",
 ]
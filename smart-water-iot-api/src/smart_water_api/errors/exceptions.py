@@ -3,7 +3,13 @@ Custom exception classes for the Smart Water API.
 All exceptions inherit from APIError for consistent handling.
 """
 
-from ..constants import HTTP_BAD_REQUEST, HTTP_NOT_FOUND, HTTP_INTERNAL_ERROR
+from ..constants import (
+    HTTP_BAD_REQUEST,
+    HTTP_NOT_FOUND,
+    HTTP_INTERNAL_ERROR,
+    HTTP_NOT_IMPLEMENTED,
+    HTTP_SERVICE_UNAVAILABLE,
+)
 
 
 class APIError(Exception):
@@ -88,3 +94,41 @@ class FirebaseError(APIError):
             status_code=HTTP_INTERNAL_ERROR,
             error_code="DATABASE_ERROR"
         )
+
+
+class FeatureUnavailableError(APIError):
+    """Raised when a feature needs an optional dependency that isn't installed."""
+    
+    def __init__(self, message: str, dependency: str = None):
+        super().__init__(
+            message=message,
+            status_code=HTTP_NOT_IMPLEMENTED,
+            error_code="FEATURE_UNAVAILABLE"
+        )
+        self.dependency = dependency
+    
+    def to_dict(self) -> dict:
+        """Include the missing dependency in the error response."""
+        result = super().to_dict()
+        if self.dependency:
+            result["error"]["dependency"] = self.dependency
+        return result
+
+
+class AnalyticsUnavailableError(APIError):
+    """Raised when an offloaded analytics computation is refused or times out."""
+    
+    def __init__(self, message: str, reason: str = None):
+        super().__init__(
+            message=message,
+            status_code=HTTP_SERVICE_UNAVAILABLE,
+            error_code="ANALYTICS_UNAVAILABLE"
+        )
+        self.reason = reason
+    
+    def to_dict(self) -> dict:
+        """Include why the computation is unavailable ('busy' or 'timeout')."""
+        result = super().to_dict()
+        if self.reason:
+            result["error"]["reason"] = self.reason
+        return result
@@ -7,8 +7,10 @@ import logging
 from flask import Flask, jsonify
 from .exceptions import APIError
 from ..constants import HTTP_INTERNAL_ERROR, HTTP_NOT_FOUND, HTTP_BAD_REQUEST
+from ..logging_config import SampledLogger
 
 logger = logging.getLogger(__name__)
+_api_error_log = SampledLogger(logger)  # Client errors can arrive at request rate
 
 
 def register_error_handlers(app: Flask) -> None:
@@ -17,7 +19,7 @@ def register_error_handlers(app: Flask) -> None:
     @app.errorhandler(APIError)
     def handle_api_error(error: APIError):
         """Handle custom API errors."""
-        logger.warning(f"API Error: {error.error_code} - {error.message}")
+        _api_error_log.warning("API error", code=error.error_code, error=error.message)
         response = jsonify(error.to_dict())
         response.status_code = error.status_code
         return response
@@ -45,7 +47,7 @@ def register_error_handlers(app: Flask) -> None:
     @app.errorhandler(HTTP_INTERNAL_ERROR)
     def handle_internal_error(error):
         """Handle 500 Internal Server errors."""
-        logger.error(f"Internal Server Error: {str(error)}")
+        logger.error("Internal server error", extra={"fields": {"error": str(error)}})
         return jsonify({
             "error": {
                 "code": "INTERNAL_ERROR",
@@ -56,7 +58,7 @@ def register_error_handlers(app: Flask) -> None:
     @app.errorhandler(Exception)
     def handle_unexpected_error(error):
         """Catch-all handler for unexpected exceptions."""
-        logger.exception(f"Unexpected error: {str(error)}")
+        logger.exception("Unexpected error", extra={"fields": {"error": str(error)}})
         return jsonify({
             "error": {
                 "code": "INTERNAL_ERROR",
@@ -1,9 +1,53 @@
 """
 Flask extensions initialization.
 Extensions are initialized here and bound to app in factory.
+Background extensions are created on first access, so their modules (and
+multiprocessing, asyncio, numpy) load only in processes that use them.
 """
 
+import threading
+from importlib import import_module
+
 from flask_cors import CORS
 
+from .middleware.compression import ResponseCompressor
+from .middleware.metrics import RequestMetrics
+from .middleware.profiling import RequestProfiler
+
 # CORS extension instance
 cors = CORS()
+
+# Response compression extension instance
+compressor = ResponseCompressor()
+
+# Request latency histograms and /metrics
+metrics = RequestMetrics()
+
+# Sampled request tracing on /debug/profiles
+profiler = RequestProfiler()
+
+# Created on first access: name -> (module, class)
+_LAZY_EXTENSIONS = {
+    # Background refresh of materialized predictions
+    "scheduler": (".services.scheduler", "RefreshScheduler"),
+    # Background retention enforcement
+    "compactor": (".services.compactor", "Compactor"),
+    # Write-ahead log and snapshots of the in-memory store
+    "persistence": (".services.persistence", "Persistence"),
+    # Worker processes for long-window analytics
+    "analytics_pool": (".services.analytics_pool", "AnalyticsPool"),
+    # TCP/UDP line-protocol ingest
+    "ingest_listener": (".services.ingest_listener", "IngestListener"),
+}
+
+_lazy_lock = threading.RLock()
+
+
+def __getattr__(name):
+    if name not in _LAZY_EXTENSIONS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, cls = _LAZY_EXTENSIONS[name]
+    with _lazy_lock:
+        if name not in globals():
+            globals()[name] = getattr(import_module(module, __package__), cls)()
+    return globals()[name]
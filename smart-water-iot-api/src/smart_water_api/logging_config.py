@@ -0,0 +1,233 @@
+"""
+Logging configuration.
+Records are handed to a queue and written by a background thread, so request
+threads never format messages or block on the output stream. Hot-path call
+sites log through SampledLogger, which rate-limits them before a record is
+even created.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Callable, Optional
+
+from .constants import LOG_DATE_FORMAT, LOG_QUEUE_SIZE, LOG_SAMPLE_BURST, LOG_SAMPLE_PER_SECOND, LOG_TEXT_FORMAT
+
+LOG_FORMATS = ("text", "json")
+
+_handler: Optional[logging.Handler] = None
+_listener: Optional[QueueListener] = None
+_sampled_loggers: "weakref.WeakSet[SampledLogger]" = weakref.WeakSet()
+
+
+class Lazy:
+    """Log field computed only when the record is written."""
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func: Callable[..., Any], *args):
+        self.func = func
+        self.args = args
+
+    def value(self) -> Any:
+        return self.func(*self.args)
+
+    def __str__(self) -> str:
+        return str(self.value())
+
+
+def _resolve(value: Any) -> Any:
+    return value.value() if isinstance(value, Lazy) else value
+
+
+class TextFormatter(logging.Formatter):
+    """Classic one-line format with structured fields appended as key=value."""
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={_resolve(value)}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; structured fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, LOG_DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            entry.setdefault(key, _resolve(value))  # Fields never shadow the standard keys
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting to the writer thread.
+
+    The stock QueueHandler renders the message in the caller; here only
+    tracebacks are rendered up front (so frames aren't kept alive) and
+    msg % args is left for the formatter. Arguments must therefore not be
+    mutated after logging, which holds for the ids and numbers logged here.
+    When the queue is full records are dropped rather than blocking, and
+    the number dropped is reported once the writer catches up.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                self.queue.put_nowait(logging.makeLogRecord({
+                    "name": __name__,
+                    "levelno": logging.WARNING,
+                    "levelname": "WARNING",
+                    "msg": "Dropped %d log records (queue full)",
+                    "args": (dropped,),
+                }))
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SampledLogger:
+    """
+    Rate-limited logger for per-reading call sites.
+
+    A token bucket lets through per_second records on average (bursts up to
+    burst); the rest are counted and the count is attached to the next
+    record that gets through as a 'suppressed' field. The bucket is
+    updated without a lock, so under contention the rate is approximate.
+    """
+
+    def __init__(self, logger: logging.Logger, per_second: float = LOG_SAMPLE_PER_SECOND, burst: int = LOG_SAMPLE_BURST):
+        """
+        Initialize the sampler.
+
+        Args:
+            logger: Logger records are sent to
+            per_second: Average records per second (0 = no limit)
+            burst: Records allowed back to back
+        """
+        self.logger = logger
+        self.per_second = per_second
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self.suppressed = 0
+        _sampled_loggers.add(self)
+
+    def debug(self, msg: str, /, *args, **fields) -> None:
+        self.log(logging.DEBUG, msg, *args, **fields)
+
+    def info(self, msg: str, /, *args, **fields) -> None:
+        self.log(logging.INFO, msg, *args, **fields)
+
+    def warning(self, msg: str, /, *args, **fields) -> None:
+        self.log(logging.WARNING, msg, *args, **fields)
+
+    def log(self, level: int, msg: str, /, *args, **fields) -> None:
+        """Log msg % args with structured fields, if enabled and not rate-limited."""
+        if not self.logger.isEnabledFor(level) or not self._allow():
+            return
+        if self.suppressed:
+            fields["suppressed"], self.suppressed = self.suppressed, 0
+        self.logger.log(level, msg, *args, extra={"fields": fields})
+
+    def _allow(self) -> bool:
+        if self.per_second <= 0:
+            return True
+        now = time.monotonic()
+        tokens = min(self.burst, self._tokens + (now - self._updated) * self.per_second)
+        self._updated = now
+        if tokens < 1:
+            self._tokens = tokens
+            self.suppressed += 1
+            return False
+        self._tokens = tokens - 1
+        return True
+
+
+def set_sample_rate(per_second: float) -> None:
+    """Change the rate of every SampledLogger."""
+    for sampled in list(_sampled_loggers):
+        sampled.per_second = per_second
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "text",
+    asynchronous: bool = True,
+    queue_size: int = LOG_QUEUE_SIZE,
+    sample_per_second: float = LOG_SAMPLE_PER_SECOND,
+) -> logging.Handler:
+    """
+    Install the root log handler (replacing one installed earlier).
+
+    Args:
+        level: Root log level name
+        log_format: 'text' or 'json'
+        asynchronous: Write through a queue and background thread
+        queue_size: Records buffered before new ones are dropped
+        sample_per_second: Rate of sampled per-reading logs (0 = no limit)
+
+    Returns:
+        The handler attached to the root logger
+    """
+    global _handler, _listener
+
+    formatter = JsonFormatter() if log_format == "json" else TextFormatter(LOG_TEXT_FORMAT, LOG_DATE_FORMAT)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    shutdown_logging()
+    if asynchronous:
+        handler = DeferredQueueHandler(queue.Queue(maxsize=queue_size))
+        _listener = QueueListener(handler.queue, stream_handler)
+        _listener.start()
+    else:
+        handler = stream_handler
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    _handler = handler
+    set_sample_rate(sample_per_second)
+    return handler
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and remove the handler installed by configure_logging()."""
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler.close()
+        _handler = None
+
+
+atexit.register(shutdown_logging)
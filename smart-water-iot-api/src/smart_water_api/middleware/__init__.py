@@ -0,0 +1,7 @@
+"""Request/response middleware module."""
+
+from .compression import ResponseCompressor, choose_encoding
+from .metrics import MetricFamily, RequestMetrics
+from .profiling import RequestProfiler
+
+__all__ = ["ResponseCompressor", "choose_encoding", "MetricFamily", "RequestMetrics", "RequestProfiler"]
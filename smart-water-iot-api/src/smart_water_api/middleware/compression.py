@@ -0,0 +1,225 @@
+"""
+Response compression middleware.
+Negotiates gzip/deflate (and brotli when installed) from Accept-Encoding.
+"""
+
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from flask import Flask, Response, request
+
+from ..constants import (
+    COMPRESSION_MIN_SIZE_BYTES,
+    COMPRESSION_LEVEL_DEFAULT,
+    COMPRESSION_CACHE_MAX_ENTRIES,
+    COMPRESSION_CACHE_MAX_BYTES,
+    COMPRESSIBLE_MIMETYPES,
+)
+
+try:
+    import brotli
+except ImportError:  # brotli is an optional extra
+    brotli = None
+
+ENCODING_BROTLI = "br"
+ENCODING_GZIP = "gzip"
+ENCODING_DEFLATE = "deflate"
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Encodings this server can produce, in order of preference."""
+    if brotli is not None:
+        return (ENCODING_BROTLI, ENCODING_GZIP, ENCODING_DEFLATE)
+    return (ENCODING_GZIP, ENCODING_DEFLATE)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """
+    Parse an Accept-Encoding header into a coding -> q-value mapping.
+
+    Args:
+        header: Raw Accept-Encoding header value
+
+    Returns:
+        Dictionary of lower-cased codings to their quality values
+    """
+    codings = {}
+    for part in header.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding.strip().lower()] = quality
+    return codings
+
+
+def choose_encoding(header: Optional[str]) -> Optional[str]:
+    """
+    Pick the best encoding acceptable to the client.
+
+    Args:
+        header: Raw Accept-Encoding header value (may be None)
+
+    Returns:
+        Chosen content coding, or None to send the body uncompressed
+    """
+    if not header:
+        return None
+
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = codings.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_bytes(data: bytes, encoding: str, level: int = COMPRESSION_LEVEL_DEFAULT) -> bytes:
+    """Compress a payload with the given content coding."""
+    if encoding == ENCODING_GZIP:
+        # mtime=0 keeps output deterministic so identical payloads match
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == ENCODING_DEFLATE:
+        return zlib.compress(data, level)
+    if encoding == ENCODING_BROTLI and brotli is not None:
+        return brotli.compress(data, quality=min(level, 11))
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+class CompressionCache:
+    """
+    Bounded LRU of compressed payloads keyed by body digest and encoding.
+    Identical responses (same data version) are compressed only once.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = COMPRESSION_CACHE_MAX_ENTRIES,
+        max_bytes: int = COMPRESSION_CACHE_MAX_BYTES,
+    ):
+        self._entries: "OrderedDict[Tuple[bytes, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[bytes, str]) -> Optional[bytes]:
+        """Return cached compressed bytes, refreshing their recency."""
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key: Tuple[bytes, str], payload: bytes) -> None:
+        """Store compressed bytes, evicting least recently used entries."""
+        if self._max_entries <= 0 or len(payload) > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size_bytes -= len(previous)
+            self._entries[key] = payload
+            self._size_bytes += len(payload)
+            while self._entries and (
+                len(self._entries) > self._max_entries
+                or self._size_bytes > self._max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._size_bytes -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Drop all cached payloads."""
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+
+class ResponseCompressor:
+    """
+    Flask extension that compresses eligible responses after each request.
+    Small, streamed or already-encoded responses are passed through untouched.
+    """
+
+    def __init__(self, app: Flask = None):
+        self.min_size = COMPRESSION_MIN_SIZE_BYTES
+        self.level = COMPRESSION_LEVEL_DEFAULT
+        self.cache = CompressionCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """Read settings from the app config and register the hook."""
+        app.extensions["compression"] = self
+        if not app.config.get("COMPRESSION_ENABLED", True):
+            return
+
+        self.min_size = app.config.get("COMPRESSION_MIN_SIZE", COMPRESSION_MIN_SIZE_BYTES)
+        self.level = app.config.get("COMPRESSION_LEVEL", COMPRESSION_LEVEL_DEFAULT)
+        self.cache = CompressionCache(
+            max_entries=app.config.get("COMPRESSION_CACHE_ENTRIES", COMPRESSION_CACHE_MAX_ENTRIES),
+        )
+        app.after_request(self.compress_response)
+
+    def compress_response(self, response: Response) -> Response:
+        """Compress the response body if the client and payload allow it."""
+        if not self._is_eligible(response):
+            return response
+
+        # The body varies by Accept-Encoding even when we send it as-is
+        response.vary.add("Accept-Encoding")
+
+        encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+
+        body = response.get_data()
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = compress_bytes(body, encoding, self.level)
+            self.cache.put(key, compressed)
+
+        if len(compressed) >= len(body):
+            return response
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        response.headers["Content-Length"] = str(len(compressed))
+        return response
+
+    def _is_eligible(self, response: Response) -> bool:
+        """Check whether a response is worth compressing at all."""
+        if response.direct_passthrough or response.is_streamed:
+            return False
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if "Content-Encoding" in response.headers:
+            return False
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return False
+        if "no-transform" in response.headers.get("Cache-Control", ""):
+            return False
+        return (response.content_length or 0) >= self.min_size
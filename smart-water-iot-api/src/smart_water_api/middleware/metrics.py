@@ -0,0 +1,293 @@
+"""
+Request metrics middleware.
+Records per-route request counts and latency histograms and serves them,
+together with registered collectors, in the Prometheus text format.
+"""
+
+import bisect
+import gc
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from flask import Flask, Response, request
+
+from ..constants import (
+    METRICS_CONTENT_TYPE,
+    METRICS_GC_BUCKETS_SECONDS,
+    METRICS_LATENCY_BUCKETS_SECONDS,
+    METRICS_PATH,
+    METRICS_PREFIX,
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+_START_KEY = "smart_water.request_started"
+
+Sample = Tuple[str, Dict[str, str], float]  # Name suffix, labels, value
+
+
+class MetricFamily(NamedTuple):
+    """One exported metric with its samples."""
+    name: str
+    kind: str  # 'counter', 'gauge' or 'histogram'
+    help: str
+    samples: List[Sample]
+
+
+class ShardedSeries:
+    """
+    Numeric series keyed by label values, sharded per thread.
+
+    Writers only touch the calling thread's shard, so recording takes no
+    lock; snapshot() sums the shards. Shards of finished threads are folded
+    into a retired total, so thread-per-request servers don't grow the
+    shard list without bound.
+    """
+
+    def __init__(self, width: int):
+        """
+        Initialize empty series.
+
+        Args:
+            width: Number of values kept per key
+        """
+        self.width = width
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, Dict[Tuple, List[float]]]] = []
+        self._retired: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def series(self, key: Tuple) -> List[float]:
+        """The calling thread's values for key (created on first use)."""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0] * self.width
+        return values
+
+    def snapshot(self) -> Dict[Tuple, List[float]]:
+        """Values per key summed over all threads."""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    _merge(self._retired, shard)
+            self._shards = live
+            totals = {key: list(values) for key, values in self._retired.items()}
+            for _, shard in live:
+                _merge(totals, dict(shard))
+        return totals
+
+
+class Counter(ShardedSeries):
+    """Monotonic counters keyed by label values."""
+
+    def __init__(self):
+        super().__init__(width=1)
+
+    def inc(self, key: Tuple, amount: float = 1) -> None:
+        """Add amount to the counter of key."""
+        self.series(key)[0] += amount
+
+
+class Histogram(ShardedSeries):
+    """Histograms keyed by label values (bucket counts, then +Inf, then the sum)."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        super().__init__(width=len(self.buckets) + 2)
+
+    def observe(self, key: Tuple, value: float) -> None:
+        """Record one observation for key."""
+        values = self.series(key)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+
+class GCPauseTracker:
+    """Times garbage collector runs through gc.callbacks."""
+
+    def __init__(self, buckets: Sequence[float] = METRICS_GC_BUCKETS_SECONDS):
+        self.pauses = Histogram(buckets)
+        self._started = 0.0
+
+    def install(self) -> None:
+        """Start timing collections (idempotent)."""
+        if self._on_gc not in gc.callbacks:
+            gc.callbacks.append(self._on_gc)
+
+    def uninstall(self) -> None:
+        """Stop timing collections."""
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    def _on_gc(self, phase: str, info: Dict) -> None:
+        if phase == "start":
+            self._started = time.perf_counter()
+        else:
+            self.pauses.observe((str(info["generation"]),), time.perf_counter() - self._started)
+
+
+# One tracker per process: collections are process-wide, apps are not
+gc_pauses = GCPauseTracker()
+
+
+def counter_family(name: str, help_text: str, label_names: Sequence[str], counter: Counter) -> MetricFamily:
+    """Export a Counter as a metric family."""
+    samples = [
+        ("", dict(zip(label_names, key)), values[0])
+        for key, values in sorted(counter.snapshot().items())
+    ]
+    return MetricFamily(name, "counter", help_text, samples)
+
+
+def histogram_family(name: str, help_text: str, label_names: Sequence[str], histogram: Histogram) -> MetricFamily:
+    """Export a Histogram as a metric family with cumulative buckets."""
+    samples = []
+    for key, values in sorted(histogram.snapshot().items()):
+        labels = dict(zip(label_names, key))
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, values):
+            cumulative += count
+            samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+        cumulative += values[len(histogram.buckets)]
+        samples.append(("_bucket", {**labels, "le": "+Inf"}, cumulative))
+        samples.append(("_sum", labels, values[-1]))
+        samples.append(("_count", labels, cumulative))
+    return MetricFamily(name, "histogram", help_text, samples)
+
+
+def render(families: Iterable[MetricFamily]) -> str:
+    """
+    Format metric families in the Prometheus text exposition format.
+
+    Args:
+        families: Metric families to export
+
+    Returns:
+        Exposition text (one sample per line)
+    """
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family.name} {family.help}")
+        lines.append(f"# TYPE {family.name} {family.kind}")
+        for suffix, labels, value in family.samples:
+            lines.append(f"{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+    return f"{{{pairs}}}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class RequestMetrics:
+    """
+    Flask extension that times every request and serves /metrics.
+
+    Requests are labelled with their URL rule (not the raw path, so ids in
+    URLs don't explode the label space) and method. Latency is measured from
+    before_request to the last after_request hook; for streamed responses
+    that is the time to the first byte, not to the end of the body.
+    Other components add their own metrics with register_collector().
+    """
+
+    def __init__(self, app: Flask = None):
+        self.latency = Histogram(METRICS_LATENCY_BUCKETS_SECONDS)
+        self.requests = Counter()
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """
+        Register the timing hooks and the /metrics route, if enabled.
+
+        Call this before other extensions add after_request hooks: hooks run
+        in reverse order, so the ones registered first see the final response.
+        """
+        app.extensions["metrics"] = self
+        self._collectors = []
+        if not app.config.get("METRICS_ENABLED", True):
+            return
+        gc_pauses.install()
+        app.before_request(self._start_timer)
+        app.after_request(self._record)
+        app.add_url_rule(METRICS_PATH, "metrics", self.metrics_view, methods=["GET"])
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """Add a callable that returns metric families at scrape time."""
+        self._collectors.append(collector)
+
+    def collect(self) -> List[MetricFamily]:
+        """Gather request, GC and collector metrics."""
+        families = [
+            counter_family(
+                f"{METRICS_PREFIX}_http_requests_total",
+                "HTTP requests by route, method and status code.",
+                ("route", "method", "status"),
+                self.requests,
+            ),
+            histogram_family(
+                f"{METRICS_PREFIX}_http_request_duration_seconds",
+                "HTTP request latency by route and method.",
+                ("route", "method"),
+                self.latency,
+            ),
+            histogram_family(
+                f"{METRICS_PREFIX}_gc_pause_seconds",
+                "Garbage collector pauses by generation.",
+                ("generation",),
+                gc_pauses.pauses,
+            ),
+        ]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def metrics_view(self) -> Response:
+        """Serve all metrics in the Prometheus text format."""
+        return Response(render(self.collect()), content_type=METRICS_CONTENT_TYPE)
+
+    def _start_timer(self) -> None:
+        request.environ[_START_KEY] = time.perf_counter()
+
+    def _record(self, response: Response) -> Response:
+        started = request.environ.get(_START_KEY)
+        if started is not None:
+            rule = request.url_rule
+            route = rule.rule if rule is not None else UNMATCHED_ROUTE
+            self.latency.observe((route, request.method), time.perf_counter() - started)
+            self.requests.inc((route, request.method, response.status_code))
+        return response
+
+
+def _merge(totals: Dict[Tuple, List[float]], shard: Dict[Tuple, List[float]]) -> None:
+    for key, values in shard.items():
+        current = totals.get(key)
+        if current is None:
+            totals[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                current[i] += value
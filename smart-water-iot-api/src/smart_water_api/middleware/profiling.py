@@ -0,0 +1,166 @@
+"""
+Request profiling middleware.
+Traces a sample of requests (1 in N, or any request carrying the profiling
+header) and keeps the results in a ring buffer served at /debug/profiles.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, Response, jsonify, request
+
+from ..constants import (
+    HTTP_OK,
+    PROFILING_BUFFER_SIZE,
+    PROFILING_HEADER,
+    PROFILING_PATH,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_TOP_FUNCTIONS,
+)
+from ..utils.timeutils import format_epoch
+from ..utils.tracing import current_trace, end_trace, start_trace
+
+_STATE_KEY = "smart_water.profile"
+
+
+def top_functions(profile: "cProfile.Profile", limit: int = PROFILING_TOP_FUNCTIONS) -> List[Dict[str, Any]]:
+    """
+    Summarize a cProfile run by self time.
+
+    Args:
+        profile: Finished profiler
+        limit: Number of functions to keep
+
+    Returns:
+        Functions with call counts and self/cumulative time, slowest first
+    """
+    import pstats
+
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{name} ({os.path.basename(filename)}:{line})" if line else name,
+            "calls": calls,
+            "self_ms": round(self_time * 1000, 3),
+            "cumulative_ms": round(cumulative * 1000, 3),
+        }
+        for (filename, line, name), (_, calls, self_time, cumulative, _) in rows
+    ]
+
+
+class RequestProfiler:
+    """
+    Flask extension that traces sampled requests.
+
+    A traced request records the spans services open with utils.tracing.span()
+    (validation, store write, alert analysis, aggregation, serialization)
+    and, if cProfile is enabled, its slowest functions. Untraced requests
+    pay for one counter increment; span() is a no-op for them.
+    """
+
+    def __init__(self, app: Flask = None):
+        self.sample_rate = PROFILING_SAMPLE_RATE
+        self.header = PROFILING_HEADER
+        self.use_cprofile = True
+        self._profiles: deque = deque(maxlen=PROFILING_BUFFER_SIZE)
+        self._ids = itertools.count(1)
+        self._requests = itertools.count()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """Read settings from the app config and register the hooks, if enabled."""
+        app.extensions["profiling"] = self
+        if not app.config.get("PROFILING_ENABLED", False):
+            return
+        self.sample_rate = app.config.get("PROFILING_SAMPLE_RATE", PROFILING_SAMPLE_RATE)
+        self.header = app.config.get("PROFILING_HEADER", PROFILING_HEADER)
+        self.use_cprofile = app.config.get("PROFILING_CPROFILE", True)
+        self._profiles = deque(maxlen=app.config.get("PROFILING_BUFFER_SIZE", PROFILING_BUFFER_SIZE))
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._abandon)
+        app.add_url_rule(PROFILING_PATH, "debug_profiles", self.profiles_view, methods=["GET"])
+
+    def profiles(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recorded profiles, newest first."""
+        with self._lock:
+            profiles = list(self._profiles)
+        profiles.reverse()
+        return profiles[:limit] if limit else profiles
+
+    def clear(self) -> None:
+        """Drop all recorded profiles."""
+        with self._lock:
+            self._profiles.clear()
+
+    def profiles_view(self) -> Response:
+        """Serve the ring buffer, newest first (optionally ?limit=N)."""
+        limit = request.args.get("limit", type=int)
+        return jsonify({
+            "sample_rate": self.sample_rate,
+            "profiles": self.profiles(limit),
+        }), HTTP_OK
+
+    def _sampled(self) -> bool:
+        if request.endpoint == "debug_profiles":
+            return False
+        if request.headers.get(self.header):
+            return True
+        return self.sample_rate > 0 and next(self._requests) % self.sample_rate == 0
+
+    def _start(self) -> None:
+        if not self._sampled():
+            return
+        profile = None
+        if self.use_cprofile:
+            import cProfile  # Only paid for when profiling is on
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # Another profiler is already active in this thread
+                profile = None
+        request.environ[_STATE_KEY] = (start_trace(), profile, time.time())
+
+    def _finish(self, response: Response) -> Response:
+        state = request.environ.pop(_STATE_KEY, None)
+        if state is None:
+            return response
+        token, profile, started_at = state
+        if profile is not None:
+            profile.disable()
+        trace = current_trace()
+        duration_ms = (time.perf_counter() - trace.started) * 1000
+        end_trace(token)
+
+        record = {
+            "id": next(self._ids),
+            "method": request.method,
+            "path": request.path,
+            "route": request.url_rule.rule if request.url_rule is not None else None,
+            "status": response.status_code,
+            "started_at": format_epoch(started_at),
+            "duration_ms": round(duration_ms, 3),
+            "spans": sorted(trace.spans, key=lambda s: s["start_ms"]),
+            "functions": top_functions(profile) if profile is not None else [],
+        }
+        with self._lock:
+            self._profiles.append(record)
+        response.headers["X-Profile-Id"] = str(record["id"])
+        return response
+
+    def _abandon(self, error: Optional[BaseException]) -> None:
+        """Stop tracing a request that ended without reaching _finish()."""
+        state = request.environ.pop(_STATE_KEY, None)
+        if state is not None:
+            token, profile, _ = state
+            if profile is not None:
+                profile.disable()
+            end_trace(token)
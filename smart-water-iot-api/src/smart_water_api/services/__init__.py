@@ -1,7 +1,39 @@
-"""Services module initialization."""
+"""
+Services module initialization.
+Exports are imported on first access, so importing one service does not
+load the others (bulk import and export pull in heavy optional modules).
+"""
 
-from .sensor_service import SensorService
-from .analytics_service import AnalyticsService
-from .alert_service import AlertService
+from importlib import import_module
 
-__all__ = ["SensorService", "AnalyticsService", "AlertService"]
+_EXPORTS = {
+    "SensorService": ".sensor_service",
+    "AnalyticsService": ".analytics_service",
+    "AlertService": ".alert_service",
+    "RuleEngine": ".rule_engine",
+    "ForecastService": ".forecast_service",
+    "ConservationService": ".conservation_service",
+    "PredictionService": ".prediction_service",
+    "SeriesService": ".series_service",
+    "ExportService": ".export_service",
+    "Persistence": ".persistence",
+    "BulkImporter": ".bulk_import",
+    "StoreMetrics": ".store_metrics",
+    "FleetSimulator": ".simulator",
+    "AnalyticsPool": ".analytics_pool",
+    "IngestListener": ".ingest_listener",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,209 @@
+"""
+Alert Models - Compact alert records with lazily rendered text.
+Human-readable fields are produced only when an alert is serialized.
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from ..constants import (
+    ALERT_TYPE_OVERFLOW,
+    ALERT_TYPE_LEAKAGE,
+    ALERT_TYPE_LOW_WATER,
+    ALERT_TYPE_HIGH_FLOW,
+    ALERT_TYPE_SENSOR_OFFLINE,
+    ALERT_PRIORITY_LOW,
+    ALERT_PRIORITY_MEDIUM,
+    ALERT_PRIORITY_HIGH,
+    ALERT_PRIORITY_CRITICAL,
+)
+from ..utils.timeutils import format_epoch
+
+# Alert type names indexed by type code; custom rule types are appended
+_ALERT_TYPE_NAMES: List[str] = [
+    ALERT_TYPE_OVERFLOW,
+    ALERT_TYPE_LEAKAGE,
+    ALERT_TYPE_LOW_WATER,
+    ALERT_TYPE_HIGH_FLOW,
+    ALERT_TYPE_SENSOR_OFFLINE,
+]
+_ALERT_TYPE_CODES: Dict[str, int] = {name: code for code, name in enumerate(_ALERT_TYPE_NAMES)}
+
+PRIORITY_LABELS = {
+    ALERT_PRIORITY_LOW: "Low",
+    ALERT_PRIORITY_MEDIUM: "Medium",
+    ALERT_PRIORITY_HIGH: "High",
+    ALERT_PRIORITY_CRITICAL: "Critical",
+}
+
+SUGGESTED_ACTION_TEMPLATES = {
+    ALERT_TYPE_OVERFLOW: "Reduce inflow immediately. Stop pump or close inlet valve.",
+    ALERT_TYPE_LEAKAGE: "Check pipeline near tank {tank_id}. Inspect for visible leaks.",
+    ALERT_TYPE_LOW_WATER: "Start pump within 30 minutes. Check water source availability.",
+    ALERT_TYPE_HIGH_FLOW: "Monitor usage. Check for open taps or unusual consumption.",
+    ALERT_TYPE_SENSOR_OFFLINE: "Check power and connectivity of sensor {device_id}.",
+}
+DEFAULT_SUGGESTED_ACTION = "Monitor the situation and take appropriate action."
+
+CAUSE_TEMPLATES = {
+    ALERT_TYPE_OVERFLOW: "Water level ({value:.1f}%) exceeded safe threshold ({threshold:g}%)",
+    ALERT_TYPE_LEAKAGE: "Continuous flow ({value:.1f} L/min) detected without active usage",
+    ALERT_TYPE_LOW_WATER: "Water level ({value:.1f}%) below minimum threshold ({threshold:g}%)",
+    ALERT_TYPE_HIGH_FLOW: "Flow rate ({value:.1f} L/min) exceeds normal usage ({threshold:g} L/min)",
+    ALERT_TYPE_SENSOR_OFFLINE: "No reading for {value:.0f}s (expected within {threshold:g}s)",
+}
+DEFAULT_CAUSE = "Sensor reading outside normal range"
+
+
+class AlertTemplate(NamedTuple):
+    """Format strings used to render an alert's human-readable fields."""
+    message: str
+    cause: str
+    suggested_action: str
+
+
+def build_template(alert_type: str, message: str, cause: str = None) -> AlertTemplate:
+    """Build a template, falling back to the type's default cause and action."""
+    return AlertTemplate(
+        message=message,
+        cause=cause or CAUSE_TEMPLATES.get(alert_type, DEFAULT_CAUSE),
+        suggested_action=SUGGESTED_ACTION_TEMPLATES.get(alert_type, DEFAULT_SUGGESTED_ACTION),
+    )
+
+
+def alert_type_code(alert_type: str) -> int:
+    """Get the compact code for an alert type, registering new types."""
+    code = _ALERT_TYPE_CODES.get(alert_type)
+    if code is None:
+        code = _ALERT_TYPE_CODES.setdefault(alert_type, len(_ALERT_TYPE_NAMES))
+        if code == len(_ALERT_TYPE_NAMES):
+            _ALERT_TYPE_NAMES.append(alert_type)
+    return code
+
+
+class Alert:
+    """
+    A stored alert as a compact record.
+
+    Only the raw facts and a shared template are kept; message, cause,
+    suggested action, priority label and timestamp string are rendered on
+    serialization.
+    """
+
+    __slots__ = (
+        "alert_id",
+        "type_code",
+        "priority",
+        "value",
+        "threshold",
+        "epoch",
+        "tank_id",
+        "device_id",
+        "template",
+        "acknowledged",
+        "deadline",
+    )
+
+    def __init__(
+        self,
+        type_code: int,
+        priority: int,
+        value: float,
+        threshold: float,
+        epoch: float,
+        tank_id: str,
+        device_id: str,
+        template: AlertTemplate,
+        acknowledged: bool = False,
+        alert_id: int = 0,
+        deadline: Optional[float] = None,
+    ):
+        self.alert_id = alert_id
+        self.type_code = type_code
+        self.priority = priority
+        self.value = value
+        self.threshold = threshold
+        self.epoch = epoch
+        self.tank_id = tank_id
+        self.device_id = device_id
+        self.template = template
+        self.acknowledged = acknowledged
+        self.deadline = deadline  # When a sensor_offline device went silent for too long
+
+    @property
+    def alert_type(self) -> str:
+        """Alert type name (e.g. 'overflow')."""
+        return _ALERT_TYPE_NAMES[self.type_code]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Render the alert into its JSON-ready representation."""
+        alert_type = _ALERT_TYPE_NAMES[self.type_code]
+        fields = {
+            "alert_type": alert_type,
+            "tank_id": self.tank_id,
+            "device_id": self.device_id,
+            "value": self.value,
+            "threshold": self.threshold,
+        }
+        template = self.template
+        rendered = {
+            "id": self.alert_id,
+            "type": alert_type,
+            "priority": self.priority,
+            "priority_label": PRIORITY_LABELS.get(self.priority, "Unknown"),
+            "message": template.message.format(**fields),
+            "device_id": self.device_id,
+            "tank_id": self.tank_id,
+            "detected_value": self.value,
+            "threshold": self.threshold,
+            "timestamp": format_epoch(self.epoch),
+            "acknowledged": self.acknowledged,
+            "suggested_action": template.suggested_action.format(**fields),
+            "cause": template.cause.format(**fields),
+        }
+        if self.deadline is not None:
+            rendered["deadline"] = format_epoch(self.deadline)
+        return rendered
+
+    def to_record(self) -> Dict[str, Any]:
+        """Raw fields for persistence (text stays unrendered)."""
+        return {
+            "id": self.alert_id,
+            "type": _ALERT_TYPE_NAMES[self.type_code],
+            "priority": self.priority,
+            "value": self.value,
+            "threshold": self.threshold,
+            "epoch": self.epoch,
+            "tank_id": self.tank_id,
+            "device_id": self.device_id,
+            "template": list(self.template),
+            "acknowledged": self.acknowledged,
+            "deadline": self.deadline,
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "Alert":
+        """Rebuild an alert from to_record() output."""
+        return cls(
+            type_code=alert_type_code(record["type"]),
+            priority=record["priority"],
+            value=record["value"],
+            threshold=record["threshold"],
+            epoch=record["epoch"],
+            tank_id=record["tank_id"],
+            device_id=record["device_id"],
+            template=AlertTemplate(*record["template"]),
+            acknowledged=record["acknowledged"],
+            alert_id=record["id"],
+            deadline=record.get("deadline"),
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Alert({self.alert_type!r}, priority={self.priority}, "
+            f"tank_id={self.tank_id!r}, value={self.value})"
+        )
+
+
+def serialize_alerts(alerts: Iterable[Alert]) -> List[Dict[str, Any]]:
+    """Render a sequence of alert records for a JSON response."""
+    return [alert.to_dict() for alert in alerts]
@@ -1,20 +1,16 @@
 """
 Alert Service - Detects water anomalies like leakage and overflow.
-Implements smart detection rules based on sensor thresholds.
+Evaluates readings against compiled rules with per-tank thresholds.
 """
 
 import logging
-from datetime import datetime
-from typing import Dict, List, Any, Optional
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Any, Optional, Tuple
 
 from ..constants import (
-    WATER_LEVEL_OVERFLOW_THRESHOLD,
-    WATER_LEVEL_CRITICAL_LOW,
-    WATER_LEVEL_WARNING_LOW,
-    WATER_LEVEL_WARNING_HIGH,
-    FLOW_RATE_LEAKAGE_THRESHOLD,
-    FLOW_RATE_HIGH_USAGE,
-    FLOW_RATE_NORMAL_MAX,
     STATUS_NORMAL,
     STATUS_WARNING,
     STATUS_CRITICAL,
@@ -24,13 +20,42 @@ from ..constants import (
     ALERT_TYPE_LEAKAGE,
     ALERT_TYPE_LOW_WATER,
     ALERT_TYPE_HIGH_FLOW,
-    ALERT_PRIORITY_LOW,
-    ALERT_PRIORITY_MEDIUM,
+    ALERT_TYPE_SENSOR_OFFLINE,
     ALERT_PRIORITY_HIGH,
     ALERT_PRIORITY_CRITICAL,
 )
+from ..errors.exceptions import NotFoundError
+from ..logging_config import Lazy, SampledLogger
+from ..utils.tracing import span
+from .alert_models import Alert, alert_type_code, build_template
+from .leak_detector import LeakageDetector
+from .offline_monitor import OfflineMonitor
+from .rule_engine import RuleEngine, RuleMatch
 
 logger = logging.getLogger(__name__)
+_alert_log = SampledLogger(logger)  # Per-reading logs are rate-limited
+
+# Alert types in the order they take precedence for the overall status
+_STATUS_TYPE_ORDER = {
+    ALERT_TYPE_OVERFLOW: 0,
+    ALERT_TYPE_LEAKAGE: 1,
+    ALERT_TYPE_LOW_WATER: 2,
+    ALERT_TYPE_HIGH_FLOW: 3,
+}
+
+_OFFLINE_TYPE_CODE = alert_type_code(ALERT_TYPE_SENSOR_OFFLINE)
+_OFFLINE_TEMPLATE = build_template(
+    ALERT_TYPE_SENSOR_OFFLINE,
+    "Sensor {device_id} on tank {tank_id} stopped reporting",
+)
+
+
+def _alert_types(alerts: List[Alert]) -> List[str]:
+    return [a.alert_type for a in alerts]
+
+
+def _device_ids(alerts: List[Alert]) -> List[str]:
+    return [a.device_id for a in alerts]
 
 
 class AlertService:
@@ -39,9 +64,28 @@ class AlertService:
     Analyzes sensor readings to detect leakage, overflow, and other issues.
     """
     
-    def __init__(self):
-        """Initialize the alert service with default thresholds."""
-        self._alerts: List[Dict] = []
+    def __init__(
+        self,
+        rule_engine: Optional[RuleEngine] = None,
+        leak_detector: Optional[LeakageDetector] = None,
+        offline_monitor: Optional[OfflineMonitor] = None,
+    ):
+        """
+        Initialize the alert service.
+        
+        Args:
+            rule_engine: Compiled alert rules (defaults to the built-in thresholds)
+            leak_detector: Streaming leakage detector (one is created if omitted)
+            offline_monitor: Last-seen tracker polled for offline sensors
+        """
+        self._alerts: Deque[Alert] = deque()  # Oldest first; retention pops from the left
+        self._by_id: Dict[int, Alert] = {}  # Same alerts, for lookups by id
+        self._next_alert_id = 1
+        self._lock = threading.Lock()
+        self.journal = None  # Optional write-ahead log for alert state changes
+        self._rule_engine = rule_engine or RuleEngine()
+        self._leak_detector = leak_detector or LeakageDetector()
+        self._offline_monitor = offline_monitor
     
     def analyze_reading(self, reading: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -53,48 +97,59 @@ class AlertService:
         Returns:
             Analysis result with status and any generated alerts
         """
+        with span("alert_analysis"):
+            matches = self._rule_engine.evaluate(reading)
+            leak = self._leak_detector.update(reading)
+            if leak is not None:
+                matches.append(leak)
+            return self._build_result(reading, matches)
+    
+    def analyze_batch(self, readings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze many sensor readings in a single rule-engine pass.
+        
+        Args:
+            readings: Validated sensor data dictionaries
+            
+        Returns:
+            One analysis result per reading, in input order
+        """
+        matches = self._rule_engine.evaluate_batch(readings)
+        for reading, reading_matches in zip(readings, matches):
+            leak = self._leak_detector.update(reading)
+            if leak is not None:
+                reading_matches.append(leak)
+        return [
+            self._build_result(reading, reading_matches)
+            for reading, reading_matches in zip(readings, matches)
+        ]
+    
+    def _build_result(self, reading: Dict[str, Any], matches: List[RuleMatch]) -> Dict[str, Any]:
+        """Turn fired rules into stored alerts and an overall status."""
         water_level = reading.get("water_level_percent", 0)
         flow_rate = reading.get("flow_rate_lpm", 0)
         device_id = reading.get("device_id", "unknown")
         tank_id = reading.get("tank_id", "unknown")
         
-        alerts = []
-        status = STATUS_NORMAL
-        status_message = "All systems normal"
-        
-        # Check for overflow risk
-        overflow_alert = self._check_overflow_risk(water_level, device_id, tank_id)
-        if overflow_alert:
-            alerts.append(overflow_alert)
-            status = STATUS_OVERFLOW_RISK
-            status_message = f"Overflow risk detected - Water level at {water_level}%"
-        
-        # Check for leakage
-        leakage_alert = self._check_leakage(water_level, flow_rate, device_id, tank_id)
-        if leakage_alert:
-            alerts.append(leakage_alert)
-            if status == STATUS_NORMAL:
-                status = STATUS_LEAKAGE_DETECTED
-                status_message = "Potential leakage detected"
-        
-        # Check for low water level
-        low_water_alert = self._check_low_water(water_level, device_id, tank_id)
-        if low_water_alert:
-            alerts.append(low_water_alert)
-            if status == STATUS_NORMAL:
-                status = STATUS_WARNING if water_level >= WATER_LEVEL_CRITICAL_LOW else STATUS_CRITICAL
-                status_message = f"Low water level - {water_level}%"
+        epoch = time.time()
+        alerts = [
+            Alert(
+                type_code=match.rule.type_code,
+                priority=match.priority,
+                value=match.value,
+                threshold=match.threshold,
+                epoch=epoch,
+                tank_id=tank_id,
+                device_id=device_id,
+                template=match.rule.template,
+            )
+            for match in matches
+        ]
         
-        # Check for high flow rate
-        high_flow_alert = self._check_high_flow(flow_rate, device_id, tank_id)
-        if high_flow_alert:
-            alerts.append(high_flow_alert)
-            if status == STATUS_NORMAL:
-                status = STATUS_WARNING
-                status_message = f"High flow rate - {flow_rate} L/min"
+        status, status_message = self._determine_status(matches, water_level, flow_rate)
         
         # Store alerts
-        self._alerts.extend(alerts)
+        self._store(alerts)
         
         result = {
             "status": status,
@@ -106,191 +161,211 @@ class AlertService:
         }
         
         if alerts:
-            logger.warning(
-                f"Alerts generated for {device_id}: {[a['type'] for a in alerts]}"
+            _alert_log.warning(
+                "Alerts generated",
+                device_id=device_id,
+                tank_id=tank_id,
+                alert_types=Lazy(_alert_types, alerts),
             )
         
         return result
     
-    def _check_overflow_risk(
-        self, 
-        water_level: float, 
-        device_id: str, 
-        tank_id: str
-    ) -> Optional[Dict]:
-        """Check if water level indicates overflow risk."""
-        if water_level >= WATER_LEVEL_OVERFLOW_THRESHOLD:
-            return self._create_alert(
-                alert_type=ALERT_TYPE_OVERFLOW,
-                priority=ALERT_PRIORITY_CRITICAL,
-                message=f"Tank {tank_id} is at {water_level}% capacity - Overflow imminent!",
-                device_id=device_id,
-                tank_id=tank_id,
-                value=water_level,
-                threshold=WATER_LEVEL_OVERFLOW_THRESHOLD,
-            )
-        elif water_level >= WATER_LEVEL_WARNING_HIGH:
-            return self._create_alert(
-                alert_type=ALERT_TYPE_OVERFLOW,
+    def _determine_status(
+        self,
+        matches: List[RuleMatch],
+        water_level: float,
+        flow_rate: float,
+    ) -> Tuple[str, str]:
+        """Derive the overall status from the most significant fired rule."""
+        if not matches:
+            return STATUS_NORMAL, "All systems normal"
+        
+        match = min(
+            matches,
+            key=lambda m: _STATUS_TYPE_ORDER.get(m.rule.alert_type, len(_STATUS_TYPE_ORDER)),
+        )
+        alert_type = match.rule.alert_type
+        if alert_type == ALERT_TYPE_OVERFLOW:
+            return STATUS_OVERFLOW_RISK, f"Overflow risk detected - Water level at {water_level}%"
+        if alert_type == ALERT_TYPE_LEAKAGE:
+            return STATUS_LEAKAGE_DETECTED, "Potential leakage detected"
+        if alert_type == ALERT_TYPE_LOW_WATER:
+            # Exactly at the critical threshold the alert is critical but the
+            # status stays a warning, as with the original hard-coded checks
+            critical = match.priority >= ALERT_PRIORITY_CRITICAL and match.value < match.threshold
+            status = STATUS_CRITICAL if critical else STATUS_WARNING
+            return status, f"Low water level - {water_level}%"
+        if alert_type == ALERT_TYPE_HIGH_FLOW:
+            return STATUS_WARNING, f"High flow rate - {flow_rate} L/min"
+        return STATUS_WARNING, f"{alert_type} alert - {match.value}"
+    
+    def poll_offline(self) -> List[Alert]:
+        """
+        Raise sensor_offline alerts for devices whose deadline passed.
+        
+        Called periodically by the refresh scheduler. Like every alert, each
+        is stamped with the time it was raised, which keeps stored alerts in
+        epoch order for expire_alerts(); the device's deadline (last seen +
+        expiry) is kept alongside.
+        
+        Returns:
+            Newly created offline alerts
+        """
+        if self._offline_monitor is None:
+            return []
+        
+        now = time.time()
+        expiry = self._offline_monitor.expiry_seconds
+        alerts = [
+            Alert(
+                type_code=_OFFLINE_TYPE_CODE,
                 priority=ALERT_PRIORITY_HIGH,
-                message=f"Tank {tank_id} water level is high at {water_level}%",
-                device_id=device_id,
-                tank_id=tank_id,
-                value=water_level,
-                threshold=WATER_LEVEL_WARNING_HIGH,
+                value=round(device.seconds_since_seen, 1),
+                threshold=expiry,
+                epoch=now,
+                tank_id=device.tank_id,
+                device_id=device.device_id,
+                template=_OFFLINE_TEMPLATE,
+                deadline=now - (device.seconds_since_seen - expiry),
             )
-        return None
+            for device in self._offline_monitor.poll()
+        ]
+        if alerts:
+            self._store(alerts)
+            logger.warning("Sensors offline", extra={"fields": {"device_ids": Lazy(_device_ids, alerts)}})
+        return alerts
     
-    def _check_leakage(
-        self, 
-        water_level: float, 
-        flow_rate: float, 
-        device_id: str, 
-        tank_id: str
-    ) -> Optional[Dict]:
+    def _store(self, alerts: List[Alert]) -> None:
+        """Assign ids to new alerts and keep them."""
+        if not alerts:
+            return
+        with self._lock:
+            for alert in alerts:
+                alert.alert_id = self._next_alert_id
+                self._next_alert_id += 1
+                self._by_id[alert.alert_id] = alert
+            self._alerts.extend(alerts)
+        if self.journal is not None:
+            self.journal.log_alerts(alerts)
+    
+    def acknowledge(self, alert_id: int) -> Alert:
+        """
+        Mark an alert as acknowledged.
+        
+        Args:
+            alert_id: Id of the alert
+            
+        Returns:
+            The acknowledged alert
+            
+        Raises:
+            NotFoundError: If no stored alert has this id
         """
-        Check for potential leakage.
-        Leakage is suspected when there's flow but water level is stable/dropping.
+        alert = self.get_alert(alert_id)
+        if not alert.acknowledged:
+            alert.acknowledged = True
+            if self.journal is not None:
+                self.journal.log_acknowledgement(alert_id)
+        return alert
+    
+    def get_alert(self, alert_id: int) -> Alert:
         """
-        # Leakage indicators:
-        # 1. Continuous low flow when tank is not being filled/used
-        # 2. Flow detected when water level is decreasing unexpectedly
+        Get a stored alert by id.
         
-        if flow_rate >= FLOW_RATE_LEAKAGE_THRESHOLD and water_level < WATER_LEVEL_WARNING_HIGH:
-            # Small but consistent flow might indicate a leak
-            if flow_rate < FLOW_RATE_NORMAL_MAX / 2:
-                return self._create_alert(
-                    alert_type=ALERT_TYPE_LEAKAGE,
-                    priority=ALERT_PRIORITY_MEDIUM,
-                    message=f"Potential leak detected - Low continuous flow of {flow_rate} L/min",
-                    device_id=device_id,
-                    tank_id=tank_id,
-                    value=flow_rate,
-                    threshold=FLOW_RATE_LEAKAGE_THRESHOLD,
-                )
-        return None
+        Raises:
+            NotFoundError: If no stored alert has this id
+        """
+        alert = self._by_id.get(alert_id)
+        if alert is None:
+            raise NotFoundError(f"Alert {alert_id} not found")
+        return alert
     
-    def _check_low_water(
-        self, 
-        water_level: float, 
-        device_id: str, 
-        tank_id: str
-    ) -> Optional[Dict]:
-        """Check for critically low water level."""
-        if water_level <= WATER_LEVEL_CRITICAL_LOW:
-            return self._create_alert(
-                alert_type=ALERT_TYPE_LOW_WATER,
-                priority=ALERT_PRIORITY_CRITICAL,
-                message=f"Tank {tank_id} water level critically low at {water_level}%",
-                device_id=device_id,
-                tank_id=tank_id,
-                value=water_level,
-                threshold=WATER_LEVEL_CRITICAL_LOW,
-            )
-        elif water_level <= WATER_LEVEL_WARNING_LOW:
-            return self._create_alert(
-                alert_type=ALERT_TYPE_LOW_WATER,
-                priority=ALERT_PRIORITY_MEDIUM,
-                message=f"Tank {tank_id} water level low at {water_level}%",
-                device_id=device_id,
-                tank_id=tank_id,
-                value=water_level,
-                threshold=WATER_LEVEL_WARNING_LOW,
-            )
-        return None
+    def export_state(self) -> Dict[str, Any]:
+        """Alert records and id counter for a snapshot."""
+        with self._lock:
+            return {
+                "next_alert_id": self._next_alert_id,
+                "alerts": [alert.to_record() for alert in self._alerts],
+            }
     
-    def _check_high_flow(
-        self, 
-        flow_rate: float, 
-        device_id: str, 
-        tank_id: str
-    ) -> Optional[Dict]:
-        """Check for abnormally high flow rate."""
-        if flow_rate >= FLOW_RATE_HIGH_USAGE:
-            return self._create_alert(
-                alert_type=ALERT_TYPE_HIGH_FLOW,
-                priority=ALERT_PRIORITY_HIGH,
-                message=f"Unusually high water flow detected - {flow_rate} L/min",
-                device_id=device_id,
-                tank_id=tank_id,
-                value=flow_rate,
-                threshold=FLOW_RATE_HIGH_USAGE,
-            )
-        return None
+    def restore_state(self, state: Dict[str, Any]) -> None:
+        """Replace stored alerts with a snapshot's state."""
+        with self._lock:
+            self._alerts = deque(Alert.from_record(record) for record in state["alerts"])
+            self._by_id = {alert.alert_id: alert for alert in self._alerts}
+            self._next_alert_id = state["next_alert_id"]
     
-    def _create_alert(
-        self,
-        alert_type: str,
-        priority: int,
-        message: str,
-        device_id: str,
-        tank_id: str,
-        value: float,
-        threshold: float,
-    ) -> Dict[str, Any]:
-        """Create a structured alert object with suggested actions."""
-        # Determine suggested action based on alert type
-        suggested_action = self._get_suggested_action(alert_type, value, threshold)
-        cause = self._get_cause_explanation(alert_type, value, threshold)
-        
-        return {
-            "type": alert_type,
-            "priority": priority,
-            "priority_label": self._get_priority_label(priority),
-            "message": message,
-            "device_id": device_id,
-            "tank_id": tank_id,
-            "detected_value": value,
-            "threshold": threshold,
-            "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
-            "acknowledged": False,
-            "suggested_action": suggested_action,
-            "cause": cause,
-        }
+    def restore_alert(self, record: Dict[str, Any]) -> None:
+        """Re-apply a logged alert during recovery, keeping alerts in id order."""
+        alert = Alert.from_record(record)
+        with self._lock:
+            alerts = self._alerts
+            position = len(alerts)
+            # Logged alerts are nearly in id order; walk back over the few that aren't
+            while position and alerts[position - 1].alert_id > alert.alert_id:
+                position -= 1
+            alerts.insert(position, alert)
+            self._by_id[alert.alert_id] = alert
+            self._next_alert_id = max(self._next_alert_id, alert.alert_id + 1)
     
-    def _get_suggested_action(self, alert_type: str, value: float, threshold: float) -> str:
-        """Get suggested action based on alert type."""
-        actions = {
-            ALERT_TYPE_OVERFLOW: "Reduce inflow immediately. Stop pump or close inlet valve.",
-            ALERT_TYPE_LEAKAGE: f"Check pipeline near {alert_type}. Inspect for visible leaks.",
-            ALERT_TYPE_LOW_WATER: "Start pump within 30 minutes. Check water source availability.",
-            ALERT_TYPE_HIGH_FLOW: "Monitor usage. Check for open taps or unusual consumption.",
-        }
-        return actions.get(alert_type, "Monitor the situation and take appropriate action.")
+    @property
+    def next_alert_id(self) -> int:
+        """Id the next raised alert will get."""
+        return self._next_alert_id
     
-    def _get_cause_explanation(self, alert_type: str, value: float, threshold: float) -> str:
-        """Get simple cause explanation."""
-        causes = {
-            ALERT_TYPE_OVERFLOW: f"Water level ({value:.1f}%) exceeded safe threshold ({threshold}%)",
-            ALERT_TYPE_LEAKAGE: f"Continuous flow ({value:.1f} L/min) detected without active usage",
-            ALERT_TYPE_LOW_WATER: f"Water level ({value:.1f}%) below minimum threshold ({threshold}%)",
-            ALERT_TYPE_HIGH_FLOW: f"Flow rate ({value:.1f} L/min) exceeds normal usage ({threshold} L/min)",
-        }
-        return causes.get(alert_type, "Sensor reading outside normal range")
+    def restore_acknowledgement(self, alert_id: int) -> None:
+        """Re-apply a logged acknowledgement during recovery."""
+        try:
+            self.get_alert(alert_id).acknowledged = True
+        except NotFoundError:
+            pass  # Alert expired before the snapshot
     
-    def _get_priority_label(self, priority: int) -> str:
-        """Convert priority number to human-readable label."""
-        labels = {
-            ALERT_PRIORITY_LOW: "Low",
-            ALERT_PRIORITY_MEDIUM: "Medium",
-            ALERT_PRIORITY_HIGH: "High",
-            ALERT_PRIORITY_CRITICAL: "Critical",
-        }
-        return labels.get(priority, "Unknown")
+    def get_all_alerts(self, limit: int = 50) -> List[Alert]:
+        """
+        Get stored alerts, most recent first.
+        
+        Alerts are stored in the order they were raised, so this walks the
+        newest end of the store instead of sorting it. Offline sensors are
+        picked up by the scheduler's poll_offline() tick, not by reads.
+        """
+        with self._lock:
+            return list(islice(reversed(self._alerts), limit))
     
-    def get_all_alerts(self, limit: int = 50) -> List[Dict]:
-        """Get all stored alerts, most recent first."""
-        sorted_alerts = sorted(
-            self._alerts, 
-            key=lambda x: x.get("timestamp", ""), 
-            reverse=True
-        )
-        return sorted_alerts[:limit]
+    def get_active_alerts(self) -> List[Alert]:
+        """Get only unacknowledged alerts, oldest first."""
+        return [a for a in self._alerts if not a.acknowledged]
+    
+    def alert_counts(self) -> Dict[str, int]:
+        """Number of stored alerts by state (without polling offline sensors)."""
+        alerts = self._alerts
+        active = sum(1 for a in alerts if not a.acknowledged)
+        return {"active": active, "acknowledged": len(alerts) - active}
+    
+    def expire_alerts(self, cutoff: float, limit: int) -> Tuple[int, bool]:
+        """
+        Drop the oldest alerts raised before cutoff.
+        
+        Args:
+            cutoff: Epoch seconds; older alerts are dropped
+            limit: Maximum number of alerts to drop in this call
+            
+        Returns:
+            (alerts dropped, whether no expired alert remains)
+        """
+        with self._lock:
+            alerts = self._alerts
+            count = 0
+            # Alerts are appended in creation order
+            while alerts and count < limit and alerts[0].epoch < cutoff:
+                del self._by_id[alerts.popleft().alert_id]
+                count += 1
+        return count, count < limit
     
-    def get_active_alerts(self) -> List[Dict]:
-        """Get only unacknowledged alerts."""
-        return [a for a in self._alerts if not a.get("acknowledged", False)]
+    def expire_leak_windows(self, now: float, limit: int) -> Tuple[int, bool]:
+        """Drop leak-detection history of tanks that went quiet (see LeakageDetector.expire_idle)."""
+        return self._leak_detector.expire_idle(now, limit)
     
     def clear_alerts(self):
         """Clear all stored alerts (for testing)."""
-        self._alerts = []
+        self._alerts = deque()
+        self._by_id = {}
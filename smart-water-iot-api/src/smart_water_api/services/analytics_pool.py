@@ -0,0 +1,286 @@
+"""
+Analytics Pool - Runs CPU-heavy analytics in worker processes.
+Column data is handed to the workers in shared memory, and identical
+concurrent requests share one computation.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, InvalidStateError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+import numpy as np
+
+from ..constants import ANALYTICS_POOL_MAX_PENDING, ANALYTICS_POOL_TIMEOUT_SECONDS, ANALYTICS_POOL_WORKERS
+from ..errors.exceptions import AnalyticsUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# (column name, dtype string, shape, byte offset) of one array in a shared block
+ColumnSpec = Tuple[str, str, Tuple[int, ...], int]
+
+
+def share_columns(columns: Dict[str, np.ndarray]) -> Tuple[shared_memory.SharedMemory, List[ColumnSpec]]:
+    """
+    Copy arrays into one new shared memory block.
+
+    Args:
+        columns: Arrays by name
+
+    Returns:
+        (the block - the caller closes and unlinks it, layout for attach_columns())
+    """
+    specs = []
+    size = 0
+    for name, array in columns.items():
+        size = -(-size // 8) * 8  # Keep every column 8-byte aligned
+        specs.append((name, array.dtype.str, array.shape, size))
+        size += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for name, dtype, shape, offset in specs:
+        np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)[...] = columns[name]
+    return block, specs
+
+
+def attach_columns(block_name: str, specs: List[ColumnSpec]) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+    """
+    Map a block written by share_columns() without copying it.
+
+    Returns:
+        (the block, arrays by name viewing it) - drop the arrays before closing the block
+    """
+    block = shared_memory.SharedMemory(name=block_name)
+    columns = {
+        name: np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+        for name, dtype, shape, offset in specs
+    }
+    return block, columns
+
+
+def _run_job(func: Callable[..., Any], block_name: str, specs: List[ColumnSpec], args: tuple, deadline: float) -> Any:
+    """Worker entry point: map the columns and run func on them."""
+    if time.time() > deadline:
+        raise TimeoutError("Job expired before a worker picked it up")
+    block, columns = attach_columns(block_name, specs)
+    try:
+        return func(columns, *args)
+    finally:
+        columns = None  # Views must be released before the block is closed
+        block.close()
+
+
+def _mp_context():
+    # Workers are forked at startup, before the store is loaded, so they start
+    # small and nothing is re-imported; spawn where fork doesn't exist
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+class AnalyticsPool:
+    """
+    Bounded process pool for CPU-heavy analytics.
+
+    run() takes a key, a module-level function and a loader for the column
+    arrays the function needs. The arrays are copied once into a shared
+    memory block that the worker maps, so they are never pickled; only the
+    (small) result travels back. A caller asking for a key that is already
+    being computed waits for that computation instead of starting another.
+
+    Callers give up when the job's timeout passes: a job still queued is
+    cancelled, and one a worker has not started by then is skipped. A job
+    that is already running can't be interrupted; it finishes in the
+    background and its result is dropped. Without a running pool, run()
+    computes in the calling thread.
+    """
+
+    def __init__(
+        self,
+        workers: int = ANALYTICS_POOL_WORKERS,
+        timeout_seconds: float = ANALYTICS_POOL_TIMEOUT_SECONDS,
+        max_pending: int = ANALYTICS_POOL_MAX_PENDING,
+    ):
+        """
+        Initialize the pool (call init_app() or start() to fork the workers).
+
+        Args:
+            workers: Number of worker processes
+            timeout_seconds: Default time callers wait for a result
+            max_pending: Distinct computations queued or running before run() refuses new ones
+        """
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Tuple[Future, float]] = {}
+        self.stats = {
+            "submitted": 0,
+            "inline": 0,
+            "coalesced": 0,
+            "rejected": 0,
+            "timeouts": 0,
+        }
+
+    def init_app(self, app) -> None:
+        """Configure the pool from app config and start it if enabled."""
+        self.workers = app.config.get("ANALYTICS_POOL_WORKERS", self.workers)
+        self.timeout_seconds = app.config.get("ANALYTICS_POOL_TIMEOUT_SECONDS", self.timeout_seconds)
+        self.max_pending = app.config.get("ANALYTICS_POOL_MAX_PENDING", self.max_pending)
+        app.extensions["analytics_pool"] = self
+
+        if self.workers > 0 and not app.testing:
+            self.start()
+
+    @property
+    def running(self) -> bool:
+        """Whether worker processes are available."""
+        return self._executor is not None
+
+    @property
+    def pending(self) -> int:
+        """Distinct computations currently queued or running."""
+        return len(self._inflight)
+
+    def start(self) -> None:
+        """Fork the worker processes (no-op if running or workers is 0)."""
+        if self.running or self.workers <= 0:
+            return
+        # Workers must share the parent's tracker, or each would start its own
+        # and unlink the blocks it has seen when it exits
+        resource_tracker.ensure_running()
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+        executor.submit(os.getpid).result()  # Forks every worker now
+        self._executor = executor
+        logger.info("Analytics pool started", extra={"fields": {"workers": self.workers}})
+
+    def stop(self) -> None:
+        """Cancel queued jobs and shut the workers down."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def run(
+        self,
+        key: Hashable,
+        func: Callable[..., Any],
+        load: Callable[[], Dict[str, np.ndarray]],
+        *args,
+        timeout: float = None,
+    ) -> Any:
+        """
+        Compute func(columns, *args), in a worker if the pool is running.
+
+        Args:
+            key: Identifies equal computations; concurrent callers with one key share a job
+            func: Module-level function taking the column dict (and args)
+            load: Returns the column arrays; only called by the caller that starts the job
+            *args: Further (picklable) arguments for func
+            timeout: Seconds to wait for the result (defaults to timeout_seconds)
+
+        Returns:
+            The function's result
+
+        Raises:
+            AnalyticsUnavailableError: Too many computations pending, or no result in time
+        """
+        timeout = self.timeout_seconds if timeout is None else timeout
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is None:
+                if len(self._inflight) >= self.max_pending:
+                    self.stats["rejected"] += 1
+                    raise AnalyticsUnavailableError(
+                        "Too many analytics computations in progress, retry shortly", reason="busy"
+                    )
+                future, deadline = Future(), time.time() + timeout
+                self._inflight[key] = (future, deadline)
+                future.add_done_callback(lambda done: self._forget(key, done))
+                leader = True
+            else:
+                future, deadline = entry
+                self.stats["coalesced"] += 1
+                leader = False
+
+        if leader:
+            self._start(future, func, load, args, deadline)
+        try:
+            return future.result(max(0.0, deadline - time.time()))
+        except (TimeoutError, CancelledError):  # A job skipped by its worker raises TimeoutError too
+            future.cancel()  # Cancels the job as well, if no worker has taken it
+            self.stats["timeouts"] += 1
+            raise AnalyticsUnavailableError(
+                f"Analytics computation did not finish within {timeout:g}s", reason="timeout"
+            )
+
+    def _start(self, future: Future, func, load, args: tuple, deadline: float) -> None:
+        """Load the columns and hand the job to a worker (or run it here)."""
+        try:
+            columns = load()
+            if self._executor is None:
+                self.stats["inline"] += 1
+                _resolve(future, func(columns, *args))
+                return
+            block, specs = share_columns(columns)
+        except Exception as e:
+            _resolve(future, error=e)
+            return
+
+        try:
+            job = self._submit(func, block.name, specs, args, deadline)
+        except Exception as e:
+            _release(block)
+            _resolve(future, error=e)
+            return
+        self.stats["submitted"] += 1
+        job.add_done_callback(lambda done: _settle(future, done, block))
+        future.add_done_callback(lambda done: done.cancelled() and job.cancel())
+
+    def _submit(self, *job_args) -> Future:
+        executor = self._executor
+        try:
+            return executor.submit(_run_job, *job_args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the pool once
+            logger.error("Analytics pool broken, restarting workers")
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.start()
+            return self._executor.submit(_run_job, *job_args)
+
+    def _forget(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is not None and entry[0] is future:
+                del self._inflight[key]
+
+
+def _release(block: shared_memory.SharedMemory) -> None:
+    block.close()
+    block.unlink()
+
+
+def _resolve(future: Future, result: Any = None, error: BaseException = None) -> None:
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass  # The waiters already gave up
+
+
+def _settle(future: Future, job: Future, block: shared_memory.SharedMemory) -> None:
+    """Free the job's shared block and pass its outcome to the waiters."""
+    _release(block)
+    if job.cancelled():
+        future.cancel()
+    elif job.exception() is not None:
+        _resolve(future, error=job.exception())
+    else:
+        _resolve(future, job.result())
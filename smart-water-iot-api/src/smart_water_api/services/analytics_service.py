@@ -3,31 +3,79 @@ Analytics Service - Provides data aggregation for charts and reports.
 Calculates daily/weekly water usage statistics.
 """
 
+import calendar
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Any
-from collections import defaultdict
 
-from ..constants import DEFAULT_ANALYTICS_DAYS
+import numpy as np
+
+from ..constants import ANALYTICS_OFFLOAD_MIN_DAYS, DEFAULT_ANALYTICS_DAYS, SECONDS_PER_DAY, SECONDS_PER_HOUR
+from ..utils.singleflight import SingleFlight
+from ..utils.timeutils import format_day
+from ..utils.tracing import span
+from .analytics_pool import AnalyticsPool
 from .sensor_service import SensorService
 
 logger = logging.getLogger(__name__)
 
 
+def daily_chart_data(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """
+    Aggregate reading columns per UTC day (in-thread or in an analytics pool worker).
+    
+    Args:
+        columns: 'epochs', 'levels' and 'flows' arrays of the readings
+        
+    Returns:
+        Per-day chart rows, oldest first, as get_daily_analytics() reports them
+    """
+    epochs, levels, flows = columns["epochs"], columns["levels"], columns["flows"]
+    if not len(epochs):
+        return []
+    days = (epochs // SECONDS_PER_DAY).astype(np.int64)
+    order = np.argsort(days, kind="stable")
+    days, levels, flows = days[order], levels[order], flows[order]
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    counts = np.diff(np.r_[starts, len(days)])
+    
+    averages = np.add.reduceat(levels, starts) / counts
+    maxima = np.maximum.reduceat(levels, starts)
+    minima = np.minimum.reduceat(levels, starts)
+    totals = np.add.reduceat(flows, starts)
+    return [
+        {
+            "date": format_day(int(day)),
+            "average_water_level": round(float(average), 1),
+            "max_water_level": round(float(maximum), 1),
+            "min_water_level": round(float(minimum), 1),
+            "total_flow_liters": round(float(total), 1),
+            "readings_count": int(count),
+        }
+        for day, average, maximum, minimum, total, count in zip(
+            days[starts], averages, maxima, minima, totals, counts
+        )
+    ]
+
+
 class AnalyticsService:
     """
     Service for generating analytics and aggregated data.
     Used for dashboard charts and usage reports.
     """
     
-    def __init__(self, sensor_service: SensorService = None):
+    def __init__(self, sensor_service: SensorService = None, pool: AnalyticsPool = None):
         """
         Initialize the analytics service.
         
         Args:
             sensor_service: Optional sensor service instance for data access
+            pool: Optional process pool for long-window analytics
         """
         self._sensor_service = sensor_service or SensorService()
+        self._pool = pool
+        # Clients polling right after new data share one computation
+        self.flights = SingleFlight()
     
     def get_daily_analytics(self, days: int = DEFAULT_ANALYTICS_DAYS) -> Dict[str, Any]:
         """
@@ -38,60 +86,28 @@ class AnalyticsService:
             
         Returns:
             Dictionary containing daily analytics data suitable for charts
+            (shared with concurrent callers; don't modify)
         """
+        return self.flights.do(("daily_analytics", days), self._daily_analytics, days)
+    
+    def _daily_analytics(self, days: int) -> Dict[str, Any]:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        readings = self._sensor_service.get_readings_by_date(start_date, end_date)
-        
-        # Aggregate data by day
-        daily_data = defaultdict(lambda: {
-            "readings_count": 0,
-            "total_flow": 0.0,
-            "avg_water_level": 0.0,
-            "max_water_level": 0.0,
-            "min_water_level": 100.0,
-            "water_levels": [],
-        })
-        
-        for reading in readings:
-            try:
-                timestamp = reading.get("timestamp", "")
-                date_str = timestamp[:10]  # Extract YYYY-MM-DD
-                
-                water_level = reading.get("water_level_percent", 0)
-                flow_rate = reading.get("flow_rate_lpm", 0)
-                
-                daily_data[date_str]["readings_count"] += 1
-                daily_data[date_str]["total_flow"] += flow_rate
-                daily_data[date_str]["water_levels"].append(water_level)
-                daily_data[date_str]["max_water_level"] = max(
-                    daily_data[date_str]["max_water_level"], 
-                    water_level
+        # Both paths window and bucket readings by reading (event) time
+        if self._pool is not None and self._pool.running and days >= ANALYTICS_OFFLOAD_MIN_DAYS:
+            # Long windows are aggregated in a worker process, keeping this
+            # thread's GIL share free
+            with span("offload"):
+                chart_data = self._pool.run(
+                    ("daily_analytics", days),
+                    daily_chart_data,
+                    lambda: self._window_columns(start_date, end_date),
                 )
-                daily_data[date_str]["min_water_level"] = min(
-                    daily_data[date_str]["min_water_level"], 
-                    water_level
-                )
-            except (ValueError, TypeError, KeyError) as e:
-                logger.warning(f"Skipping invalid reading: {e}")
-                continue
-        
-        # Calculate averages and format response
-        chart_data = []
-        for date_str in sorted(daily_data.keys()):
-            data = daily_data[date_str]
-            levels = data["water_levels"]
-            avg_level = sum(levels) / len(levels) if levels else 0
-            
-            chart_data.append({
-                "date": date_str,
-                "average_water_level": round(avg_level, 1),
-                "max_water_level": round(data["max_water_level"], 1),
-                "min_water_level": round(data["min_water_level"], 1),
-                "total_flow_liters": round(data["total_flow"], 1),
-                "readings_count": data["readings_count"],
-            })
+        else:
+            columns = self._window_columns(start_date, end_date)
+            with span("aggregation"):
+                chart_data = daily_chart_data(columns)
         
         # Calculate summary statistics
         total_flow = sum(d["total_flow_liters"] for d in chart_data)
@@ -114,6 +130,23 @@ class AnalyticsService:
             "daily_data": chart_data,
         }
     
+    def _window_columns(self, start_date: datetime, end_date: datetime) -> Dict[str, np.ndarray]:
+        """Gather every tank's reading columns within a window."""
+        db = self._sensor_service.db
+        start = calendar.timegm(start_date.timetuple())
+        end = calendar.timegm(end_date.timetuple()) + end_date.microsecond / 1e6
+        with span("store_read"):
+            chunks = [
+                chunk
+                for tank_id in db.rollups.tank_ids
+                for chunk in db.columns.iter_range(tank_id, start, end)
+            ]
+        if not chunks:
+            empty = np.empty(0, dtype=np.float64)
+            return {"epochs": empty, "levels": empty, "flows": empty}
+        epochs, levels, flows = (np.concatenate(column) for column in zip(*chunks))
+        return {"epochs": epochs, "levels": levels, "flows": flows}
+    
     def get_weekly_summary(self) -> Dict[str, Any]:
         """
         Get a weekly summary of water usage.
@@ -164,32 +197,23 @@ class AnalyticsService:
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=7)
         
-        readings = self._sensor_service.get_readings_by_date(start_date, end_date)
+        columns = self._window_columns(start_date, end_date)
         
-        # Aggregate by hour
-        hourly_data = defaultdict(lambda: {"total_flow": 0.0, "count": 0})
+        # Aggregate by UTC hour of the reading time
+        with span("aggregation"):
+            hours = ((columns["epochs"] % SECONDS_PER_DAY) // SECONDS_PER_HOUR).astype(np.int64)
+            totals = np.bincount(hours, weights=columns["flows"], minlength=24)
+            counts = np.bincount(hours, minlength=24)
+            averages = np.divide(totals, counts, out=np.zeros(24), where=counts > 0)
         
-        for reading in readings:
-            try:
-                timestamp = reading.get("timestamp", "")
-                hour = int(timestamp[11:13])  # Extract HH from timestamp
-                flow_rate = reading.get("flow_rate_lpm", 0)
-                
-                hourly_data[hour]["total_flow"] += flow_rate
-                hourly_data[hour]["count"] += 1
-            except (ValueError, TypeError, IndexError):
-                continue
-        
-        # Calculate average flow per hour
-        hourly_pattern = []
-        for hour in range(24):
-            data = hourly_data[hour]
-            avg_flow = data["total_flow"] / data["count"] if data["count"] > 0 else 0
-            hourly_pattern.append({
+        hourly_pattern = [
+            {
                 "hour": hour,
                 "hour_label": f"{hour:02d}:00",
-                "average_flow_lpm": round(avg_flow, 2),
-            })
+                "average_flow_lpm": round(float(average), 2),
+            }
+            for hour, average in enumerate(averages.tolist())
+        ]
         
         return {
             "period_days": 7,
@@ -0,0 +1,249 @@
+"""
+Bulk Import - Streams historical sensor files into the store in batches.
+Chunks are parsed and validated in worker processes; the main process writes.
+"""
+
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..constants import COLLECTION_READINGS, IMPORT_CHUNK_SIZE, IMPORT_ERROR_SAMPLES, IMPORT_FORMATS
+from ..errors.exceptions import ValidationError
+from ..utils.validators import validate_sensor_batch
+
+logger = logging.getLogger(__name__)
+
+# A chunk handed to a parse worker: (format, CSV header, lines, line number of the first line)
+ChunkTask = Tuple[str, Optional[List[str]], List[str], int]
+# What a worker returns: (valid readings, (line number, message) per rejected line, lines read)
+ChunkResult = Tuple[List[Dict[str, Any]], List[Tuple[int, str]], int]
+
+
+def detect_format(path: str) -> str:
+    """
+    Infer the file format from its extension.
+
+    Raises:
+        ValidationError: If the extension is not a supported format
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in IMPORT_FORMATS:
+        raise ValidationError(
+            f"Cannot infer the format of {path}; expected one of {', '.join(sorted(IMPORT_FORMATS))}",
+            field="format"
+        )
+    return IMPORT_FORMATS[extension]
+
+
+def read_chunks(path: str, file_format: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[ChunkTask]:
+    """
+    Stream a file as chunks of raw lines, never holding more than one chunk.
+
+    CSV files must start with a header row naming the reading fields.
+
+    Args:
+        path: File to read
+        file_format: 'csv' or 'ndjson'
+        chunk_size: Lines per chunk
+
+    Yields:
+        Parse tasks for parse_chunk()
+    """
+    with open(path, newline="", encoding="utf-8") as handle:
+        header = None
+        line_number = 1
+        if file_format == "csv":
+            first = handle.readline()
+            header = [name.strip() for name in next(csv.reader([first]), [])]
+            line_number = 2
+        lines: List[str] = []
+        for line in handle:
+            lines.append(line)
+            if len(lines) >= chunk_size:
+                yield file_format, header, lines, line_number
+                line_number += len(lines)
+                lines = []
+        if lines:
+            yield file_format, header, lines, line_number
+
+
+def parse_chunk(task: ChunkTask) -> ChunkResult:
+    """
+    Parse and validate one chunk (runs in a worker process).
+
+    Args:
+        task: Chunk produced by read_chunks()
+
+    Returns:
+        (valid readings, rejected lines with messages, lines read)
+    """
+    file_format, header, lines, first_line = task
+    records: List[Dict[str, Any]] = []
+    line_numbers: List[int] = []
+    errors: List[Tuple[int, str]] = []
+
+    if file_format == "csv":
+        rows = csv.reader(lines)
+        for line_number, row in enumerate(rows, first_line):
+            if not row:
+                continue
+            if len(row) != len(header):
+                errors.append((line_number, f"expected {len(header)} columns, got {len(row)}"))
+                continue
+            # Empty cells count as missing, like absent JSON keys
+            records.append({name: value or None for name, value in zip(header, row)})
+            line_numbers.append(line_number)
+    else:
+        for line_number, line in enumerate(lines, first_line):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                errors.append((line_number, f"invalid JSON: {str(e)}"))
+                continue
+            if not isinstance(record, dict):
+                errors.append((line_number, "expected a JSON object"))
+                continue
+            records.append(record)
+            line_numbers.append(line_number)
+
+    valid, rejected = validate_sensor_batch(records)
+    errors.extend((line_numbers[index], message) for index, message in rejected)
+    return valid, errors, len(lines)
+
+
+class BulkImporter:
+    """
+    Replays historical sensor files through the database's bulk write path.
+
+    Files are streamed in chunks so memory stays flat regardless of file
+    size. With workers > 0, chunks are parsed and validated in a process
+    pool while the main process stores the previous results; at most two
+    chunks per worker are in flight. Each chunk is stored with one
+    add_many() call, which indexes the columns and folds the rollups
+    incrementally.
+    """
+
+    def __init__(
+        self,
+        db,
+        alert_service=None,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        workers: int = 0,
+        max_errors: Optional[int] = None,
+        dry_run: bool = False,
+        progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        """
+        Initialize the importer.
+
+        Args:
+            db: Database to write into
+            alert_service: If given, imported readings are also run through the alert rules
+            chunk_size: Lines per chunk
+            workers: Parse worker processes (0 parses in this process)
+            max_errors: Abort once more lines than this were rejected (None = never)
+            dry_run: Parse and validate only, storing nothing
+            progress: Called with the running stats after every chunk
+        """
+        self._db = db
+        self._alert_service = alert_service
+        self.chunk_size = max(1, chunk_size)
+        self.workers = max(0, workers)
+        self.max_errors = max_errors
+        self.dry_run = dry_run
+        self._progress = progress
+
+    def import_files(self, paths: List[str], file_format: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Import every file in order.
+
+        Args:
+            paths: Files to import
+            file_format: 'csv' or 'ndjson' for all files (default: by extension)
+
+        Returns:
+            Import statistics, including throughput
+
+        Raises:
+            ValidationError: If a format is unknown or too many lines were rejected
+        """
+        formats = [file_format or detect_format(path) for path in paths]
+        stats: Dict[str, Any] = {
+            "files": len(paths),
+            "lines_read": 0,
+            "rows_imported": 0,
+            "rows_rejected": 0,
+            "alerts_raised": 0,
+            "chunks": 0,
+            "seconds": 0.0,
+            "rows_per_second": 0.0,
+            "errors": [],
+        }
+        started = time.perf_counter()
+
+        tasks = (
+            (path, task)
+            for path, fmt in zip(paths, formats)
+            for task in read_chunks(path, fmt, self.chunk_size)
+        )
+        for path, (valid, errors, lines_read) in self._parse(tasks):
+            if valid and not self.dry_run:
+                self._db.add_many(COLLECTION_READINGS, valid)
+                if self._alert_service is not None:
+                    results = self._alert_service.analyze_batch(valid)
+                    stats["alerts_raised"] += sum(len(result["alerts"]) for result in results)
+
+            stats["chunks"] += 1
+            stats["lines_read"] += lines_read
+            stats["rows_imported"] += len(valid)
+            stats["rows_rejected"] += len(errors)
+            samples = stats["errors"]
+            for line_number, message in errors[:IMPORT_ERROR_SAMPLES - len(samples)]:
+                samples.append({"file": path, "line": line_number, "message": message})
+
+            elapsed = time.perf_counter() - started
+            stats["seconds"] = round(elapsed, 3)
+            stats["rows_per_second"] = round(stats["rows_imported"] / elapsed, 1) if elapsed > 0 else 0.0
+            if self._progress is not None:
+                self._progress(dict(stats))
+            if self.max_errors is not None and stats["rows_rejected"] > self.max_errors:
+                raise ValidationError(
+                    f"Import aborted: {stats['rows_rejected']} rejected lines exceed the limit of {self.max_errors}"
+                )
+
+        logger.info(
+            "Import complete",
+            extra={"fields": {
+                "readings": stats["rows_imported"],
+                "files": len(paths),
+                "rejected": stats["rows_rejected"],
+                "rows_per_second": stats["rows_per_second"],
+            }},
+        )
+        return stats
+
+    def _parse(self, tasks: Iterable[Tuple[str, ChunkTask]]) -> Iterator[Tuple[str, ChunkResult]]:
+        """Parse chunks in order, in the pool when workers are configured."""
+        if not self.workers:
+            for path, task in tasks:
+                yield path, parse_chunk(task)
+            return
+
+        with multiprocessing.Pool(self.workers) as pool:
+            # Bounded read-ahead keeps memory flat on files larger than RAM
+            pending = deque()
+            for path, task in tasks:
+                pending.append((path, pool.apply_async(parse_chunk, (task,))))
+                if len(pending) >= 2 * self.workers:
+                    path, result = pending.popleft()
+                    yield path, result.get()
+            while pending:
+                path, result = pending.popleft()
+                yield path, result.get()
@@ -0,0 +1,288 @@
+"""
+Compactor - Enforces data retention in small, time-sliced steps.
+Expires raw readings, rollup buckets and alerts according to a policy,
+and releases leak-detection history of tanks that went quiet.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
+from ..constants import (
+    SECONDS_PER_HOUR,
+    SECONDS_PER_DAY,
+    RETENTION_RAW_DAYS,
+    RETENTION_HOURLY_DAYS,
+    RETENTION_DAILY_DAYS,
+    RETENTION_ALERT_DAYS,
+    COMPACTION_INTERVAL_SECONDS,
+    COMPACTION_SLICE_SECONDS,
+    COMPACTION_PAUSE_SECONDS,
+    COMPACTION_CHUNK_SIZE,
+    SEGMENT_ACTIVE_DAYS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _days_to_seconds(days: float) -> Optional[float]:
+    """Retention in seconds, None meaning keep forever."""
+    return days * SECONDS_PER_DAY if days and days > 0 else None
+
+
+class RetentionPolicy(NamedTuple):
+    """How long each tier is kept (None = forever)."""
+    raw_seconds: Optional[float] = _days_to_seconds(RETENTION_RAW_DAYS)
+    hourly_seconds: Optional[float] = _days_to_seconds(RETENTION_HOURLY_DAYS)
+    daily_seconds: Optional[float] = _days_to_seconds(RETENTION_DAILY_DAYS)
+    alert_seconds: Optional[float] = _days_to_seconds(RETENTION_ALERT_DAYS)
+    active_seconds: Optional[float] = _days_to_seconds(SEGMENT_ACTIVE_DAYS)  # Before sealing
+
+    @classmethod
+    def from_config(cls, config) -> "RetentionPolicy":
+        """Build a policy from RETENTION_*_DAYS config values."""
+        return cls(
+            raw_seconds=_days_to_seconds(config.get("RETENTION_RAW_DAYS", RETENTION_RAW_DAYS)),
+            hourly_seconds=_days_to_seconds(config.get("RETENTION_HOURLY_DAYS", RETENTION_HOURLY_DAYS)),
+            daily_seconds=_days_to_seconds(config.get("RETENTION_DAILY_DAYS", RETENTION_DAILY_DAYS)),
+            alert_seconds=_days_to_seconds(config.get("RETENTION_ALERT_DAYS", RETENTION_ALERT_DAYS)),
+            active_seconds=_days_to_seconds(config.get("SEGMENT_ACTIVE_DAYS", SEGMENT_ACTIVE_DAYS)),
+        )
+
+
+class Compactor:
+    """
+    Background retention enforcement.
+
+    A compaction cycle is a generator that works one chunk at a time
+    (sealing finished days to segments, then expiring readings, column
+    rows, hourly and daily buckets, then alerts and idle leak-detection
+    windows).
+    Each slice resumes the generator until its time budget is spent, and
+    the thread pauses between slices, so no single step holds locks or the
+    interpreter long enough to show up in request latency.
+    """
+
+    def __init__(
+        self,
+        policy: RetentionPolicy = None,
+        chunk_size: int = COMPACTION_CHUNK_SIZE,
+        slice_seconds: float = COMPACTION_SLICE_SECONDS,
+        interval_seconds: float = COMPACTION_INTERVAL_SECONDS,
+        clock=time.time,
+    ):
+        """
+        Initialize the compactor (call init_app() or start() to run it).
+
+        Args:
+            policy: Retention policy (defaults to the built-in tiers)
+            chunk_size: Items expired per step
+            slice_seconds: Time budget of one slice
+            interval_seconds: Pause between compaction cycles
+            clock: Wall-clock source for retention cutoffs
+        """
+        self.policy = policy or RetentionPolicy()
+        self.chunk_size = chunk_size
+        self.slice_seconds = slice_seconds
+        self.interval_seconds = interval_seconds
+        self._clock = clock
+        self._db = None
+        self._alert_service = None
+        self._load_stores: Optional[Callable[[], Tuple[Any, Any]]] = None
+        self._work: Optional[Iterator[None]] = None
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, int] = {
+            "cycles": 0,
+            "readings_sealed": 0,
+            "readings_expired": 0,
+            "segment_days_expired": 0,
+            "column_rows_expired": 0,
+            "hourly_buckets_expired": 0,
+            "daily_buckets_expired": 0,
+            "alerts_expired": 0,
+            "leak_windows_expired": 0,
+        }
+
+    def init_app(self, app, stores: Callable[[], Tuple[Any, Any]]) -> None:
+        """
+        Configure the compactor from app config and start it if enabled.
+
+        Args:
+            app: Flask application
+            stores: Returns (database, optional alert service whose alerts
+                expire); called before the first cycle or seal(), so the
+                store isn't created during startup
+        """
+        self.policy = RetentionPolicy.from_config(app.config)
+        self.interval_seconds = app.config.get("COMPACTION_INTERVAL_SECONDS", self.interval_seconds)
+        self.configure(None)
+        self._load_stores = stores
+        app.extensions["compactor"] = self
+
+        if app.config.get("COMPACTION_ENABLED", True) and not app.testing:
+            self.start()
+
+    def configure(self, db, alert_service=None) -> None:
+        """Set the stores to compact."""
+        self._db = db
+        self._alert_service = alert_service
+        self._load_stores = None
+        self._work = None
+
+    def _resolve_stores(self) -> None:
+        """Load the stores passed to init_app() on first use."""
+        if self._db is None and self._load_stores is not None:
+            self.configure(*self._load_stores())
+
+    @property
+    def running(self) -> bool:
+        """Whether the background thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the background thread (no-op if already running)."""
+        if self.running or (self._db is None and self._load_stores is None):
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="retention-compactor", daemon=True)
+        self._thread.start()
+        logger.info("Retention compactor started", extra={"fields": {"interval_seconds": self.interval_seconds}})
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop the background thread."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_slice(self, budget_seconds: float = None) -> bool:
+        """
+        Advance the current compaction cycle for up to budget_seconds.
+
+        Returns:
+            True if the cycle finished during this slice
+        """
+        budget = self.slice_seconds if budget_seconds is None else budget_seconds
+        deadline = time.perf_counter() + budget
+        if self._work is None:
+            self._resolve_stores()
+            self._work = self._cycle()
+        while True:
+            try:
+                next(self._work)
+            except StopIteration:
+                self._work = None
+                self.stats["cycles"] += 1
+                return True
+            if time.perf_counter() >= deadline:
+                return False
+
+    def run_cycle(self) -> Dict[str, Any]:
+        """Run a full compaction cycle synchronously (CLI and tests)."""
+        while not self.run_slice(float("inf")):
+            pass
+        return dict(self.stats)
+
+    def seal(self) -> int:
+        """
+        Seal finished days to segments synchronously, without expiring anything.
+
+        Returns:
+            Number of readings sealed
+        """
+        self._resolve_stores()
+        before = self.stats["readings_sealed"]
+        for _ in self._seal(self._clock()):
+            pass
+        return self.stats["readings_sealed"] - before
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                finished = self.run_slice()
+            except Exception as e:  # Keep the thread alive; retry next cycle
+                logger.error("Compaction failed", extra={"fields": {"error": str(e)}})
+                self._work = None
+                finished = True
+            self._stopping.wait(self.interval_seconds if finished else COMPACTION_PAUSE_SECONDS)
+
+    def _seal(self, now: float) -> Iterator[None]:
+        """Move readings older than the active window into segments, yielding per chunk and group."""
+        db = self._db
+        if db.segments is None or self.policy.active_seconds is None:
+            return
+        sealed_before = int((now - self.policy.active_seconds) // SECONDS_PER_DAY)
+        # Seal once per day rollover; late readings wait for the next one
+        if sealed_before > db.columns.sealed_before:
+            groups = yield from db.detach_sealable(sealed_before, self.chunk_size)
+            yield
+            for (tank_id, day), docs in groups.items():
+                self.stats["readings_sealed"] += db.seal_group(tank_id, day, docs)
+                yield
+            db.finish_sealing(sealed_before, sorted({tank_id for tank_id, _ in groups}))
+            yield
+
+    def _cycle(self) -> Iterator[None]:
+        """One pass over every tier, yielding after each chunk."""
+        now = self._clock()
+        policy = self.policy
+        chunk = self.chunk_size
+        db = self._db
+
+        yield from self._seal(now)
+
+        segments = db.segments
+        if policy.raw_seconds is not None:
+            cutoff = now - policy.raw_seconds
+            if segments is not None:
+                done = False
+                while not done:
+                    dropped, done = segments.drop_before(int(cutoff // SECONDS_PER_DAY), chunk)
+                    self.stats["segment_days_expired"] += dropped
+                    yield
+            done = False
+            while not done:
+                dropped, done = db.expire_readings(cutoff, chunk)
+                self.stats["readings_expired"] += dropped
+                yield
+            for tank_id in db.columns.tank_ids:
+                done = False
+                while not done:
+                    dropped, done = db.columns.drop_before(tank_id, cutoff, chunk)
+                    self.stats["column_rows_expired"] += dropped
+                    yield
+
+        tiers = (
+            (policy.hourly_seconds, SECONDS_PER_HOUR, db.rollups.drop_hourly_before, "hourly_buckets_expired"),
+            (policy.daily_seconds, SECONDS_PER_DAY, db.rollups.drop_daily_before, "daily_buckets_expired"),
+        )
+        for retention, period, drop, stat in tiers:
+            if retention is None:
+                continue
+            first_kept = int((now - retention) // period)
+            for tank_id in db.rollups.tank_ids:
+                done = False
+                while not done:
+                    dropped, done = drop(tank_id, first_kept, chunk)
+                    self.stats[stat] += dropped
+                    yield
+
+        if policy.alert_seconds is not None and self._alert_service is not None:
+            cutoff = now - policy.alert_seconds
+            done = False
+            while not done:
+                dropped, done = self._alert_service.expire_alerts(cutoff, chunk)
+                self.stats["alerts_expired"] += dropped
+                yield
+
+        if self._alert_service is not None:
+            done = False
+            while not done:
+                dropped, done = self._alert_service.expire_leak_windows(now, chunk)
+                self.stats["leak_windows_expired"] += dropped
+                yield
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Compaction cycle complete", extra={"fields": dict(self.stats)})
@@ -0,0 +1,224 @@
+"""
+Conservation Service - Conservation reports computed from daily rollups.
+Compares usage in a period against a historical baseline per tank.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..constants import (
+    CONSERVATION_PERIOD_DAYS,
+    CONSERVATION_TRAILING_BASELINE_DAYS,
+    CONSERVATION_BASELINE_MIN_COVERAGE,
+    DAYS_PER_YEAR,
+)
+from ..storage.rollups import B_COUNT, B_FLOW_SUM, B_LEVEL_SUM
+from ..utils.timeutils import day_index, format_day, format_epoch
+from .sensor_service import SensorService
+
+logger = logging.getLogger(__name__)
+
+BASELINE_LAST_YEAR = "same_period_last_year"
+BASELINE_TRAILING = "trailing_4_weeks"
+BASELINE_UNAVAILABLE = "unavailable"
+
+
+def _sum_days(rollups, tank_id: str, start_day: int, end_day: int) -> Tuple[float, float, int, int]:
+    """
+    Sum a tank's daily buckets over an inclusive day range.
+
+    Returns:
+        (usage liters, level sum, reading count, days with data)
+    """
+    usage = level_sum = 0.0
+    count = days = 0
+    for _, bucket in rollups.daily_buckets(tank_id, start_day, end_day):
+        usage += bucket[B_FLOW_SUM]
+        level_sum += bucket[B_LEVEL_SUM]
+        count += bucket[B_COUNT]
+        days += 1
+    return usage, level_sum, count, days
+
+
+def _efficiency(avg_level: float) -> float:
+    """Efficiency score (50-95%) based on water level stability."""
+    if avg_level >= 60:
+        efficiency = 85 + (avg_level - 60) / 4  # 85-95%
+    elif avg_level >= 40:
+        efficiency = 70 + (avg_level - 40) / 2  # 70-85%
+    else:
+        efficiency = 50 + avg_level / 2  # 50-70%
+    return min(95, max(50, efficiency))
+
+
+class ConservationService:
+    """
+    Service building conservation reports from the daily rollups.
+
+    A report over N days reads N daily buckets per tank, however many raw
+    readings those days contain. Each tank's usage is compared against the
+    same period last year when enough of it is covered by data, otherwise
+    against its trailing 4 weeks scaled to the period length.
+    """
+
+    def __init__(self, sensor_service: SensorService = None):
+        """
+        Initialize the conservation service.
+
+        Args:
+            sensor_service: Optional sensor service instance for data access
+        """
+        self._sensor_service = sensor_service or SensorService()
+
+    def period_range(self, period: str, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        Resolve a named period to an inclusive day range ending today.
+
+        Args:
+            period: 'daily', 'weekly' or 'monthly'
+            now: Epoch seconds to resolve against (defaults to current time)
+
+        Returns:
+            (start_day, end_day) as UTC day numbers
+        """
+        today = day_index(time.time() if now is None else now)
+        return today - CONSERVATION_PERIOD_DAYS[period] + 1, today
+
+    def get_report(
+        self,
+        period: str,
+        start_day: Optional[int] = None,
+        end_day: Optional[int] = None,
+        tank_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build a water conservation report.
+
+        Args:
+            period: Period name ('daily', 'weekly', 'monthly' or 'custom')
+            start_day: First day (UTC day number); derived from period if omitted
+            end_day: Last day, inclusive (UTC day number)
+            tank_id: Optional tank to restrict the report to
+
+        Returns:
+            Dictionary with fleet totals, per-tank metrics and explanations
+        """
+        if start_day is None or end_day is None:
+            start_day, end_day = self.period_range(period)
+        days = end_day - start_day + 1
+
+        rollups = self._sensor_service.db.rollups
+        tank_ids = [tank_id] if tank_id else rollups.tank_ids
+
+        tanks = []
+        level_sum = 0.0
+        reading_count = 0
+        for tid in tank_ids:
+            tank, tank_level_sum, tank_count = self._tank_report(rollups, tid, start_day, end_day)
+            tanks.append(tank)
+            level_sum += tank_level_sum
+            reading_count += tank_count
+
+        total_usage = sum((t["usage_liters"] for t in tanks), 0.0)
+        baseline_tanks = [t for t in tanks if t["baseline_liters"] is not None]
+        baseline_usage = sum((t["baseline_liters"] for t in baseline_tanks), 0.0)
+        compared_usage = sum((t["usage_liters"] for t in baseline_tanks), 0.0)
+
+        water_saved = baseline_usage - compared_usage
+        savings_percent = (water_saved / baseline_usage) * 100 if baseline_usage > 0 else 0.0
+        avg_daily = total_usage / days
+        avg_level = level_sum / reading_count if reading_count else 0.0
+        efficiency = _efficiency(avg_level)
+
+        methods = {t["baseline_method"] for t in tanks}
+        baseline_method = methods.pop() if len(methods) == 1 else "mixed"
+        if not tanks:
+            baseline_method = BASELINE_UNAVAILABLE
+
+        return {
+            "period": period,
+            "start_date": format_day(start_day),
+            "end_date": format_day(end_day),
+            "days": days,
+            "tank_count": len(tanks),
+            "total_usage_liters": round(total_usage, 1),
+            "average_daily_liters": round(avg_daily, 1),
+            "baseline_usage_liters": round(baseline_usage, 1),
+            "baseline_method": baseline_method,
+            "water_saved_liters": round(water_saved, 1),
+            "savings_percent": round(savings_percent, 1),
+            "efficiency_percent": round(efficiency, 1),
+            "insights": self._insights(efficiency, water_saved, avg_daily, baseline_method),
+            "tanks": tanks,
+            "explanation": {
+                "efficiency": "Calculated based on water level stability and usage patterns",
+                "savings": "Compared to each tank's historical usage for an equally long period",
+                "method": (
+                    "Baseline is the same period last year when at least half of it has data, "
+                    "otherwise the trailing 4 weeks scaled to the period length"
+                ),
+            },
+            "timestamp": format_epoch(time.time()),
+        }
+
+    def _tank_report(
+        self, rollups, tank_id: str, start_day: int, end_day: int
+    ) -> Tuple[Dict[str, Any], float, int]:
+        """Usage and baseline for one tank, plus its level sum and reading count."""
+        days = end_day - start_day + 1
+        usage, level_sum, count, days_with_data = _sum_days(rollups, tank_id, start_day, end_day)
+
+        baseline, method = None, BASELINE_UNAVAILABLE
+        last_year = _sum_days(rollups, tank_id, start_day - DAYS_PER_YEAR, end_day - DAYS_PER_YEAR)
+        if last_year[3] >= days * CONSERVATION_BASELINE_MIN_COVERAGE:
+            baseline = last_year[0] * days / last_year[3]
+            method = BASELINE_LAST_YEAR
+        else:
+            trailing = _sum_days(
+                rollups, tank_id, start_day - CONSERVATION_TRAILING_BASELINE_DAYS, start_day - 1
+            )
+            if trailing[3] >= CONSERVATION_TRAILING_BASELINE_DAYS * CONSERVATION_BASELINE_MIN_COVERAGE:
+                baseline = trailing[0] / trailing[3] * days
+                method = BASELINE_TRAILING
+
+        savings_percent = None
+        if baseline:
+            savings_percent = round((baseline - usage) / baseline * 100, 1)
+
+        tank = {
+            "tank_id": tank_id,
+            "usage_liters": round(usage, 1),
+            "baseline_liters": None if baseline is None else round(baseline, 1),
+            "baseline_method": method,
+            "savings_percent": savings_percent,
+            "average_level_percent": round(level_sum / count, 1) if count else None,
+            "days_with_data": days_with_data,
+        }
+        return tank, level_sum, count
+
+    @staticmethod
+    def _insights(efficiency: float, water_saved: float, avg_daily: float, baseline_method: str) -> List[str]:
+        """Generate human-readable insights."""
+        insights = []
+
+        if efficiency >= 80:
+            insights.append("Excellent water management! System is operating efficiently.")
+        elif efficiency >= 70:
+            insights.append("Good water usage patterns. Minor optimizations possible.")
+        else:
+            insights.append("Water usage can be optimized. Consider reviewing consumption patterns.")
+
+        if baseline_method == BASELINE_UNAVAILABLE:
+            insights.append("Not enough history yet to compare against a baseline.")
+        elif water_saved > 100:
+            insights.append(f"You've saved {water_saved:.0f}L compared to baseline usage.")
+        elif water_saved < -100:
+            insights.append(f"Usage is {-water_saved:.0f}L above baseline. Look for ways to reduce usage.")
+
+        if avg_daily < 500:
+            insights.append("Daily consumption is below average. Great conservation effort!")
+        elif avg_daily > 800:
+            insights.append("Daily consumption is high. Look for ways to reduce usage.")
+
+        return insights
@@ -0,0 +1,247 @@
+"""
+Export Service - Streams raw readings as NDJSON, CSV or Arrow.
+Rows are serialized in small batches straight from the storage iterator;
+Arrow batches wrap the stored column buffers directly.
+"""
+
+import csv
+import io
+import json
+import os
+from functools import lru_cache
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+from ..constants import EXPORT_BATCH_ROWS, EXPORT_COLUMNS, EXPORT_FORMATS
+from ..errors.exceptions import FeatureUnavailableError, ValidationError
+from .sensor_service import SensorService
+
+_NOT_IMPORTED = object()
+
+# pyarrow is an optional extra and slow to import; loaded on first columnar export
+pa: Any = _NOT_IMPORTED
+
+
+def require_pyarrow() -> None:
+    """
+    Import the optional pyarrow package on first use.
+
+    Raises:
+        FeatureUnavailableError: If pyarrow is missing
+    """
+    global pa
+    if pa is _NOT_IMPORTED:
+        try:
+            import pyarrow
+        except ImportError:
+            pa = None
+        else:
+            pa = pyarrow
+    if pa is None:
+        raise FeatureUnavailableError(
+            "Columnar export needs the optional pyarrow package (pip install pyarrow)",
+            dependency="pyarrow"
+        )
+
+
+def arrow_schema() -> "pa.Schema":
+    """Schema of exported Arrow batches (call require_pyarrow() first)."""
+    return pa.schema([
+        ("timestamp", pa.timestamp("ms", tz="UTC")),
+        ("device_id", pa.dictionary(pa.int32(), pa.string())),
+        ("tank_id", pa.dictionary(pa.int32(), pa.string())),
+        ("water_level_percent", pa.float64()),
+        ("flow_rate_lpm", pa.float64()),
+    ])
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that collects what the Arrow writer emits."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+@lru_cache(maxsize=4096)
+def _json_string(value: str) -> str:
+    """JSON-encode an identifier (few distinct values, so cached)."""
+    return json.dumps(value)
+
+
+class ExportService:
+    """
+    Service for bulk reading exports.
+
+    Exports never materialize the result: readings come from the database
+    iterator in time order and are serialized EXPORT_BATCH_ROWS at a time,
+    so memory stays flat whether a dump has a thousand rows or fifty million.
+    """
+
+    def __init__(self, sensor_service: SensorService = None):
+        """
+        Initialize with a sensor service.
+
+        Args:
+            sensor_service: SensorService instance for data access
+        """
+        self._sensor_service = sensor_service or SensorService()
+
+    def stream(
+        self,
+        file_format: str,
+        start: float = 0.0,
+        end: float = float("inf"),
+        tank_id: Optional[str] = None,
+    ) -> Iterator[str]:
+        """
+        Serialize readings within [start, end] as text chunks.
+
+        Args:
+            file_format: 'ndjson', 'csv' or 'arrow'
+            start: Window start (epoch seconds)
+            end: Window end (epoch seconds)
+            tank_id: Optional tank to restrict the export to
+
+        Returns:
+            Iterator of chunks: text holding whole rows, or Arrow IPC stream bytes
+
+        Raises:
+            ValidationError: If the format is unknown
+            FeatureUnavailableError: If Arrow is requested without pyarrow
+        """
+        if file_format not in EXPORT_FORMATS:
+            raise ValidationError(f"format must be one of: {', '.join(EXPORT_FORMATS)}", field="format")
+        if file_format == "arrow":
+            require_pyarrow()
+            return self._arrow_stream(self.record_batches(start, end, tank_id))
+        rows = self._sensor_service.db.iter_readings(start, end, tank_id)
+        if file_format == "csv":
+            return self._csv(rows)
+        return self._ndjson(rows)
+
+    def write_file(
+        self,
+        path: str,
+        file_format: str,
+        start: float = 0.0,
+        end: float = float("inf"),
+        tank_id: Optional[str] = None,
+    ) -> int:
+        """
+        Write an export to a file, batch by batch.
+
+        Args:
+            path: Output file
+            file_format: 'ndjson', 'csv', 'arrow' (IPC stream) or 'parquet'
+
+        Returns:
+            Number of bytes written
+
+        Raises:
+            ValidationError: If the format is unknown
+            FeatureUnavailableError: If a columnar format is requested without pyarrow
+        """
+        if file_format == "parquet":
+            require_pyarrow()
+            import pyarrow.parquet as pq
+
+            with pq.ParquetWriter(path, arrow_schema()) as writer:
+                for batch in self.record_batches(start, end, tank_id):
+                    writer.write_batch(batch)
+        else:
+            chunks = self.stream(file_format, start, end, tank_id)
+            if file_format == "arrow":
+                handle = open(path, "wb")
+            else:
+                handle = open(path, "w", encoding="utf-8", newline="")
+            with handle:
+                for chunk in chunks:
+                    handle.write(chunk)
+        return os.path.getsize(path)
+
+    def record_batches(
+        self,
+        start: float = 0.0,
+        end: float = float("inf"),
+        tank_id: Optional[str] = None,
+    ) -> Iterator["pa.RecordBatch"]:
+        """
+        Readings within [start, end] as Arrow record batches (pyarrow required).
+
+        Level and flow buffers of sealed days are handed to Arrow as they
+        are mapped from disk; timestamps and device codes are converted with
+        whole-array casts. No value goes through Python one row at a time
+        except for the in-memory active window.
+
+        Returns:
+            Iterator of batches, one per tank and sealed day, then one per tank
+        """
+        require_pyarrow()
+        schema = arrow_schema()
+        db = self._sensor_service.db
+        for tank, epochs, levels, flows, codes, devices in db.iter_column_batches(start, end, tank_id):
+            millis = (epochs * 1000).astype("datetime64[ms]")
+            yield pa.RecordBatch.from_arrays(
+                [
+                    pa.array(millis, type=schema.field("timestamp").type),
+                    pa.DictionaryArray.from_arrays(pa.array(codes), pa.array(devices, type=pa.string())),
+                    pa.DictionaryArray.from_arrays(
+                        pa.array(np.zeros(len(epochs), dtype=np.int32)), pa.array([tank], type=pa.string())
+                    ),
+                    pa.array(np.ascontiguousarray(levels)),
+                    pa.array(np.ascontiguousarray(flows)),
+                ],
+                schema=schema,
+            )
+
+    def _arrow_stream(self, batches) -> Iterator[bytes]:
+        sink = _ChunkSink()
+        with pa.ipc.new_stream(sink, arrow_schema()) as writer:
+            yield sink.take()  # Schema message
+            for batch in batches:
+                writer.write_batch(batch)
+                yield sink.take()
+        yield sink.take()  # End-of-stream marker
+
+    def _ndjson(self, rows) -> Iterator[str]:
+        batch = []
+        for _, timestamp, device_id, tank_id, level, flow in rows:
+            batch.append(
+                f'{{"timestamp": "{timestamp}", "device_id": {_json_string(device_id)}, '
+                f'"tank_id": {_json_string(tank_id)}, "water_level_percent": {level!r}, '
+                f'"flow_rate_lpm": {flow!r}}}\n'
+            )
+            if len(batch) >= EXPORT_BATCH_ROWS:
+                yield "".join(batch)
+                batch = []
+        if batch:
+            yield "".join(batch)
+
+    def _csv(self, rows) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(EXPORT_COLUMNS)
+        pending = 0
+        for row in rows:
+            writer.writerow(row[1:])
+            pending += 1
+            if pending >= EXPORT_BATCH_ROWS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        yield buffer.getvalue()
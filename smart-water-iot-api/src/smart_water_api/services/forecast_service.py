@@ -0,0 +1,262 @@
+"""
+Forecast Service - Fleet-wide time-to-empty and time-to-overflow projections.
+Fits hour-of-week profiles from the rollups and projects every tank at once.
+"""
+
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..constants import (
+    ANALYTICS_OFFLOAD_MIN_TANKS,
+    COLLECTION_TANKS,
+    TANK_CAPACITY_DEFAULT_LITERS,
+    HOURS_PER_WEEK,
+    FORECAST_HORIZON_HOURS,
+    FORECAST_CRITICAL_HOURS,
+    FORECAST_WARNING_HOURS,
+    FORECAST_CAUTION_HOURS,
+    WATER_LEVEL_MAX,
+)
+from ..storage.rollups import (
+    hour_of_week,
+    P_FLOW_SUM,
+    P_FLOW_COUNT,
+    P_LEVEL_RATE_SUM,
+    P_LEVEL_RATE_COUNT,
+    L_EPOCH,
+    L_LEVEL,
+    L_FLOW,
+)
+from ..utils.timeutils import format_epoch
+from .analytics_pool import AnalyticsPool
+from .sensor_service import SensorService
+
+logger = logging.getLogger(__name__)
+
+
+def get_warning_level(hours_remaining: Optional[float]) -> str:
+    """Map hours until empty to a warning level."""
+    if hours_remaining is None:
+        return "normal"
+    if hours_remaining < FORECAST_CRITICAL_HOURS:
+        return "critical"
+    if hours_remaining < FORECAST_WARNING_HOURS:
+        return "warning"
+    if hours_remaining < FORECAST_CAUTION_HOURS:
+        return "caution"
+    return "normal"
+
+
+def _profile_average(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Average each hour-of-week slot, filling empty slots with the tank's mean.
+
+    Args:
+        sums: (n, 168) per-slot sums
+        counts: (n, 168) per-slot sample counts
+
+    Returns:
+        (n, 168) averages (0 for tanks without any samples)
+    """
+    total_counts = counts.sum(axis=1, keepdims=True)
+    overall = np.divide(
+        sums.sum(axis=1, keepdims=True), total_counts,
+        out=np.zeros_like(total_counts), where=total_counts > 0,
+    )
+    averages = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    return np.where(counts > 0, averages, overall)
+
+
+def _first_crossing(trajectory: np.ndarray, start: np.ndarray, steps: np.ndarray, limit: float, rising: bool):
+    """
+    Find when each tank's projected level first crosses a limit.
+
+    Args:
+        trajectory: (n, H) projected level at the end of each hour
+        start: (n,) current level
+        steps: (n, H) level change during each hour
+        limit: Level to cross (0 for empty, 100 for overflow)
+        rising: True when crossing upwards
+
+    Returns:
+        (n,) hours until crossing, NaN when not within the horizon
+    """
+    crossed = trajectory >= limit if rising else trajectory <= limit
+    has_crossing = crossed.any(axis=1)
+    first = crossed.argmax(axis=1)
+
+    rows = np.arange(trajectory.shape[0])
+    previous = np.where(first > 0, trajectory[rows, np.maximum(first - 1, 0)], start)
+    step = steps[rows, first]
+    # Interpolate linearly inside the crossing hour
+    fraction = np.divide(limit - previous, step, out=np.zeros_like(step), where=step != 0)
+    hours = np.where(has_crossing, first + np.clip(fraction, 0.0, 1.0), np.nan)
+    already = start >= limit if rising else start <= limit
+    return np.where(already, 0.0, hours)
+
+
+def project_fleet(
+    columns: Dict[str, np.ndarray],
+    tank_ids: List[str],
+    horizon_hours: int,
+    now: float,
+) -> List[Dict[str, Any]]:
+    """
+    Run the vectorized projection over fleet arrays (also in pool workers).
+
+    Args:
+        columns: 'profiles' (n, 168, 4), 'latest' (n, 3) and 'capacity' (n,) arrays
+        tank_ids: Tank of each row
+        horizon_hours: How far ahead to project
+        now: Epoch seconds to project from
+
+    Returns:
+        Per-tank projections in row order
+    """
+    if not tank_ids:
+        return []
+
+    profiles, latest, capacity = columns["profiles"], columns["latest"], columns["capacity"]
+    level = np.nan_to_num(latest[:, L_LEVEL])
+
+    level_rate = _profile_average(profiles[:, :, P_LEVEL_RATE_SUM], profiles[:, :, P_LEVEL_RATE_COUNT])
+    outflow_lph = _profile_average(profiles[:, :, P_FLOW_SUM], profiles[:, :, P_FLOW_COUNT]) * 60
+
+    # Roll profiles so column 0 is the current hour of week
+    hours = (hour_of_week(now) + np.arange(horizon_hours)) % HOURS_PER_WEEK
+    steps = level_rate[:, hours]
+    trajectory = level[:, None] + np.cumsum(steps, axis=1)
+
+    hours_to_empty = _first_crossing(trajectory, level, steps, 0.0, rising=False)
+    hours_to_overflow = _first_crossing(trajectory, level, steps, float(WATER_LEVEL_MAX), rising=True)
+    daily_outflow = outflow_lph[:, hours[:24]].sum(axis=1)
+
+    results = []
+    for row, tank_id in enumerate(tank_ids):
+        to_empty = None if np.isnan(hours_to_empty[row]) else round(float(hours_to_empty[row]), 1)
+        to_overflow = None if np.isnan(hours_to_overflow[row]) else round(float(hours_to_overflow[row]), 1)
+        last_epoch = latest[row, L_EPOCH]
+        results.append({
+            "tank_id": tank_id,
+            "capacity_liters": float(capacity[row]),
+            "current_level_percent": round(float(level[row]), 1),
+            "current_water_liters": round(float(level[row] / 100 * capacity[row]), 1),
+            "current_flow_lpm": round(float(np.nan_to_num(latest[row, L_FLOW])), 2),
+            "hours_to_empty": to_empty,
+            "hours_to_overflow": to_overflow,
+            "projected_daily_outflow_liters": round(float(daily_outflow[row]), 1),
+            "warning_level": get_warning_level(to_empty),
+            "last_reading": None if np.isnan(last_epoch) else format_epoch(last_epoch),
+        })
+    return results
+
+
+class ForecastService:
+    """
+    Service projecting tank levels for the whole fleet in one pass.
+
+    Each tank's hour-of-week profile (average level change rate and average
+    outflow) is maintained by the rollups on ingest. A forecast rolls the
+    profiles to the current hour of week, accumulates them over the horizon
+    and locates the first empty/overflow crossing with array operations.
+    """
+
+    def __init__(self, sensor_service: SensorService = None, pool: AnalyticsPool = None):
+        """
+        Initialize the forecast service.
+
+        Args:
+            sensor_service: Optional sensor service instance for data access
+            pool: Optional process pool for large fleets
+        """
+        self._sensor_service = sensor_service or SensorService()
+        self._pool = pool
+
+    @property
+    def _db(self):
+        return self._sensor_service.db
+
+    def set_tank_capacity(self, tank_id: str, capacity_liters: float) -> Dict[str, Any]:
+        """
+        Store a tank's capacity metadata.
+
+        Args:
+            tank_id: Tank identifier
+            capacity_liters: Usable tank volume in liters
+
+        Returns:
+            The stored tank metadata document
+        """
+        document = {
+            "tank_id": tank_id,
+            "capacity_liters": float(capacity_liters),
+            "updated_at": format_epoch(time.time()),
+        }
+        self._db.set(COLLECTION_TANKS, tank_id, document)
+        logger.info("Tank capacity set", extra={"fields": {"tank_id": tank_id, "capacity_liters": capacity_liters}})
+        return dict(document)
+
+    def get_tank(self, tank_id: str) -> Dict[str, Any]:
+        """Get a tank's metadata, with defaults for unregistered tanks."""
+        document = self._db.get(COLLECTION_TANKS, tank_id)
+        if document is None:
+            return {"tank_id": tank_id, "capacity_liters": TANK_CAPACITY_DEFAULT_LITERS}
+        return dict(document)
+
+    def get_tank_capacity(self, tank_id: str) -> float:
+        """Get a tank's capacity in liters."""
+        document = self._db.get(COLLECTION_TANKS, tank_id)
+        if document is None:
+            return TANK_CAPACITY_DEFAULT_LITERS
+        return document["capacity_liters"]
+
+    def forecast_fleet(
+        self,
+        horizon_hours: int = FORECAST_HORIZON_HOURS,
+        now: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Project time-to-empty and time-to-overflow for every tank.
+
+        Args:
+            horizon_hours: How far ahead to project
+            now: Epoch seconds to project from (defaults to current time)
+
+        Returns:
+            Dictionary with per-tank projections and computation metadata
+        """
+        started = time.perf_counter()
+        now = time.time() if now is None else now
+        tank_ids, profiles, latest = self._db.rollups.fleet_arrays()
+        columns = {"profiles": profiles, "latest": latest, "capacity": self._capacities(tank_ids)}
+        if self._pool is not None and self._pool.running and len(tank_ids) >= ANALYTICS_OFFLOAD_MIN_TANKS:
+            projections = self._pool.run(
+                ("forecast_fleet", horizon_hours, int(now)),
+                project_fleet,
+                lambda: columns,
+                tank_ids,
+                horizon_hours,
+                now,
+            )
+        else:
+            projections = project_fleet(columns, tank_ids, horizon_hours, now)
+        compute_ms = (time.perf_counter() - started) * 1000
+
+        return {
+            "generated_at": format_epoch(now),
+            "horizon_hours": horizon_hours,
+            "tank_count": len(tank_ids),
+            "compute_ms": round(compute_ms, 2),
+            "tanks": projections,
+        }
+
+    def _capacities(self, tank_ids: List[str]) -> np.ndarray:
+        """Capacity in liters of each tank, in row order."""
+        return np.fromiter(
+            (self.get_tank_capacity(tank_id) for tank_id in tank_ids),
+            dtype=np.float64,
+            count=len(tank_ids),
+        )
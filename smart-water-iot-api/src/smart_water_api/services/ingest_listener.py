@@ -0,0 +1,512 @@
+"""
+Ingest Listener - Line-protocol reading ingest over TCP and UDP.
+A lighter alternative to POST /sensors/ingest for devices that report often:
+one short text line per reading, batched into bulk writes.
+"""
+
+import asyncio
+import logging
+import socket
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..constants import (
+    INGEST_BATCH_SIZE,
+    INGEST_ERROR_SAMPLES,
+    INGEST_FLUSH_MS,
+    INGEST_LISTENER_HOST,
+    INGEST_MAX_CONNECTIONS,
+    INGEST_MAX_LINE_BYTES,
+    INGEST_MAX_PENDING_BATCHES,
+    INGEST_TCP_PORT,
+    INGEST_UDP_PORT,
+)
+from ..logging_config import SampledLogger
+from ..utils.timeutils import format_epoch, parse_timestamp
+from ..utils.validators import validate_sensor_batch
+
+logger = logging.getLogger(__name__)
+_reject_log = SampledLogger(logger)  # Misbehaving devices can reject thousands of lines a second
+
+_UDP_RECEIVE_BUFFER_BYTES = 4 * 1024 * 1024  # Absorbs bursts while the writer is behind
+
+
+def parse_lines(
+    text: str,
+    received_at: float,
+    max_line_length: int = INGEST_MAX_LINE_BYTES,
+) -> Tuple[List[Dict[str, Any]], List[Optional[float]], List[Tuple[str, str]]]:
+    """
+    Split line-protocol text into raw reading records.
+
+    Each line is ``device_id,tank_id,water_level_percent,flow_rate_lpm[,timestamp]``
+    where the optional timestamp is epoch seconds or ISO 8601; readings
+    without one are stamped with the receive time. Empty lines and lines
+    starting with '#' are ignored. Field values are checked afterwards by
+    validate_sensor_batch().
+
+    Args:
+        text: One or more newline-separated lines
+        received_at: Epoch seconds the text arrived
+        max_line_length: Longer lines are rejected unparsed
+
+    Returns:
+        (records, epoch per record or None when given as ISO, (line, message) per malformed line)
+    """
+    records: List[Dict[str, Any]] = []
+    epochs: List[Optional[float]] = []
+    malformed: List[Tuple[str, str]] = []
+    stamps: Dict[int, str] = {}  # Readings of one batch share a handful of seconds
+
+    for line in text.splitlines():
+        if not line or line[0] == "#":
+            continue
+        if len(line) > max_line_length:
+            malformed.append((line[:80], "line too long"))
+            continue
+        fields = line.split(",")
+        if len(fields) == 4:
+            stamp = None
+        elif len(fields) == 5:
+            stamp = fields[4].strip()
+        else:
+            malformed.append((line, f"expected 4 or 5 comma-separated fields, got {len(fields)}"))
+            continue
+
+        epoch: Optional[float] = received_at
+        timestamp = None
+        if stamp:
+            try:
+                epoch = float(stamp)
+            except ValueError:
+                epoch, timestamp = None, stamp  # ISO 8601, normalized by the validator
+        if epoch is not None:
+            try:
+                second = int(epoch)
+                timestamp = stamps.get(second)
+                if timestamp is None:
+                    timestamp = stamps[second] = format_epoch(second)
+            except (ValueError, OverflowError, OSError):
+                malformed.append((line, "timestamp must be epoch seconds or ISO 8601"))
+                continue
+            epoch = float(second)
+
+        records.append({
+            "device_id": fields[0],
+            "tank_id": fields[1],
+            "water_level_percent": fields[2],
+            "flow_rate_lpm": fields[3],
+            "timestamp": timestamp,
+        })
+        epochs.append(epoch)
+    return records, epochs, malformed
+
+
+class _LineProtocol(asyncio.Protocol):
+    """One device connection: newline-framed lines, handed over in whole-line chunks."""
+
+    def __init__(self, listener: "IngestListener"):
+        self._listener = listener
+        self._transport = None
+        self._partial = b""
+        self._discarding = False  # Skipping the rest of an over-long line
+
+    def connection_made(self, transport) -> None:
+        listener = self._listener
+        if len(listener._connections) >= listener.max_connections:
+            listener.stats["connections_refused"] += 1
+            transport.abort()
+            return
+        self._transport = transport
+        listener._connections.add(transport)
+        listener.stats["connections_total"] += 1
+        if listener._paused:
+            transport.pause_reading()
+
+    def data_received(self, data: bytes) -> None:
+        if self._partial:
+            data = self._partial + data
+        end = data.rfind(b"\n")
+        if end < 0:
+            self._keep(data)
+            return
+        start = 0
+        if self._discarding:
+            start = data.find(b"\n") + 1
+            self._discarding = False
+        self._keep(data[end + 1:])
+        if start <= end:
+            self._listener._receive(data[start:end])
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self._transport is None:
+            return
+        self._listener._connections.discard(self._transport)
+        if self._partial and not self._discarding:
+            self._listener._receive(self._partial)  # Last line without a newline
+        self._partial = b""
+
+    def _keep(self, partial: bytes) -> None:
+        if len(partial) > self._listener.max_line_bytes:
+            self._listener._reject(partial[:80].decode("utf-8", "replace"), "line too long")
+            self._partial = b""
+            self._discarding = True
+        else:
+            self._partial = partial
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    """UDP: every datagram holds one or more complete lines."""
+
+    def __init__(self, listener: "IngestListener"):
+        self._listener = listener
+
+    def datagram_received(self, data: bytes, addr) -> None:
+        if self._listener._paused:
+            self._listener.stats["datagrams_dropped"] += 1  # Datagrams can't be held back
+            return
+        self._listener._receive(data)
+
+
+class IngestListener:
+    """
+    TCP/UDP listener for line-protocol readings.
+
+    Devices keep a TCP connection open and write one line per reading, or
+    send lines in UDP datagrams (see parse_lines() for the format). There
+    are no replies; rejected lines are counted and the latest kept in
+    `errors`.
+
+    Sockets are served by one asyncio loop in a background thread.
+    Received lines are buffered, then parsed and validated as a batch once
+    batch_size lines are waiting or flush_ms after the first of them
+    arrived. A writer thread stores each batch through the same path as
+    HTTP and bulk ingest (one add_many() and one alert-rule pass per
+    batch), so store locks and log fsyncs never stall the loop. Once
+    max_pending_batches are waiting for the writer, TCP connections stop
+    being read (senders are slowed down by flow control instead of the
+    queue growing) and UDP datagrams are dropped.
+    """
+
+    def __init__(
+        self,
+        host: str = INGEST_LISTENER_HOST,
+        tcp_port: int = INGEST_TCP_PORT,
+        udp_port: int = INGEST_UDP_PORT,
+        batch_size: int = INGEST_BATCH_SIZE,
+        flush_ms: float = INGEST_FLUSH_MS,
+        max_line_bytes: int = INGEST_MAX_LINE_BYTES,
+        max_connections: int = INGEST_MAX_CONNECTIONS,
+        max_pending_batches: int = INGEST_MAX_PENDING_BATCHES,
+    ):
+        """
+        Initialize the listener (call init_app() or configure() and start() to run it).
+
+        Args:
+            host: Interface to bind
+            tcp_port: TCP port (0 = disabled; None = any free port)
+            udp_port: UDP port (0 = disabled; None = any free port)
+            batch_size: Lines that trigger a write
+            flush_ms: Longest a line waits for its batch
+            max_line_bytes: Longest accepted line
+            max_connections: Concurrent TCP connections
+            max_pending_batches: Batches waiting for the writer before reading pauses
+        """
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.max_line_bytes = max_line_bytes
+        self.max_connections = max_connections
+        self.max_pending_batches = max_pending_batches
+        self.tcp_address: Optional[Tuple[str, int]] = None
+        self.udp_address: Optional[Tuple[str, int]] = None
+        self._sensor_service = None
+        self._alert_service = None
+        self._on_ingest: Optional[Callable[[], None]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._startup_error: Optional[BaseException] = None
+        self._connections = set()
+        self._chunks: List[bytes] = []
+        self._pending = 0
+        self._timer = None
+        self._batches: deque = deque()  # Validated batches waiting for the writer
+        self._batches_changed = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+        self._closing = False
+        self._paused = False  # Sockets are not read while the writer is behind
+        self.errors: deque = deque(maxlen=INGEST_ERROR_SAMPLES)
+        self.stats = {
+            "connections_total": 0,
+            "connections_refused": 0,
+            "lines": 0,
+            "accepted": 0,
+            "rejected": 0,
+            "batches": 0,
+            "failed_batches": 0,
+            "alerts_raised": 0,
+            "datagrams_dropped": 0,
+        }
+
+    def init_app(self, app, sensor_service, alert_service=None, on_ingest: Callable[[], None] = None) -> None:
+        """
+        Configure the listener from app config and start it if enabled.
+
+        Args:
+            app: Flask application
+            sensor_service: Service whose store receives the readings
+            alert_service: Optional alert service run over every batch
+            on_ingest: Called after every stored batch (e.g. scheduler.notify)
+        """
+        self.host = app.config.get("INGEST_LISTENER_HOST", self.host)
+        self.tcp_port = app.config.get("INGEST_TCP_PORT", self.tcp_port)
+        self.udp_port = app.config.get("INGEST_UDP_PORT", self.udp_port)
+        self.batch_size = app.config.get("INGEST_BATCH_SIZE", self.batch_size)
+        self.flush_ms = app.config.get("INGEST_FLUSH_MS", self.flush_ms)
+        self.max_connections = app.config.get("INGEST_MAX_CONNECTIONS", self.max_connections)
+        self.max_pending_batches = app.config.get("INGEST_MAX_PENDING_BATCHES", self.max_pending_batches)
+        self.configure(sensor_service, alert_service, on_ingest)
+        app.extensions["ingest_listener"] = self
+
+        if app.config.get("INGEST_LISTENER_ENABLED", False) and not app.testing:
+            try:
+                self.start()
+            except OSError as e:  # e.g. the port is held by another worker; HTTP ingest still works
+                logger.error("Ingest listener not started", extra={"fields": {"error": str(e)}})
+
+    def configure(self, sensor_service, alert_service=None, on_ingest: Callable[[], None] = None) -> None:
+        """Set where readings go."""
+        self._sensor_service = sensor_service
+        self._alert_service = alert_service
+        self._on_ingest = on_ingest
+
+    @property
+    def running(self) -> bool:
+        """Whether the listener thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def connections(self) -> int:
+        """Open TCP connections."""
+        return len(self._connections)
+
+    @property
+    def pending_batches(self) -> int:
+        """Batches waiting for (or being stored by) the writer."""
+        return len(self._batches)
+
+    def start(self) -> None:
+        """
+        Bind the sockets and start serving (no-op if already running).
+
+        Raises:
+            OSError: If a port can't be bound
+        """
+        if self.running or self._sensor_service is None:
+            return
+        self._ready.clear()
+        self._startup_error = None
+        self._closing = False
+        self._paused = False
+        self._writer = threading.Thread(target=self._write_batches, name="ingest-writer", daemon=True)
+        self._writer.start()
+        self._thread = threading.Thread(target=self._run, name="ingest-listener", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            self._thread.join()
+            self._thread = None
+            self._stop_writer()
+            raise self._startup_error
+        logger.info("Ingest listener started", extra={"fields": {"tcp": self.tcp_address, "udp": self.udp_address}})
+
+    def stop(self, timeout: float = None) -> None:
+        """Close the sockets, write what is buffered and stop the threads."""
+        if self._thread is None:
+            return
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+        self._stop_writer(timeout)
+
+    def _stop_writer(self, timeout: float = None) -> None:
+        """Let the writer store the queued batches, then end it."""
+        with self._batches_changed:
+            self._closing = True
+            self._batches_changed.notify_all()
+        if self._writer is not None:
+            self._writer.join(timeout)
+            self._writer = None
+
+    def _run(self) -> None:
+        loop = self._loop = asyncio.new_event_loop()
+        try:
+            servers = loop.run_until_complete(self._open())
+        except BaseException as e:
+            self._startup_error = e
+            self._ready.set()
+            loop.close()
+            return
+        self._ready.set()
+
+        try:
+            loop.run_forever()
+        finally:
+            for server in servers:
+                server.close()
+            for transport in list(self._connections):
+                transport.close()
+            # Let the closed connections hand over their last partial lines
+            loop.run_until_complete(asyncio.sleep(0))
+            self._flush()
+            loop.close()
+            self._loop = None
+
+    async def _open(self) -> list:
+        loop = asyncio.get_running_loop()
+        servers = []
+        self.tcp_address = self.udp_address = None
+        if self.tcp_port != 0:
+            server = await loop.create_server(
+                lambda: _LineProtocol(self),
+                self.host,
+                self.tcp_port or 0,
+                reuse_address=True,
+                backlog=min(self.max_connections, socket.SOMAXCONN),
+            )
+            self.tcp_address = server.sockets[0].getsockname()[:2]
+            servers.append(server)
+        if self.udp_port != 0:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramProtocol(self), local_addr=(self.host, self.udp_port or 0)
+            )
+            sock = transport.get_extra_info("socket")
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _UDP_RECEIVE_BUFFER_BYTES)
+            self.udp_address = sock.getsockname()[:2]
+            servers.append(transport)
+        return servers
+
+    def _receive(self, data: bytes) -> None:
+        """Buffer complete lines; write them once the batch is full or old enough."""
+        self._chunks.append(data)
+        self._pending += data.count(b"\n") + 1
+        if self._pending >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.flush_ms / 1000, self._flush)
+
+    def _flush(self) -> None:
+        """Parse the buffered lines and queue them for the writer (on the loop)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._chunks:
+            return
+        text = b"\n".join(self._chunks).decode("utf-8", "replace")
+        self._chunks = []
+        self._pending = 0
+        try:
+            batch = self._parse(text)
+        except Exception as e:  # Keep serving; the devices will report again
+            self.stats["failed_batches"] += 1
+            logger.error("Failed to parse ingest batch", extra={"fields": {"error": str(e)}})
+            return
+        if batch is None:
+            return
+        with self._batches_changed:
+            self._batches.append(batch)
+            self._batches_changed.notify_all()
+            pause = not self._paused and len(self._batches) >= self.max_pending_batches
+            if pause:
+                self._paused = True
+        if pause:
+            for transport in self._connections:
+                transport.pause_reading()
+
+    def _resume_if_drained(self) -> None:
+        """Read the TCP connections again once the writer has caught up (on the loop)."""
+        with self._batches_changed:
+            resume = self._paused and len(self._batches) < self.max_pending_batches
+            if resume:
+                self._paused = False
+        if resume:
+            for transport in self._connections:
+                transport.resume_reading()
+
+    def _write_batches(self) -> None:
+        """Writer thread: store queued batches in order until stopped and drained."""
+        while True:
+            with self._batches_changed:
+                while not self._batches and not self._closing:
+                    self._batches_changed.wait()
+                if not self._batches:
+                    return
+                batch = self._batches[0]  # Stays counted as pending until stored
+            try:
+                self._store(*batch)
+            except Exception as e:  # Keep serving; the devices will report again
+                self.stats["failed_batches"] += 1
+                logger.error(
+                    "Failed to store ingest batch", extra={"fields": {"readings": len(batch[0]), "error": str(e)}}
+                )
+            with self._batches_changed:
+                self._batches.popleft()
+                paused = self._paused
+            loop = self._loop
+            if paused and loop is not None:
+                try:
+                    loop.call_soon_threadsafe(self._resume_if_drained)
+                except RuntimeError:
+                    pass  # Loop already closed during stop()
+
+    def _parse(self, text: str) -> Optional[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """Parse and validate one batch; returns the valid readings and their epochs."""
+        records, epochs, malformed = parse_lines(text, time.time(), self.max_line_bytes)
+        self.stats["lines"] += len(records) + len(malformed)
+        for line, message in malformed:
+            self._reject(line, message)
+
+        valid, rejected = validate_sensor_batch(records)
+        if rejected:
+            bad = {index for index, _ in rejected}
+            for index, message in rejected:
+                record = records[index]
+                self._reject(
+                    f"{record['device_id']},{record['tank_id']},"
+                    f"{record['water_level_percent']},{record['flow_rate_lpm']}",
+                    message,
+                )
+            epochs = [epoch for index, epoch in enumerate(epochs) if index not in bad]
+        if not valid:
+            return None
+
+        column = np.fromiter(
+            (parse_timestamp(r["timestamp"]) if e is None else e for r, e in zip(valid, epochs)),
+            dtype=np.float64,
+            count=len(valid),
+        )
+        return valid, column
+
+    def _store(self, valid: List[Dict[str, Any]], column: np.ndarray) -> None:
+        """Write one validated batch through the bulk ingest path (on the writer thread)."""
+        self._sensor_service.ingest_batch(valid, column)
+        self.stats["accepted"] += len(valid)
+        self.stats["batches"] += 1
+        if self._alert_service is not None:
+            results = self._alert_service.analyze_batch(valid)
+            self.stats["alerts_raised"] += sum(len(result["alerts"]) for result in results)
+        if self._on_ingest is not None:
+            self._on_ingest()
+
+    def _reject(self, line: str, message: str) -> None:
+        self.stats["rejected"] += 1
+        self.errors.append({"line": line, "message": message})
+        _reject_log.warning("Rejected ingest line", line=line, reason=message)
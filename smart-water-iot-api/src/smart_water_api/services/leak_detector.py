@@ -0,0 +1,276 @@
+"""
+Leakage Detector - Streaming leak detection over per-tank reading history.
+Keeps a fixed-size ring buffer per tank so each reading costs O(1).
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from ..constants import (
+    ALERT_TYPE_LEAKAGE,
+    ALERT_PRIORITY_MEDIUM,
+    FLOW_RATE_LEAKAGE_THRESHOLD,
+    FLOW_RATE_NORMAL_MAX,
+    TANK_CAPACITY_DEFAULT_LITERS,
+    LEAK_WINDOW_SIZE,
+    LEAK_IDLE_START_HOUR,
+    LEAK_IDLE_END_HOUR,
+    LEAK_PERSISTENCE_SECONDS,
+    LEAK_FLOW_STABILITY_RATIO,
+    LEAK_MIN_WINDOW_SECONDS,
+    LEAK_MAX_GAP_SECONDS,
+    LEAK_MIN_UNEXPLAINED_LITERS,
+    LEAK_UNEXPLAINED_RATIO,
+    LEAK_ALERT_COOLDOWN_SECONDS,
+)
+from ..utils.timeutils import parse_timestamp
+from .alert_models import alert_type_code, build_template
+from .rule_engine import CompiledRule, RuleMatch
+
+IDLE_FLOW_RULE = CompiledRule(
+    rule_id="leakage_idle_flow",
+    alert_type=ALERT_TYPE_LEAKAGE,
+    type_code=alert_type_code(ALERT_TYPE_LEAKAGE),
+    metric="flow_rate_lpm",
+    template=build_template(
+        ALERT_TYPE_LEAKAGE,
+        "Potential leak detected - Continuous flow of {value} L/min during idle hours",
+        "Flow ({value:.1f} L/min) persisted through the idle window without active usage",
+    ),
+)
+
+LEVEL_DROP_RULE = CompiledRule(
+    rule_id="leakage_level_drop",
+    alert_type=ALERT_TYPE_LEAKAGE,
+    type_code=alert_type_code(ALERT_TYPE_LEAKAGE),
+    metric="water_level_percent",
+    template=build_template(
+        ALERT_TYPE_LEAKAGE,
+        "Potential leak detected - Tank {tank_id} lost {value:.0f} L more than metered outflow",
+        "Water level fell {value:.1f} L faster than metered outflow explains",
+    ),
+)
+
+
+class _TankWindow:
+    """Ring buffer of (time, level, flow) for one tank plus running totals."""
+
+    __slots__ = (
+        "epochs",
+        "levels",
+        "flows",
+        "volumes",
+        "head",
+        "count",
+        "metered_liters",
+        "flow_since",
+        "flow_baseline",
+        "last_alert",
+    )
+
+    def __init__(self, size: int):
+        self.epochs = [0.0] * size
+        self.levels = [0.0] * size
+        self.flows = [0.0] * size
+        # volumes[i] = metered liters between entry i and its predecessor
+        self.volumes = [0.0] * size
+        self.last_alert = float("-inf")
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget buffered history (alert cooldown is kept)."""
+        self.head = 0
+        self.count = 0
+        self.metered_liters = 0.0
+        self.flow_since = None
+        self.flow_baseline = 0.0
+
+
+class LeakageDetector:
+    """
+    Flags leaks from reading history instead of single readings.
+
+    A leak is reported when either
+      * steady low flow persists through the idle window (night hours), or
+      * the level drops by more liters than the metered outflow explains.
+    Metered flow is treated as outflow; alerts per tank are rate-limited.
+
+    Windows are kept in least recently updated order, so the compactor can
+    drop those of tanks that went quiet from the front (expire_idle()).
+    """
+
+    def __init__(
+        self,
+        window_size: int = LEAK_WINDOW_SIZE,
+        capacity_for: Optional[Callable[[str], float]] = None,
+    ):
+        """
+        Initialize the detector.
+
+        Args:
+            window_size: Readings kept per tank
+            capacity_for: Optional lookup of a tank's capacity in liters
+        """
+        self._window_size = max(2, window_size)
+        self._capacity_for = capacity_for or (lambda tank_id: TANK_CAPACITY_DEFAULT_LITERS)
+        self._windows: Dict[str, _TankWindow] = {}  # Least recently updated first
+        self._lock = threading.Lock()
+
+    def update(self, reading: Dict) -> Optional[RuleMatch]:
+        """
+        Add a reading to its tank's window and check for leakage.
+
+        Args:
+            reading: Validated sensor data dictionary
+
+        Returns:
+            A leakage match, or None if no (new) leak is detected
+        """
+        tank_id = reading.get("tank_id", "unknown")
+        level = float(reading.get("water_level_percent", 0))
+        flow = float(reading.get("flow_rate_lpm", 0))
+        epoch = _reading_epoch(reading)
+
+        with self._lock:
+            # Re-inserting moves the tank to the most recently updated end
+            window = self._windows.pop(tank_id, None)
+            if window is None:
+                window = _TankWindow(self._window_size)
+            self._windows[tank_id] = window
+        if window.count:
+            newest = (window.head + window.count - 1) % self._window_size
+            last_epoch = window.epochs[newest]
+            if epoch <= last_epoch:
+                return None  # Duplicate or out-of-order reading
+            if epoch - last_epoch > LEAK_MAX_GAP_SECONDS:
+                window.reset()
+
+        self._push(window, epoch, level, flow)
+
+        match = self._check_idle_flow(window, epoch, flow)
+        if match is None:
+            match = self._check_level_drop(window, tank_id)
+        if match is None or epoch - window.last_alert < LEAK_ALERT_COOLDOWN_SECONDS:
+            return None
+
+        window.last_alert = epoch
+        return match
+
+    def forget(self, tank_id: str) -> None:
+        """Drop the history of a tank."""
+        with self._lock:
+            self._windows.pop(tank_id, None)
+
+    def expire_idle(self, now: float, limit: int) -> Tuple[int, bool]:
+        """
+        Drop windows of tanks with no reading for LEAK_MAX_GAP_SECONDS.
+
+        Such a window would be reset by the tank's next reading anyway, and
+        its alert cooldown has run out, so dropping it changes no result.
+        Windows are examined from the least recently updated end; a
+        backfilled tank may wait behind a more recent one until that
+        expires too.
+
+        Args:
+            now: Current time in epoch seconds
+            limit: Maximum number of windows to drop in this call
+
+        Returns:
+            (windows dropped, whether no idle window remains at the front)
+        """
+        cutoff = now - LEAK_MAX_GAP_SECONDS
+        size = self._window_size
+        dropped = 0
+        with self._lock:
+            windows = self._windows
+            while windows and dropped < limit:
+                tank_id = next(iter(windows))
+                window = windows[tank_id]
+                newest = window.epochs[(window.head + window.count - 1) % size] if window.count else float("-inf")
+                if newest >= cutoff:
+                    return dropped, True
+                del windows[tank_id]
+                dropped += 1
+        return dropped, dropped < limit
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def _push(self, window: _TankWindow, epoch: float, level: float, flow: float) -> None:
+        """Append to the ring buffer, evicting the oldest entry when full."""
+        size = self._window_size
+        volume = 0.0
+        if window.count:
+            previous = (window.head + window.count - 1) % size
+            minutes = (epoch - window.epochs[previous]) / 60
+            volume = (window.flows[previous] + flow) / 2 * minutes
+
+        if window.count == size:
+            # The new oldest entry has no predecessor inside the window
+            window.head = (window.head + 1) % size
+            window.count -= 1
+            window.metered_liters -= window.volumes[window.head]
+            window.volumes[window.head] = 0.0
+
+        tail = (window.head + window.count) % size
+        window.epochs[tail] = epoch
+        window.levels[tail] = level
+        window.flows[tail] = flow
+        window.volumes[tail] = volume
+        window.count += 1
+        window.metered_liters += volume
+
+    def _check_idle_flow(self, window: _TankWindow, epoch: float, flow: float) -> Optional[RuleMatch]:
+        """Steady low flow that persists through the idle window suggests a leak."""
+        hour = int(epoch // 3600) % 24
+        idle = LEAK_IDLE_START_HOUR <= hour < LEAK_IDLE_END_HOUR
+        if not (idle and FLOW_RATE_LEAKAGE_THRESHOLD <= flow < FLOW_RATE_NORMAL_MAX / 2):
+            window.flow_since = None
+            return None
+
+        if (
+            window.flow_since is None
+            or abs(flow - window.flow_baseline) > LEAK_FLOW_STABILITY_RATIO * window.flow_baseline
+        ):
+            window.flow_since = epoch
+            window.flow_baseline = flow
+            return None
+        if epoch - window.flow_since < LEAK_PERSISTENCE_SECONDS:
+            return None
+        return RuleMatch(
+            rule=IDLE_FLOW_RULE,
+            priority=ALERT_PRIORITY_MEDIUM,
+            value=flow,
+            threshold=FLOW_RATE_LEAKAGE_THRESHOLD,
+        )
+
+    def _check_level_drop(self, window: _TankWindow, tank_id: str) -> Optional[RuleMatch]:
+        """A level drop larger than metered outflow suggests a leak."""
+        if window.count < 2:
+            return None
+
+        oldest = window.head
+        newest = (window.head + window.count - 1) % self._window_size
+        if window.epochs[newest] - window.epochs[oldest] < LEAK_MIN_WINDOW_SECONDS:
+            return None
+
+        capacity = self._capacity_for(tank_id)
+        drop_liters = (window.levels[oldest] - window.levels[newest]) / 100 * capacity
+        unexplained = drop_liters - max(window.metered_liters, 0.0)
+        if unexplained < LEAK_MIN_UNEXPLAINED_LITERS or unexplained < LEAK_UNEXPLAINED_RATIO * drop_liters:
+            return None
+        return RuleMatch(
+            rule=LEVEL_DROP_RULE,
+            priority=ALERT_PRIORITY_MEDIUM,
+            value=round(unexplained, 1),
+            threshold=LEAK_MIN_UNEXPLAINED_LITERS,
+        )
+
+
+def _reading_epoch(reading: Dict) -> float:
+    """Event time of a reading, falling back to now if unparseable."""
+    try:
+        return parse_timestamp(reading["timestamp"])
+    except (KeyError, TypeError, ValueError):
+        return time.time()
@@ -0,0 +1,135 @@
+"""
+Offline Monitor - Detects sensors that stopped reporting.
+Tracks last-seen times and expires devices through a hashed timer wheel.
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+from ..constants import SENSOR_DATA_EXPIRY, OFFLINE_WHEEL_RESOLUTION_SECONDS
+
+
+class OfflineDevice(NamedTuple):
+    """A device whose reporting deadline has passed."""
+    device_id: str
+    tank_id: str
+    seconds_since_seen: float
+
+
+class OfflineMonitor:
+    """
+    Last-seen tracker with deadline expiry on a timer wheel.
+
+    touch() only records the time and, if the device has no pending timer,
+    schedules one - O(1). When a timer fires, the device is either reported
+    offline or lazily rescheduled to its current deadline, so each device is
+    rescheduled at most once per expiry period. Every deadline lies within
+    one expiry period of "now", so a single wheel level of
+    expiry / resolution slots is enough.
+    """
+
+    def __init__(
+        self,
+        expiry_seconds: float = SENSOR_DATA_EXPIRY,
+        resolution_seconds: float = OFFLINE_WHEEL_RESOLUTION_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the monitor.
+
+        Args:
+            expiry_seconds: Silence after which a device counts as offline
+            resolution_seconds: Timer wheel tick length
+            clock: Monotonic time source (injectable for tests)
+        """
+        self.expiry_seconds = expiry_seconds
+        self._resolution = resolution_seconds
+        self._clock = clock
+        self._num_slots = int(math.ceil(expiry_seconds / resolution_seconds)) + 1
+        # Each slot is an insertion-ordered set of device ids
+        self._slots: List[Dict[str, None]] = [{} for _ in range(self._num_slots)]
+        self._scheduled: Dict[str, int] = {}  # device_id -> tick of its timer
+        self._last_seen: Dict[str, float] = {}
+        self._tanks: Dict[str, str] = {}
+        self._offline: Dict[str, None] = {}
+        self._cursor = self._tick(clock())
+        self._lock = threading.Lock()
+
+    def touch(self, device_id: str, tank_id: str) -> None:
+        """Record that a device just reported."""
+        now = self._clock()
+        with self._lock:
+            self._last_seen[device_id] = now
+            self._tanks[device_id] = tank_id
+            self._offline.pop(device_id, None)
+            if device_id not in self._scheduled:
+                self._schedule(device_id, now + self.expiry_seconds)
+
+    def touch_many(self, devices: Dict[str, str]) -> None:
+        """Record that many devices just reported (device_id -> tank_id), under one lock."""
+        now = self._clock()
+        with self._lock:
+            for device_id, tank_id in devices.items():
+                self._last_seen[device_id] = now
+                self._tanks[device_id] = tank_id
+                self._offline.pop(device_id, None)
+                if device_id not in self._scheduled:
+                    self._schedule(device_id, now + self.expiry_seconds)
+
+    def poll(self) -> List[OfflineDevice]:
+        """
+        Advance the wheel to now and collect newly offline devices.
+
+        Returns:
+            Devices whose deadline passed since the previous poll
+        """
+        now = self._clock()
+        current = self._tick(now)
+        expired: List[OfflineDevice] = []
+        with self._lock:
+            if current < self._cursor:
+                return expired
+
+            # After a long pause, one full revolution visits every slot
+            steps = min(current - self._cursor + 1, self._num_slots)
+            for step in range(steps):
+                slot = self._slots[(self._cursor + step) % self._num_slots]
+                if not slot:
+                    continue
+                for device_id in [d for d in slot if self._scheduled[d] <= current]:
+                    del slot[device_id]
+                    del self._scheduled[device_id]
+                    self._expire(device_id, now, expired)
+            self._cursor = current + 1
+        return expired
+
+    def is_offline(self, device_id: str) -> bool:
+        """Check whether a device is currently considered offline."""
+        return device_id in self._offline
+
+    @property
+    def tracked_devices(self) -> int:
+        """Number of devices ever seen."""
+        return len(self._last_seen)
+
+    def _expire(self, device_id: str, now: float, expired: List[OfflineDevice]) -> None:
+        """Report a device offline, or re-arm its timer if it was seen since."""
+        last_seen = self._last_seen[device_id]
+        deadline = last_seen + self.expiry_seconds
+        if deadline > now:
+            self._schedule(device_id, deadline)
+            return
+        self._offline[device_id] = None
+        expired.append(OfflineDevice(device_id, self._tanks[device_id], now - last_seen))
+
+    def _schedule(self, device_id: str, deadline: float) -> None:
+        """Place a device's timer in the slot of its deadline tick."""
+        tick = max(int(math.ceil(deadline / self._resolution)), self._cursor)
+        self._slots[tick % self._num_slots][device_id] = None
+        self._scheduled[device_id] = tick
+
+    def _tick(self, moment: float) -> int:
+        """Convert a clock reading to a wheel tick."""
+        return int(moment // self._resolution)
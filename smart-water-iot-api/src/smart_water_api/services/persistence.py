@@ -0,0 +1,303 @@
+"""
+Persistence - Durable in-memory store via write-ahead log and snapshots.
+Recovers the store on startup and snapshots it periodically in the background.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..constants import (
+    COLLECTION_READINGS,
+    PERSISTENCE_DATA_DIR,
+    WAL_SYNC_MODES,
+    WAL_COMMIT_INTERVAL_MS,
+    SNAPSHOT_INTERVAL_SECONDS,
+    SNAPSHOT_FILENAME,
+)
+from ..storage.snapshot import read_snapshot, write_snapshot
+from ..storage.wal import (
+    WriteAheadLog,
+    replay,
+    decode_reading,
+    decode_json,
+    decode_ack,
+    RECORD_READING,
+    RECORD_DOCUMENT,
+    RECORD_SET,
+    RECORD_ALERT,
+    RECORD_ACK,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Persistence:
+    """
+    Snapshot + write-ahead log persistence for the database and alerts.
+
+    A snapshot stores readings as columns (with a string table for tank and
+    device ids), the rollups as flat arrays, and everything else as JSON.
+    Each snapshot is taken right after the log rotates to a new segment and
+    records which segment recovery must replay from; older segments are
+    deleted once the snapshot is on disk.
+
+    Recovery loads the snapshot, then replays the remaining segments.
+    Records whose ids the snapshot already covers are skipped, so records
+    that straddle a rotation are never applied twice. Its cost is linear in
+    the in-memory readings, since each one is rebuilt as a document; sealed
+    segments keep that number bounded.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = PERSISTENCE_DATA_DIR,
+        sync_mode: str = "group",
+        commit_interval_ms: float = WAL_COMMIT_INTERVAL_MS,
+        snapshot_interval_seconds: float = SNAPSHOT_INTERVAL_SECONDS,
+    ):
+        """
+        Initialize persistence (call init_app() or open() to use it).
+
+        Args:
+            data_dir: Directory for the snapshot and log segments
+            sync_mode: 'group' (writes wait for fsync) or 'async'
+            commit_interval_ms: How long the log writer lingers to batch records
+            snapshot_interval_seconds: Pause between background snapshots
+        """
+        self.data_dir = data_dir
+        self.sync_mode = sync_mode
+        self.commit_interval_ms = commit_interval_ms
+        self.snapshot_interval_seconds = snapshot_interval_seconds
+        self._db = None
+        self._alert_service = None
+        self._wal: Optional[WriteAheadLog] = None
+        self._snapshot_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, Any] = {
+            "snapshots": 0,
+            "last_snapshot_bytes": 0,
+            "last_snapshot_ms": 0.0,
+            "recovered_readings": 0,
+            "replayed_records": 0,
+            "recovery_ms": 0.0,
+        }
+
+    def init_app(self, app, db, alert_service=None) -> None:
+        """
+        Recover the stores from DATA_DIR and start snapshotting, if enabled.
+
+        Args:
+            app: Flask application
+            db: Database to persist
+            alert_service: Optional alert service whose alerts are persisted
+        """
+        app.extensions["persistence"] = self
+        if not app.config.get("PERSISTENCE_ENABLED", False):
+            return
+        self.data_dir = app.config.get("DATA_DIR", self.data_dir)
+        self.sync_mode = app.config.get("WAL_SYNC_MODE", self.sync_mode)
+        if self.sync_mode not in WAL_SYNC_MODES:
+            logger.warning("Unknown WAL_SYNC_MODE, using 'group'", extra={"fields": {"sync_mode": self.sync_mode}})
+            self.sync_mode = "group"
+        self.commit_interval_ms = app.config.get("WAL_COMMIT_INTERVAL_MS", self.commit_interval_ms)
+        self.snapshot_interval_seconds = app.config.get(
+            "SNAPSHOT_INTERVAL_SECONDS", self.snapshot_interval_seconds
+        )
+        self.open(db, alert_service)
+        if not app.testing:
+            self.start()
+
+    @property
+    def snapshot_path(self) -> str:
+        """Path of the snapshot file."""
+        return os.path.join(self.data_dir, SNAPSHOT_FILENAME)
+
+    @property
+    def is_open(self) -> bool:
+        """Whether writes are being logged."""
+        return self._wal is not None
+
+    @property
+    def queue_depth(self) -> int:
+        """Journal records waiting for the log writer (0 when closed)."""
+        wal = self._wal
+        return wal.queue_depth if wal is not None else 0
+
+    def open(self, db, alert_service=None) -> Dict[str, Any]:
+        """
+        Recover the stores, then log every later write.
+
+        Args:
+            db: Database to restore into and journal
+            alert_service: Optional alert service to restore into and journal
+
+        Returns:
+            Recovery statistics
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._db = db
+        self._alert_service = alert_service
+        has_snapshot = self._recover()
+
+        self._wal = WriteAheadLog(self.data_dir, self.sync_mode, self.commit_interval_ms)
+        self._wal.open()
+        db.journal = self._wal
+        if alert_service is not None:
+            alert_service.journal = self._wal
+
+        # Fold the replayed tail (or a freshly seeded store) into a snapshot right away
+        if not has_snapshot or self.stats["replayed_records"]:
+            self.snapshot()
+        return dict(self.stats)
+
+    def close(self) -> None:
+        """Stop snapshotting, take a final snapshot and close the log."""
+        self.stop()
+        if self._wal is None:
+            return
+        self.snapshot()
+        self._db.journal = None
+        if self._alert_service is not None:
+            self._alert_service.journal = None
+        self._wal.close()
+        self._wal = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Write a snapshot and drop the log segments it covers.
+
+        Returns:
+            Snapshot statistics
+        """
+        with self._snapshot_lock:
+            started = time.perf_counter()
+            segment = self._wal.rotate()
+            arrays, metadata = self._db.export_state()
+            if self._alert_service is not None:
+                metadata["alerts"] = self._alert_service.export_state()
+            metadata["wal_segment"] = segment
+            size = write_snapshot(self.snapshot_path, arrays, metadata)
+            self._wal.delete_segments_before(segment)
+
+            self.stats["snapshots"] += 1
+            self.stats["last_snapshot_bytes"] = size
+            self.stats["last_snapshot_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            logger.info(
+                "Snapshot written",
+                extra={"fields": {
+                    "readings": len(arrays["reading_ids"]),
+                    "bytes": size,
+                    "ms": self.stats["last_snapshot_ms"],
+                }},
+            )
+            return dict(self.stats)
+
+    @property
+    def running(self) -> bool:
+        """Whether the snapshot thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start periodic background snapshots (no-op if already running)."""
+        if self.running or self._wal is None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="snapshot-writer", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Snapshots scheduled",
+            extra={"fields": {"interval_seconds": self.snapshot_interval_seconds, "data_dir": self.data_dir}},
+        )
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop the background thread."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stopping.wait(self.snapshot_interval_seconds):
+            try:
+                self.snapshot()
+            except Exception as e:  # Keep logging; retry on the next interval
+                logger.error("Snapshot failed", extra={"fields": {"error": str(e)}})
+
+    def _recover(self) -> bool:
+        """
+        Load the snapshot and replay the log tail.
+
+        Returns:
+            Whether a snapshot was found
+        """
+        started = time.perf_counter()
+        db = self._db
+        alert_service = self._alert_service
+        loaded = read_snapshot(self.snapshot_path)
+        first_segment = 0
+        if loaded is not None:
+            arrays, metadata = loaded
+            db.restore_state(arrays, metadata)
+            if alert_service is not None and "alerts" in metadata:
+                alert_service.restore_state(metadata["alerts"])
+            first_segment = metadata["wal_segment"]
+            self.stats["recovered_readings"] = len(arrays["reading_ids"])
+
+        # Ids below these were in the snapshot
+        document_floor = db.next_ids()
+        alert_floor = alert_service.next_alert_id if alert_service is not None else 0
+
+        replayed = 0
+        for record_type, payload in replay(self.data_dir, first_segment):
+            if self._apply(record_type, payload, document_floor, alert_floor):
+                replayed += 1
+
+        self.stats["replayed_records"] = replayed
+        self.stats["recovery_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(
+            "Recovered from snapshot and log",
+            extra={"fields": {
+                "readings": self.stats["recovered_readings"],
+                "log_records": replayed,
+                "ms": self.stats["recovery_ms"],
+            }},
+        )
+        return loaded is not None
+
+    def _apply(self, record_type: int, payload: bytes, document_floor: Dict[str, int], alert_floor: int) -> bool:
+        """Apply one log record unless the snapshot already has it."""
+        db = self._db
+        alert_service = self._alert_service
+
+        if record_type in (RECORD_READING, RECORD_DOCUMENT):
+            if record_type == RECORD_READING:
+                collection, document = COLLECTION_READINGS, decode_reading(payload)
+            else:
+                record = decode_json(payload)
+                collection, document = record["collection"], record["document"]
+            if int(document["_id"][4:]) < document_floor.get(collection, 0):
+                return False
+            db.restore_document(collection, document)
+            return True
+
+        if record_type == RECORD_SET:
+            record = decode_json(payload)
+            db.restore_set(record["collection"], record["id"], record["document"])
+            return True
+
+        if alert_service is None:
+            return False
+        if record_type == RECORD_ALERT:
+            record = decode_json(payload)
+            if record["id"] < alert_floor:
+                return False
+            alert_service.restore_alert(record)
+            return True
+        if record_type == RECORD_ACK:
+            alert_service.restore_acknowledgement(decode_ack(payload))
+            return True
+        return False
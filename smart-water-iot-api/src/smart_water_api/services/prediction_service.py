@@ -0,0 +1,221 @@
+"""
+Prediction Service - Materialized water-shortage, conservation and fleet results.
+Results are computed off the request path and served with their age.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, NamedTuple
+
+from ..constants import CONSERVATION_PERIODS
+from ..utils.timeutils import format_epoch
+from .analytics_service import AnalyticsService
+from .conservation_service import ConservationService
+from .forecast_service import ForecastService, get_warning_level
+from .sensor_service import SensorService
+
+logger = logging.getLogger(__name__)
+
+WATER_SHORTAGE = "water_shortage"
+FLEET_FORECAST = "fleet_forecast"
+
+
+def conservation_key(period: str) -> str:
+    """Materialization key of a conservation report."""
+    return f"conservation:{period}"
+
+
+class MaterializedResult(NamedTuple):
+    """A computed result and when it was produced."""
+    value: Dict[str, Any]
+    computed_at: float  # Epoch seconds
+    data_version: int
+    compute_ms: float
+
+
+class PredictionService:
+    """
+    Computes predictions and keeps the latest result of each in memory.
+
+    refresh() recomputes everything and is meant to run on the background
+    scheduler; get() serves the stored result, computing it inline the first
+    time it is requested, and again whenever it is stale while no scheduler
+    thread is running to refresh it.
+    """
+
+    def __init__(
+        self,
+        sensor_service: SensorService = None,
+        analytics_service: AnalyticsService = None,
+        forecast_service: ForecastService = None,
+        conservation_service: ConservationService = None,
+        scheduler=None,
+    ):
+        """
+        Initialize the prediction service.
+
+        Args:
+            sensor_service: Optional sensor service instance for data access
+            analytics_service: Optional analytics service instance
+            forecast_service: Optional forecast service instance
+            conservation_service: Optional conservation service instance
+            scheduler: RefreshScheduler calling refresh(); while it isn't
+                running, stale results are recomputed on read
+        """
+        self._sensor_service = sensor_service or SensorService()
+        self._analytics_service = analytics_service or AnalyticsService(self._sensor_service)
+        self._forecast_service = forecast_service or ForecastService(self._sensor_service)
+        self._conservation_service = conservation_service or ConservationService(self._sensor_service)
+        self._scheduler = scheduler
+        self._results: Dict[str, MaterializedResult] = {}
+        self._compute_lock = threading.Lock()
+        self.hits = 0  # get() calls served from a materialized result
+        self.misses = 0
+
+        self._producers: Dict[str, Callable[[], Dict[str, Any]]] = {
+            WATER_SHORTAGE: self.compute_water_shortage,
+            FLEET_FORECAST: self._forecast_service.forecast_fleet,
+        }
+        for period in CONSERVATION_PERIODS:
+            self._producers[conservation_key(period)] = (
+                lambda period=period: self._conservation_service.get_report(period)
+            )
+
+    def get(self, key: str) -> Dict[str, Any]:
+        """
+        Get the latest materialized result with its age.
+
+        Args:
+            key: Result key (e.g. WATER_SHORTAGE)
+
+        Returns:
+            The result dictionary extended with computed_at and age_seconds
+        """
+        result = self._results.get(key)
+        if result is None or self._needs_inline_refresh(result):
+            self.misses += 1
+            with self._compute_lock:
+                result = self._results.get(key)
+                if result is None or self._needs_inline_refresh(result):
+                    result = self._materialize(key)
+        else:
+            self.hits += 1
+        return self._with_age(result)
+
+    def refresh(self) -> None:
+        """Recompute every result (called from the background scheduler)."""
+        with self._compute_lock:
+            for key in self._producers:
+                try:
+                    self._materialize(key)
+                except Exception as e:  # One failing result must not block the others
+                    logger.error("Failed to refresh prediction", extra={"fields": {"key": key, "error": str(e)}})
+
+    @property
+    def data_version(self) -> int:
+        """Version of the sensor data results are computed from."""
+        return self._sensor_service.data_version
+
+    def _needs_inline_refresh(self, result: MaterializedResult) -> bool:
+        """Whether a stale result must be recomputed because nothing else will."""
+        if result.data_version == self._sensor_service.data_version:
+            return False
+        return self._scheduler is None or not self._scheduler.running
+
+    def invalidate(self) -> None:
+        """Drop all materialized results."""
+        self._results = {}
+
+    def _materialize(self, key: str) -> MaterializedResult:
+        data_version = self._sensor_service.data_version
+        started = time.perf_counter()
+        value = self._producers[key]()
+        result = MaterializedResult(
+            value=value,
+            computed_at=time.time(),
+            data_version=data_version,
+            compute_ms=(time.perf_counter() - started) * 1000,
+        )
+        self._results[key] = result
+        return result
+
+    def _with_age(self, result: MaterializedResult) -> Dict[str, Any]:
+        return {
+            **result.value,
+            "computed_at": format_epoch(result.computed_at),
+            "age_seconds": round(max(0.0, time.time() - result.computed_at), 1),
+            "data_version": result.data_version,
+            "stale": result.data_version != self._sensor_service.data_version,
+        }
+
+    def compute_water_shortage(self) -> Dict[str, Any]:
+        """
+        Predict water shortage based on current usage patterns.
+
+        Returns:
+            Dictionary with hours remaining and usage comparison
+        """
+        latest = self._sensor_service.get_latest_readings(limit=1)
+        if not latest:
+            return {
+                "error": "No sensor data available",
+                "hours_remaining": 0,
+                "usage_status": "unknown",
+            }
+
+        current_level = latest[0].get("water_level_percent", 50)
+        current_flow = latest[0].get("flow_rate_lpm", 0)
+
+        # Get historical average usage (last 7 days)
+        analytics = self._analytics_service.get_daily_analytics(days=7)
+        avg_daily_flow = analytics["summary"]["total_water_flow_liters"] / 7
+
+        # Get today's usage
+        today_analytics = self._analytics_service.get_daily_analytics(days=1)
+        today_flow = today_analytics["summary"]["total_water_flow_liters"]
+
+        # Simple prediction logic based on the tank's stored capacity
+        tank_capacity_liters = self._forecast_service.get_tank_capacity(latest[0].get("tank_id"))
+        current_water_liters = (current_level / 100) * tank_capacity_liters
+
+        # Calculate hours remaining based on current flow rate
+        if current_flow > 0:
+            hours_remaining = current_water_liters / (current_flow * 60)  # Convert L/min to L/hour
+        else:
+            # Use average daily consumption
+            avg_hourly_consumption = avg_daily_flow / 24
+            if avg_hourly_consumption > 0:
+                hours_remaining = current_water_liters / avg_hourly_consumption
+            else:
+                hours_remaining = 999  # Essentially infinite
+
+        # Compare today's usage with average
+        usage_diff_percent = 0
+        if avg_daily_flow > 0:
+            usage_diff_percent = ((today_flow - avg_daily_flow) / avg_daily_flow) * 100
+
+        # Determine usage status
+        if usage_diff_percent > 20:
+            usage_status = "high"
+            usage_message = f"Today's usage is {abs(usage_diff_percent):.1f}% above normal"
+        elif usage_diff_percent < -20:
+            usage_status = "low"
+            usage_message = f"Today's usage is {abs(usage_diff_percent):.1f}% below normal"
+        else:
+            usage_status = "normal"
+            usage_message = "Today's usage is within normal range"
+
+        return {
+            "hours_remaining": round(hours_remaining, 1),
+            "current_level_percent": round(current_level, 1),
+            "current_water_liters": round(current_water_liters, 1),
+            "tank_capacity_liters": tank_capacity_liters,
+            "usage_status": usage_status,
+            "usage_message": usage_message,
+            "usage_diff_percent": round(usage_diff_percent, 1),
+            "warning_level": get_warning_level(hours_remaining),
+            "avg_daily_consumption": round(avg_daily_flow, 1),
+            "today_consumption": round(today_flow, 1),
+            "timestamp": format_epoch(time.time()),
+        }
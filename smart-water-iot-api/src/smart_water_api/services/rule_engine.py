@@ -0,0 +1,397 @@
+"""
+Rule Engine - Compiles alert rule definitions into a flat evaluation table.
+Supports per-tank threshold overrides and vectorized batch evaluation.
+"""
+
+import json
+import logging
+import operator
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .alert_models import AlertTemplate, alert_type_code, build_template
+from ..constants import (
+    WATER_LEVEL_OVERFLOW_THRESHOLD,
+    WATER_LEVEL_CRITICAL_LOW,
+    WATER_LEVEL_WARNING_LOW,
+    WATER_LEVEL_WARNING_HIGH,
+    FLOW_RATE_HIGH_USAGE,
+    ALERT_TYPE_OVERFLOW,
+    ALERT_TYPE_LOW_WATER,
+    ALERT_TYPE_HIGH_FLOW,
+    ALERT_PRIORITY_MEDIUM,
+    ALERT_PRIORITY_HIGH,
+    ALERT_PRIORITY_CRITICAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Reading fields a rule may test, in evaluation-table column order
+RULE_METRICS = ("water_level_percent", "flow_rate_lpm")
+
+# Comparator codes used in the compiled table
+_COMPARATORS = {
+    ">=": np.greater_equal,
+    ">": np.greater,
+    "<=": np.less_equal,
+    "<": np.less,
+}
+_COMPARATOR_CODES = {symbol: code for code, symbol in enumerate(_COMPARATORS)}
+_COMPARATOR_FUNCS = tuple(_COMPARATORS.values())
+# Scalar equivalents, indexed by the same codes
+_SCALAR_FUNCS = (operator.ge, operator.gt, operator.le, operator.lt)
+
+# Within one alert type, the first matching rule wins (like if/elif).
+# Leakage needs reading history and is handled by LeakageDetector.
+DEFAULT_ALERT_RULES: List[Dict[str, Any]] = [
+    {
+        "id": "overflow_critical",
+        "type": ALERT_TYPE_OVERFLOW,
+        "metric": "water_level_percent",
+        "comparator": ">=",
+        "threshold": WATER_LEVEL_OVERFLOW_THRESHOLD,
+        "priority": ALERT_PRIORITY_CRITICAL,
+        "message": "Tank {tank_id} is at {value}% capacity - Overflow imminent!",
+    },
+    {
+        "id": "overflow_high",
+        "type": ALERT_TYPE_OVERFLOW,
+        "metric": "water_level_percent",
+        "comparator": ">=",
+        "threshold": WATER_LEVEL_WARNING_HIGH,
+        "priority": ALERT_PRIORITY_HIGH,
+        "message": "Tank {tank_id} water level is high at {value}%",
+    },
+    {
+        "id": "low_water_critical",
+        "type": ALERT_TYPE_LOW_WATER,
+        "metric": "water_level_percent",
+        "comparator": "<=",
+        "threshold": WATER_LEVEL_CRITICAL_LOW,
+        "priority": ALERT_PRIORITY_CRITICAL,
+        "message": "Tank {tank_id} water level critically low at {value}%",
+    },
+    {
+        "id": "low_water_warning",
+        "type": ALERT_TYPE_LOW_WATER,
+        "metric": "water_level_percent",
+        "comparator": "<=",
+        "threshold": WATER_LEVEL_WARNING_LOW,
+        "priority": ALERT_PRIORITY_MEDIUM,
+        "message": "Tank {tank_id} water level low at {value}%",
+    },
+    {
+        "id": "high_flow",
+        "type": ALERT_TYPE_HIGH_FLOW,
+        "metric": "flow_rate_lpm",
+        "comparator": ">=",
+        "threshold": FLOW_RATE_HIGH_USAGE,
+        "priority": ALERT_PRIORITY_HIGH,
+        "message": "Unusually high water flow detected - {value} L/min",
+    },
+]
+
+
+class CompiledRule(NamedTuple):
+    """Static metadata for one rule in the evaluation table."""
+    rule_id: str
+    alert_type: str
+    type_code: int
+    metric: str
+    template: AlertTemplate
+
+
+class RuleMatch(NamedTuple):
+    """A rule that fired for a reading, with tank-specific values applied."""
+    rule: CompiledRule
+    priority: int
+    value: float
+    threshold: float
+
+
+class RuleEngine:
+    """
+    Evaluates alert rules against readings using a compiled, flat table.
+
+    Every rule is a conjunction of conditions (metric, comparator, threshold).
+    Conditions of all rules are laid out as columns so a whole batch of
+    readings is tested with a handful of array operations, independent of
+    how many rules or tank profiles are configured.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Sequence[Dict[str, Any]]] = None,
+        overrides: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None,
+    ):
+        """
+        Compile rule definitions and per-tank overrides.
+
+        Args:
+            rules: Rule definitions (defaults to DEFAULT_ALERT_RULES)
+            overrides: Mapping of tank_id -> rule_id -> {threshold, priority, enabled}
+        """
+        self._compile(
+            list(DEFAULT_ALERT_RULES if rules is None else rules),
+            overrides or {},
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleEngine":
+        """
+        Load rule definitions from a JSON file.
+
+        The file holds {"rules": [...], "overrides": {...}}; a missing
+        "rules" key keeps the default rule set.
+        """
+        with open(path, "r", encoding="utf-8") as handle:
+            config = json.load(handle)
+        engine = cls(config.get("rules"), config.get("overrides"))
+        logger.info(
+            "Loaded alert rules",
+            extra={"fields": {
+                "rules": len(engine.rules),
+                "tank_profiles": len(engine._profile_index),
+                "path": path,
+            }},
+        )
+        return engine
+
+    @property
+    def rules(self) -> List[CompiledRule]:
+        """Compiled rules in evaluation order."""
+        return list(self._rules)
+
+    def _compile(self, definitions: List[Dict[str, Any]], overrides: Dict) -> None:
+        """Flatten rule definitions into condition columns and profile rows."""
+        for definition in definitions:
+            _validate_rule(definition)
+
+        # Group rules by alert type (first appearance order), keeping the
+        # relative order inside each type so "first match wins" holds.
+        type_order: Dict[str, int] = {}
+        for definition in definitions:
+            type_order.setdefault(definition["type"], len(type_order))
+        definitions = sorted(definitions, key=lambda d: type_order[d["type"]])
+
+        self._rules: List[CompiledRule] = []
+        self._rule_ids: Dict[str, int] = {}
+        cond_metric, cond_op, cond_threshold = [], [], []
+        rule_cond_start, primary_cond, priorities = [], [], []
+        group_starts = []
+
+        previous_type = None
+        for rule_index, definition in enumerate(definitions):
+            if definition["type"] != previous_type:
+                group_starts.append(rule_index)
+                previous_type = definition["type"]
+
+            self._rules.append(CompiledRule(
+                rule_id=definition["id"],
+                alert_type=definition["type"],
+                type_code=alert_type_code(definition["type"]),
+                metric=definition["metric"],
+                template=build_template(
+                    definition["type"],
+                    definition.get("message", "{alert_type} alert: {value}"),
+                ),
+            ))
+            self._rule_ids[definition["id"]] = rule_index
+            priorities.append(int(definition["priority"]))
+
+            rule_cond_start.append(len(cond_metric))
+            primary_cond.append(len(cond_metric))
+            conditions = [definition] + list(definition.get("conditions", []))
+            for condition in conditions:
+                cond_metric.append(RULE_METRICS.index(condition["metric"]))
+                cond_op.append(_COMPARATOR_CODES[condition["comparator"]])
+                cond_threshold.append(float(condition["threshold"]))
+
+        num_rules = len(self._rules)
+        self._cond_metric = np.asarray(cond_metric, dtype=np.intp)
+        self._rule_cond_start = np.asarray(rule_cond_start, dtype=np.intp)
+        self._primary_cond = np.asarray(primary_cond, dtype=np.intp)
+        self._group_starts = np.asarray(group_starts, dtype=np.intp)
+        self._rule_positions = np.arange(num_rules, dtype=np.intp)
+        cond_op = np.asarray(cond_op, dtype=np.intp)
+        self._op_columns = [
+            (func, np.flatnonzero(cond_op == code))
+            for code, func in enumerate(_COMPARATOR_FUNCS)
+            if np.any(cond_op == code)
+        ]
+
+        # Row 0 is the default profile; each overridden tank gets its own row
+        self._profile_index: Dict[str, int] = {}
+        thresholds = [cond_threshold]
+        priority_rows = [priorities]
+        enabled_rows = [[True] * num_rules]
+        for tank_id, tank_overrides in overrides.items():
+            row_thresholds = list(cond_threshold)
+            row_priorities = list(priorities)
+            row_enabled = [True] * num_rules
+            for rule_id, override in tank_overrides.items():
+                if rule_id not in self._rule_ids:
+                    raise ValueError(f"Override for unknown rule '{rule_id}' on tank {tank_id}")
+                rule_index = self._rule_ids[rule_id]
+                if "threshold" in override:
+                    row_thresholds[primary_cond[rule_index]] = float(override["threshold"])
+                if "priority" in override:
+                    row_priorities[rule_index] = int(override["priority"])
+                if "enabled" in override:
+                    row_enabled[rule_index] = bool(override["enabled"])
+            self._profile_index[tank_id] = len(thresholds)
+            thresholds.append(row_thresholds)
+            priority_rows.append(row_priorities)
+            enabled_rows.append(row_enabled)
+
+        # Explicit shapes keep an empty rule set valid (zero-width rows)
+        num_profiles = len(thresholds)
+        self._thresholds = np.asarray(thresholds, dtype=np.float64).reshape(num_profiles, len(cond_metric))
+        self._priorities = np.asarray(priority_rows, dtype=np.int64).reshape(num_profiles, num_rules)
+        self._enabled = np.asarray(enabled_rows, dtype=bool).reshape(num_profiles, num_rules)
+
+        # The same table as Python lists, for evaluating one reading without
+        # NumPy. Per rule: (index, rule, conditions as (metric, compare, column)),
+        # with the primary condition first.
+        self._scalar_groups: List[List[Tuple[int, CompiledRule, List[Tuple[int, Callable, int]]]]] = []
+        group_ends = group_starts[1:] + [num_rules]
+        cond_ends = rule_cond_start[1:] + [len(cond_metric)]
+        for group_start, group_end in zip(group_starts, group_ends):
+            self._scalar_groups.append([
+                (
+                    rule_index,
+                    self._rules[rule_index],
+                    [
+                        (cond_metric[cond], _SCALAR_FUNCS[cond_op[cond]], cond)
+                        for cond in range(rule_cond_start[rule_index], cond_ends[rule_index])
+                    ],
+                )
+                for rule_index in range(group_start, group_end)
+            ])
+        self._threshold_rows = [list(row) for row in thresholds]
+        self._priority_rows = [list(row) for row in priority_rows]
+        self._enabled_rows = [list(row) for row in enabled_rows]
+
+    def profile_for(self, tank_id: str) -> int:
+        """Get the profile row for a tank (0 = default thresholds)."""
+        return self._profile_index.get(tank_id, 0)
+
+    def evaluate(self, reading: Dict[str, Any]) -> List[RuleMatch]:
+        """
+        Evaluate a single reading.
+
+        Walks the compiled table in plain Python: for one reading that is
+        cheaper than building arrays, so per-request ingest stays off NumPy.
+        Batches go through evaluate_batch().
+
+        Args:
+            reading: Validated sensor data dictionary
+
+        Returns:
+            Fired rules, at most one per alert type, in rule-type order
+        """
+        profile = self.profile_for(reading.get("tank_id"))
+        values = [float(reading.get(metric, 0)) for metric in RULE_METRICS]
+        thresholds = self._threshold_rows[profile]
+        enabled = self._enabled_rows[profile]
+        priorities = self._priority_rows[profile]
+        matches = []
+        for group in self._scalar_groups:
+            for rule_index, rule, conditions in group:
+                if enabled[rule_index] and all(
+                    compare(values[metric], thresholds[cond]) for metric, compare, cond in conditions
+                ):
+                    metric, _, primary = conditions[0]
+                    matches.append(RuleMatch(
+                        rule=rule,
+                        priority=priorities[rule_index],
+                        value=values[metric],
+                        threshold=thresholds[primary],
+                    ))
+                    break  # First match wins within a type
+        return matches
+
+    def evaluate_batch(self, readings: Sequence[Dict[str, Any]]) -> List[List[RuleMatch]]:
+        """
+        Evaluate many readings in one vectorized pass.
+
+        Args:
+            readings: Validated sensor data dictionaries
+
+        Returns:
+            One list of fired rules per input reading
+        """
+        values = np.array(
+            [[reading.get(metric, 0) for metric in RULE_METRICS] for reading in readings],
+            dtype=np.float64,
+        ).reshape(-1, len(RULE_METRICS))
+        profiles = np.fromiter(
+            (self.profile_for(reading.get("tank_id")) for reading in readings),
+            dtype=np.intp,
+            count=len(readings),
+        )
+
+        fired_rows, fired_rules = self.evaluate_columns(values, profiles)
+
+        results: List[List[RuleMatch]] = [[] for _ in readings]
+        for row, rule_index in zip(fired_rows.tolist(), fired_rules.tolist()):
+            profile = profiles[row]
+            cond = self._primary_cond[rule_index]
+            results[row].append(RuleMatch(
+                rule=self._rules[rule_index],
+                priority=int(self._priorities[profile, rule_index]),
+                value=float(values[row, self._cond_metric[cond]]),
+                threshold=float(self._thresholds[profile, cond]),
+            ))
+        return results
+
+    def evaluate_columns(self, values: np.ndarray, profiles: np.ndarray):
+        """
+        Evaluate a columnar batch against the compiled table.
+
+        Args:
+            values: (n, len(RULE_METRICS)) array of metric values
+            profiles: (n,) array of profile rows from profile_for()
+
+        Returns:
+            (row indices, rule indices) of fired rules, ordered by row then type
+        """
+        num_rows = values.shape[0]
+        if num_rows == 0 or not self._rules:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+
+        lhs = values[:, self._cond_metric]
+        rhs = self._thresholds[profiles]
+        passed = np.empty(lhs.shape, dtype=bool)
+        for func, columns in self._op_columns:
+            passed[:, columns] = func(lhs[:, columns], rhs[:, columns])
+
+        # A rule matches when all of its conditions pass
+        matched = np.logical_and.reduceat(passed, self._rule_cond_start, axis=1)
+        matched &= self._enabled[profiles]
+
+        # First matching rule inside each type group
+        sentinel = len(self._rules)
+        ranks = np.where(matched, self._rule_positions, sentinel)
+        first = np.minimum.reduceat(ranks, self._group_starts, axis=1)
+        rows, groups = np.nonzero(first < sentinel)
+        return rows, first[rows, groups]
+
+
+def _validate_rule(definition: Dict[str, Any]) -> None:
+    """Raise ValueError if a rule definition is malformed."""
+    for key in ("id", "type", "metric", "comparator", "threshold", "priority"):
+        if key not in definition:
+            raise ValueError(f"Alert rule is missing '{key}': {definition}")
+    conditions: Iterable[Dict[str, Any]] = [definition] + list(definition.get("conditions", []))
+    for condition in conditions:
+        if condition.get("metric") not in RULE_METRICS:
+            raise ValueError(
+                f"Alert rule '{definition['id']}' uses unknown metric '{condition.get('metric')}'"
+            )
+        if condition.get("comparator") not in _COMPARATOR_CODES:
+            raise ValueError(
+                f"Alert rule '{definition['id']}' uses unknown comparator '{condition.get('comparator')}'"
+            )
@@ -0,0 +1,203 @@
+"""
+Refresh Scheduler - Background thread that keeps materialized results fresh.
+Runs a job on a jittered cadence and soon after the data version changes,
+plus lightweight periodic ticks on the same thread.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from ..constants import (
+    SCHEDULER_REFRESH_SECONDS,
+    SCHEDULER_MIN_REFRESH_SECONDS,
+    SCHEDULER_JITTER_RATIO,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    In-process scheduler for a single refresh job.
+
+    The job runs every `interval_seconds` (randomly jittered so several
+    workers don't refresh in lockstep). notify() signals new data: the job
+    then runs as soon as `min_interval_seconds` have passed since the last
+    run, provided the data version actually changed. Requests never wait
+    for the job; they read whatever it last produced.
+
+    Ticks are small callables run every few seconds on the same thread
+    (e.g. advancing the offline-sensor timer wheel); they are not jittered
+    and do not depend on the data version.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: float = SCHEDULER_REFRESH_SECONDS,
+        min_interval_seconds: float = SCHEDULER_MIN_REFRESH_SECONDS,
+        jitter_ratio: float = SCHEDULER_JITTER_RATIO,
+    ):
+        """
+        Initialize the scheduler (call init_app() or start() to run it).
+
+        Args:
+            interval_seconds: Periodic refresh cadence
+            min_interval_seconds: Minimum spacing of data-triggered refreshes
+            jitter_ratio: Maximum relative jitter applied to the cadence
+        """
+        self.interval_seconds = interval_seconds
+        self.min_interval_seconds = min_interval_seconds
+        self.jitter_ratio = jitter_ratio
+        self._job: Optional[Callable[[], None]] = None
+        self._ticks: List[List] = []  # [callable, interval, next due]
+        self._version: Callable[[], int] = lambda: 0
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._dirty = False
+        self._last_run = float("-inf")
+        self._last_version: Optional[int] = None
+        self._next_run = 0.0
+        self.runs = 0
+        self.failures = 0
+        self.tick_failures = 0
+
+    def init_app(
+        self,
+        app,
+        job: Callable[[], None],
+        version: Callable[[], int] = None,
+        ticks: Sequence[Tuple[Callable[[], object], float]] = (),
+    ) -> None:
+        """
+        Configure the scheduler from app config and start it if enabled.
+
+        Args:
+            app: Flask application
+            job: Callable performing one refresh
+            version: Callable returning the current data version
+            ticks: (callable, interval seconds) pairs run periodically
+        """
+        self.interval_seconds = app.config.get("SCHEDULER_REFRESH_SECONDS", self.interval_seconds)
+        self.min_interval_seconds = app.config.get("SCHEDULER_MIN_REFRESH_SECONDS", self.min_interval_seconds)
+        self.configure(job, version, ticks)
+        app.extensions["scheduler"] = self
+
+        if app.config.get("SCHEDULER_ENABLED", True) and not app.testing:
+            self.start()
+
+    def configure(
+        self,
+        job: Callable[[], None],
+        version: Callable[[], int] = None,
+        ticks: Sequence[Tuple[Callable[[], object], float]] = (),
+    ) -> None:
+        """Set the job to run, the data version source and the periodic ticks."""
+        self._job = job
+        if version is not None:
+            self._version = version
+        self._ticks = [[tick, interval, 0.0] for tick, interval in ticks]
+
+    @property
+    def running(self) -> bool:
+        """Whether the background thread is alive."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the background thread (no-op if already running)."""
+        if self.running or self._job is None:
+            return
+        self._stopping.clear()
+        self._next_run = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, name="refresh-scheduler", daemon=True)
+        self._thread.start()
+        logger.info("Refresh scheduler started", extra={"fields": {"interval_seconds": self.interval_seconds}})
+
+    def stop(self, timeout: float = None) -> None:
+        """Stop the background thread."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def notify(self) -> None:
+        """Signal that new data arrived; cheap enough to call on every write."""
+        if not self._dirty:
+            self._dirty = True
+            self._wake.set()
+
+    def run_once(self) -> bool:
+        """
+        Run the job now.
+
+        Returns:
+            True if the job completed without raising
+        """
+        self._dirty = False
+        version = self._version()
+        started = time.monotonic()
+        try:
+            self._job()
+        except Exception as e:  # Keep the thread alive; the next run may succeed
+            self.failures += 1
+            logger.error("Scheduled refresh failed", extra={"fields": {"error": str(e)}})
+            return False
+        finally:
+            self._last_run = started
+            self._next_run = started + self._jittered(self.interval_seconds)
+        self._last_version = version
+        self.runs += 1
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Scheduled refresh complete",
+                extra={"fields": {"ms": round((time.monotonic() - started) * 1000, 1)}},
+            )
+        return True
+
+    def run_ticks(self, now: float = None) -> float:
+        """
+        Run every tick that is due.
+
+        Returns:
+            Monotonic time the next tick is due (inf without ticks)
+        """
+        now = time.monotonic() if now is None else now
+        next_due = float("inf")
+        for tick in self._ticks:
+            func, interval, due = tick
+            if due <= now:
+                try:
+                    func()
+                except Exception as e:  # A failing tick must not stop the refresh job
+                    self.tick_failures += 1
+                    logger.error("Scheduled tick failed", extra={"fields": {"error": str(e)}})
+                tick[2] = due = now + interval
+            next_due = min(next_due, due)
+        return next_due
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            tick_due = self.run_ticks()
+            due = self._next_run
+            if self._dirty:
+                if self._version() == self._last_version:
+                    self._dirty = False
+                else:
+                    due = min(due, self._last_run + self.min_interval_seconds)
+
+            wait = min(due, tick_due) - time.monotonic()
+            if wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+            if due <= time.monotonic():
+                self.run_once()
+
+    def _jittered(self, seconds: float) -> float:
+        """Apply random +/- jitter to a delay."""
+        spread = seconds * self.jitter_ratio
+        return max(0.0, seconds + random.uniform(-spread, spread))
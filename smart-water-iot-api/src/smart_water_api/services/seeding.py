@@ -0,0 +1,53 @@
+"""
+Seeding - How a new mock database is filled.
+Kept apart from the sensor service so the app factory can choose the seed
+mode without importing the store (the database is created on first use).
+"""
+
+from typing import Any, Dict, Optional
+
+from ..constants import (
+    SEED_MODE_SAMPLE,
+    SEED_MODE_SNAPSHOT,
+    SEED_MODES,
+    SEED_SAMPLE_DAYS,
+    SEED_SAMPLE_TANKS,
+)
+
+# How get_mock_db() seeds a new database (see configure_seeding)
+_seed_settings: Dict[str, Any] = {
+    "mode": SEED_MODE_SAMPLE,
+    "days": SEED_SAMPLE_DAYS,
+    "tanks": SEED_SAMPLE_TANKS,
+    "snapshot_path": None,
+}
+
+
+def configure_seeding(
+    mode: str = SEED_MODE_SAMPLE,
+    days: int = SEED_SAMPLE_DAYS,
+    tanks: int = SEED_SAMPLE_TANKS,
+    snapshot_path: Optional[str] = None,
+) -> None:
+    """
+    Choose how the next database created by get_mock_db() is seeded.
+
+    Args:
+        mode: 'sample' (generated hourly readings), 'none' or 'snapshot'
+        days: Days of sample readings
+        tanks: Number of sample tanks
+        snapshot_path: Persistence snapshot loaded in 'snapshot' mode
+
+    Raises:
+        ValueError: If the mode is unknown or a snapshot path is missing
+    """
+    if mode not in SEED_MODES:
+        raise ValueError(f"Unknown seed mode {mode!r} (expected one of: {', '.join(SEED_MODES)})")
+    if mode == SEED_MODE_SNAPSHOT and not snapshot_path:
+        raise ValueError("Seed mode 'snapshot' needs a snapshot path")
+    _seed_settings.update(mode=mode, days=days, tanks=tanks, snapshot_path=snapshot_path)
+
+
+def seed_settings() -> Dict[str, Any]:
+    """The current seed settings, as seed_database() keyword arguments."""
+    return dict(_seed_settings)
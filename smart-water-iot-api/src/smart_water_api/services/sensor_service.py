@@ -3,19 +3,49 @@ Sensor Service - Handles sensor data ingestion and retrieval.
 Uses mock Firebase for development and testing.
 """
 
+import calendar
+import heapq
 import logging
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from collections import defaultdict
+from operator import itemgetter
+from typing import Deque, Dict, Generator, Iterator, List, Optional, Any, Tuple
+from collections import defaultdict, deque
+
+import numpy as np
 
 from ..constants import (
     COLLECTION_READINGS,
+    COMPACTION_CHUNK_SIZE,
+    SECONDS_PER_DAY,
     SENSOR_DATA_EXPIRY,
     DEFAULT_PAGE_SIZE,
+    SEED_MODE_SAMPLE,
+    SEED_MODE_SNAPSHOT,
+    SEED_SAMPLE_DAYS,
+    SEED_SAMPLE_TANKS,
 )
 from ..errors.exceptions import FirebaseError, SensorDataError
+from ..storage.column_store import ColumnStore
+from ..storage.rollups import RollupStore
+from ..storage.segments import S_EPOCH, S_LEVEL, S_FLOW, S_DEVICE, SegmentStore
+from ..storage.snapshot import read_snapshot
+from ..utils.singleflight import SingleFlight
+from ..utils.timeutils import parse_timestamp
+from ..logging_config import SampledLogger
+from ..utils.tracing import span
+from .offline_monitor import OfflineMonitor
+from .seeding import configure_seeding, seed_settings
 
 logger = logging.getLogger(__name__)
+_ingest_log = SampledLogger(logger)  # Per-reading logs are rate-limited
+
+
+def _sample_ids(tank: int) -> Tuple[str, str]:
+    """Device and tank id of the n-th sample tank."""
+    if tank == 0:
+        return "SENSOR-001", "TANK-MAIN"
+    return f"SENSOR-{tank + 1:03d}", f"TANK-{tank + 1:03d}"
 
 
 class MockFirebaseDB:
@@ -24,58 +54,493 @@ class MockFirebaseDB:
     Stores data in memory with basic query support.
     """
     
-    def __init__(self):
-        self._collections: Dict[str, List[Dict]] = defaultdict(list)
-        self._seed_sample_data()
-    
-    def _seed_sample_data(self):
-        """Seed the database with sample sensor readings."""
-        base_time = datetime.utcnow()
-        
-        # Generate 7 days of sample data
-        for day_offset in range(7):
-            for hour in range(24):
-                timestamp = base_time - timedelta(days=day_offset, hours=hour)
-                
-                # Simulate realistic water usage patterns
-                hour_of_day = timestamp.hour
-                
-                # Higher usage in morning (6-9) and evening (18-21)
-                if 6 <= hour_of_day <= 9:
-                    water_level = 60 + (hour_of_day - 6) * 5
-                    flow_rate = 8.5 + (hour_of_day % 3)
-                elif 18 <= hour_of_day <= 21:
-                    water_level = 70 - (hour_of_day - 18) * 5
-                    flow_rate = 7.0 + (hour_of_day % 2)
-                else:
-                    water_level = 65 + (hour_of_day % 10)
-                    flow_rate = 2.0 + (hour_of_day % 5) * 0.5
-                
-                reading = {
-                    "device_id": "SENSOR-001",
-                    "tank_id": "TANK-MAIN",
-                    "water_level_percent": min(95, max(10, water_level)),
-                    "flow_rate_lpm": round(flow_rate, 2),
-                    "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%SZ"),
-                    "created_at": timestamp.isoformat(),
+    def __init__(self, seed: bool = True):
+        # Collections are append-ordered; expiry pops from the left
+        self._collections: Dict[str, Deque[Dict]] = defaultdict(deque)
+        self._next_ids: Dict[str, int] = defaultdict(int)
+        self._lock = threading.RLock()
+        self._documents: Dict[str, Dict[str, Dict]] = defaultdict(dict)
+        self.rollups = RollupStore()
+        self.columns = ColumnStore()
+        self.journal = None  # Optional write-ahead log, called after each write
+        self.segments: Optional[SegmentStore] = None  # Sealed history on disk
+        self._sealing: List[Dict] = []  # Readings detached for sealing, not yet on disk
+        self._scanned: Deque[Dict] = deque()  # Readings kept by an unfinished detach pass
+        if seed:
+            self._seed_sample_data()
+    
+    def _seed_sample_data(self, days: int = SEED_SAMPLE_DAYS, tanks: int = SEED_SAMPLE_TANKS):
+        """Seed the database with hourly sample readings per tank, oldest first."""
+        hours = days * 24
+        stamps = np.datetime64(datetime.utcnow(), "us") - np.arange(hours - 1, -1, -1) * np.timedelta64(1, "h")
+        hour_of_day = stamps.astype("datetime64[h]").astype(np.int64) % 24
+        
+        # Higher usage in morning (6-9) and evening (18-21)
+        morning = (hour_of_day >= 6) & (hour_of_day <= 9)
+        evening = (hour_of_day >= 18) & (hour_of_day <= 21)
+        water_levels = np.where(
+            morning, 60 + (hour_of_day - 6) * 5,
+            np.where(evening, 70 - (hour_of_day - 18) * 5, 65 + hour_of_day % 10),
+        )
+        flow_rates = np.where(
+            morning, 8.5 + hour_of_day % 3,
+            np.where(evening, 7.0 + hour_of_day % 2, 2.0 + (hour_of_day % 5) * 0.5),
+        ).round(2).tolist()
+        timestamps = [f"{stamp}Z" for stamp in np.datetime_as_string(stamps, unit="s")]
+        
+        readings = []
+        for tank in range(tanks):
+            device_id, tank_id = _sample_ids(tank)
+            levels = np.clip(water_levels - tank % 5, 10, 95).tolist()
+            readings.append([
+                {
+                    "device_id": device_id,
+                    "tank_id": tank_id,
+                    "water_level_percent": levels[row],
+                    "flow_rate_lpm": flow_rates[row],
+                    "timestamp": timestamps[row],
                 }
-                self._collections[COLLECTION_READINGS].append(reading)
+                for row in range(hours)
+            ])
+        # Interleave tanks so the collection stays in time order
+        documents = [reading for row in zip(*readings) for reading in row]
+        epochs = np.repeat(stamps.astype("datetime64[s]").astype(np.int64), tanks).astype(np.float64)
+        self.add_many(COLLECTION_READINGS, documents, epochs)
         
-        logger.info(f"Seeded {len(self._collections[COLLECTION_READINGS])} sample readings")
+        logger.info("Seeded sample readings", extra={"fields": {"readings": len(documents), "tanks": tanks}})
     
     def add(self, collection: str, document: Dict) -> str:
         """Add a document to a collection."""
-        doc_id = f"doc_{len(self._collections[collection])}"
-        document["_id"] = doc_id
-        document["created_at"] = datetime.utcnow().isoformat()
-        self._collections[collection].append(document)
+        with self._lock:
+            doc_id = f"doc_{self._next_ids[collection]}"
+            self._next_ids[collection] += 1
+            document["_id"] = doc_id
+            document["created_at"] = datetime.utcnow().isoformat()
+            self._collections[collection].append(document)
+            if collection == COLLECTION_READINGS:
+                self._index_reading(document)
+        if self.journal is not None:
+            self.journal.log_add(collection, document)
         return doc_id
     
+    def add_many(self, collection: str, documents: List[Dict], epochs: Optional[np.ndarray] = None) -> List[str]:
+        """
+        Add a batch of documents with one lock hold and one journal commit.
+        
+        Readings are indexed per tank in bulk. As with add(), created_at is
+        the time the document was stored; date-range queries over readings
+        use their event time. Readings of days that are already sealed go
+        straight into their segments instead of through the in-memory
+        collection.
+        
+        Args:
+            collection: Collection name
+            documents: Documents to add (readings need timestamp, tank and values)
+            epochs: Event times of the readings, if already known (skips parsing)
+        
+        Returns:
+            Ids of the added documents, in order
+        """
+        created_at = datetime.utcnow().isoformat()
+        if collection == COLLECTION_READINGS:
+            if epochs is None:
+                epochs = np.fromiter(
+                    (parse_timestamp(d["timestamp"]) for d in documents), dtype=np.float64, count=len(documents)
+                )
+        historical: Dict[Tuple[str, int], List[Dict]] = defaultdict(list)
+        with self._lock:
+            first = self._next_ids[collection]
+            self._next_ids[collection] = first + len(documents)
+            for number, document in enumerate(documents, first):
+                document["_id"] = f"doc_{number}"
+                document["created_at"] = created_at
+            if collection != COLLECTION_READINGS:
+                self._collections[collection].extend(documents)
+            else:
+                cutoff = self.columns.sealed_before * SECONDS_PER_DAY if self.segments is not None else None
+                heap_rows: Dict[str, List[int]] = defaultdict(list)
+                tank_rows: Dict[str, List[int]] = defaultdict(list)
+                levels = np.empty(len(documents))
+                flows = np.empty(len(documents))
+                for row, document in enumerate(documents):
+                    epoch = epochs[row]
+                    levels[row] = document["water_level_percent"]
+                    flows[row] = document["flow_rate_lpm"]
+                    tank_id = document["tank_id"]
+                    tank_rows[tank_id].append(row)
+                    if cutoff is not None and epoch < cutoff:
+                        historical[(tank_id, int(epoch // SECONDS_PER_DAY))].append(document)
+                    else:
+                        self._collections[collection].append(document)
+                        heap_rows[tank_id].append(row)
+                for tank_id, rows in heap_rows.items():
+                    self.columns.add_many(tank_id, epochs[rows], levels[rows], flows[rows])
+                # Rollups see every reading of a tank in input order, sealed or not
+                for tank_id, rows in tank_rows.items():
+                    self.rollups.add_many(tank_id, epochs[rows], levels[rows], flows[rows])
+        
+        for (tank_id, day), docs in historical.items():
+            self.seal_group(tank_id, day, docs)
+        if historical:
+            self.segments.flush()
+        if self.journal is not None:
+            self.journal.log_add_many(collection, documents)
+        return [document["_id"] for document in documents]
+    
+    def restore_document(self, collection: str, document: Dict) -> None:
+        """
+        Re-apply a logged add() during recovery.
+        
+        Logged documents can arrive slightly out of id order (writers log
+        after releasing the lock), so the id counter only ever moves up.
+        """
+        number = int(document["_id"][4:])
+        with self._lock:
+            self._next_ids[collection] = max(self._next_ids[collection], number + 1)
+            if collection == COLLECTION_READINGS:
+                epoch = parse_timestamp(document["timestamp"])
+                if self._is_sealed(document["tank_id"], epoch, number):
+                    # Sealed after the snapshot: the segment has the row, the rollups don't
+                    self.rollups.add(
+                        document["tank_id"], epoch, document["water_level_percent"], document["flow_rate_lpm"]
+                    )
+                    return
+            self._collections[collection].append(document)
+            if collection == COLLECTION_READINGS:
+                self._index_reading(document)
+    
+    def next_ids(self) -> Dict[str, int]:
+        """Next document number per collection."""
+        with self._lock:
+            return dict(self._next_ids)
+    
+    def expire_readings(self, cutoff: float, limit: int) -> Tuple[int, bool]:
+        """
+        Drop the oldest stored readings whose event time is before cutoff.
+        
+        Readings are expired from the front of the collection, so a reading
+        that arrived late is dropped once everything stored before it is.
+        
+        Args:
+            cutoff: Epoch seconds; older readings are dropped
+            limit: Maximum number of readings to drop in this call
+            
+        Returns:
+            (readings dropped, whether no expired reading remains at the front)
+        """
+        dropped = 0
+        with self._lock:
+            docs = self._collections[COLLECTION_READINGS]
+            while docs and dropped < limit:
+                try:
+                    epoch = parse_timestamp(docs[0]["timestamp"])
+                except (KeyError, TypeError, ValueError):
+                    epoch = float("-inf")  # Unreadable timestamps never become valid
+                if epoch >= cutoff:
+                    return dropped, True
+                docs.popleft()
+                dropped += 1
+            return dropped, not docs
+    
+    def export_state(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """
+        Capture the database for a snapshot.
+        
+        Readings are encoded as columns (with dictionary-encoded tank and
+        device ids); other documents go into a JSON-ready dictionary.
+        Readings already sealed to segments are durable on their own and
+        are left out.
+        
+        Returns:
+            (arrays, metadata)
+        """
+        with self._lock:
+            readings = self._in_memory_readings()
+            other = {
+                name: list(docs)
+                for name, docs in self._collections.items()
+                if name != COLLECTION_READINGS
+            }
+            metadata = {
+                "next_ids": dict(self._next_ids),
+                "collections": other,
+                "documents": {name: dict(docs) for name, docs in self._documents.items()},
+            }
+            rollup_arrays = self.rollups.export_arrays()
+        
+        tanks: Dict[str, int] = {}
+        devices: Dict[str, int] = {}
+        arrays = {
+            "reading_ids": np.fromiter(
+                (int(r["_id"][4:]) if "_id" in r else -1 for r in readings), dtype=np.int64, count=len(readings)
+            ),
+            "reading_epochs": np.fromiter(
+                (parse_timestamp(r["timestamp"]) for r in readings), dtype=np.float64, count=len(readings)
+            ),
+            "reading_levels": np.fromiter(
+                (r["water_level_percent"] for r in readings), dtype=np.float64, count=len(readings)
+            ),
+            "reading_flows": np.fromiter(
+                (r["flow_rate_lpm"] for r in readings), dtype=np.float64, count=len(readings)
+            ),
+            "reading_tanks": np.fromiter(
+                (tanks.setdefault(r["tank_id"], len(tanks)) for r in readings), dtype=np.int32, count=len(readings)
+            ),
+            "reading_devices": np.fromiter(
+                (devices.setdefault(r["device_id"], len(devices)) for r in readings), dtype=np.int32,
+                count=len(readings),
+            ),
+            # Timestamps are ASCII; byte strings are a quarter the size of unicode arrays
+            "reading_timestamps": np.array([r["timestamp"] for r in readings], dtype=bytes),
+            "reading_created": np.array([r.get("created_at", "") for r in readings], dtype=bytes),
+            "tank_names": np.array(list(tanks), dtype=str),
+            "device_names": np.array(list(devices), dtype=str),
+        }
+        arrays.update({f"rollup_{name}": value for name, value in rollup_arrays.items()})
+        return arrays, metadata
+    
+    def restore_state(self, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> None:
+        """Replace the database contents with export_state() output."""
+        tank_names = arrays["tank_names"].tolist()
+        device_names = arrays["device_names"].tolist()
+        readings_arrays = {name: value for name, value in arrays.items() if name.startswith("reading_")}
+        
+        if self.segments is not None:
+            # A crash between sealing and the next snapshot leaves sealed readings in the snapshot
+            epochs = readings_arrays["reading_epochs"]
+            keep = np.ones(len(epochs), dtype=bool)
+            for row in np.flatnonzero(epochs < self.segments.sealed_before * SECONDS_PER_DAY).tolist():
+                keep[row] = not self._is_sealed(
+                    tank_names[readings_arrays["reading_tanks"][row]],
+                    float(epochs[row]),
+                    int(readings_arrays["reading_ids"][row]),
+                )
+            readings_arrays = {name: value[keep] for name, value in readings_arrays.items()}
+        
+        ids = readings_arrays["reading_ids"].tolist()
+        epochs = readings_arrays["reading_epochs"]
+        levels = readings_arrays["reading_levels"]
+        flows = readings_arrays["reading_flows"]
+        tank_codes = readings_arrays["reading_tanks"]
+        
+        readings = deque()
+        for doc_number, timestamp, level, flow, tank, device, created in zip(
+            ids, readings_arrays["reading_timestamps"].tolist(), levels.tolist(), flows.tolist(),
+            tank_codes.tolist(), readings_arrays["reading_devices"].tolist(),
+            readings_arrays["reading_created"].tolist(),
+        ):
+            reading = {
+                "device_id": device_names[device],
+                "tank_id": tank_names[tank],
+                "water_level_percent": level,
+                "flow_rate_lpm": flow,
+                "timestamp": timestamp.decode(),
+                "created_at": created.decode(),
+            }
+            if doc_number >= 0:
+                reading["_id"] = f"doc_{doc_number}"
+            readings.append(reading)
+        
+        columns = ColumnStore(self.segments)
+        if len(tank_codes):
+            # Group rows by tank with one stable sort instead of per-row appends
+            order = np.argsort(tank_codes, kind="stable")
+            bounds = np.searchsorted(tank_codes[order], np.arange(len(tank_names) + 1))
+            for code, tank_id in enumerate(tank_names):
+                rows = order[bounds[code]:bounds[code + 1]]
+                columns.add_many(tank_id, epochs[rows], levels[rows], flows[rows])
+        
+        rollups = RollupStore()
+        rollups.load_arrays({
+            name[len("rollup_"):]: value for name, value in arrays.items() if name.startswith("rollup_")
+        })
+        
+        with self._lock:
+            self._collections = defaultdict(deque, {
+                name: deque(docs) for name, docs in metadata["collections"].items()
+            })
+            self._collections[COLLECTION_READINGS] = readings
+            self._sealing = []
+            self._scanned = deque()
+            self._next_ids = defaultdict(int, metadata["next_ids"])
+            if self.segments is not None:
+                # Bulk adds seal historical rows before journaling them
+                self._next_ids[COLLECTION_READINGS] = max(
+                    self._next_ids[COLLECTION_READINGS], self.segments.next_doc_number
+                )
+            self._documents = defaultdict(dict, metadata["documents"])
+            self.columns = columns
+            self.rollups = rollups
+    
+    def attach_segments(self, segments: SegmentStore) -> None:
+        """
+        Keep sealed reading history in a segment store.
+        
+        Must be called before any reading is stored or restored. If the
+        segments already hold history, sample data is discarded so it never
+        mixes into real readings.
+        """
+        with self._lock:
+            self.segments = segments
+            if segments.segment_count():
+                self._collections[COLLECTION_READINGS] = deque()
+                self._scanned = deque()
+                self.columns = ColumnStore(segments)
+                self.rollups = RollupStore()
+                self._next_ids[COLLECTION_READINGS] = segments.next_doc_number
+            else:
+                self.columns.segments = segments
+                self.columns.sealed_before = segments.sealed_before
+    
+    def detach_sealable(
+        self, sealed_before: int, chunk_size: int = COMPACTION_CHUNK_SIZE
+    ) -> Generator[None, None, Dict[Tuple[str, int], List[Dict]]]:
+        """
+        Take readings of days below sealed_before out of the collection.
+        
+        The collection is walked from the front in chunks of chunk_size,
+        each under its own short lock hold, yielding between chunks so
+        ingest and reads interleave with the pass. Readings to seal move to
+        the sealing list and the rest to a scanned deque; both stay visible
+        to queries and snapshots, and readings added meanwhile are appended
+        behind the scanned ones when the pass ends. Detached readings stay
+        visible until finish_sealing().
+        
+        Use as ``groups = yield from db.detach_sealable(...)``.
+        
+        Returns:
+            Detached readings grouped by (tank id, day index)
+        """
+        cutoff = sealed_before * SECONDS_PER_DAY
+        with self._lock:
+            if self._scanned:
+                # An interrupted pass left kept readings aside; put them back in front
+                self._scanned.extend(self._collections[COLLECTION_READINGS])
+                self._collections[COLLECTION_READINGS] = self._scanned
+                self._scanned = deque()
+            remaining = len(self._collections[COLLECTION_READINGS])
+        
+        while remaining:
+            with self._lock:
+                docs = self._collections[COLLECTION_READINGS]
+                for _ in range(min(chunk_size, remaining)):
+                    doc = docs.popleft()
+                    if parse_timestamp(doc["timestamp"]) < cutoff:
+                        self._sealing.append(doc)
+                    else:
+                        self._scanned.append(doc)
+                    remaining -= 1
+                if not remaining:
+                    # Only readings added during the pass are left behind the scanned ones
+                    self._scanned.extend(docs)
+                    self._collections[COLLECTION_READINGS] = self._scanned
+                    self._scanned = deque()
+            if remaining:
+                yield
+        
+        with self._lock:
+            # Includes readings left over by an interrupted pass; segments skip known ids
+            sealing = list(self._sealing)
+        
+        groups: Dict[Tuple[str, int], List[Dict]] = defaultdict(list)
+        for doc in sealing:
+            groups[(doc["tank_id"], int(parse_timestamp(doc["timestamp"]) // SECONDS_PER_DAY))].append(doc)
+        return groups
+    
+    def seal_group(self, tank_id: str, day: int, docs: List[Dict]) -> int:
+        """
+        Write one tank's detached readings of one day to its segment.
+        
+        Returns:
+            Number of readings written
+        """
+        self.segments.write(
+            tank_id,
+            day,
+            np.fromiter((parse_timestamp(d["timestamp"]) for d in docs), dtype=np.float64, count=len(docs)),
+            np.fromiter((d["water_level_percent"] for d in docs), dtype=np.float64, count=len(docs)),
+            np.fromiter((d["flow_rate_lpm"] for d in docs), dtype=np.float64, count=len(docs)),
+            [d["device_id"] for d in docs],
+            np.fromiter((int(d["_id"][4:]) for d in docs), dtype=np.float64, count=len(docs)),
+        )
+        return len(docs)
+    
+    def finish_sealing(self, sealed_before: int, tank_ids: List[str]) -> int:
+        """
+        Make sealed days authoritative and release their memory.
+        
+        Returns:
+            Number of column rows released
+        """
+        with self._lock:
+            self.segments.advance(sealed_before)
+            released = self.columns.seal(tank_ids, sealed_before)
+            self._sealing = []
+        return released
+    
+    def _is_sealed(self, tank_id: str, epoch: float, doc_number: int) -> bool:
+        """Whether a reading is already stored in a sealed segment."""
+        segments = self.segments
+        if segments is None or epoch >= segments.sealed_before * SECONDS_PER_DAY:
+            return False
+        return segments.contains(tank_id, int(epoch // SECONDS_PER_DAY), doc_number)
+    
+    def count(self, collection: str) -> int:
+        """Number of documents in a collection."""
+        if collection == COLLECTION_READINGS:
+            return len(self._collections[collection]) + len(self._scanned)
+        return len(self._collections[collection])
+    
+    def collection_sizes(self) -> Dict[str, int]:
+        """Number of in-memory documents per collection."""
+        with self._lock:
+            sizes = {name: len(docs) for name, docs in self._collections.items()}
+            if COLLECTION_READINGS in sizes:
+                sizes[COLLECTION_READINGS] += len(self._scanned)
+            return sizes
+    
+    def _in_memory_readings(self) -> List[Dict]:
+        """Readings held in memory, including any mid-seal (call with the lock held)."""
+        return [*self._sealing, *self._scanned, *self._collections[COLLECTION_READINGS]]
+    
+    def _index_reading(self, reading: Dict) -> None:
+        """Fold a stored reading into the columns and rollups."""
+        tank_id = reading["tank_id"]
+        epoch = parse_timestamp(reading["timestamp"])
+        level = reading["water_level_percent"]
+        flow = reading["flow_rate_lpm"]
+        self.columns.add(tank_id, epoch, level, flow)
+        self.rollups.add(tank_id, epoch, level, flow)
+    
+    def set(self, collection: str, doc_id: str, document: Dict) -> None:
+        """Create or replace a document with a known id."""
+        self._documents[collection][doc_id] = document
+        if self.journal is not None:
+            self.journal.log_set(collection, doc_id, document)
+    
+    def restore_set(self, collection: str, doc_id: str, document: Dict) -> None:
+        """Re-apply a logged set() during recovery."""
+        self._documents[collection][doc_id] = document
+    
+    def get(self, collection: str, doc_id: str) -> Optional[Dict]:
+        """Get a document by id, or None if it doesn't exist."""
+        return self._documents[collection].get(doc_id)
+    
     def get_latest(self, collection: str, limit: int = 1) -> List[Dict]:
-        """Get the most recent documents from a collection."""
-        docs = self._collections[collection]
-        sorted_docs = sorted(docs, key=lambda x: x.get("created_at", ""), reverse=True)
-        return sorted_docs[:limit]
+        """
+        Get the most recent documents from a collection (sealed history excluded).
+        
+        Documents are ordered by created_at; readings stored in the same
+        batch share it and are ordered by event time.
+        """
+        with self._lock:
+            if collection == COLLECTION_READINGS:
+                docs = self._in_memory_readings()
+            else:
+                docs = list(self._collections[collection])
+        if collection == COLLECTION_READINGS:
+            return heapq.nlargest(limit, docs, key=lambda x: (x["created_at"], parse_timestamp(x["timestamp"])))
+        return heapq.nlargest(limit, docs, key=lambda x: x.get("created_at", ""))
     
     def get_by_date_range(
         self, 
@@ -83,9 +548,27 @@ class MockFirebaseDB:
         start_date: datetime, 
         end_date: datetime
     ) -> List[Dict]:
-        """Get documents within a date range."""
+        """
+        Get documents within a date range.
+        
+        Readings are windowed and ordered by event time (their timestamp),
+        whether they are in memory or sealed; other documents by created_at.
+        Range consumers that don't need documents should stream
+        iter_readings() or iter_column_batches() instead.
+        """
+        if collection == COLLECTION_READINGS:
+            start = calendar.timegm(start_date.timetuple())
+            end = calendar.timegm(end_date.timetuple()) + end_date.microsecond / 1e6
+            live, sealed_before = self._live_readings(start, end)
+            if self.segments is None:
+                return [doc for _, doc in live]
+            sealed = self.segments.iter_documents(start, end, sealed_before=sealed_before)
+            return [doc for _, doc in heapq.merge(sealed, live, key=itemgetter(0))]
+        
         results = []
-        for doc in self._collections[collection]:
+        with self._lock:
+            docs = list(self._collections[collection])
+        for doc in docs:
             try:
                 doc_time = datetime.fromisoformat(doc.get("created_at", "").replace("Z", "+00:00"))
                 if start_date <= doc_time.replace(tzinfo=None) <= end_date:
@@ -93,17 +576,116 @@ class MockFirebaseDB:
             except (ValueError, TypeError):
                 continue
         return sorted(results, key=lambda x: x.get("created_at", ""))
+    
+    def iter_readings(
+        self, start: float, end: float, tank_id: Optional[str] = None
+    ) -> Iterator[Tuple[float, str, str, str, float, float]]:
+        """
+        Stream readings with event times within [start, end] in time order.
+        
+        Sealed days are read lazily from the mapped segments; the in-memory
+        readings (only the active window when segments are enabled) are
+        sorted once and merged in.
+        
+        Yields:
+            (epoch, timestamp, device_id, tank_id, level, flow)
+        """
+        live, sealed_before = self._live_readings(start, end, tank_id)
+        in_memory = [
+            (epoch, doc["timestamp"], doc["device_id"], doc["tank_id"],
+             doc["water_level_percent"], doc["flow_rate_lpm"])
+            for epoch, doc in live
+        ]
+        if self.segments is None:
+            return iter(in_memory)
+        sealed = self.segments.iter_rows(start, end, tank_id, sealed_before)
+        return heapq.merge(sealed, in_memory, key=itemgetter(0))
+    
+    def iter_column_batches(
+        self, start: float, end: float, tank_id: Optional[str] = None
+    ) -> Iterator[Tuple[str, np.ndarray, np.ndarray, np.ndarray, np.ndarray, List[str]]]:
+        """
+        Stream readings within [start, end] as per-tank column batches.
+        
+        Sealed batches are views of the mapped segments (one per tank and
+        day, oldest day first); the in-memory readings follow as one batch
+        per tank. Each batch is sorted by time.
+        
+        Yields:
+            (tank_id, epochs, levels, flows, device codes, device table)
+        """
+        live, sealed_before = self._live_readings(start, end, tank_id)
+        if self.segments is not None:
+            for tank, data, devices in self.segments.iter_columns(start, end, tank_id, sealed_before):
+                yield tank, data[S_EPOCH], data[S_LEVEL], data[S_FLOW], data[S_DEVICE].astype(np.int32), devices
+        
+        by_tank: Dict[str, List[Dict]] = defaultdict(list)
+        for _, doc in live:
+            by_tank[doc["tank_id"]].append(doc)
+        for tank, docs in by_tank.items():
+            device_codes: Dict[str, int] = {}
+            codes = np.fromiter(
+                (device_codes.setdefault(d["device_id"], len(device_codes)) for d in docs),
+                dtype=np.int32, count=len(docs),
+            )
+            yield (
+                tank,
+                np.fromiter((parse_timestamp(d["timestamp"]) for d in docs), dtype=np.float64, count=len(docs)),
+                np.fromiter((d["water_level_percent"] for d in docs), dtype=np.float64, count=len(docs)),
+                np.fromiter((d["flow_rate_lpm"] for d in docs), dtype=np.float64, count=len(docs)),
+                codes,
+                list(device_codes),
+            )
+    
+    def _live_readings(
+        self, start: float, end: float, tank_id: Optional[str] = None
+    ) -> Tuple[List[Tuple[float, Dict]], int]:
+        """
+        In-memory readings within [start, end], sorted by event time.
+        
+        Returns:
+            ((epoch, document) pairs, sealed boundary they were captured with)
+        """
+        with self._lock:
+            docs = self._in_memory_readings()
+            sealed_before = self.columns.sealed_before
+        
+        live = []
+        for doc in docs:
+            if tank_id is not None and doc["tank_id"] != tank_id:
+                continue
+            epoch = parse_timestamp(doc["timestamp"])
+            if start <= epoch <= end:
+                live.append((epoch, doc))
+        live.sort(key=itemgetter(0))
+        return live, sealed_before
 
 
 # Global mock database instance
 _mock_db: Optional[MockFirebaseDB] = None
 
+def seed_database(db: MockFirebaseDB, mode: str, days: int, tanks: int, snapshot_path: Optional[str] = None) -> None:
+    """Fill an empty database according to a seed mode (see configure_seeding)."""
+    if mode == SEED_MODE_SAMPLE:
+        db._seed_sample_data(days, tanks)
+    elif mode == SEED_MODE_SNAPSHOT:
+        loaded = read_snapshot(snapshot_path)
+        if loaded is None:
+            logger.warning("Seed snapshot not found; starting empty", extra={"fields": {"path": snapshot_path}})
+            return
+        db.restore_state(*loaded)
+        logger.info(
+            "Seeded readings from snapshot",
+            extra={"fields": {"readings": db.count(COLLECTION_READINGS), "path": snapshot_path}},
+        )
+
 
 def get_mock_db() -> MockFirebaseDB:
     """Get or create the mock database instance."""
     global _mock_db
     if _mock_db is None:
-        _mock_db = MockFirebaseDB()
+        _mock_db = MockFirebaseDB(seed=False)
+        seed_database(_mock_db, **seed_settings())
     return _mock_db
 
 
@@ -119,15 +701,29 @@ class SensorService:
     Provides methods for ingesting and retrieving sensor readings.
     """
     
-    def __init__(self, use_mock: bool = True):
+    def __init__(self, use_mock: bool = True, offline_monitor: Optional[OfflineMonitor] = None):
         """
         Initialize the sensor service.
         
         Args:
             use_mock: Whether to use mock Firebase (default: True for dev)
+            offline_monitor: Optional last-seen tracker updated on ingest
         """
         self.use_mock = use_mock
         self._db = get_mock_db() if use_mock else None
+        self._offline_monitor = offline_monitor
+        # Dashboards polling together share one scan of the collection
+        self.flights = SingleFlight()
+    
+    @property
+    def db(self) -> MockFirebaseDB:
+        """Underlying database (rollups and document access)."""
+        return self._db
+    
+    @property
+    def data_version(self) -> int:
+        """Counter that changes whenever readings are added."""
+        return self._db.rollups.version
     
     def ingest_reading(self, validated_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -141,12 +737,18 @@ class SensorService:
         """
         try:
             # Store the reading
-            doc_id = self._db.add(COLLECTION_READINGS, validated_data.copy())
+            with span("store_write"):
+                doc_id = self._db.add(COLLECTION_READINGS, validated_data.copy())
             
-            logger.info(
-                f"Ingested reading from device {validated_data['device_id']}: "
-                f"level={validated_data['water_level_percent']}%, "
-                f"flow={validated_data['flow_rate_lpm']}L/min"
+            if self._offline_monitor is not None:
+                self._offline_monitor.touch(validated_data["device_id"], validated_data["tank_id"])
+            
+            _ingest_log.info(
+                "Ingested reading",
+                device_id=validated_data["device_id"],
+                tank_id=validated_data["tank_id"],
+                water_level_percent=validated_data["water_level_percent"],
+                flow_rate_lpm=validated_data["flow_rate_lpm"],
             )
             
             return {
@@ -158,9 +760,33 @@ class SensorService:
             }
             
         except Exception as e:
-            logger.error(f"Failed to ingest sensor data: {str(e)}")
+            logger.error("Failed to ingest sensor data", extra={"fields": {"error": str(e)}})
             raise FirebaseError(f"Failed to store sensor reading: {str(e)}")
     
+    def ingest_batch(self, validated: List[Dict[str, Any]], epochs: Optional[np.ndarray] = None) -> List[str]:
+        """
+        Store many validated readings with one bulk write.
+        
+        Args:
+            validated: Readings as returned by validate_sensor_batch()
+            epochs: Their event times in epoch seconds, if already known
+            
+        Returns:
+            Document ids, in input order
+        """
+        try:
+            with span("store_write"):
+                doc_ids = self._db.add_many(COLLECTION_READINGS, validated, epochs)
+        except Exception as e:
+            logger.error(
+                "Failed to ingest sensor batch", extra={"fields": {"readings": len(validated), "error": str(e)}}
+            )
+            raise FirebaseError(f"Failed to store sensor readings: {str(e)}")
+        
+        if self._offline_monitor is not None:
+            self._offline_monitor.touch_many({r["device_id"]: r["tank_id"] for r in validated})
+        return doc_ids
+    
     def get_latest_readings(self, limit: int = DEFAULT_PAGE_SIZE) -> List[Dict]:
         """
         Get the most recent sensor readings.
@@ -169,8 +795,11 @@ class SensorService:
             limit: Maximum number of readings to return
             
         Returns:
-            List of recent sensor readings
+            List of recent sensor readings (shared with concurrent callers; don't modify)
         """
+        return self.flights.do(("latest_readings", limit), self._read_latest, limit)
+    
+    def _read_latest(self, limit: int) -> List[Dict]:
         try:
             readings = self._db.get_latest(COLLECTION_READINGS, limit)
             # Remove internal fields before returning
@@ -179,7 +808,7 @@ class SensorService:
                 for r in readings
             ]
         except Exception as e:
-            logger.error(f"Failed to retrieve readings: {str(e)}")
+            logger.error("Failed to retrieve readings", extra={"fields": {"error": str(e)}})
             raise FirebaseError(f"Failed to retrieve sensor readings: {str(e)}")
     
     def get_readings_by_date(
@@ -188,14 +817,14 @@ class SensorService:
         end_date: datetime
     ) -> List[Dict]:
         """
-        Get sensor readings within a date range.
+        Get sensor readings taken within a date range.
         
         Args:
             start_date: Start of the date range
             end_date: End of the date range
             
         Returns:
-            List of sensor readings in the date range
+            List of sensor readings in the date range, oldest first
         """
         try:
             readings = self._db.get_by_date_range(
@@ -208,5 +837,5 @@ class SensorService:
                 for r in readings
             ]
         except Exception as e:
-            logger.error(f"Failed to retrieve readings by date: {str(e)}")
+            logger.error("Failed to retrieve readings by date", extra={"fields": {"error": str(e)}})
             raise FirebaseError(f"Failed to retrieve sensor readings: {str(e)}")
@@ -0,0 +1,265 @@
+"""
+Series Service - Downsampled time series for charts.
+Picks a bucket size so responses never exceed the requested point count.
+"""
+
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..constants import (
+    SECONDS_PER_HOUR,
+    SECONDS_PER_DAY,
+    SERIES_DEFAULT_POINTS,
+    SERIES_DEFAULT_WINDOW_SECONDS,
+    SERIES_BUCKET_STEPS_SECONDS,
+    SERIES_LTTB_OVERSAMPLE,
+)
+from ..storage.rollups import (
+    B_COUNT,
+    B_LEVEL_SUM,
+    B_LEVEL_MIN,
+    B_LEVEL_MAX,
+    B_FLOW_SUM,
+    B_FLOW_MIN,
+    B_FLOW_MAX,
+)
+from ..utils.timeutils import format_epoch
+from .sensor_service import SensorService
+
+# Rollup bucket fields gathered for coarse series, in output order
+_ROLLUP_FIELDS = (B_COUNT, B_LEVEL_SUM, B_LEVEL_MIN, B_LEVEL_MAX, B_FLOW_SUM, B_FLOW_MIN, B_FLOW_MAX)
+
+
+def choose_step(span_seconds: float, max_points: int) -> int:
+    """
+    Smallest standard bucket size that fits the span into max_points buckets.
+
+    Spans too wide for the largest standard step use a multiple of it.
+    """
+    for step in SERIES_BUCKET_STEPS_SECONDS:
+        if math.ceil(span_seconds / step) <= max_points:
+            return step
+    largest = SERIES_BUCKET_STEPS_SECONDS[-1]
+    return largest * math.ceil(span_seconds / (largest * max_points))
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Args:
+        x: Sorted x values
+        y: y values
+        threshold: Number of points to keep
+
+    Returns:
+        Indices of the selected points
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def _bucket_bounds(epochs: np.ndarray, first_edge: float, step: int, num_buckets: int):
+    """Start offsets of non-empty buckets and their bucket numbers."""
+    edges = first_edge + step * np.arange(num_buckets + 1)
+    positions = np.searchsorted(epochs, edges, side="left")
+    non_empty = np.flatnonzero(positions[1:] > positions[:-1])
+    return positions, non_empty
+
+
+class SeriesService:
+    """
+    Service producing chart-ready series bounded by a point budget.
+
+    Narrow windows are bucketed from the raw reading columns; windows whose
+    bucket size reaches an hour are built from the hourly or daily rollups,
+    so server work grows with the number of buckets, not with the number of
+    raw readings in the window.
+    """
+
+    def __init__(self, sensor_service: SensorService = None):
+        """
+        Initialize the series service.
+
+        Args:
+            sensor_service: Optional sensor service instance for data access
+        """
+        self._sensor_service = sensor_service or SensorService()
+
+    def get_series(
+        self,
+        tank_id: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        max_points: int = SERIES_DEFAULT_POINTS,
+        method: str = "buckets",
+    ) -> Dict[str, Any]:
+        """
+        Get a downsampled series for a tank.
+
+        Args:
+            tank_id: Tank identifier
+            start: Window start in epoch seconds (default: end - 24h)
+            end: Window end in epoch seconds (default: now)
+            max_points: Maximum number of points to return
+            method: 'buckets' (min/max/avg per bucket) or 'lttb'
+
+        Returns:
+            Dictionary with the window, chosen resolution and points
+        """
+        end = time.time() if end is None else end
+        start = end - SERIES_DEFAULT_WINDOW_SECONDS if start is None else start
+        span = max(end - start, 1.0)
+
+        if method == "lttb":
+            step = choose_step(span, max_points * SERIES_LTTB_OVERSAMPLE)
+            points = self._lttb_points(tank_id, start, end, step, max_points)
+        else:
+            step = choose_step(span, max_points)
+            points = self._bucket_points(tank_id, start, end, step)
+
+        return {
+            "tank_id": tank_id,
+            "start": format_epoch(start),
+            "end": format_epoch(end),
+            "method": method,
+            "bucket_seconds": step,
+            "source": "raw" if step < SECONDS_PER_HOUR else "rollups",
+            "max_points": max_points,
+            "point_count": len(points),
+            "points": points,
+        }
+
+    def _bucket_points(self, tank_id: str, start: float, end: float, step: int) -> List[Dict[str, Any]]:
+        """Min/max/avg per bucket."""
+        aggregates = self._aggregate(tank_id, start, end, step)
+        if aggregates is None:
+            return []
+        edges, count, level_sum, level_min, level_max, flow_sum, flow_min, flow_max = aggregates
+
+        return [
+            {
+                "timestamp": format_epoch(edges[i]),
+                "count": int(count[i]),
+                "level_min": round(float(level_min[i]), 2),
+                "level_max": round(float(level_max[i]), 2),
+                "level_avg": round(float(level_sum[i] / count[i]), 2),
+                "flow_min": round(float(flow_min[i]), 2),
+                "flow_max": round(float(flow_max[i]), 2),
+                "flow_avg": round(float(flow_sum[i] / count[i]), 2),
+            }
+            for i in range(len(edges))
+        ]
+
+    def _lttb_points(
+        self, tank_id: str, start: float, end: float, step: int, max_points: int
+    ) -> List[Dict[str, Any]]:
+        """LTTB over raw readings (narrow windows) or bucket averages (wide windows)."""
+        if step < SECONDS_PER_HOUR:
+            epochs, levels, flows = self._sensor_service.db.columns.range(tank_id, start, end)
+        else:
+            aggregates = self._aggregate(tank_id, start, end, step)
+            if aggregates is None:
+                return []
+            epochs, count, level_sum, _, _, flow_sum, _, _ = aggregates
+            # Place each bucket's average at the bucket centre
+            epochs = epochs + step / 2
+            levels = level_sum / count
+            flows = flow_sum / count
+
+        selected = lttb(epochs, levels, max_points)
+        return [
+            {
+                "timestamp": format_epoch(epochs[i]),
+                "water_level_percent": round(float(levels[i]), 2),
+                "flow_rate_lpm": round(float(flows[i]), 2),
+            }
+            for i in selected
+        ]
+
+    def _aggregate(self, tank_id: str, start: float, end: float, step: int):
+        """
+        Aggregate a window into buckets of `step` seconds aligned to the epoch.
+
+        Returns:
+            (bucket starts, count, level sum/min/max, flow sum/min/max) arrays
+            for non-empty buckets, or None if the window has no data
+        """
+        first_edge = (start // step) * step
+        num_buckets = int((end - first_edge) // step) + 1
+
+        if step < SECONDS_PER_HOUR:
+            epochs, levels, flows = self._sensor_service.db.columns.range(tank_id, start, end)
+            if not len(epochs):
+                return None
+            positions, non_empty = _bucket_bounds(epochs, first_edge, step, num_buckets)
+            offsets = positions[non_empty]
+            count = np.diff(np.append(offsets, len(epochs)))
+            return (
+                first_edge + step * non_empty,
+                count,
+                np.add.reduceat(levels, offsets),
+                np.minimum.reduceat(levels, offsets),
+                np.maximum.reduceat(levels, offsets),
+                np.add.reduceat(flows, offsets),
+                np.minimum.reduceat(flows, offsets),
+                np.maximum.reduceat(flows, offsets),
+            )
+
+        rollups = self._sensor_service.db.rollups
+        if step >= SECONDS_PER_DAY:
+            period = SECONDS_PER_DAY
+            buckets = rollups.daily_buckets(tank_id, int(start // period), int(end // period))
+        else:
+            period = SECONDS_PER_HOUR
+            buckets = rollups.hourly_buckets(tank_id, int(start // period), int(end // period))
+
+        keys = []
+        rows = []
+        for key, bucket in buckets:
+            keys.append(key)
+            rows.append([bucket[field] for field in _ROLLUP_FIELDS])
+        if not keys:
+            return None
+
+        # Rollup periods divide the step, so each rollup bucket maps to one output bucket
+        bucket_starts = np.asarray(keys, dtype=np.float64) * period
+        data = np.asarray(rows, dtype=np.float64)
+        positions, non_empty = _bucket_bounds(bucket_starts, first_edge, step, num_buckets)
+        offsets = positions[non_empty]
+        return (
+            first_edge + step * non_empty,
+            np.add.reduceat(data[:, 0], offsets),
+            np.add.reduceat(data[:, 1], offsets),
+            np.minimum.reduceat(data[:, 2], offsets),
+            np.maximum.reduceat(data[:, 3], offsets),
+            np.add.reduceat(data[:, 4], offsets),
+            np.minimum.reduceat(data[:, 5], offsets),
+            np.maximum.reduceat(data[:, 6], offsets),
+        )
@@ -0,0 +1,419 @@
+"""
+Fleet Simulator - Synthetic multi-tank sensor load.
+Generates readings from a simple tank model (diurnal usage, pump refills,
+leaks, overfilling) and writes them to a store or sends them to the HTTP API.
+"""
+
+import http.client
+import itertools
+import json
+import logging
+import multiprocessing
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from ..constants import (
+    API_PREFIX,
+    COLLECTION_READINGS,
+    COLLECTION_TANKS,
+    FLOW_RATE_MAX,
+    IMPORT_CHUNK_SIZE,
+    SIM_CAPACITIES_LITERS,
+    SIM_DEVICES_PER_TANK,
+    SIM_DIURNAL_PROFILE,
+    SIM_FLOW_NOISE,
+    SIM_HTTP_TIMEOUT_SECONDS,
+    SIM_INTERVAL_SECONDS,
+    SIM_LEAK_FRACTION,
+    SIM_LEAK_LPM,
+    SIM_OVERFILL_TO_PERCENT,
+    SIM_OVERFLOW_FRACTION,
+    SIM_PEAK_FLOW_LPM,
+    SIM_RANDOM_SEED,
+    SIM_REFILL_BELOW_PERCENT,
+    SIM_REFILL_LPM,
+    SIM_REFILL_TO_PERCENT,
+    SIM_TANKS,
+)
+from ..utils.timeutils import format_epoch
+
+logger = logging.getLogger(__name__)
+
+SENSOR_NOISE_PERCENT = 0.2  # Standard deviation of a level sensor around the true level
+
+
+class FleetProfile(NamedTuple):
+    """Shape of a simulated fleet."""
+    tanks: int = SIM_TANKS
+    devices_per_tank: int = SIM_DEVICES_PER_TANK
+    interval_seconds: float = SIM_INTERVAL_SECONDS
+    peak_flow_lpm: float = SIM_PEAK_FLOW_LPM
+    diurnal_profile: Tuple[float, ...] = SIM_DIURNAL_PROFILE  # Share of peak usage per UTC hour
+    flow_noise: float = SIM_FLOW_NOISE
+    leak_fraction: float = SIM_LEAK_FRACTION
+    leak_lpm: float = SIM_LEAK_LPM
+    overflow_fraction: float = SIM_OVERFLOW_FRACTION
+    seed: int = SIM_RANDOM_SEED
+
+
+class FleetSimulator:
+    """
+    Steps a fleet of tanks through simulated time.
+
+    Each tank gets a capacity, a usage scale and a shift of up to half an
+    hour of the diurnal profile. Usage is metered outflow; the pump refills
+    a tank from SIM_REFILL_BELOW_PERCENT to SIM_REFILL_TO_PERCENT and is not
+    metered. Leaking tanks add a steady metered outflow, which stands out at
+    night; overfilling tanks have a float switch that stops the pump at
+    SIM_OVERFILL_TO_PERCENT. Every device of a tank reports the tank's level
+    (with its own sensor noise) and flow. All tanks advance together, so a
+    step costs a handful of numpy operations whatever the fleet size.
+
+    The fleet is fully determined by the profile (including its seed), so
+    separate processes can simulate the same fleet and each send a share.
+    """
+
+    def __init__(self, profile: FleetProfile = None, start: Optional[float] = None):
+        """
+        Initialize the fleet.
+
+        Args:
+            profile: Fleet shape
+            start: Epoch seconds of the first step (default: now)
+        """
+        self.profile = profile = profile or FleetProfile()
+        tanks = max(1, profile.tanks)
+        devices = max(1, profile.devices_per_tank)
+        rng = self._rng = np.random.default_rng(profile.seed)
+
+        self.tank_ids = [f"SIM-TANK-{tank:05d}" for tank in range(tanks)]
+        self.device_ids = [f"SIM-{tank:05d}-{device}" for tank in range(tanks) for device in range(devices)]
+        self.capacities = rng.choice(SIM_CAPACITIES_LITERS, tanks)
+        self.leaking = rng.random(tanks) < profile.leak_fraction
+        self.overfilling = (rng.random(tanks) < profile.overflow_fraction) & ~self.leaking
+        self._scales = rng.uniform(0.5, 1.5, tanks) * profile.peak_flow_lpm
+        self._shifts = rng.uniform(-0.5, 0.5, tanks)
+        self._diurnal = np.asarray(profile.diurnal_profile, dtype=np.float64)
+        self._stop_levels = np.where(self.overfilling, SIM_OVERFILL_TO_PERCENT, SIM_REFILL_TO_PERCENT)
+        self._levels = rng.uniform(SIM_REFILL_BELOW_PERCENT, SIM_REFILL_TO_PERCENT, tanks)
+        self._pumping = np.zeros(tanks, dtype=bool)
+        self._reading_tanks = np.repeat(np.arange(tanks), devices)  # Tank of each device
+        self.epoch = time.time() if start is None else float(start)
+
+    @property
+    def readings_per_step(self) -> int:
+        return len(self.device_ids)
+
+    def step(self) -> Tuple[float, np.ndarray, np.ndarray]:
+        """
+        Advance the fleet by one interval.
+
+        Returns:
+            (epoch of the step, level percent per tank, metered flow per tank)
+            as they were at that epoch
+        """
+        profile = self.profile
+        epoch = self.epoch
+        hours = (epoch / 3600 + self._shifts) % 24
+        hour = hours.astype(np.int64)
+        fraction = hours - hour
+        usage = (self._diurnal[hour] * (1 - fraction) + self._diurnal[(hour + 1) % 24] * fraction) * self._scales
+        usage *= np.maximum(0.0, 1 + profile.flow_noise * self._rng.standard_normal(len(usage)))
+        flows = usage + np.where(self.leaking, profile.leak_lpm, 0.0)
+        levels = self._levels
+
+        # The pump starts below the refill level and runs until the stop level
+        self._pumping |= levels < SIM_REFILL_BELOW_PERCENT
+        self._pumping &= levels < self._stop_levels
+        net_lpm = np.where(self._pumping, SIM_REFILL_LPM, 0.0) - flows
+        self._levels = np.clip(levels + net_lpm * (profile.interval_seconds / 60) / self.capacities * 100, 0.0, 100.0)
+        self.epoch = epoch + profile.interval_seconds
+        return epoch, levels, flows
+
+    def documents(
+        self,
+        epoch: float,
+        levels: np.ndarray,
+        flows: np.ndarray,
+        tanks: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Build the readings every device reports for one step.
+
+        Args:
+            epoch: Step time
+            levels: Level percent per tank
+            flows: Metered flow per tank
+            tanks: Optional boolean mask of the tanks to report
+
+        Returns:
+            Reading documents in the ingest format
+        """
+        if tanks is None:
+            rows = self._reading_tanks
+            devices = self.device_ids
+        else:
+            positions = np.flatnonzero(tanks[self._reading_tanks])
+            rows = self._reading_tanks[positions]
+            devices = [self.device_ids[position] for position in positions.tolist()]
+        noise = self._rng.standard_normal(len(rows)) * SENSOR_NOISE_PERCENT
+        reported_levels = np.clip(levels[rows] + noise, 0.0, 100.0).round(2).tolist()
+        reported_flows = np.clip(flows[rows], 0.0, FLOW_RATE_MAX).round(2).tolist()
+        timestamp = format_epoch(epoch)
+        tank_ids = self.tank_ids
+        return [
+            {
+                "device_id": devices[i],
+                "tank_id": tank_ids[tank],
+                "water_level_percent": reported_levels[i],
+                "flow_rate_lpm": reported_flows[i],
+                "timestamp": timestamp,
+            }
+            for i, tank in enumerate(rows.tolist())
+        ]
+
+    def readings(self, steps: int, tanks: Optional[np.ndarray] = None) -> Iterator[Tuple[float, List[Dict[str, Any]]]]:
+        """Yield (epoch, readings) for the next steps."""
+        for _ in range(steps):
+            epoch, levels, flows = self.step()
+            yield epoch, self.documents(epoch, levels, flows, tanks)
+
+    def tank_documents(self, tanks: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Capacity metadata of the (selected) tanks."""
+        selected = range(len(self.tank_ids)) if tanks is None else np.flatnonzero(tanks).tolist()
+        return [
+            {"tank_id": self.tank_ids[tank], "capacity_liters": float(self.capacities[tank])}
+            for tank in selected
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        """Fleet composition, for reports."""
+        return {
+            "tanks": len(self.tank_ids),
+            "devices": len(self.device_ids),
+            "interval_seconds": self.profile.interval_seconds,
+            "leaking_tanks": [self.tank_ids[tank] for tank in np.flatnonzero(self.leaking)],
+            "overfilling_tanks": [self.tank_ids[tank] for tank in np.flatnonzero(self.overfilling)],
+        }
+
+
+def write_fleet(
+    db,
+    simulator: FleetSimulator,
+    steps: int,
+    alert_service=None,
+    batch_size: int = IMPORT_CHUNK_SIZE,
+    progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Write simulated readings straight into a database.
+
+    Readings go through add_many() in batches (with their epochs, so nothing
+    is parsed), the same path as the bulk importer.
+
+    Args:
+        db: Database to write into
+        simulator: Fleet to step
+        steps: Number of intervals to simulate
+        alert_service: If given, readings are also run through the alert rules
+        batch_size: Readings per add_many() call
+        progress: Called with the running stats after every batch
+
+    Returns:
+        Write statistics, including throughput
+    """
+    stats: Dict[str, Any] = {
+        **simulator.summary(),
+        "steps": 0,
+        "readings_written": 0,
+        "alerts_raised": 0,
+        "seconds": 0.0,
+        "rows_per_second": 0.0,
+    }
+    started = time.perf_counter()
+    updated_at = format_epoch(time.time())
+    for tank in simulator.tank_documents():
+        db.set(COLLECTION_TANKS, tank["tank_id"], {**tank, "updated_at": updated_at})
+
+    batch: List[Dict[str, Any]] = []
+    epochs: List[float] = []
+
+    def flush():
+        db.add_many(COLLECTION_READINGS, batch, np.asarray(epochs))
+        if alert_service is not None:
+            results = alert_service.analyze_batch(batch)
+            stats["alerts_raised"] += sum(len(result["alerts"]) for result in results)
+        stats["readings_written"] += len(batch)
+        elapsed = time.perf_counter() - started
+        stats["seconds"] = round(elapsed, 3)
+        stats["rows_per_second"] = round(stats["readings_written"] / elapsed, 1) if elapsed > 0 else 0.0
+        if progress is not None:
+            progress(dict(stats))
+        batch.clear()
+        epochs.clear()
+
+    for epoch, documents in simulator.readings(steps):
+        batch.extend(documents)
+        epochs.extend([epoch] * len(documents))
+        stats["steps"] += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    logger.info(
+        "Simulation complete",
+        extra={"fields": {
+            "readings": stats["readings_written"],
+            "tanks": stats["tanks"],
+            "rows_per_second": stats["rows_per_second"],
+        }},
+    )
+    return stats
+
+
+def drive_http(
+    base_url: str,
+    profile: FleetProfile,
+    rate: float,
+    duration_seconds: float,
+    workers: int = 0,
+    start: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Send simulated readings to a running API at a target rate.
+
+    Every worker process simulates the whole fleet (it is deterministic) and
+    sends the readings of every workers-th tank, pacing itself to its share
+    of the rate on an open-loop schedule: a slow response delays later
+    requests, which are then sent back to back and counted as behind
+    schedule, rather than silently lowering the offered load. Tank
+    capacities are registered first.
+
+    Args:
+        base_url: API root, e.g. http://localhost:5000
+        profile: Fleet shape
+        rate: Target requests per second over all workers (0 = as fast as possible)
+        duration_seconds: How long to send
+        workers: Sender processes (0 sends from this process)
+        start: Epoch of the first simulated step (default: now)
+
+    Returns:
+        Request counts, achieved rate and latency percentiles
+    """
+    start = time.time() if start is None else start
+    processes = max(1, workers)
+    tasks = [
+        (base_url, profile, start, worker, processes, rate / processes, duration_seconds)
+        for worker in range(processes)
+    ]
+    if not workers:
+        results = [_http_worker(tasks[0])]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(_http_worker, tasks)
+
+    latencies = np.concatenate([result["latencies"] for result in results])
+    statuses: Counter = Counter()
+    for result in results:
+        statuses.update(result["statuses"])
+    seconds = max(result["seconds"] for result in results)
+    sent = int(len(latencies))
+    stats = {
+        "workers": processes,
+        "target_rate": rate,
+        "sent": sent,
+        "ok": sum(count for status, count in statuses.items() if 200 <= status < 300),
+        "errors": sum(count for status, count in statuses.items() if not 200 <= status < 300),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "behind_schedule": sum(result["behind_schedule"] for result in results),
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(sent / seconds, 1) if seconds > 0 else 0.0,
+    }
+    if sent:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        stats["latency_ms"] = {
+            "p50": round(p50, 3),
+            "p95": round(p95, 3),
+            "p99": round(p99, 3),
+            "max": round(float(latencies.max()) * 1000, 3),
+        }
+    return stats
+
+
+def _http_worker(task: Tuple) -> Dict[str, Any]:
+    """Send one worker's share of the fleet (runs in a worker process)."""
+    base_url, profile, start, worker, workers, rate, duration_seconds = task
+    simulator = FleetSimulator(profile, start)
+    mine = np.arange(len(simulator.tank_ids)) % workers == worker
+    client = _ApiClient(base_url)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    behind = 0
+    period = 1 / rate if rate > 0 else 0.0
+    documents = itertools.chain.from_iterable(
+        simulator.documents(*simulator.step(), mine) for _ in itertools.count()
+    )
+
+    try:
+        for tank in simulator.tank_documents(mine):
+            client.request("PUT", f"/tanks/{tank['tank_id']}", {"capacity_liters": tank["capacity_liters"]})
+        started = time.perf_counter()
+        deadline = started + duration_seconds
+        if mine.any():
+            for document in documents:
+                due = started + len(latencies) * period
+                now = time.perf_counter()
+                if due >= deadline or now >= deadline:
+                    break
+                if now < due:
+                    time.sleep(due - now)
+                elif now - due > period > 0:
+                    behind += 1
+                sent_at = time.perf_counter()
+                statuses[client.request("POST", "/sensors/ingest", document)] += 1
+                latencies.append(time.perf_counter() - sent_at)
+        seconds = time.perf_counter() - started
+    finally:
+        client.close()
+
+    return {
+        "latencies": np.asarray(latencies),
+        "statuses": dict(statuses),
+        "behind_schedule": behind,
+        "seconds": seconds,
+    }
+
+
+class _ApiClient:
+    """Keep-alive JSON client for one API host (status 0 = connection error)."""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._connect = lambda: connection_class(parts.netloc, timeout=SIM_HTTP_TIMEOUT_SECONDS)
+        self._prefix = parts.path.rstrip("/") + API_PREFIX
+        self._connection = self._connect()
+
+    def request(self, method: str, path: str, body: Dict[str, Any]) -> int:
+        try:
+            self._connection.request(
+                method,
+                self._prefix + path,
+                body=json.dumps(body),
+                headers={"Content-Type": "application/json"},
+            )
+            response = self._connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self._connection.close()
+            self._connection = self._connect()
+            return 0
+
+    def close(self) -> None:
+        self._connection.close()
@@ -0,0 +1,94 @@
+"""
+Store Metrics - Gauges and counters describing the data stores.
+Collected when /metrics is scraped; nothing is recorded on the write path.
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+from ..constants import COLLECTION_READINGS, METRICS_PREFIX
+from ..middleware.metrics import MetricFamily
+
+# Returns (hits, misses) of a cache
+CacheStats = Callable[[], Tuple[int, int]]
+
+
+class StoreMetrics:
+    """
+    Collector for store sizes, write counters, queue depth and cache ratios.
+
+    Ingest rate is exported as a counter of written documents; take its
+    rate() in Prometheus rather than averaging in the process.
+    """
+
+    def __init__(self, db, alert_service=None, persistence=None, caches: Dict[str, CacheStats] = None):
+        """
+        Initialize the collector.
+
+        Args:
+            db: Database whose collections are measured
+            alert_service: Optional alert service whose alert store is measured
+            persistence: Optional persistence extension whose log queue is measured
+            caches: Cache name -> callable returning its (hits, misses)
+        """
+        self._db = db
+        self._alert_service = alert_service
+        self._persistence = persistence
+        self._caches = caches or {}
+
+    def collect(self) -> List[MetricFamily]:
+        """Read every gauge and counter (called at scrape time)."""
+        db = self._db
+        families = [
+            MetricFamily(
+                f"{METRICS_PREFIX}_documents_written_total",
+                "counter",
+                "Documents written per collection (rate() of sensor_readings is the ingest rate).",
+                [("", {"collection": name}, count) for name, count in sorted(db.next_ids().items())],
+            ),
+            MetricFamily(
+                f"{METRICS_PREFIX}_store_documents",
+                "gauge",
+                "Documents held in memory per collection.",
+                [("", {"collection": name}, count) for name, count in sorted(db.collection_sizes().items())],
+            ),
+        ]
+
+        segments = db.segments
+        if segments is not None:
+            families.append(MetricFamily(
+                f"{METRICS_PREFIX}_store_sealed_documents",
+                "gauge",
+                "Readings held in memory-mapped day segments.",
+                [("", {"collection": COLLECTION_READINGS}, segments.row_count())],
+            ))
+
+        if self._alert_service is not None:
+            families.append(MetricFamily(
+                f"{METRICS_PREFIX}_alerts",
+                "gauge",
+                "Stored alerts by state.",
+                [("", {"state": state}, count) for state, count in self._alert_service.alert_counts().items()],
+            ))
+
+        if self._persistence is not None:
+            families.append(MetricFamily(
+                f"{METRICS_PREFIX}_wal_queue_depth",
+                "gauge",
+                "Journal records waiting for the write-ahead log writer.",
+                [("", {}, self._persistence.queue_depth)],
+            ))
+
+        if self._caches:
+            hits, misses, ratios = [], [], []
+            for name, stats in sorted(self._caches.items()):
+                hit_count, miss_count = stats()
+                lookups = hit_count + miss_count
+                hits.append(("", {"cache": name}, hit_count))
+                misses.append(("", {"cache": name}, miss_count))
+                ratios.append(("", {"cache": name}, hit_count / lookups if lookups else 0.0))
+            families.extend([
+                MetricFamily(f"{METRICS_PREFIX}_cache_hits_total", "counter", "Cache lookups served from the cache.", hits),
+                MetricFamily(f"{METRICS_PREFIX}_cache_misses_total", "counter", "Cache lookups that missed.", misses),
+                MetricFamily(f"{METRICS_PREFIX}_cache_hit_ratio", "gauge", "Share of cache lookups that hit.", ratios),
+            ])
+        return families
@@ -0,0 +1,8 @@
+"""Storage module - in-memory indexes and aggregates behind the database."""
+
+from .rollups import RollupStore, hour_of_week
+from .column_store import ColumnStore
+from .segments import SegmentStore
+from .wal import WriteAheadLog
+
+__all__ = ["RollupStore", "ColumnStore", "SegmentStore", "WriteAheadLog", "hour_of_week"]
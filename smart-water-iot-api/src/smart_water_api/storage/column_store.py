@@ -0,0 +1,292 @@
+"""
+Column Store - Per-tank time-ordered reading columns.
+Keeps timestamps, levels and flows in NumPy arrays for range queries.
+"""
+
+import threading
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+from ..constants import SECONDS_PER_DAY
+
+_INITIAL_CAPACITY = 256
+
+Columns = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+class TankColumns:
+    """
+    Growable (epoch, level, flow) columns for one tank.
+
+    Live rows are [head, end). Appends are amortized O(1). Out-of-order
+    appends only clear the sorted flag; the columns are re-sorted once, on
+    the next range query. Expiring old rows just advances head; the space
+    is reclaimed when the arrays next need room.
+    """
+
+    __slots__ = ("epochs", "levels", "flows", "head", "end", "is_sorted")
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        self.epochs = np.empty(capacity, dtype=np.float64)
+        self.levels = np.empty(capacity, dtype=np.float64)
+        self.flows = np.empty(capacity, dtype=np.float64)
+        self.head = 0
+        self.end = 0
+        self.is_sorted = True
+
+    @property
+    def size(self) -> int:
+        """Number of live readings."""
+        return self.end - self.head
+
+    def append(self, epoch: float, level: float, flow: float) -> None:
+        """Append one reading."""
+        end = self.end
+        if end == self.epochs.shape[0]:
+            self._make_room()
+            end = self.end
+        if end > self.head and epoch < self.epochs[end - 1]:
+            self.is_sorted = False
+        self.epochs[end] = epoch
+        self.levels[end] = level
+        self.flows[end] = flow
+        self.end = end + 1
+
+    def extend(self, epochs: np.ndarray, levels: np.ndarray, flows: np.ndarray) -> None:
+        """Append many readings with array copies."""
+        count = len(epochs)
+        while self.end + count > self.epochs.shape[0]:
+            self._make_room(self.size + count)
+        end = self.end
+        if (end > self.head and epochs[0] < self.epochs[end - 1]) or np.any(np.diff(epochs) < 0):
+            self.is_sorted = False
+        self.epochs[end:end + count] = epochs
+        self.levels[end:end + count] = levels
+        self.flows[end:end + count] = flows
+        self.end = end + count
+
+    def range(self, start: float, end: float) -> Columns:
+        """
+        Readings with start <= epoch <= end, in time order.
+
+        Returns:
+            (epochs, levels, flows) views - valid until the next write
+        """
+        self._ensure_sorted()
+        epochs = self.epochs[self.head:self.end]
+        lo = self.head + int(np.searchsorted(epochs, start, side="left"))
+        hi = self.head + int(np.searchsorted(epochs, end, side="right"))
+        return self.epochs[lo:hi], self.levels[lo:hi], self.flows[lo:hi]
+
+    def count_between(self, start: float, end: float) -> int:
+        """Number of readings with start <= epoch <= end."""
+        return len(self.range(start, end)[0])
+
+    def drop_before(self, cutoff: float) -> int:
+        """
+        Expire readings older than cutoff.
+
+        Returns:
+            Number of readings dropped
+        """
+        self._ensure_sorted()
+        dropped = int(np.searchsorted(self.epochs[self.head:self.end], cutoff, side="left"))
+        self.head += dropped
+        return dropped
+
+    def expire_before(self, cutoff: float, limit: int) -> Tuple[int, bool]:
+        """
+        Expire up to limit readings older than cutoff, without sorting.
+
+        Sorted columns are cut with a binary search. Unsorted ones only
+        lose their expired prefix, examined limit rows at a time; late rows
+        behind it expire once a range query has re-sorted the columns.
+
+        Returns:
+            (readings dropped, whether nothing more can be dropped now)
+        """
+        if self.is_sorted:
+            expired = int(np.searchsorted(self.epochs[self.head:self.end], cutoff, side="left"))
+            dropped = min(expired, limit)
+            self.head += dropped
+            return dropped, dropped == expired
+        window = self.epochs[self.head:min(self.end, self.head + limit)]
+        below = window < cutoff
+        dropped = len(window) if below.all() else int(np.argmin(below))
+        self.head += dropped
+        return dropped, dropped < limit or self.head == self.end
+
+    def _ensure_sorted(self) -> None:
+        if self.is_sorted:
+            return
+        live = slice(self.head, self.end)
+        order = np.argsort(self.epochs[live], kind="stable")
+        self.epochs[live] = self.epochs[live][order]
+        self.levels[live] = self.levels[live][order]
+        self.flows[live] = self.flows[live][order]
+        self.is_sorted = True
+
+    def _make_room(self, needed: int = 0) -> None:
+        """Reclaim expired rows, growing the arrays when mostly live."""
+        size = self.size
+        capacity = self.epochs.shape[0]
+        if size > capacity // 2 or needed > capacity:
+            capacity = max(capacity * 2, needed)
+        for name in ("epochs", "levels", "flows"):
+            column = getattr(self, name)
+            moved = np.empty(capacity, dtype=column.dtype)
+            moved[:size] = column[self.head:self.end]
+            setattr(self, name, moved)
+        self.head, self.end = 0, size
+
+
+class ColumnStore:
+    """
+    Readings indexed as per-tank columns.
+
+    Complements the document store: documents keep the full payload while
+    the columns answer time-range queries (charts, exports, aggregates)
+    with binary search and array slicing instead of scanning dictionaries.
+
+    With a segment store attached, days that have been sealed to disk are
+    read from memory-mapped segments and only newer rows stay in the heap.
+    """
+
+    def __init__(self, segments=None):
+        self._lock = threading.Lock()
+        self._tanks: Dict[str, TankColumns] = {}
+        self.segments = segments
+        # Days below this are read from segments; set together with the heap drop
+        self.sealed_before = segments.sealed_before if segments is not None else 0
+
+    def add(self, tank_id: str, epoch: float, level: float, flow: float) -> None:
+        """
+        Append a reading to its tank's columns.
+
+        Args:
+            tank_id: Tank identifier
+            epoch: Event time in epoch seconds
+            level: Water level percent
+            flow: Flow rate in L/min
+        """
+        with self._lock:
+            columns = self._tanks.get(tank_id)
+            if columns is None:
+                columns = self._tanks[tank_id] = TankColumns()
+            columns.append(epoch, level, flow)
+
+    def add_many(self, tank_id: str, epochs: np.ndarray, levels: np.ndarray, flows: np.ndarray) -> None:
+        """
+        Append many readings of one tank at once.
+
+        Args:
+            tank_id: Tank identifier
+            epochs: Event times in epoch seconds
+            levels: Water levels percent
+            flows: Flow rates in L/min
+        """
+        count = len(epochs)
+        if not count:
+            return
+        with self._lock:
+            columns = self._tanks.get(tank_id)
+            if columns is None:
+                columns = self._tanks[tank_id] = TankColumns(max(_INITIAL_CAPACITY, count))
+            columns.extend(epochs, levels, flows)
+
+    def range(self, tank_id: str, start: float, end: float) -> Columns:
+        """
+        Get a tank's readings within [start, end] as copied arrays.
+
+        Returns:
+            (epochs, levels, flows) in time order; empty arrays for unknown tanks
+        """
+        parts = list(self.iter_range(tank_id, start, end))
+        if not parts:
+            empty = np.empty(0, dtype=np.float64)
+            return empty, empty, empty
+        if len(parts) == 1:
+            return tuple(np.array(column) for column in parts[0])
+        epochs, levels, flows = (np.concatenate(columns) for columns in zip(*parts))
+        if np.any(np.diff(epochs) < 0):
+            # Late readings for sealed days wait in memory until the next seal
+            order = np.argsort(epochs, kind="stable")
+            epochs, levels, flows = epochs[order], levels[order], flows[order]
+        return epochs, levels, flows
+
+    def iter_range(self, tank_id: str, start: float, end: float) -> Iterator[Columns]:
+        """
+        Yield a tank's readings within [start, end] chunk by chunk.
+
+        Sealed days come first as zero-copy views of the mapped segments,
+        followed by a copy of the rows still held in memory. Aggregations
+        that can work chunk-wise never materialize the whole range.
+        """
+        with self._lock:
+            # Capture the heap rows and the sealed boundary as one consistent pair
+            sealed_before = self.sealed_before
+            columns = self._tanks.get(tank_id)
+            chunk = None
+            if columns is not None:
+                epochs, levels, flows = columns.range(start, end)
+                chunk = epochs.copy(), levels.copy(), flows.copy()
+        if self.segments is not None:
+            yield from self.segments.iter_range(tank_id, start, end, sealed_before)
+        if chunk is not None and len(chunk[0]):
+            yield chunk
+
+    def count_between(self, tank_id: str, start: float, end: float) -> int:
+        """Number of a tank's readings within [start, end]."""
+        return sum(len(epochs) for epochs, _, _ in self.iter_range(tank_id, start, end))
+
+    def drop_before(self, tank_id: str, cutoff: float, limit: int) -> Tuple[int, bool]:
+        """
+        Expire a tank's readings older than cutoff, at most limit per call.
+
+        Each call holds the lock for O(limit) work at most; columns are
+        never re-sorted here (see TankColumns.expire_before).
+
+        Returns:
+            (readings dropped, whether the tank is fully compacted)
+        """
+        with self._lock:
+            columns = self._tanks.get(tank_id)
+            if columns is None:
+                return 0, True
+            dropped, done = columns.expire_before(cutoff, limit)
+            if not columns.size:
+                del self._tanks[tank_id]
+            return dropped, done
+
+    def seal(self, tank_ids: Iterable[str], sealed_before: int) -> int:
+        """
+        Switch days below sealed_before from memory to the segments.
+
+        Rows older than the boundary are dropped from the heap in the same
+        critical section that moves the boundary, so readers never see a
+        sealed reading twice or not at all.
+
+        Returns:
+            Number of rows released from memory
+        """
+        cutoff = sealed_before * SECONDS_PER_DAY
+        released = 0
+        with self._lock:
+            for tank_id in tank_ids:
+                columns = self._tanks.get(tank_id)
+                if columns is None:
+                    continue
+                released += columns.drop_before(cutoff)
+                if not columns.size:
+                    del self._tanks[tank_id]
+            self.sealed_before = max(self.sealed_before, sealed_before)
+        return released
+
+    @property
+    def tank_ids(self) -> List[str]:
+        """Tanks with stored readings."""
+        return list(self._tanks)
+
+    def __len__(self) -> int:
+        return sum(columns.size for columns in self._tanks.values())
@@ -0,0 +1,325 @@
+"""
+Rollup Store - Incrementally maintained per-tank aggregates.
+Keeps hourly and daily buckets plus hour-of-week consumption profiles.
+"""
+
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..constants import (
+    SECONDS_PER_HOUR,
+    SECONDS_PER_DAY,
+    HOURS_PER_WEEK,
+    PROFILE_MAX_GAP_SECONDS,
+)
+
+# Bucket layout: one mutable list per (tank, period)
+B_COUNT = 0
+B_LEVEL_SUM = 1
+B_LEVEL_MIN = 2
+B_LEVEL_MAX = 3
+B_FLOW_SUM = 4
+B_FLOW_MIN = 5
+B_FLOW_MAX = 6
+B_LEVEL_OPEN = 7
+B_LEVEL_CLOSE = 8
+B_FIRST_EPOCH = 9
+B_LAST_EPOCH = 10
+
+# Profile layout: (tanks, HOURS_PER_WEEK, 4)
+P_FLOW_SUM = 0
+P_FLOW_COUNT = 1
+P_LEVEL_RATE_SUM = 2  # Sum of level change rates (% per hour)
+P_LEVEL_RATE_COUNT = 3
+
+# Latest reading layout: (tanks, 3)
+L_EPOCH = 0
+L_LEVEL = 1
+L_FLOW = 2
+
+# 1970-01-01 was a Thursday; shift so hour-of-week 0 is Monday 00:00 UTC
+_HOUR_OF_WEEK_OFFSET = 72
+
+_INITIAL_TANK_ROWS = 16
+
+
+def hour_of_week(epoch: float) -> int:
+    """Hour of week (0 = Monday 00:00 UTC) for epoch seconds."""
+    return (int(epoch // SECONDS_PER_HOUR) + _HOUR_OF_WEEK_OFFSET) % HOURS_PER_WEEK
+
+
+def _new_bucket(epoch: float, level: float, flow: float, open_level: float) -> list:
+    return [1, level, level, level, flow, flow, flow, open_level, level, epoch, epoch]
+
+
+def _update_bucket(bucket: list, epoch: float, level: float, flow: float) -> None:
+    bucket[B_COUNT] += 1
+    bucket[B_LEVEL_SUM] += level
+    bucket[B_FLOW_SUM] += flow
+    if level < bucket[B_LEVEL_MIN]:
+        bucket[B_LEVEL_MIN] = level
+    elif level > bucket[B_LEVEL_MAX]:
+        bucket[B_LEVEL_MAX] = level
+    if flow < bucket[B_FLOW_MIN]:
+        bucket[B_FLOW_MIN] = flow
+    elif flow > bucket[B_FLOW_MAX]:
+        bucket[B_FLOW_MAX] = flow
+    if epoch >= bucket[B_LAST_EPOCH]:
+        bucket[B_LAST_EPOCH] = epoch
+        bucket[B_LEVEL_CLOSE] = level
+    elif epoch < bucket[B_FIRST_EPOCH]:
+        bucket[B_FIRST_EPOCH] = epoch
+
+
+class RollupStore:
+    """
+    Per-tank hourly/daily aggregates maintained on every write.
+
+    Buckets are keyed by hour or day index (epoch // period). Besides the
+    buckets, every tank owns a row in fleet-wide arrays holding its latest
+    reading and its hour-of-week profile (average flow and level change
+    rate), so fleet computations work on whole arrays without gathering.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hourly: Dict[str, Dict[int, list]] = {}
+        self._daily: Dict[str, Dict[int, list]] = {}
+        # Lowest bucket key that may still exist, per (buckets dict id, tank)
+        self._floors: Dict[Tuple[str, str], int] = {}
+        self._tank_index: Dict[str, int] = {}
+        self._tank_ids: List[str] = []
+        self._profiles = np.zeros((_INITIAL_TANK_ROWS, HOURS_PER_WEEK, 4), dtype=np.float64)
+        self._latest = np.full((_INITIAL_TANK_ROWS, 3), np.nan, dtype=np.float64)
+        self.version = 0
+
+    def add(self, tank_id: str, epoch: float, level: float, flow: float) -> None:
+        """
+        Fold one reading into the tank's buckets and profile.
+
+        Args:
+            tank_id: Tank identifier
+            epoch: Event time in epoch seconds
+            level: Water level percent
+            flow: Flow rate in L/min
+        """
+        with self._lock:
+            self._add_locked(tank_id, epoch, level, flow)
+
+    def add_many(self, tank_id: str, epochs: np.ndarray, levels: np.ndarray, flows: np.ndarray) -> None:
+        """
+        Fold many readings of one tank, in order, under a single lock hold.
+
+        Args:
+            tank_id: Tank identifier
+            epochs: Event times in epoch seconds
+            levels: Water levels percent
+            flows: Flow rates in L/min
+        """
+        with self._lock:
+            for epoch, level, flow in zip(epochs.tolist(), levels.tolist(), flows.tolist()):
+                self._add_locked(tank_id, epoch, level, flow)
+
+    def _add_locked(self, tank_id: str, epoch: float, level: float, flow: float) -> None:
+        """Fold one reading (caller holds the lock)."""
+        row = self._tank_index.get(tank_id)
+        if row is None:
+            row = self._register_tank(tank_id)
+
+        latest = self._latest[row]
+        last_epoch = float(latest[L_EPOCH])
+        last_level = float(latest[L_LEVEL])
+        has_previous = not np.isnan(last_epoch)
+        in_order = not has_previous or epoch >= last_epoch
+        # A bucket opens at the level carried over from the previous reading
+        open_level = last_level if has_previous and in_order else level
+
+        hour = int(epoch // SECONDS_PER_HOUR)
+        hourly = self._hourly[tank_id]
+        bucket = hourly.get(hour)
+        if bucket is None:
+            hourly[hour] = _new_bucket(epoch, level, flow, open_level)
+            self._lower_floor("hourly", tank_id, hour)
+        else:
+            _update_bucket(bucket, epoch, level, flow)
+
+        day = int(epoch // SECONDS_PER_DAY)
+        daily = self._daily[tank_id]
+        bucket = daily.get(day)
+        if bucket is None:
+            daily[day] = _new_bucket(epoch, level, flow, open_level)
+            self._lower_floor("daily", tank_id, day)
+        else:
+            _update_bucket(bucket, epoch, level, flow)
+
+        profile = self._profiles[row, (hour + _HOUR_OF_WEEK_OFFSET) % HOURS_PER_WEEK]
+        profile[P_FLOW_SUM] += flow
+        profile[P_FLOW_COUNT] += 1
+
+        if in_order:
+            gap = epoch - last_epoch if has_previous else 0
+            if 0 < gap <= PROFILE_MAX_GAP_SECONDS:
+                profile[P_LEVEL_RATE_SUM] += (level - last_level) * SECONDS_PER_HOUR / gap
+                profile[P_LEVEL_RATE_COUNT] += 1
+            latest[L_EPOCH] = epoch
+            latest[L_LEVEL] = level
+            latest[L_FLOW] = flow
+
+        self.version += 1
+
+    def _lower_floor(self, name: str, tank_id: str, key: int) -> None:
+        """Make sure a late bucket below the compaction floor stays reachable."""
+        floor = self._floors.get((name, tank_id))
+        if floor is not None and key < floor:
+            self._floors[(name, tank_id)] = key
+
+    def _register_tank(self, tank_id: str) -> int:
+        """Allocate a row for a new tank, growing the arrays if needed."""
+        row = len(self._tank_ids)
+        if row == self._profiles.shape[0]:
+            grown = row * 2
+            profiles = np.zeros((grown, HOURS_PER_WEEK, 4), dtype=np.float64)
+            profiles[:row] = self._profiles
+            latest = np.full((grown, 3), np.nan, dtype=np.float64)
+            latest[:row] = self._latest
+            self._profiles, self._latest = profiles, latest
+        self._tank_index[tank_id] = row
+        self._tank_ids.append(tank_id)
+        self._hourly[tank_id] = {}
+        self._daily[tank_id] = {}
+        return row
+
+    @property
+    def tank_ids(self) -> List[str]:
+        """Tanks in row order."""
+        return list(self._tank_ids)
+
+    def tank_row(self, tank_id: str) -> Optional[int]:
+        """Row of a tank in the fleet arrays, or None if unknown."""
+        return self._tank_index.get(tank_id)
+
+    def fleet_arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        Snapshot fleet-wide arrays for vectorized computations.
+
+        Returns:
+            (tank ids, profiles (n, 168, 4), latest (n, 3)) - arrays are copies
+        """
+        with self._lock:
+            count = len(self._tank_ids)
+            return (
+                list(self._tank_ids),
+                self._profiles[:count].copy(),
+                self._latest[:count].copy(),
+            )
+
+    def hourly_buckets(self, tank_id: str, start_hour: int, end_hour: int) -> Iterator[Tuple[int, list]]:
+        """Yield (hour index, bucket) for a tank within [start_hour, end_hour]."""
+        return _range_buckets(self._hourly.get(tank_id, {}), start_hour, end_hour)
+
+    def daily_buckets(self, tank_id: str, start_day: int, end_day: int) -> Iterator[Tuple[int, list]]:
+        """Yield (day index, bucket) for a tank within [start_day, end_day]."""
+        return _range_buckets(self._daily.get(tank_id, {}), start_day, end_day)
+
+    def export_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Snapshot all rollup state as flat arrays.
+
+        Returns:
+            Arrays for tank ids, hourly/daily bucket keys and values, profiles and latest readings
+        """
+        with self._lock:
+            arrays = {
+                "tank_ids": np.array(self._tank_ids, dtype=str),
+                "profiles": self._profiles[:len(self._tank_ids)].copy(),
+                "latest": self._latest[:len(self._tank_ids)].copy(),
+                "version": np.array(self.version, dtype=np.int64),
+            }
+            for name, store in (("hourly", self._hourly), ("daily", self._daily)):
+                rows, keys, values = [], [], []
+                for tank_id in self._tank_ids:
+                    row = self._tank_index[tank_id]
+                    for key, bucket in store[tank_id].items():
+                        rows.append(row)
+                        keys.append(key)
+                        values.append(bucket)
+                arrays[f"{name}_rows"] = np.array(rows, dtype=np.int32)
+                arrays[f"{name}_keys"] = np.array(keys, dtype=np.int64)
+                arrays[f"{name}_values"] = np.array(values, dtype=np.float64).reshape(-1, B_LAST_EPOCH + 1)
+            return arrays
+
+    def load_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """Replace all rollup state with export_arrays() output."""
+        with self._lock:
+            tank_ids = [str(t) for t in arrays["tank_ids"]]
+            self._tank_ids = tank_ids
+            self._tank_index = {tank_id: row for row, tank_id in enumerate(tank_ids)}
+            self._floors = {}
+            rows = max(_INITIAL_TANK_ROWS, len(tank_ids))
+            self._profiles = np.zeros((rows, HOURS_PER_WEEK, 4), dtype=np.float64)
+            self._profiles[:len(tank_ids)] = arrays["profiles"]
+            self._latest = np.full((rows, 3), np.nan, dtype=np.float64)
+            self._latest[:len(tank_ids)] = arrays["latest"]
+            self.version = int(arrays["version"])
+            for name in ("hourly", "daily"):
+                store = {tank_id: {} for tank_id in tank_ids}
+                values = arrays[f"{name}_values"].tolist()
+                for row, key, bucket in zip(arrays[f"{name}_rows"].tolist(), arrays[f"{name}_keys"].tolist(), values):
+                    bucket[B_COUNT] = int(bucket[B_COUNT])
+                    store[tank_ids[row]][key] = bucket
+                setattr(self, f"_{name}", store)
+
+    def drop_hourly_before(self, tank_id: str, hour: int, limit: int) -> Tuple[int, bool]:
+        """
+        Expire a tank's hourly buckets older than an hour index.
+
+        Args:
+            tank_id: Tank identifier
+            hour: First hour index to keep
+            limit: Maximum number of hour keys to examine in this call
+
+        Returns:
+            (buckets dropped, whether the tank is fully compacted)
+        """
+        return self._drop_before("hourly", self._hourly, tank_id, hour, limit)
+
+    def drop_daily_before(self, tank_id: str, day: int, limit: int) -> Tuple[int, bool]:
+        """Expire a tank's daily buckets older than a day index (see drop_hourly_before)."""
+        return self._drop_before("daily", self._daily, tank_id, day, limit)
+
+    def _drop_before(
+        self, name: str, store: Dict[str, Dict[int, list]], tank_id: str, key: int, limit: int
+    ) -> Tuple[int, bool]:
+        with self._lock:
+            buckets = store.get(tank_id)
+            if not buckets:
+                return 0, True
+            floor = self._floors.get((name, tank_id))
+            if floor is None:
+                floor = min(buckets)
+            # Walk keys upwards from the floor; cost is bounded by limit
+            stop = min(key, floor + limit)
+            dropped = 0
+            for old in range(floor, stop):
+                if buckets.pop(old, None) is not None:
+                    dropped += 1
+            self._floors[(name, tank_id)] = max(floor, stop)
+            return dropped, stop >= key
+
+    def bucket_count(self) -> int:
+        """Total number of hourly and daily buckets held."""
+        return sum(len(b) for b in self._hourly.values()) + sum(len(b) for b in self._daily.values())
+
+
+def _range_buckets(buckets: Dict[int, list], start: int, end: int) -> Iterator[Tuple[int, list]]:
+    """Iterate buckets in key order, probing keys or scanning, whichever is cheaper."""
+    if end - start + 1 <= len(buckets):
+        for key in range(start, end + 1):
+            bucket = buckets.get(key)
+            if bucket is not None:
+                yield key, bucket
+    else:
+        for key in sorted(k for k in buckets if start <= k <= end):
+            yield key, buckets[key]
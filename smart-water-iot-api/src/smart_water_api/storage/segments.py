@@ -0,0 +1,401 @@
+"""
+Segment Store - Sealed per-day reading columns on disk, read through mmap.
+Keeps history out of the Python heap; queries slice memory-mapped arrays.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Dict, Iterator, List, Set, Tuple
+
+import numpy as np
+
+from ..constants import SECONDS_PER_DAY
+from ..utils.timeutils import format_epoch
+
+logger = logging.getLogger(__name__)
+
+# Segment layout: float64 array of shape (5, rows), rows sorted by epoch.
+# Each row of the array is one contiguous column.
+S_EPOCH = 0
+S_LEVEL = 1
+S_FLOW = 2
+S_DEVICE = 3  # Index into the segment's device table
+S_DOC = 4  # Document number (doc_N), used to deduplicate on recovery
+_SEGMENT_COLUMNS = 5
+
+_MANIFEST = "manifest.json"
+_STATE = "state.json"
+_DAY_PREFIX = "day-"
+
+
+class SegmentInfo:
+    """Manifest entry of one sealed (tank, day) segment."""
+
+    __slots__ = ("path", "rows", "devices", "max_doc")
+
+    def __init__(self, path: str, rows: int, devices: List[str], max_doc: int):
+        self.path = path
+        self.rows = rows
+        self.devices = devices
+        self.max_doc = max_doc
+
+
+class SegmentStore:
+    """
+    Sealed reading history as fixed-width binary column files.
+
+    Each UTC day gets a directory holding one .npy file per tank and a
+    manifest. Files are written once (a late reading rewrites its day's file
+    under a new name) and opened with mmap, so reading a range is slicing
+    mapped arrays: nothing is copied into the heap and pages the OS evicts
+    cost nothing to keep "open". Opening the store only reads the manifests.
+
+    Days below `sealed_before` are complete; readings for newer days still
+    live in the in-memory store.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize the store (call open() to load existing segments).
+
+        Args:
+            directory: Root directory of the day directories
+        """
+        self.directory = directory
+        self.sealed_before = 0  # First day index not yet sealed
+        self.next_doc_number = 0  # Above every sealed document number
+        self._lock = threading.Lock()
+        self._segments: Dict[str, Dict[int, SegmentInfo]] = {}
+        self._maps: Dict[str, np.ndarray] = {}
+        self._id_sets: Dict[Tuple[str, int], Set[int]] = {}
+        self._dirty_days: Set[int] = set()
+        self._obsolete: List[str] = []
+
+    def open(self) -> "SegmentStore":
+        """Load the manifests of all sealed days."""
+        os.makedirs(self.directory, exist_ok=True)
+        state_path = os.path.join(self.directory, _STATE)
+        if os.path.exists(state_path):
+            with open(state_path) as handle:
+                self.sealed_before = json.load(handle)["sealed_before"]
+        for name in os.listdir(self.directory):
+            if not name.startswith(_DAY_PREFIX):
+                continue
+            day = int(name[len(_DAY_PREFIX):])
+            manifest_path = os.path.join(self.directory, name, _MANIFEST)
+            if not os.path.exists(manifest_path):
+                continue  # Day directory whose first write never completed
+            with open(manifest_path) as handle:
+                manifest = json.load(handle)
+            for tank_id, entry in manifest.items():
+                self._segments.setdefault(tank_id, {})[day] = SegmentInfo(
+                    os.path.join(self.directory, name, entry["file"]), entry["rows"], entry["devices"],
+                    entry["max_doc"],
+                )
+                self.next_doc_number = max(self.next_doc_number, entry["max_doc"] + 1)
+        logger.info(
+            "Opened sealed segments",
+            extra={"fields": {"segments": self.segment_count(), "sealed_before_day": self.sealed_before}},
+        )
+        return self
+
+    def write(
+        self,
+        tank_id: str,
+        day: int,
+        epochs: np.ndarray,
+        levels: np.ndarray,
+        flows: np.ndarray,
+        devices: List[str],
+        doc_numbers: np.ndarray,
+    ) -> int:
+        """
+        Seal readings of one tank and day, merging with an existing segment.
+
+        Readings whose document number is already sealed are skipped, so
+        re-sealing after a crash never duplicates rows.
+
+        Returns:
+            Number of rows in the segment
+        """
+        device_table: List[str] = []
+        device_codes: Dict[str, int] = {}
+        codes = np.fromiter(
+            (device_codes.setdefault(d, len(device_codes)) for d in devices), dtype=np.float64, count=len(devices)
+        )
+        data = np.empty((_SEGMENT_COLUMNS, len(epochs)), dtype=np.float64)
+        data[S_EPOCH], data[S_LEVEL], data[S_FLOW] = epochs, levels, flows
+        data[S_DEVICE], data[S_DOC] = codes, doc_numbers
+
+        with self._lock:
+            existing = self._segments.get(tank_id, {}).get(day)
+            if existing is not None:
+                old = self._map(existing)
+                old_devices = existing.devices
+                device_table = list(old_devices)
+                remap = np.array(
+                    [_index_of(device_table, d) for d in device_codes], dtype=np.float64
+                ) if device_codes else np.empty(0)
+                fresh = ~np.isin(data[S_DOC], old[S_DOC])
+                data = data[:, fresh]
+                if len(remap):
+                    data[S_DEVICE] = remap[data[S_DEVICE].astype(np.int64)]
+                data = np.concatenate([np.asarray(old), data], axis=1)
+                generation = int(os.path.basename(existing.path).rsplit(".", 2)[1]) + 1
+            else:
+                device_table = list(device_codes)
+                generation = 0
+            data = data[:, np.argsort(data[S_EPOCH], kind="stable")]
+
+            day_dir = os.path.join(self.directory, f"{_DAY_PREFIX}{day}")
+            os.makedirs(day_dir, exist_ok=True)
+            filename = f"{tank_id.encode('utf-8').hex()}.{generation}.npy"
+            path = os.path.join(day_dir, filename)
+            with open(path, "wb") as handle:
+                np.save(handle, data)
+                handle.flush()
+                os.fsync(handle.fileno())
+
+            max_doc = int(data[S_DOC].max()) if data.shape[1] else -1
+            info = SegmentInfo(path, data.shape[1], device_table, max_doc)
+            self.next_doc_number = max(self.next_doc_number, max_doc + 1)
+            self._segments.setdefault(tank_id, {})[day] = info
+            self._dirty_days.add(day)
+            if existing is not None:
+                self._maps.pop(existing.path, None)
+                self._obsolete.append(existing.path)
+            self._id_sets.pop((tank_id, day), None)
+            return info.rows
+
+    def flush(self) -> None:
+        """Write the manifests of changed days, then delete replaced files."""
+        with self._lock:
+            self._flush()
+
+    def advance(self, sealed_before: int) -> None:
+        """Record that every day below sealed_before is fully sealed."""
+        with self._lock:
+            self._flush()
+            self.sealed_before = max(self.sealed_before, sealed_before)
+            _write_json(os.path.join(self.directory, _STATE), {"sealed_before": self.sealed_before})
+
+    def iter_range(
+        self, tank_id: str, start: float, end: float, sealed_before: int = None
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Yield (epochs, levels, flows) views of sealed readings within [start, end].
+
+        Only days below sealed_before (default: the store's boundary) are
+        read. Views point into the mapped files; no data is copied.
+        """
+        start_day, end_day = self._sealed_days(start, end, sealed_before)
+        with self._lock:
+            days = self._segments.get(tank_id, {})
+            infos = [days[day] for day in sorted(days) if start_day <= day <= end_day]
+            maps = [self._map(info) for info in infos]
+        for data in maps:
+            epochs = data[S_EPOCH]
+            lo = int(np.searchsorted(epochs, start, side="left"))
+            hi = int(np.searchsorted(epochs, end, side="right"))
+            if hi > lo:
+                yield epochs[lo:hi], data[S_LEVEL, lo:hi], data[S_FLOW, lo:hi]
+
+    def iter_documents(
+        self, start: float, end: float, tank_id: str = None, sealed_before: int = None
+    ) -> Iterator[Tuple[float, Dict]]:
+        """
+        Yield rebuilt reading documents within [start, end] in time order.
+
+        Documents are built one at a time as the caller iterates, a day at
+        a time as in iter_rows(). Sealed readings carry their event time as
+        created_at, since the arrival time isn't kept.
+
+        Yields:
+            (epoch, document)
+        """
+        for epoch, tank, device, level, flow, number in self._iter_merged(start, end, tank_id, sealed_before):
+            timestamp = format_epoch(epoch)
+            yield epoch, {
+                "device_id": device,
+                "tank_id": tank,
+                "water_level_percent": level,
+                "flow_rate_lpm": flow,
+                "timestamp": timestamp,
+                "_id": f"doc_{number}",
+                "created_at": timestamp[:-1],
+            }
+
+    def iter_rows(
+        self, start: float, end: float, tank_id: str = None, sealed_before: int = None
+    ) -> Iterator[Tuple[float, str, str, str, float, float]]:
+        """
+        Yield sealed readings within [start, end] in time order.
+
+        Days are merged across tanks one at a time, so memory is bounded by
+        a single day's rows however long the range is.
+
+        Yields:
+            (epoch, timestamp, device_id, tank_id, level, flow)
+        """
+        for epoch, tank, device, level, flow, _ in self._iter_merged(start, end, tank_id, sealed_before):
+            yield epoch, format_epoch(epoch), device, tank, level, flow
+
+    def _iter_merged(
+        self, start: float, end: float, tank_id: str = None, sealed_before: int = None
+    ) -> Iterator[Tuple[float, str, str, float, float, int]]:
+        """(epoch, tank, device, level, flow, doc number) of each day's readings, merged across tanks."""
+        for parts in self._iter_days(start, end, tank_id, sealed_before):
+            tanks, devices = [], []
+            for tank, device_table, data in parts:
+                tanks.extend([tank] * data.shape[1])
+                devices.extend(device_table[code] for code in data[S_DEVICE].astype(np.int64).tolist())
+            merged = np.concatenate([data for _, _, data in parts], axis=1)
+            order = np.argsort(merged[S_EPOCH], kind="stable")
+            for index, epoch, level, flow, number in zip(
+                order.tolist(), merged[S_EPOCH, order].tolist(), merged[S_LEVEL, order].tolist(),
+                merged[S_FLOW, order].tolist(), merged[S_DOC, order].astype(np.int64).tolist(),
+            ):
+                yield epoch, tanks[index], devices[index], level, flow, number
+
+    def iter_columns(
+        self, start: float, end: float, tank_id: str = None, sealed_before: int = None
+    ) -> Iterator[Tuple[str, np.ndarray, List[str]]]:
+        """
+        Yield sealed readings within [start, end] as column views, day by day.
+
+        Nothing is copied: each item slices one mapped (tank, day) segment.
+
+        Yields:
+            (tank_id, (S_EPOCH..S_DOC, rows) view sorted by epoch, device table)
+        """
+        for parts in self._iter_days(start, end, tank_id, sealed_before):
+            for tank, devices, data in parts:
+                yield tank, data, devices
+
+    def _iter_days(
+        self, start: float, end: float, tank_id: str = None, sealed_before: int = None
+    ) -> Iterator[List[Tuple[str, List[str], np.ndarray]]]:
+        """Per sealed day in range, the non-empty (tank, device table, view) slices."""
+        start_day, end_day = self._sealed_days(start, end, sealed_before)
+        with self._lock:
+            days = sorted({
+                day
+                for tank, tank_days in self._segments.items()
+                if tank_id is None or tank == tank_id
+                for day in tank_days
+                if start_day <= day <= end_day
+            })
+        for day in days:
+            with self._lock:
+                # Looked up per day: retention may have dropped it meanwhile
+                found = [
+                    (tank, tank_days[day], self._map(tank_days[day]))
+                    for tank, tank_days in self._segments.items()
+                    if (tank_id is None or tank == tank_id) and day in tank_days
+                ]
+            parts = []
+            for tank, info, data in found:
+                epochs = data[S_EPOCH]
+                lo = int(np.searchsorted(epochs, start, side="left"))
+                hi = int(np.searchsorted(epochs, end, side="right"))
+                if hi > lo:
+                    parts.append((tank, info.devices, data[:, lo:hi]))
+            if parts:
+                yield parts
+
+    def contains(self, tank_id: str, day: int, doc_number: int) -> bool:
+        """Whether a document is already sealed (used while recovering)."""
+        key = (tank_id, day)
+        with self._lock:
+            ids = self._id_sets.get(key)
+            if ids is None:
+                info = self._segments.get(tank_id, {}).get(day)
+                ids = set() if info is None else set(self._map(info)[S_DOC].astype(np.int64).tolist())
+                self._id_sets[key] = ids
+        return doc_number in ids
+
+    def drop_before(self, day: int, limit: int) -> Tuple[int, bool]:
+        """
+        Delete whole sealed days older than a day index.
+
+        Returns:
+            (days deleted, whether no older day remains)
+        """
+        with self._lock:
+            old_days = sorted({d for days in self._segments.values() for d in days if d < day})
+            for old in old_days[:limit]:
+                for tank_id in list(self._segments):
+                    info = self._segments[tank_id].pop(old, None)
+                    if info is not None:
+                        self._maps.pop(info.path, None)
+                    if not self._segments[tank_id]:
+                        del self._segments[tank_id]
+                shutil.rmtree(os.path.join(self.directory, f"{_DAY_PREFIX}{old}"), ignore_errors=True)
+            return min(len(old_days), limit), len(old_days) <= limit
+
+    def segment_count(self) -> int:
+        """Number of sealed (tank, day) segments."""
+        return sum(len(days) for days in self._segments.values())
+
+    def row_count(self) -> int:
+        """Number of sealed readings."""
+        return sum(info.rows for days in self._segments.values() for info in days.values())
+
+    def _sealed_days(self, start: float, end: float, sealed_before: int = None) -> Tuple[int, int]:
+        """Sealed day indexes overlapping [start, end] (open-ended bounds allowed)."""
+        last = (self.sealed_before if sealed_before is None else sealed_before) - 1
+        start_day = int(start // SECONDS_PER_DAY) if start > 0 else 0
+        end_day = last if end >= last * SECONDS_PER_DAY else int(end // SECONDS_PER_DAY)
+        return start_day, end_day
+
+    def _map(self, info: SegmentInfo) -> np.ndarray:
+        """Memory-map a segment file (cached; caller holds the lock)."""
+        data = self._maps.get(info.path)
+        if data is None:
+            data = self._maps[info.path] = np.load(info.path, mmap_mode="r")
+        return data
+
+    def _flush(self) -> None:
+        for day in sorted(self._dirty_days):
+            self._write_manifest(day)
+        self._dirty_days.clear()
+        # Only now is no manifest pointing at the replaced files
+        for path in self._obsolete:
+            os.remove(path)
+        self._obsolete.clear()
+
+    def _write_manifest(self, day: int) -> None:
+        """Rewrite a day's manifest from the in-memory index (caller holds the lock)."""
+        manifest = {
+            tank_id: {
+                "file": os.path.basename(days[day].path),
+                "rows": days[day].rows,
+                "devices": days[day].devices,
+                "max_doc": days[day].max_doc,
+            }
+            for tank_id, days in self._segments.items()
+            if day in days
+        }
+        _write_json(os.path.join(self.directory, f"{_DAY_PREFIX}{day}", _MANIFEST), manifest)
+
+
+def _index_of(table: List[str], value: str) -> int:
+    """Index of value in a device table, appending it if missing."""
+    try:
+        return table.index(value)
+    except ValueError:
+        table.append(value)
+        return len(table) - 1
+
+
+def _write_json(path: str, value) -> None:
+    """Atomically replace a small JSON file."""
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as handle:
+        json.dump(value, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
@@ -0,0 +1,65 @@
+"""
+Snapshots - Point-in-time images of the store as NumPy archives.
+Written to a temporary file and renamed, so a crash never leaves a partial snapshot.
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+_METADATA_KEY = "metadata"
+
+
+def write_snapshot(path: str, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> int:
+    """
+    Atomically write arrays plus JSON metadata to path.
+
+    Args:
+        path: Snapshot file path
+        arrays: Named arrays (column data, rollups)
+        metadata: JSON-serializable state stored alongside the arrays
+
+    Returns:
+        Size of the snapshot in bytes
+    """
+    temporary = f"{path}.tmp"
+    encoded = np.frombuffer(json.dumps(metadata, separators=(",", ":")).encode("utf-8"), dtype=np.uint8)
+    with open(temporary, "wb") as handle:
+        # Uncompressed: loading is a straight copy into arrays
+        np.savez(handle, **arrays, **{_METADATA_KEY: encoded})
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temporary, path)
+    _sync_directory(os.path.dirname(path) or ".")
+    return os.path.getsize(path)
+
+
+def read_snapshot(path: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+    """
+    Load a snapshot written by write_snapshot().
+
+    Returns:
+        (arrays, metadata), or None if there is no snapshot
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as archive:
+        arrays = {name: archive[name] for name in archive.files if name != _METADATA_KEY}
+        metadata = json.loads(archive[_METADATA_KEY].tobytes().decode("utf-8"))
+    return arrays, metadata
+
+
+def _sync_directory(directory: str) -> None:
+    """Make a rename durable (not supported on every platform)."""
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
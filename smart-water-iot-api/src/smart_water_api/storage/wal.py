@@ -0,0 +1,347 @@
+"""
+Write-Ahead Log - Append-only binary log of store mutations.
+Records are CRC-checked and fsynced in batches by a single writer thread.
+"""
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..constants import COLLECTION_READINGS, WAL_COMMIT_INTERVAL_MS
+from ..errors.exceptions import FirebaseError
+
+logger = logging.getLogger(__name__)
+
+# Record types
+RECORD_READING = 1  # Reading added (binary)
+RECORD_DOCUMENT = 2  # Other document added (JSON: collection, document)
+RECORD_SET = 3  # Document set by id (JSON: collection, id, document)
+RECORD_ALERT = 4  # Alert raised (JSON alert record)
+RECORD_ACK = 5  # Alert acknowledged (alert id)
+
+# Header: payload length, CRC32 of type + payload, record type
+_HEADER = struct.Struct("<IIB")
+_READING = struct.Struct("<qdd")  # Document number, level, flow
+_STRING_LENGTH = struct.Struct("<H")
+_ACK = struct.Struct("<q")
+
+_READING_KEYS = frozenset(
+    ("_id", "device_id", "tank_id", "water_level_percent", "flow_rate_lpm", "timestamp", "created_at")
+)
+
+_SEGMENT_PREFIX = "wal-"
+_SEGMENT_SUFFIX = ".log"
+
+
+def segment_path(directory: str, number: int) -> str:
+    """Path of a numbered log segment."""
+    return os.path.join(directory, f"{_SEGMENT_PREFIX}{number:08d}{_SEGMENT_SUFFIX}")
+
+
+def list_segments(directory: str) -> List[int]:
+    """Numbers of the log segments in a directory, ascending."""
+    numbers = []
+    for name in os.listdir(directory):
+        if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+            try:
+                numbers.append(int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]))
+            except ValueError:
+                continue
+    return sorted(numbers)
+
+
+def encode_record(record_type: int, payload: bytes) -> bytes:
+    """Frame a payload with its header."""
+    crc = zlib.crc32(payload, zlib.crc32(bytes((record_type,))))
+    return _HEADER.pack(len(payload), crc, record_type) + payload
+
+
+def encode_reading(document: Dict[str, Any]) -> bytes:
+    """Binary payload of a stored reading."""
+    parts = [_READING.pack(
+        int(document["_id"][4:]),
+        document["water_level_percent"],
+        document["flow_rate_lpm"],
+    )]
+    for key in ("tank_id", "device_id", "timestamp", "created_at"):
+        value = document[key].encode("utf-8")
+        parts.append(_STRING_LENGTH.pack(len(value)))
+        parts.append(value)
+    return b"".join(parts)
+
+
+def decode_reading(payload: bytes) -> Dict[str, Any]:
+    """Rebuild a reading document from encode_reading() output."""
+    number, level, flow = _READING.unpack_from(payload)
+    offset = _READING.size
+    strings = []
+    for _ in range(4):
+        (length,) = _STRING_LENGTH.unpack_from(payload, offset)
+        offset += _STRING_LENGTH.size
+        strings.append(payload[offset:offset + length].decode("utf-8"))
+        offset += length
+    tank_id, device_id, timestamp, created_at = strings
+    return {
+        "device_id": device_id,
+        "tank_id": tank_id,
+        "water_level_percent": level,
+        "flow_rate_lpm": flow,
+        "timestamp": timestamp,
+        "_id": f"doc_{number}",
+        "created_at": created_at,
+    }
+
+
+def read_segment(path: str, repair: bool = True) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (record type, payload) from a segment, one record at a time.
+
+    Reading stops at the first torn or corrupt record - the tail of a
+    write that was cut short by a crash. With repair, the file is truncated
+    there so new records never follow garbage.
+    """
+    offset = 0
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        while offset + _HEADER.size <= size:
+            length, crc, record_type = _HEADER.unpack(handle.read(_HEADER.size))
+            start = offset + _HEADER.size
+            if start + length > size:
+                break  # Never allocate for a length the file can't hold
+            payload = handle.read(length)
+            if len(payload) < length or zlib.crc32(payload, zlib.crc32(bytes((record_type,)))) != crc:
+                break
+            yield record_type, payload
+            offset = start + length
+    if offset < size:
+        logger.warning("Discarding torn log tail", extra={"fields": {"path": path, "bytes": size - offset}})
+        if repair:
+            with open(path, "r+b") as handle:
+                handle.truncate(offset)
+
+
+def replay(directory: str, first_segment: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """Yield every intact record from first_segment onwards, in log order."""
+    for number in list_segments(directory):
+        if number >= first_segment:
+            yield from read_segment(segment_path(directory, number))
+
+
+class WriteAheadLog:
+    """
+    Append-only log with group commit.
+
+    Callers frame records and queue them; one writer thread drains the
+    queue, writes everything queued in a single call and fsyncs once for
+    the whole batch. In "group" mode callers wait until their record is
+    durable, so a burst of concurrent ingests costs one fsync instead of
+    one each; in "async" mode they return immediately and a crash may lose
+    the last commit interval of writes.
+
+    The log also implements the journal hooks of the database
+    (log_add/log_set) and the alert service (log_alerts/log_acknowledgement).
+    """
+
+    def __init__(self, directory: str, sync_mode: str = "group", commit_interval_ms: float = WAL_COMMIT_INTERVAL_MS):
+        """
+        Initialize the log (call open() before appending).
+
+        Args:
+            directory: Directory holding the log segments
+            sync_mode: 'group' (wait for fsync) or 'async'
+            commit_interval_ms: How long the writer lingers to batch records
+        """
+        self.directory = directory
+        self.sync_mode = sync_mode
+        self.commit_interval = commit_interval_ms / 1000
+        self.segment: Optional[int] = None
+        self._file = None
+        self._pending: List[bytes] = []
+        self._appended = 0  # Sequence number of the last queued record
+        self._durable = 0  # Sequence number of the last fsynced record
+        self._error: Optional[Exception] = None
+        self._closing = False
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, int] = {"records": 0, "bytes": 0, "commits": 0}
+
+    def open(self) -> int:
+        """
+        Start a new segment after any existing ones and start the writer.
+
+        Returns:
+            Number of the segment being written
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        existing = list_segments(self.directory)
+        self.segment = existing[-1] + 1 if existing else 0
+        self._file = open(segment_path(self.directory, self.segment), "ab")
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="wal-writer", daemon=True)
+        self._thread.start()
+        return self.segment
+
+    def append(self, record_type: int, payload: bytes) -> None:
+        """
+        Queue a record; in group mode, return once it is on disk.
+
+        Raises:
+            FirebaseError: If the log cannot be written
+        """
+        self._enqueue([encode_record(record_type, payload)])
+
+    def _enqueue(self, records: List[bytes]) -> None:
+        """Queue framed records; in group mode, wait for the last one to be durable."""
+        with self._cond:
+            if self._error is not None:
+                raise FirebaseError(f"Write-ahead log failed: {self._error}")
+            self._pending.extend(records)
+            self._appended += len(records)
+            sequence = self._appended
+            self._cond.notify_all()
+            if self.sync_mode == "group":
+                while self._durable < sequence and self._error is None:
+                    self._cond.wait()
+                if self._error is not None:
+                    raise FirebaseError(f"Write-ahead log failed: {self._error}")
+
+    @property
+    def queue_depth(self) -> int:
+        """Records queued but not yet on disk."""
+        return self._appended - self._durable
+
+    def rotate(self) -> int:
+        """
+        Flush queued records and continue in a new segment.
+
+        Every record queued before the call ends up in an older segment,
+        so a snapshot taken afterwards covers all of them.
+
+        Returns:
+            Number of the new segment
+        """
+        with self._io_lock:
+            self._write_pending()
+            self._file.close()
+            self.segment += 1
+            self._file = open(segment_path(self.directory, self.segment), "ab")
+            return self.segment
+
+    def delete_segments_before(self, number: int) -> int:
+        """
+        Remove segments older than number (covered by a snapshot).
+
+        Returns:
+            Number of segments removed
+        """
+        removed = 0
+        for old in list_segments(self.directory):
+            if old < number:
+                os.remove(segment_path(self.directory, old))
+                removed += 1
+        return removed
+
+    def close(self) -> None:
+        """Flush everything queued and stop the writer."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._thread = None
+        with self._io_lock:
+            self._write_pending()
+            self._file.close()
+            self._file = None
+
+    # Journal hooks
+
+    def log_add(self, collection: str, document: Dict[str, Any]) -> None:
+        """Log a document added to a collection."""
+        self._enqueue([_frame_add(collection, document)])
+
+    def log_add_many(self, collection: str, documents: List[Dict[str, Any]]) -> None:
+        """Log a batch of added documents, waiting for durability only once."""
+        if documents:
+            self._enqueue([_frame_add(collection, document) for document in documents])
+
+    def log_set(self, collection: str, doc_id: str, document: Dict[str, Any]) -> None:
+        """Log a document stored under a known id."""
+        self.append(RECORD_SET, _to_json({"collection": collection, "id": doc_id, "document": document}))
+
+    def log_alert(self, alert) -> None:
+        """Log a raised alert."""
+        self.append(RECORD_ALERT, _to_json(alert.to_record()))
+
+    def log_alerts(self, alerts: List[Any]) -> None:
+        """Log alerts raised together, waiting for durability only once."""
+        if alerts:
+            self._enqueue([encode_record(RECORD_ALERT, _to_json(alert.to_record())) for alert in alerts])
+
+    def log_acknowledgement(self, alert_id: int) -> None:
+        """Log an alert acknowledgement."""
+        self.append(RECORD_ACK, _ACK.pack(alert_id))
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closing:
+                    self._cond.wait()
+                if self._closing:
+                    return
+            if self.commit_interval:
+                time.sleep(self.commit_interval)  # Let concurrent writers join the batch
+            with self._io_lock:
+                self._write_pending()
+
+    def _write_pending(self) -> None:
+        """Write and fsync everything queued (caller holds the I/O lock)."""
+        with self._cond:
+            batch, self._pending = self._pending, []
+            sequence = self._appended
+        if batch:
+            data = b"".join(batch)
+            try:
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as e:
+                logger.error("Write-ahead log write failed", extra={"fields": {"error": str(e)}})
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            self.stats["records"] += len(batch)
+            self.stats["bytes"] += len(data)
+            self.stats["commits"] += 1
+        with self._cond:
+            self._durable = sequence
+            self._cond.notify_all()
+
+
+def _frame_add(collection: str, document: Dict[str, Any]) -> bytes:
+    """Frame an added document, using the binary layout for plain readings."""
+    if collection == COLLECTION_READINGS and document.keys() <= _READING_KEYS:
+        return encode_record(RECORD_READING, encode_reading(document))
+    return encode_record(RECORD_DOCUMENT, _to_json({"collection": collection, "document": document}))
+
+
+def decode_json(payload: bytes) -> Dict[str, Any]:
+    """Decode a JSON record payload."""
+    return json.loads(payload.decode("utf-8"))
+
+
+def decode_ack(payload: bytes) -> int:
+    """Alert id of an acknowledgement record."""
+    return _ACK.unpack(payload)[0]
+
+
+def _to_json(value: Dict[str, Any]) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
@@ -1,5 +1,21 @@
 """Utility functions module."""
 
-from .validators import validate_sensor_data, validate_timestamp
+from .validators import (
+    validate_sensor_data,
+    validate_sensor_batch,
+    validate_tank_metadata,
+    validate_date_range,
+    validate_time_param,
+    validate_timestamp,
+)
+from .tracing import span
 
-__all__ = ["validate_sensor_data", "validate_timestamp"]
+__all__ = [
+    "validate_sensor_data",
+    "validate_sensor_batch",
+    "validate_tank_metadata",
+    "validate_date_range",
+    "validate_time_param",
+    "validate_timestamp",
+    "span",
+]
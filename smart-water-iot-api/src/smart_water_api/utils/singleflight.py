@@ -0,0 +1,72 @@
+"""
+Request coalescing.
+Concurrent calls for the same key wait on one in-flight computation and
+share its result instead of each computing it.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with equal keys into one execution.
+
+    The first caller for a key (the leader) runs the function; callers
+    arriving while it runs wait and receive the same result, or the same
+    exception. Nothing is cached: once the leader finishes, the next call
+    runs the function again. Shared results must be treated as read-only,
+    and a function must not call do() with its own key.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs), or wait for the identical call in flight.
+
+        Args:
+            key: Identifies equal calls (include every argument that changes the result)
+            func: Function to run
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The function's result, possibly shared with other callers
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self.executions += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    @property
+    def in_flight(self) -> int:
+        """Number of keys currently being computed."""
+        return len(self._calls)
+
+    def _finish(self, key: Hashable) -> None:
+        # Later callers start a fresh call rather than reuse a finished result
+        with self._lock:
+            del self._calls[key]
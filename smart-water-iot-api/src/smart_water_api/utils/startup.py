@@ -0,0 +1,46 @@
+"""
+Startup timing.
+Records how long each phase of application startup takes.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+
+class StartupReport:
+    """Wall time of each named startup phase, in the order they ran."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        """Record a phase timed elsewhere."""
+        self.phases.append((name, seconds * 1000))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as one phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    @property
+    def total_ms(self) -> float:
+        """Sum of all recorded phases."""
+        return sum(ms for _, ms in self.phases)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Phases and total, rounded to microseconds."""
+        return {
+            "total_ms": round(self.total_ms, 3),
+            "phases": [{"name": name, "ms": round(ms, 3)} for name, ms in self.phases],
+        }
+
+    def summary(self) -> str:
+        """One line listing every phase, slowest first."""
+        phases = ", ".join(f"{name} {ms:.1f}" for name, ms in sorted(self.phases, key=lambda p: -p[1]))
+        return f"Startup took {self.total_ms:.1f} ms ({phases})"
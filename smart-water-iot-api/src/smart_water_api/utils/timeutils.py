@@ -0,0 +1,58 @@
+"""
+Time conversion helpers.
+Fast conversions between epoch seconds and the API timestamp format.
+"""
+
+import calendar
+import time
+from datetime import datetime
+
+from ..constants import TIMESTAMP_FORMAT, SECONDS_PER_DAY
+
+
+def format_epoch(epoch: float) -> str:
+    """Format epoch seconds (UTC) as an API timestamp string."""
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(epoch))
+
+
+def parse_timestamp(timestamp: str) -> float:
+    """
+    Convert an API timestamp string to epoch seconds (UTC).
+
+    The canonical "YYYY-MM-DDTHH:MM:SSZ" form is parsed by slicing, which is
+    much cheaper than strptime; other ISO forms fall back to fromisoformat.
+
+    Raises:
+        ValueError: If the timestamp cannot be parsed
+    """
+    if len(timestamp) == 20 and timestamp[10] == "T" and timestamp[19] == "Z":
+        return float(calendar.timegm((
+            int(timestamp[0:4]), int(timestamp[5:7]), int(timestamp[8:10]),
+            int(timestamp[11:13]), int(timestamp[14:16]), int(timestamp[17:19]),
+        )))
+    parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        return calendar.timegm(parsed.timetuple()) + parsed.microsecond / 1e6
+    return parsed.timestamp()
+
+
+def day_index(epoch: float) -> int:
+    """UTC day number (days since 1970-01-01) of epoch seconds."""
+    return int(epoch // SECONDS_PER_DAY)
+
+
+def format_day(day: int) -> str:
+    """Format a UTC day number as YYYY-MM-DD."""
+    return time.strftime("%Y-%m-%d", time.gmtime(day * SECONDS_PER_DAY))
+
+
+def parse_day(date_str: str) -> int:
+    """
+    Convert a YYYY-MM-DD date (or full timestamp) to a UTC day number.
+
+    Raises:
+        ValueError: If the date cannot be parsed
+    """
+    if len(date_str) == 10:
+        date_str = f"{date_str}T00:00:00Z"
+    return day_index(parse_timestamp(date_str))
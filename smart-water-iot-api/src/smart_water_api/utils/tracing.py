@@ -0,0 +1,94 @@
+"""
+Request tracing helpers.
+Services mark their stages with span(); spans are only recorded while a
+sampled request is being traced, otherwise span() returns a shared no-op.
+"""
+
+import time
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, Optional
+
+
+class Trace:
+    """Spans recorded during one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.depth = 0
+
+
+class _Span:
+    """Times one stage of a trace (nested spans record their depth)."""
+
+    __slots__ = ("trace", "name", "started", "depth")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        trace = self.trace
+        self.depth = trace.depth
+        trace.depth += 1
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        ended = time.perf_counter()
+        trace = self.trace
+        trace.depth -= 1
+        trace.spans.append({
+            "name": self.name,
+            "start_ms": round((self.started - trace.started) * 1000, 3),
+            "duration_ms": round((ended - self.started) * 1000, 3),
+            "depth": self.depth,
+        })
+        return False
+
+
+class _NoopSpan:
+    """Stand-in returned when no trace is active."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("smart_water_trace", default=None)
+
+
+def span(name: str):
+    """
+    Context manager timing a stage of the current request.
+
+    Args:
+        name: Stage name (e.g. 'validation', 'store_write')
+
+    Returns:
+        A span recording into the active trace, or a no-op if none is active
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+
+def start_trace() -> Token:
+    """Start recording spans in the current context; pass the token to end_trace()."""
+    return _current_trace.set(Trace())
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace recording in the current context, if any."""
+    return _current_trace.get()
+
+
+def end_trace(token: Token) -> None:
+    """Stop recording spans started with start_trace()."""
+    _current_trace.reset(token)
@@ -4,7 +4,8 @@ Provides reusable validation functions for sensor data.
 """
 
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
 from ..constants import (
     WATER_LEVEL_MIN,
     WATER_LEVEL_MAX,
@@ -12,9 +13,12 @@ from ..constants import (
     FLOW_RATE_MAX,
     DEVICE_ID_MAX_LENGTH,
     TANK_ID_MAX_LENGTH,
+    TANK_CAPACITY_MAX_LITERS,
+    CONSERVATION_MAX_RANGE_DAYS,
     TIMESTAMP_FORMAT,
 )
 from ..errors.exceptions import ValidationError
+from .timeutils import parse_day, parse_timestamp
 
 
 def validate_sensor_data(data: dict) -> dict:
@@ -104,6 +108,177 @@ def validate_sensor_data(data: dict) -> dict:
     return validated
 
 
+def validate_sensor_batch(records: List[dict]) -> Tuple[List[dict], List[Tuple[int, str]]]:
+    """
+    Validate many sensor readings at once, keeping the valid ones.
+    
+    Applies the rules of validate_sensor_data(). Identifiers and timestamps
+    are checked per record; the numeric fields are converted in one pass
+    and range-checked and rounded as whole arrays.
+    
+    Args:
+        records: Raw sensor reading dictionaries
+        
+    Returns:
+        (validated records in input order, (index, message) per rejected record)
+    """
+    errors: Dict[int, str] = {}
+    partial: List[Tuple[int, str, str, str]] = []
+    levels: List[float] = []
+    flows: List[float] = []
+    
+    for index, data in enumerate(records):
+        try:
+            device_id = _validate_identifier(data, "device_id", DEVICE_ID_MAX_LENGTH)
+            tank_id = _validate_identifier(data, "tank_id", TANK_ID_MAX_LENGTH)
+            level = _validate_number(data, "water_level_percent")
+            flow = _validate_number(data, "flow_rate_lpm")
+            timestamp = data.get("timestamp")
+            timestamp = validate_timestamp(timestamp) if timestamp else datetime.utcnow().isoformat() + "Z"
+        except ValidationError as e:
+            errors[index] = e.message
+            continue
+        partial.append((index, device_id, tank_id, timestamp))
+        levels.append(level)
+        flows.append(flow)
+    
+    import numpy as np  # Only batch validation needs it; keeps single-reading imports light
+    
+    level_array = np.array(levels, dtype=np.float64)
+    flow_array = np.array(flows, dtype=np.float64)
+    bad_level = (level_array < WATER_LEVEL_MIN) | (level_array > WATER_LEVEL_MAX)
+    bad_flow = (flow_array < FLOW_RATE_MIN) | (flow_array > FLOW_RATE_MAX)
+    
+    valid = []
+    for position, (index, device_id, tank_id, timestamp) in enumerate(partial):
+        if bad_level[position]:
+            errors[index] = f"water_level_percent must be between {WATER_LEVEL_MIN} and {WATER_LEVEL_MAX}"
+        elif bad_flow[position]:
+            errors[index] = f"flow_rate_lpm must be between {FLOW_RATE_MIN} and {FLOW_RATE_MAX}"
+        else:
+            valid.append({
+                "device_id": device_id,
+                "tank_id": tank_id,
+                "water_level_percent": round(levels[position], 2),
+                "flow_rate_lpm": round(flows[position], 2),
+                "timestamp": timestamp,
+            })
+    
+    return valid, sorted(errors.items())
+
+
+def _validate_identifier(data: dict, field: str, max_length: int) -> str:
+    """Check a required identifier the way validate_sensor_data() does."""
+    value = data.get(field)
+    if not value:
+        raise ValidationError(f"{field} is required", field=field)
+    if not isinstance(value, str):
+        raise ValidationError(f"{field} must be a string", field=field)
+    if len(value) > max_length:
+        raise ValidationError(f"{field} must be at most {max_length} characters", field=field)
+    return value.strip()
+
+
+def _validate_number(data: dict, field: str) -> float:
+    """Convert a required numeric field (range checks happen per batch)."""
+    value = data.get(field)
+    if value is None:
+        raise ValidationError(f"{field} is required", field=field)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{field} must be a number", field=field)
+
+
+def validate_tank_metadata(data: dict) -> dict:
+    """
+    Validate tank metadata updates.
+    
+    Args:
+        data: Dictionary containing tank metadata
+        
+    Returns:
+        Validated metadata dictionary
+        
+    Raises:
+        ValidationError: If any field fails validation
+    """
+    capacity = data.get("capacity_liters")
+    if capacity is None:
+        raise ValidationError("capacity_liters is required", field="capacity_liters")
+    try:
+        capacity = float(capacity)
+    except (TypeError, ValueError):
+        raise ValidationError("capacity_liters must be a number", field="capacity_liters")
+    if capacity <= 0 or capacity > TANK_CAPACITY_MAX_LITERS:
+        raise ValidationError(
+            f"capacity_liters must be greater than 0 and at most {TANK_CAPACITY_MAX_LITERS:g}",
+            field="capacity_liters"
+        )
+    return {"capacity_liters": capacity}
+
+
+def validate_time_param(value: Any, field: str) -> Optional[float]:
+    """
+    Validate an optional timestamp query parameter.
+    
+    Args:
+        value: Timestamp string (ISO format or YYYY-MM-DD), or None
+        field: Parameter name for error reporting
+        
+    Returns:
+        Epoch seconds, or None if the parameter was not given
+        
+    Raises:
+        ValidationError: If the timestamp cannot be parsed
+    """
+    if value is None or value == "":
+        return None
+    try:
+        if len(value) == 10:
+            value = f"{value}T00:00:00Z"
+        return parse_timestamp(value)
+    except (TypeError, ValueError):
+        raise ValidationError(
+            f"{field} must be in ISO format or {TIMESTAMP_FORMAT}",
+            field=field
+        )
+
+
+def validate_date_range(start: Any, end: Any) -> Tuple[int, int]:
+    """
+    Validate an inclusive report date range.
+    
+    Args:
+        start: Start date (YYYY-MM-DD)
+        end: End date (YYYY-MM-DD)
+        
+    Returns:
+        (start_day, end_day) as UTC day numbers
+        
+    Raises:
+        ValidationError: If a date is missing, malformed or the range is invalid
+    """
+    days = []
+    for field, value in (("start", start), ("end", end)):
+        if not value:
+            raise ValidationError(f"{field} is required for a custom period", field=field)
+        try:
+            days.append(parse_day(str(value)))
+        except ValueError:
+            raise ValidationError(f"{field} must be a date in YYYY-MM-DD format", field=field)
+    
+    start_day, end_day = days
+    if end_day < start_day:
+        raise ValidationError("end must not be before start", field="end")
+    if end_day - start_day + 1 > CONSERVATION_MAX_RANGE_DAYS:
+        raise ValidationError(
+            f"Date range must not exceed {CONSERVATION_MAX_RANGE_DAYS} days",
+            field="end"
+        )
+    return start_day, end_day
+
+
 def validate_timestamp(timestamp: Any) -> str:
     """
     Validate and normalize timestamp.
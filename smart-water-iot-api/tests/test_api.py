@@ -3,7 +3,10 @@ API endpoint tests for Smart Water IoT API.
 Tests all endpoints for correct behavior.
 """
 
+import asyncio
 import json
+import subprocess
+import sys
 import pytest
 
 
@@ -27,6 +30,27 @@ class TestHealthEndpoint:
         assert response.status_code == 200
         data = json.loads(response.data)
         assert data["status"] == "healthy"
+    
+    def test_startup_phases_recorded(self, app):
+        """App creation records how long each startup phase took."""
+        phases = [p["name"] for p in app.extensions["startup"].to_dict()["phases"]]
+        
+        assert {"config", "extensions", "seed"} <= set(phases)
+    
+    def test_create_app_defers_unused_services(self):
+        """Services, the store and unused extensions are loaded on first use, not at startup."""
+        code = (
+            "import sys\n"
+            "from src.smart_water_api.app_factory import create_app\n"
+            "create_app({'TESTING': True})\n"
+            "services = ('sensor_service', 'rule_engine', 'alert_service', 'prediction_service', 'analytics_pool',"
+            " 'ingest_listener', 'persistence')\n"
+            "print(' '.join([m for m in services if 'src.smart_water_api.services.' + m in sys.modules]"
+            " + [m for m in ('numpy', 'asyncio', 'multiprocessing') if m in sys.modules]))\n"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        
+        assert result.stdout.strip() == ""
 
 
 class TestSensorIngestEndpoint:
@@ -124,6 +148,102 @@ class TestSensorIngestEndpoint:
         assert response.status_code == 400
 
 
+class TestSeriesEndpoint:
+    """Tests for the downsampled series endpoint."""
+    
+    def test_series_respects_max_points(self, client):
+        """Should return at most max_points points for the window."""
+        response = client.get(
+            "/api/v1/sensors/series?tank_id=TANK-MAIN&start=2020-01-01&max_points=20"
+        )
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["point_count"] <= 20
+        assert data["bucket_seconds"] > 0
+    
+    def test_series_requires_tank_id(self, client):
+        """Should reject requests without a tank."""
+        response = client.get("/api/v1/sensors/series")
+        
+        assert response.status_code == 400
+    
+    def test_series_rejects_invalid_window(self, client):
+        """Should reject unparseable or inverted windows."""
+        response = client.get("/api/v1/sensors/series?tank_id=TANK-MAIN&start=yesterday")
+        assert response.status_code == 400
+        
+        response = client.get(
+            "/api/v1/sensors/series?tank_id=TANK-MAIN&start=2024-01-02&end=2024-01-01"
+        )
+        assert response.status_code == 400
+
+
+class TestExportEndpoint:
+    """Tests for the streamed reading export."""
+    
+    def test_export_streams_ndjson_in_time_order(self, client, sample_sensor_data):
+        """Should stream one JSON object per reading, oldest first."""
+        client.post("/api/v1/sensors/ingest", data=json.dumps(sample_sensor_data),
+                    content_type="application/json")
+        
+        response = client.get("/api/v1/export/readings")
+        
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == "application/x-ndjson"
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert any(r["tank_id"] == "TEST-TANK-001" for r in rows)
+        assert any(r["tank_id"] == "TANK-MAIN" for r in rows)
+        assert [r["timestamp"] for r in rows] == sorted(r["timestamp"] for r in rows)
+    
+    def test_export_csv_filters_by_tank_and_window(self, client, sample_sensor_data):
+        """Should write a header row and only the matching readings."""
+        reading = dict(sample_sensor_data, tank_id="EXPORT-TANK")
+        client.post("/api/v1/sensors/ingest", data=json.dumps(reading), content_type="application/json")
+        
+        response = client.get(
+            "/api/v1/export/readings?format=csv&tank_id=EXPORT-TANK&start=2024-01-15&end=2024-01-16"
+        )
+        
+        lines = response.get_data(as_text=True).splitlines()
+        assert response.mimetype == "text/csv"
+        assert lines[0] == "timestamp,device_id,tank_id,water_level_percent,flow_rate_lpm"
+        assert len(lines) > 1
+        assert set(lines[1:]) == {"2024-01-15T10:30:00Z,TEST-SENSOR-001,EXPORT-TANK,65.5,5.2"}
+    
+    def test_export_arrow_stream(self, client, sample_sensor_data):
+        """Should stream an Arrow IPC stream readable by pyarrow."""
+        pa = pytest.importorskip("pyarrow")
+        reading = dict(sample_sensor_data, tank_id="ARROW-TANK")
+        client.post("/api/v1/sensors/ingest", data=json.dumps(reading), content_type="application/json")
+        
+        response = client.get("/api/v1/export/readings?format=arrow&tank_id=ARROW-TANK")
+        
+        assert response.mimetype == "application/vnd.apache.arrow.stream"
+        table = pa.ipc.open_stream(response.get_data()).read_all()
+        assert table.column("tank_id").to_pylist() == ["ARROW-TANK"] * table.num_rows
+        assert table.column("water_level_percent").to_pylist()[0] == 65.5
+    
+    def test_export_arrow_without_pyarrow(self, client, monkeypatch):
+        """Should fail cleanly with 501 when the optional dependency is missing."""
+        from src.smart_water_api.services import export_service
+        monkeypatch.setattr(export_service, "pa", None)
+        
+        response = client.get("/api/v1/export/readings?format=arrow")
+        
+        assert response.status_code == 501
+        data = json.loads(response.data)
+        assert data["error"]["code"] == "FEATURE_UNAVAILABLE"
+        assert data["error"]["dependency"] == "pyarrow"
+    
+    def test_export_rejects_unknown_format(self, client):
+        """Should reject formats other than ndjson and csv."""
+        response = client.get("/api/v1/export/readings?format=xml")
+        
+        assert response.status_code == 400
+
+
 class TestDashboardEndpoint:
     """Tests for the live dashboard endpoint."""
     
@@ -207,6 +327,83 @@ class TestAnalyticsEndpoint:
         assert len(data["hourly_pattern"]) == 24  # 24 hours
 
 
+class TestForecastEndpoints:
+    """Tests for fleet forecasting and tank metadata endpoints."""
+    
+    def test_fleet_forecast(self, client):
+        """Should project every tank with seeded history."""
+        response = client.get("/api/v1/predictions/fleet")
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        
+        assert data["horizon_hours"] == 168
+        assert data["tank_count"] == len(data["tanks"])
+        tank = data["tanks"][0]
+        assert "hours_to_empty" in tank
+        assert "hours_to_overflow" in tank
+        assert "warning_level" in tank
+    
+    def test_update_tank_capacity(self, client):
+        """Stored capacity should be returned by the tank endpoint."""
+        response = client.put("/api/v1/tanks/TEST-TANK-CAP", json={"capacity_liters": 2500})
+        assert response.status_code == 200
+        
+        response = client.get("/api/v1/tanks/TEST-TANK-CAP")
+        data = json.loads(response.data)
+        assert data["capacity_liters"] == 2500.0
+    
+    def test_update_tank_rejects_invalid_capacity(self, client):
+        """Non-positive capacities should be rejected."""
+        response = client.put("/api/v1/tanks/TEST-TANK-CAP", json={"capacity_liters": -5})
+        
+        assert response.status_code == 400
+
+
+class TestPredictionEndpoints:
+    """Tests for materialized prediction endpoints."""
+    
+    def test_water_shortage_reports_age(self, client):
+        """Predictions should be served with their age."""
+        response = client.get("/api/v1/predictions/water-shortage")
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert "hours_remaining" in data
+        assert "computed_at" in data
+        assert data["age_seconds"] >= 0
+    
+    def test_conservation_report_periods(self, client):
+        """Standard report periods should be materialized."""
+        for period, days in (("weekly", 7), ("daily", 1), ("monthly", 30)):
+            response = client.get(f"/api/v1/reports/conservation?period={period}")
+            data = json.loads(response.data)
+            assert data["days"] == days
+            assert "age_seconds" in data
+    
+    def test_conservation_report_custom_range(self, client):
+        """Custom ranges should report per tank over the requested days."""
+        response = client.get(
+            "/api/v1/reports/conservation?period=custom&start=2024-01-01&end=2024-12-31"
+        )
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["days"] == 366
+        assert data["start_date"] == "2024-01-01"
+        assert isinstance(data["tanks"], list)
+    
+    def test_conservation_report_rejects_bad_range(self, client):
+        """Custom ranges need both dates in order."""
+        response = client.get(
+            "/api/v1/reports/conservation?period=custom&start=2024-02-01&end=2024-01-01"
+        )
+        assert response.status_code == 400
+        
+        response = client.get("/api/v1/reports/conservation?period=yearly")
+        assert response.status_code == 400
+
+
 class TestAlertsEndpoint:
     """Tests for the alerts endpoint."""
     
@@ -247,6 +444,29 @@ class TestAlertsEndpoint:
         # All returned alerts should be unacknowledged
         for alert in data["alerts"]:
             assert alert.get("acknowledged", False) is False
+    
+    def test_acknowledge_alert(self, client, overflow_sensor_data):
+        """Acknowledged alerts should drop out of the active list."""
+        overflow_sensor_data["tank_id"] = "TEST-TANK-ACK"
+        client.post(
+            "/api/v1/sensors/ingest",
+            data=json.dumps(overflow_sensor_data),
+            content_type="application/json"
+        )
+        alert_id = json.loads(client.get("/api/v1/alerts?active_only=true&limit=100").data)["alerts"][-1]["id"]
+        
+        response = client.post(f"/api/v1/alerts/{alert_id}/acknowledge")
+        
+        assert response.status_code == 200
+        assert json.loads(response.data)["alert"]["acknowledged"] is True
+        active = json.loads(client.get("/api/v1/alerts?active_only=true&limit=100").data)["alerts"]
+        assert alert_id not in [alert["id"] for alert in active]
+    
+    def test_acknowledge_unknown_alert(self, client):
+        """Unknown alert ids should return 404."""
+        response = client.post("/api/v1/alerts/999999/acknowledge")
+        
+        assert response.status_code == 404
 
 
 class TestErrorHandling:
@@ -275,3 +495,266 @@ class TestErrorHandling:
         )
         
         assert response.status_code == 400
+
+
+class TestResponseCompression:
+    """Tests for Accept-Encoding negotiated response compression."""
+    
+    def test_large_payload_is_gzipped(self, client):
+        """Large JSON responses should be gzip-compressed when accepted."""
+        import gzip
+        
+        response = client.get(
+            "/api/v1/analytics/hourly-pattern",
+            headers={"Accept-Encoding": "gzip, deflate"}
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        data = json.loads(gzip.decompress(response.data))
+        assert len(data["hourly_pattern"]) == 24
+    
+    def test_small_payload_not_compressed(self, client):
+        """Responses below the size threshold should be sent as-is."""
+        response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+        
+        assert response.status_code == 200
+        assert "Content-Encoding" not in response.headers
+    
+    def test_no_accept_encoding_not_compressed(self, client):
+        """Clients that don't advertise encodings get identity responses."""
+        response = client.get("/api/v1/analytics/hourly-pattern")
+        
+        assert "Content-Encoding" not in response.headers
+        assert len(json.loads(response.data)["hourly_pattern"]) == 24
+    
+    def test_choose_encoding_respects_q_values(self):
+        """Encodings with q=0 must never be chosen."""
+        from src.smart_water_api.middleware.compression import choose_encoding
+        
+        assert choose_encoding("gzip;q=0, deflate") == "deflate"
+        assert choose_encoding("identity") is None
+        assert choose_encoding("*;q=0") is None
+
+
+class TestMetricsEndpoint:
+    """Tests for the Prometheus /metrics endpoint."""
+    
+    def test_requests_are_counted_per_route(self, client):
+        """Requests are labelled by URL rule, not raw path."""
+        client.get("/api/v1/tanks/METRICS-TANK-A")
+        client.get("/api/v1/tanks/METRICS-TANK-B")
+        
+        response = client.get("/metrics")
+        text = response.get_data(as_text=True)
+        
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain; version=0.0.4")
+        assert "METRICS-TANK" not in text
+        assert 'smart_water_http_requests_total{route="/api/v1/tanks/<tank_id>",method="GET",status="200"}' in text
+        assert 'smart_water_http_request_duration_seconds_bucket{route="/api/v1/tanks/<tank_id>",method="GET",le="+Inf"}' in text
+    
+    def test_store_and_cache_metrics_exported(self, client, sample_sensor_data):
+        """Store sizes, alert counts and cache counters are collected at scrape time."""
+        client.post("/api/v1/sensors/ingest", data=json.dumps(sample_sensor_data), content_type="application/json")
+        
+        text = client.get("/metrics").get_data(as_text=True)
+        
+        assert "# TYPE smart_water_store_documents gauge" in text
+        assert 'smart_water_documents_written_total{collection="sensor_readings"}' in text
+        assert 'smart_water_alerts{state="active"}' in text
+        assert 'smart_water_cache_hit_ratio{cache="compression"}' in text
+        assert "# TYPE smart_water_gc_pause_seconds histogram" in text
+    
+    def test_single_flight_counters_exported(self, client):
+        """Coalesced dashboard and analytics calls are reported as cache lookups."""
+        client.get("/api/v1/dashboard/live")
+        client.get("/api/v1/analytics/daily")
+        
+        text = client.get("/metrics").get_data(as_text=True)
+        
+        for name in ("flight_dashboard", "flight_latest_readings", "flight_daily_analytics"):
+            assert f'smart_water_cache_misses_total{{cache="{name}"}}' in text
+
+
+class TestProfilingEndpoint:
+    """Tests for sampled request profiling."""
+    
+    @pytest.fixture
+    def profiled_client(self):
+        from src.smart_water_api.app_factory import create_app
+        from src.smart_water_api.extensions import profiler
+        
+        app = create_app({"TESTING": True, "PROFILING_ENABLED": True, "PROFILING_SAMPLE_RATE": 0})
+        profiler.clear()
+        return app.test_client()
+    
+    def test_header_traces_ingest_stages(self, profiled_client, sample_sensor_data):
+        """A request with the profiling header records its stage spans."""
+        response = profiled_client.post(
+            "/api/v1/sensors/ingest",
+            data=json.dumps(sample_sensor_data),
+            content_type="application/json",
+            headers={"X-Profile": "1"},
+        )
+        profile_id = int(response.headers["X-Profile-Id"])
+        
+        profiles = profiled_client.get("/debug/profiles").get_json()["profiles"]
+        
+        assert [p["id"] for p in profiles] == [profile_id]
+        profile = profiles[0]
+        assert profile["route"] == "/api/v1/sensors/ingest"
+        assert [s["name"] for s in profile["spans"]] == [
+            "validation", "store_write", "alert_analysis", "serialization"
+        ]
+        assert profile["functions"] and profile["duration_ms"] > 0
+    
+    def test_unsampled_requests_not_recorded(self, profiled_client):
+        """With a zero sample rate only header requests are traced."""
+        response = profiled_client.get("/api/v1/analytics/daily")
+        
+        assert "X-Profile-Id" not in response.headers
+        assert profiled_client.get("/debug/profiles").get_json()["profiles"] == []
+    
+    def test_profiles_endpoint_disabled_by_default(self, client):
+        """The debug endpoint only exists when profiling is enabled."""
+        assert client.get("/debug/profiles").status_code == 404
+
+
+def _asgi_scope(method, path, query=b"", headers=()):
+    return {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": list(headers),
+        "http_version": "1.1",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 50000),
+    }
+
+
+async def _asgi_request(asgi_app, method, path, body=b"", query=b"", headers=()):
+    """Run one request through an ASGI app; returns (status, headers, body)."""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+    
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+    
+    async def send(message):
+        sent.append(message)
+    
+    await asgi_app(_asgi_scope(method, path, query, headers), receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+class TestAsgiApp:
+    """Tests for the ASGI entry point and dashboard streams."""
+    
+    @pytest.fixture
+    def asgi_app(self, app):
+        from src.smart_water_api.asgi import AsgiApp
+        
+        app.config.update(ASGI_STREAM_POLL_SECONDS=0.01, ASGI_WORKER_THREADS=4, ASGI_MAX_STREAMS=2)
+        asgi_app = AsgiApp(app)
+        yield asgi_app
+        asgi_app.services.close()
+    
+    def test_flask_routes_served_through_pool(self, asgi_app, sample_sensor_data):
+        """Regular routes behave exactly as under WSGI, errors included."""
+        async def scenario():
+            created = await _asgi_request(
+                asgi_app, "POST", "/api/v1/sensors/ingest",
+                body=json.dumps(sample_sensor_data).encode(),
+                headers=[(b"content-type", b"application/json")],
+            )
+            missing = await _asgi_request(asgi_app, "GET", "/api/v1/tanks/T/unknown")
+            return created, missing
+        
+        (status, _, body), (missing_status, _, _) = asyncio.run(scenario())
+        
+        assert status == 201
+        assert json.loads(body)["analysis"]["status"] == "normal"
+        assert missing_status == 404
+    
+    def test_stream_sends_event_per_change(self, asgi_app, sample_sensor_data):
+        """SSE clients get the current dashboard, then one event per new reading."""
+        events = []
+        
+        async def scenario():
+            disconnect = asyncio.Event()
+            
+            async def receive():
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+            
+            async def send(message):
+                events.append(message)
+            
+            stream = asyncio.ensure_future(asgi_app(_asgi_scope("GET", "/api/v1/dashboard/stream"), receive, send))
+            while len(events) < 2:
+                await asyncio.sleep(0.005)
+            await asgi_app.services.ingest(dict(sample_sensor_data, water_level_percent=42.5))
+            while len(events) < 3:
+                await asyncio.sleep(0.005)
+            disconnect.set()
+            await asgi_app.services.ingest(dict(sample_sensor_data, water_level_percent=43.0))
+            await asyncio.wait_for(stream, 5)
+        
+        asyncio.run(scenario())
+        
+        assert (b"content-type", b"text/event-stream") in events[0]["headers"]
+        first, second = events[1]["body"], events[2]["body"]
+        assert first.startswith(b"id: 1\nevent: dashboard\ndata: ")
+        assert second.startswith(b"id: 2\n")
+        payload = json.loads(second.split(b"data: ", 1)[1])
+        assert payload["latest_reading"]["water_level_percent"] == 42.5
+        assert asgi_app.streams == 0
+    
+    def test_long_poll_waits_for_newer_version(self, asgi_app, sample_sensor_data):
+        """A long poll at the current version returns on change or timeout."""
+        async def scenario():
+            _, headers, _ = await _asgi_request(asgi_app, "GET", "/api/v1/dashboard/live", query=b"wait=1")
+            version = headers[b"x-dashboard-version"]
+            timed_out = await _asgi_request(
+                asgi_app, "GET", "/api/v1/dashboard/live", query=b"wait=0.05&version=" + version
+            )
+            poll = asyncio.ensure_future(_asgi_request(
+                asgi_app, "GET", "/api/v1/dashboard/live", query=b"wait=5&version=" + version
+            ))
+            await asgi_app.services.ingest(sample_sensor_data)
+            return version, timed_out, await asyncio.wait_for(poll, 5)
+        
+        version, timed_out, changed = asyncio.run(scenario())
+        
+        assert timed_out[1][b"x-dashboard-version"] == version
+        assert changed[0] == 200
+        assert int(changed[1][b"x-dashboard-version"]) == int(version) + 1
+    
+    def test_async_services_run_in_pool(self, asgi_app):
+        """Service calls are awaitable and run on the pool, not the event loop."""
+        import threading
+        
+        async def scenario():
+            thread = await asgi_app.services.run(lambda: threading.current_thread().name)
+            return thread, await asgi_app.services.daily_analytics(days=3), await asgi_app.services.active_alerts()
+        
+        thread, analytics, alerts = asyncio.run(scenario())
+        
+        assert thread.startswith("asgi-worker")
+        assert analytics["daily_data"]
+        assert isinstance(alerts, list)
+    
+    def test_stream_limit_returns_503(self, asgi_app):
+        """Beyond ASGI_MAX_STREAMS, new stream clients are turned away."""
+        asgi_app.streams = asgi_app.max_streams
+        
+        status, headers, body = asyncio.run(_asgi_request(asgi_app, "GET", "/api/v1/dashboard/stream"))
+        
+        assert status == 503 and headers[b"retry-after"] == b"5"
+        assert json.loads(body)["error"]["code"] == "TOO_MANY_STREAMS"
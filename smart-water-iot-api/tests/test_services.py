@@ -0,0 +1,1771 @@
+"""
+Service-level tests for Smart Water IoT API.
+Exercises services directly, without going through HTTP.
+"""
+
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from benchmarks.run_benchmarks import compare, run_suite
+from src.smart_water_api.logging_config import DeferredQueueHandler, JsonFormatter, Lazy, SampledLogger
+from src.smart_water_api.middleware.metrics import Histogram, MetricFamily, histogram_family, render
+from src.smart_water_api.storage import wal
+from src.smart_water_api.storage.column_store import ColumnStore
+from src.smart_water_api.storage.segments import SegmentStore
+from src.smart_water_api.storage.wal import WriteAheadLog, decode_json, decode_reading, replay
+from src.smart_water_api.storage.snapshot import write_snapshot
+from src.smart_water_api.utils.singleflight import SingleFlight
+from src.smart_water_api.utils.startup import StartupReport
+from src.smart_water_api.utils.timeutils import parse_timestamp
+from src.smart_water_api.utils.tracing import current_trace, end_trace, span, start_trace
+from src.smart_water_api.utils.validators import validate_sensor_batch
+
+from src.smart_water_api.errors.exceptions import AnalyticsUnavailableError, NotFoundError
+from src.smart_water_api.services.alert_service import AlertService
+from src.smart_water_api.services.analytics_pool import AnalyticsPool, attach_columns, share_columns
+from src.smart_water_api.services.analytics_service import AnalyticsService
+from src.smart_water_api.services.bulk_import import BulkImporter
+from src.smart_water_api.services.compactor import Compactor, RetentionPolicy
+from src.smart_water_api.services.conservation_service import ConservationService
+from src.smart_water_api.services.forecast_service import ForecastService
+from src.smart_water_api.services.ingest_listener import IngestListener, parse_lines
+from src.smart_water_api.services.leak_detector import LeakageDetector
+from src.smart_water_api.services.offline_monitor import OfflineMonitor
+from src.smart_water_api.services.persistence import Persistence
+from src.smart_water_api.services.prediction_service import PredictionService, WATER_SHORTAGE
+from src.smart_water_api.services.rule_engine import DEFAULT_ALERT_RULES, RuleEngine
+from src.smart_water_api.services.scheduler import RefreshScheduler
+from src.smart_water_api.services.simulator import FleetProfile, FleetSimulator, drive_http, write_fleet
+from src.smart_water_api.services.series_service import SeriesService, choose_step, lttb
+from src.smart_water_api.services.sensor_service import (
+    MockFirebaseDB,
+    SensorService,
+    configure_seeding,
+    reset_mock_db,
+    seed_database,
+)
+
+
+def _reading(level, flow, tank_id="TANK-001", timestamp="2024-01-15T10:30:00Z"):
+    """Build a validated reading dictionary."""
+    return {
+        "device_id": "SENSOR-001",
+        "tank_id": tank_id,
+        "water_level_percent": level,
+        "flow_rate_lpm": flow,
+        "timestamp": timestamp,
+    }
+
+
+class TestRuleEngine:
+    """Tests for the compiled alert rule engine."""
+    
+    def test_default_rules_first_match_per_type(self):
+        """Only the most severe rule of each type should fire."""
+        matches = RuleEngine().evaluate(_reading(97.0, 25.0))
+        
+        assert [m.rule.rule_id for m in matches] == ["overflow_critical", "high_flow"]
+        assert matches[0].threshold == 95
+    
+    def test_per_tank_overrides(self):
+        """Overridden tanks use their own thresholds; others keep defaults."""
+        engine = RuleEngine(overrides={
+            "TANK-SMALL": {
+                "overflow_critical": {"threshold": 80},
+                "high_flow": {"enabled": False},
+            },
+        })
+        
+        small = engine.evaluate(_reading(82.0, 25.0, tank_id="TANK-SMALL"))
+        default = engine.evaluate(_reading(82.0, 25.0))
+        
+        assert [m.rule.rule_id for m in small] == ["overflow_critical"]
+        assert small[0].threshold == 80
+        assert [m.rule.rule_id for m in default] == ["high_flow"]
+    
+    def test_batch_matches_single_evaluation(self):
+        """Vectorized batch evaluation should equal per-reading evaluation."""
+        engine = RuleEngine()
+        readings = [_reading(level, flow) for level in (5, 15, 50, 90, 99) for flow in (0, 3, 30)]
+        
+        batch = engine.evaluate_batch(readings)
+        
+        assert batch == [engine.evaluate(r) for r in readings]
+    
+    def test_scalar_path_matches_batch_with_conditions_and_overrides(self, monkeypatch):
+        """One reading is evaluated without the array path, with identical results."""
+        rules = [
+            {"id": "quiet_leak", "type": "leak_suspect", "metric": "flow_rate_lpm", "comparator": ">",
+             "threshold": 1, "priority": 2, "conditions": [
+                 {"metric": "water_level_percent", "comparator": "<", "threshold": 40},
+             ]},
+            *[rule for rule in DEFAULT_ALERT_RULES if rule["type"] != "high_flow"],
+        ]
+        engine = RuleEngine(rules=rules, overrides={
+            "TANK-SMALL": {"overflow_critical": {"threshold": 80, "priority": 2}, "quiet_leak": {"enabled": False}},
+        })
+        readings = [
+            _reading(level, flow, tank_id=tank)
+            for level in (5, 15, 35, 82, 91, 99) for flow in (0, 1, 3) for tank in ("TANK-001", "TANK-SMALL")
+        ]
+        batch = engine.evaluate_batch(readings)
+        
+        monkeypatch.setattr(engine, "evaluate_batch", None)
+        assert [engine.evaluate(r) for r in readings] == batch
+        assert any(m.rule.rule_id == "quiet_leak" for matches in batch for m in matches)
+    
+    def test_empty_rule_set_fires_nothing(self):
+        """An engine without rules is valid and never fires."""
+        engine = RuleEngine(rules=[], overrides={})
+        
+        assert engine.rules == []
+        assert engine.evaluate(_reading(99.0, 50.0)) == []
+        assert engine.evaluate_batch([_reading(5.0, 0.0), _reading(50.0, 3.0)]) == [[], []]
+    
+    def test_unknown_metric_rejected(self):
+        """Malformed rule definitions should fail at compile time."""
+        with pytest.raises(ValueError):
+            RuleEngine(rules=[{
+                "id": "bad", "type": "x", "metric": "pressure",
+                "comparator": ">", "threshold": 1, "priority": 1,
+            }])
+
+
+class TestAlertService:
+    """Tests for alert analysis on top of the rule engine."""
+    
+    def test_critical_low_status(self):
+        """Critically low water should report a critical status."""
+        result = AlertService().analyze_reading(_reading(8.0, 0.0))
+        
+        assert result["status"] == "critical"
+        assert result["alerts"][0].alert_type == "low_water"
+    
+    def test_status_at_critical_low_boundary(self):
+        """Exactly at the critical threshold the alert is critical but the status a warning."""
+        result = AlertService().analyze_reading(_reading(10.0, 0.0))
+        
+        assert result["alerts"][0].priority == 4
+        assert result["status"] == "warning"
+    
+    def test_analyze_batch_stores_alerts(self):
+        """Batch analysis should return one result per reading and store alerts."""
+        service = AlertService()
+        results = service.analyze_batch([_reading(96.0, 0.0), _reading(50.0, 0.0)])
+        
+        assert [r["status"] for r in results] == ["overflow_risk", "normal"]
+        assert len(service.get_all_alerts()) == 1
+    
+    def test_alerts_are_listed_newest_first_up_to_limit(self):
+        """Listing walks the store from its newest end."""
+        service = AlertService()
+        for level in (96.0, 97.0, 98.0):
+            service.analyze_reading(_reading(level, 0.0))
+        
+        assert [a.value for a in service.get_all_alerts(limit=2)] == [98.0, 97.0]
+        assert [a.value for a in service.get_active_alerts()] == [96.0, 97.0, 98.0]
+
+
+class TestAlertRecords:
+    """Tests for compact alert records and lazy rendering."""
+    
+    def test_alert_renders_text_on_serialization(self):
+        """Serialized alerts should carry the human-readable fields."""
+        service = AlertService()
+        service.analyze_reading(_reading(96.0, 0.0))
+        
+        alert = service.get_all_alerts()[0]
+        rendered = alert.to_dict()
+        
+        assert not hasattr(alert, "__dict__")
+        assert rendered["type"] == "overflow"
+        assert rendered["priority_label"] == "Critical"
+        assert rendered["message"] == "Tank TANK-001 is at 96.0% capacity - Overflow imminent!"
+        assert rendered["cause"] == "Water level (96.0%) exceeded safe threshold (95%)"
+        assert rendered["timestamp"].endswith("Z")
+
+
+class TestLeakageDetector:
+    """Tests for the sliding-window leakage detector."""
+    
+    def test_single_low_flow_reading_is_not_a_leak(self):
+        """One reading with low flow is normal usage, not a leak."""
+        detector = LeakageDetector()
+        
+        assert detector.update(_reading(60.0, 3.0)) is None
+    
+    def test_flow_persisting_through_idle_window(self):
+        """Low flow for 30+ minutes at night should be flagged once."""
+        detector = LeakageDetector()
+        results = [
+            detector.update(_reading(60.0, 1.2, timestamp=f"2024-01-15T02:{minute:02d}:00Z"))
+            for minute in range(0, 50, 10)
+        ]
+        
+        fired = [r for r in results if r is not None]
+        assert len(fired) == 1
+        assert fired[0].rule.rule_id == "leakage_idle_flow"
+    
+    def test_level_drop_not_explained_by_outflow(self):
+        """A level drop far above metered outflow should be flagged."""
+        detector = LeakageDetector()
+        detector.update(_reading(80.0, 0.0, timestamp="2024-01-15T12:00:00Z"))
+        match = detector.update(_reading(70.0, 0.0, timestamp="2024-01-15T12:20:00Z"))
+        
+        assert match is not None
+        assert match.rule.rule_id == "leakage_level_drop"
+        assert match.value == pytest.approx(100.0)
+    
+    def test_idle_windows_expire_least_recently_updated_first(self):
+        """Windows of quiet tanks are dropped in chunks; active tanks keep their history."""
+        detector = LeakageDetector()
+        for index in range(5):
+            detector.update(_reading(80.0, 0.0, tank_id=f"TANK-{index}", timestamp="2024-01-15T08:00:00Z"))
+        detector.update(_reading(80.0, 0.0, tank_id="TANK-0", timestamp="2024-01-15T12:00:00Z"))
+        now = parse_timestamp("2024-01-15T12:30:00Z")
+        
+        assert detector.expire_idle(now, limit=3) == (3, False)
+        assert detector.expire_idle(now, limit=3) == (1, True)
+        assert len(detector) == 1
+        # TANK-0 still has its window, so the level drop is measured against it
+        match = detector.update(_reading(70.0, 0.0, tank_id="TANK-0", timestamp="2024-01-15T12:20:00Z"))
+        assert match is not None and match.rule.rule_id == "leakage_level_drop"
+    
+    def test_level_drop_explained_by_outflow(self):
+        """Metered usage that accounts for the drop is not a leak."""
+        detector = LeakageDetector()
+        detector.update(_reading(80.0, 5.0, timestamp="2024-01-15T12:00:00Z"))
+        
+        assert detector.update(_reading(70.0, 5.0, timestamp="2024-01-15T12:20:00Z")) is None
+
+
+class FakeClock:
+    """Manually advanced clock for timer tests."""
+    
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+class TestOfflineMonitor:
+    """Tests for timer-wheel based sensor offline detection."""
+    
+    def test_device_expires_after_deadline(self):
+        """A silent device should be reported once its deadline passes."""
+        clock = FakeClock()
+        monitor = OfflineMonitor(expiry_seconds=300, clock=clock)
+        monitor.touch("SENSOR-1", "TANK-1")
+        
+        clock.now += 299
+        assert monitor.poll() == []
+        
+        clock.now += 2
+        expired = monitor.poll()
+        assert [d.device_id for d in expired] == ["SENSOR-1"]
+        assert monitor.is_offline("SENSOR-1")
+        assert monitor.poll() == []
+    
+    def test_touch_postpones_deadline(self):
+        """Devices that keep reporting are rescheduled, not reported."""
+        clock = FakeClock()
+        monitor = OfflineMonitor(expiry_seconds=300, clock=clock)
+        monitor.touch("SENSOR-1", "TANK-1")
+        
+        for _ in range(10):
+            clock.now += 200
+            monitor.touch("SENSOR-1", "TANK-1")
+            assert monitor.poll() == []
+        
+        clock.now += 301
+        assert len(monitor.poll()) == 1
+    
+    def test_long_pause_between_polls(self):
+        """Polling after many revolutions should still expire every device."""
+        clock = FakeClock()
+        monitor = OfflineMonitor(expiry_seconds=10, clock=clock)
+        for index in range(100):
+            monitor.touch(f"SENSOR-{index}", "TANK-1")
+        
+        clock.now += 1000
+        assert len(monitor.poll()) == 100
+    
+    def test_alert_service_raises_offline_alerts(self):
+        """Offline devices should surface as sensor_offline alerts."""
+        clock = FakeClock()
+        monitor = OfflineMonitor(expiry_seconds=300, clock=clock)
+        service = AlertService(offline_monitor=monitor)
+        monitor.touch("SENSOR-9", "TANK-9")
+        
+        clock.now += 600
+        before = time.time()
+        assert service.get_all_alerts() == []  # Reads never poll
+        service.poll_offline()
+        alerts = service.get_all_alerts()
+        
+        assert [a.alert_type for a in alerts] == ["sensor_offline"]
+        assert alerts[0].to_dict()["priority_label"] == "High"
+        # Raised at the poll; the deadline (last seen + expiry) was 300s earlier
+        assert before <= alerts[0].epoch <= time.time()
+        assert alerts[0].deadline == pytest.approx(alerts[0].epoch - 300)
+        assert "deadline" in alerts[0].to_dict()
+    
+    def test_offline_alerts_expire_in_order_with_other_alerts(self):
+        """Offline alerts keep the alert store in raise order, so expiry stops at the right place."""
+        clock = FakeClock()
+        monitor = OfflineMonitor(expiry_seconds=300, clock=clock)
+        service = AlertService(offline_monitor=monitor)
+        monitor.touch("SENSOR-9", "TANK-9")
+        service.analyze_reading(_reading(97.0, 1.0))
+        
+        clock.now += 600
+        time.sleep(0.01)
+        offline = service.poll_offline()
+        service.analyze_reading(_reading(97.0, 1.0))
+        
+        epochs = [a.epoch for a in service._alerts]
+        assert epochs == sorted(epochs)
+        # Everything raised before the offline alert goes; it and newer alerts stay
+        dropped, done = service.expire_alerts(offline[0].epoch, limit=100)
+        assert dropped == 1 and done
+        assert [a.alert_type for a in service._alerts] == ["sensor_offline", "overflow"]
+    
+    def test_scheduler_tick_raises_offline_alerts(self):
+        """The scheduler thread should poll for offline sensors without any reads."""
+        monitor = OfflineMonitor(expiry_seconds=0.05, resolution_seconds=0.01)
+        service = AlertService(offline_monitor=monitor)
+        scheduler = RefreshScheduler(interval_seconds=3600)
+        scheduler.configure(lambda: None, ticks=[(service.poll_offline, 0.01)])
+        monitor.touch("SENSOR-9", "TANK-9")
+        
+        scheduler.start()
+        try:
+            deadline = time.monotonic() + 2
+            while not monitor.is_offline("SENSOR-9") and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            scheduler.stop(timeout=2)
+        
+        assert [a.alert_type for a in service._alerts] == ["sensor_offline"]
+
+
+
+class TestForecastService:
+    """Tests for vectorized fleet forecasting."""
+    
+    @pytest.fixture
+    def service(self):
+        reset_mock_db()
+        yield ForecastService(SensorService())
+        reset_mock_db()
+    
+    @staticmethod
+    def _fill(service, tank_id, start_level, rate_per_hour, start=1_705_300_000.0, samples=24):
+        """Add half-hourly readings changing by rate_per_hour; returns last epoch."""
+        epoch = start
+        for step in range(samples):
+            epoch = start + step * 1800
+            level = start_level + rate_per_hour * step / 2
+            service._db.rollups.add(tank_id, epoch, level, 2.0)
+        return epoch
+    
+    @staticmethod
+    def _tank(forecast, tank_id):
+        return next(t for t in forecast["tanks"] if t["tank_id"] == tank_id)
+    
+    def test_draining_tank_time_to_empty(self, service):
+        """A tank losing 5%/h at 32.5% should empty in 6.5 hours."""
+        now = self._fill(service, "TANK-DRAIN", 90.0, -5.0)
+        
+        tank = self._tank(service.forecast_fleet(now=now), "TANK-DRAIN")
+        
+        assert tank["current_level_percent"] == 32.5
+        assert tank["hours_to_empty"] == pytest.approx(6.5)
+        assert tank["hours_to_overflow"] is None
+        assert tank["warning_level"] == "warning"
+    
+    def test_filling_tank_time_to_overflow(self, service):
+        """A filling tank should report overflow, not emptiness."""
+        now = self._fill(service, "TANK-FILL", 20.0, 2.0)
+        
+        tank = self._tank(service.forecast_fleet(now=now), "TANK-FILL")
+        
+        assert tank["hours_to_empty"] is None
+        assert tank["hours_to_overflow"] == pytest.approx(28.5)
+    
+    def test_capacity_metadata_scales_volume(self, service):
+        """Stored capacity should be used for liters, defaults otherwise."""
+        now = self._fill(service, "TANK-BIG", 50.0, 0.0, samples=4)
+        assert service.get_tank_capacity("TANK-BIG") == 1000.0
+        
+        service.set_tank_capacity("TANK-BIG", 5000)
+        tank = self._tank(service.forecast_fleet(now=now), "TANK-BIG")
+        
+        assert tank["capacity_liters"] == 5000.0
+        assert tank["current_water_liters"] == 2500.0
+
+
+class TestRefreshScheduler:
+    """Tests for the background refresh scheduler."""
+    
+    def test_failing_job_does_not_stop_scheduler(self):
+        """A raising job is counted and the scheduler keeps going."""
+        scheduler = RefreshScheduler()
+        scheduler.configure(lambda: 1 / 0)
+        
+        assert scheduler.run_once() is False
+        assert scheduler.failures == 1
+    
+    def test_failing_tick_is_counted_and_rescheduled(self):
+        """Ticks run when due; a raising tick doesn't stop the others."""
+        calls = []
+        scheduler = RefreshScheduler()
+        scheduler.configure(lambda: None, ticks=[(lambda: 1 / 0, 5.0), (lambda: calls.append(1), 2.0)])
+        
+        assert scheduler.run_ticks(now=100.0) == 102.0
+        assert scheduler.run_ticks(now=101.0) == 102.0
+        assert scheduler.run_ticks(now=102.0) == 104.0
+        assert (len(calls), scheduler.tick_failures) == (2, 1)
+    
+    def test_notify_triggers_refresh_on_new_data(self):
+        """A data-version change should wake the thread before the cadence."""
+        version = [0]
+        refreshed = threading.Event()
+        
+        def job():
+            if version[0] > 0:
+                refreshed.set()
+        
+        scheduler = RefreshScheduler(interval_seconds=3600, min_interval_seconds=0)
+        scheduler.configure(job, version=lambda: version[0])
+        scheduler.start()
+        try:
+            version[0] += 1
+            scheduler.notify()
+            assert refreshed.wait(2)
+        finally:
+            scheduler.stop(timeout=2)
+        assert not scheduler.running
+
+
+class RunningScheduler:
+    """Stand-in for a scheduler whose thread is alive."""
+    running = True
+
+
+class TestPredictionService:
+    """Tests for materialized predictions."""
+    
+    @pytest.fixture
+    def service(self):
+        reset_mock_db()
+        yield PredictionService(SensorService())
+        reset_mock_db()
+    
+    def test_result_is_materialized_with_age(self, service):
+        """Repeated reads serve the same stored result with its age."""
+        first = service.get(WATER_SHORTAGE)
+        second = service.get(WATER_SHORTAGE)
+        
+        assert "age_seconds" in first
+        assert first["computed_at"] == second["computed_at"]
+        assert first["stale"] is False
+    
+    def test_new_data_marks_result_stale_until_refresh(self, service):
+        """With a running scheduler, stale results are served and flagged until refresh."""
+        service._scheduler = RunningScheduler()
+        service.get(WATER_SHORTAGE)
+        service._sensor_service.ingest_reading(_reading(40.0, 3.0, timestamp="2030-01-01T00:00:00Z"))
+        
+        assert service.get(WATER_SHORTAGE)["stale"] is True
+        service.refresh()
+        assert service.get(WATER_SHORTAGE)["stale"] is False
+    
+    def test_stale_result_recomputed_inline_without_scheduler(self, service):
+        """Without a running scheduler, a stale result is recomputed on read."""
+        first = service.get(WATER_SHORTAGE)
+        service._sensor_service.ingest_reading(_reading(40.0, 3.0, timestamp="2030-01-01T00:00:00Z"))
+        
+        second = service.get(WATER_SHORTAGE)
+        
+        assert second["stale"] is False
+        assert second["data_version"] == service.data_version != first["data_version"]
+        assert service.misses == 2
+
+
+class TestConservationService:
+    """Tests for rollup-based conservation reports."""
+    
+    DAY = 86400
+    
+    @pytest.fixture
+    def service(self):
+        reset_mock_db()
+        yield ConservationService(SensorService())
+        reset_mock_db()
+    
+    def _fill_days(self, service, tank_id, first_day, last_day, flow):
+        """Add four readings per day with the given flow."""
+        for day in range(first_day, last_day + 1):
+            for hour in (0, 6, 12, 18):
+                service._sensor_service.db.rollups.add(tank_id, day * self.DAY + hour * 3600, 60.0, flow)
+    
+    def test_trailing_baseline(self, service):
+        """Without last year's data, the trailing 4 weeks are the baseline."""
+        self._fill_days(service, "SITE-A", 20000 - 28, 19999, flow=10.0)
+        self._fill_days(service, "SITE-A", 20000, 20006, flow=5.0)
+        
+        report = service.get_report("custom", 20000, 20006, tank_id="SITE-A")
+        
+        assert report["total_usage_liters"] == 140.0
+        assert report["baseline_usage_liters"] == 280.0
+        assert report["baseline_method"] == "trailing_4_weeks"
+        assert report["savings_percent"] == 50.0
+    
+    def test_same_period_last_year_baseline(self, service):
+        """Last year's matching period takes precedence when covered."""
+        self._fill_days(service, "SITE-B", 20000 - 365, 20000 - 365 + 29, flow=4.0)
+        self._fill_days(service, "SITE-B", 20000, 20029, flow=5.0)
+        
+        report = service.get_report("custom", 20000, 20029, tank_id="SITE-B")
+        
+        tank = report["tanks"][0]
+        assert tank["baseline_method"] == "same_period_last_year"
+        assert tank["baseline_liters"] == 480.0
+        assert tank["savings_percent"] == -25.0
+    
+    def test_named_periods_end_today(self, service):
+        """Named periods resolve to ranges ending on the current day."""
+        start_day, end_day = service.period_range("monthly", now=20000 * self.DAY + 100)
+        
+        assert (start_day, end_day) == (19971, 20000)
+
+
+class TestSeriesService:
+    """Tests for downsampled chart series."""
+    
+    START = 1_705_276_800.0  # 2024-01-15T00:00:00Z
+    
+    @pytest.fixture
+    def service(self):
+        reset_mock_db()
+        service = SeriesService(SensorService())
+        db = service._sensor_service.db
+        # One reading per minute for two days
+        for minute in range(2 * 24 * 60):
+            epoch = self.START + minute * 60
+            level = 50.0 + (minute % 60) / 6
+            db.columns.add("TANK-S", epoch, level, 2.0)
+            db.rollups.add("TANK-S", epoch, level, 2.0)
+        yield service
+        reset_mock_db()
+    
+    def test_choose_step_fits_budget(self):
+        """The chosen bucket keeps the point count within the budget."""
+        assert choose_step(3600, 300) == 60
+        assert choose_step(86400, 300) == 300
+        assert choose_step(365 * 86400, 100) == 7 * 86400
+        assert 10 * 365 * 86400 / choose_step(10 * 365 * 86400, 100) <= 100
+    
+    def test_raw_buckets_aggregate_min_max_avg(self, service):
+        """Narrow windows are bucketed from raw columns."""
+        series = service.get_series("TANK-S", self.START, self.START + 3 * 3600 - 1, max_points=3)
+        
+        assert series["source"] == "rollups"
+        series = service.get_series("TANK-S", self.START, self.START + 3600 - 1, max_points=6)
+        assert series["source"] == "raw"
+        assert series["bucket_seconds"] == 900
+        first = series["points"][0]
+        assert first["count"] == 15
+        assert first["level_min"] == 50.0
+        assert first["level_max"] == pytest.approx(52.33, abs=0.01)
+    
+    def test_wide_window_bounded_by_max_points(self, service):
+        """Point count never exceeds max_points, whatever the window."""
+        for method in ("buckets", "lttb"):
+            series = service.get_series(
+                "TANK-S", self.START - 365 * 86400, self.START + 2 * 86400, max_points=50, method=method
+            )
+            assert 0 < series["point_count"] <= 50
+    
+    def test_lttb_keeps_endpoints_and_peak(self):
+        """LTTB keeps the first, last and most prominent points."""
+        x = np.arange(100, dtype=float)
+        y = np.zeros(100)
+        y[40] = 10.0
+        
+        selected = lttb(x, y, 10)
+        
+        assert len(selected) == 10
+        assert selected[0] == 0 and selected[-1] == 99
+        assert 40 in selected
+
+
+class TestCompactor:
+    """Tests for time-sliced retention enforcement."""
+    
+    NOW = 1_705_276_800.0  # 2024-01-15T00:00:00Z
+    DAY = 86400
+    
+    @pytest.fixture
+    def db(self):
+        db = MockFirebaseDB(seed=False)
+        # Two readings per day for 400 days, ending now
+        for day in range(400, 0, -1):
+            for hour in (6, 18):
+                epoch = self.NOW - day * self.DAY + hour * 3600
+                db.add("sensor_readings", {
+                    "device_id": "SENSOR-001",
+                    "tank_id": "TANK-R",
+                    "water_level_percent": 50.0,
+                    "flow_rate_lpm": 2.0,
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch)),
+                })
+        return db
+    
+    def _compactor(self, db, **kwargs):
+        policy = RetentionPolicy(
+            raw_seconds=14 * self.DAY,
+            hourly_seconds=365 * self.DAY,
+            daily_seconds=None,
+            alert_seconds=30 * self.DAY,
+        )
+        compactor = Compactor(policy=policy, clock=lambda: self.NOW, **kwargs)
+        compactor.configure(db)
+        return compactor
+    
+    def test_tiers_expire_by_policy(self, db):
+        """Raw readings keep 14 days, hourly rollups a year, daily forever."""
+        stats = self._compactor(db).run_cycle()
+        
+        cutoff = self.NOW - 14 * self.DAY
+        assert stats["readings_expired"] == 2 * (400 - 14)
+        assert all(parse_timestamp(r["timestamp"]) >= cutoff for r in db.get_latest("sensor_readings", 10_000))
+        assert len(db.columns) == db.count("sensor_readings") == 28
+        
+        year_ago_hour = int((self.NOW - 365 * self.DAY) // 3600)
+        assert not list(db.rollups.hourly_buckets("TANK-R", 0, year_ago_hour - 1))
+        assert list(db.rollups.hourly_buckets("TANK-R", year_ago_hour, year_ago_hour + 48))
+        assert len(list(db.rollups.daily_buckets("TANK-R", 0, 10**6))) == 400
+    
+    def test_cycle_is_time_sliced(self, db):
+        """With a tiny budget, a cycle spreads over several slices."""
+        compactor = self._compactor(db, chunk_size=10)
+        
+        slices = 1
+        while not compactor.run_slice(budget_seconds=0):
+            slices += 1
+        
+        assert slices > 10
+        assert compactor.stats["cycles"] == 1
+    
+    def test_alerts_expire(self, db):
+        """Old alerts are dropped, recent ones kept."""
+        alert_service = AlertService()
+        alert_service.analyze_reading(_reading(97.0, 5.0))
+        old_alerts = alert_service.get_all_alerts()
+        for alert in old_alerts:
+            alert.epoch = self.NOW - 60 * self.DAY
+        alert_service.analyze_reading(_reading(97.0, 5.0))
+        
+        compactor = self._compactor(db)
+        compactor.configure(db, alert_service)
+        compactor.run_cycle()
+        
+        assert compactor.stats["alerts_expired"] == len(old_alerts)
+    
+    def test_cycle_drops_idle_leak_windows(self, db):
+        """Leak-detection history of tanks that stopped reporting is released."""
+        alert_service = AlertService()
+        alert_service.analyze_reading(_reading(50.0, 0.0, tank_id="TANK-OLD", timestamp="2024-01-10T00:00:00Z"))
+        alert_service.analyze_reading(_reading(50.0, 0.0, tank_id="TANK-NEW", timestamp="2024-01-14T23:30:00Z"))
+        
+        compactor = self._compactor(db)
+        compactor.configure(db, alert_service)
+        compactor.run_cycle()
+        
+        assert compactor.stats["leak_windows_expired"] == 1
+        assert len(alert_service._leak_detector) == 1
+    
+    def test_expired_alerts_drop_in_chunks_and_ids_still_resolve(self):
+        """Expiry pops from the front in chunks; later ids stay addressable."""
+        alert_service = AlertService()
+        for _ in range(5):
+            alert_service.analyze_reading(_reading(97.0, 5.0))
+        stored = list(alert_service._alerts)
+        for alert in stored[:3]:
+            alert.epoch = self.NOW - 60 * self.DAY
+        
+        assert alert_service.expire_alerts(self.NOW - self.DAY, 2) == (2, False)
+        assert alert_service.expire_alerts(self.NOW - self.DAY, 2) == (1, True)
+        assert alert_service.get_alert(stored[4].alert_id) is stored[4]
+        with pytest.raises(NotFoundError):
+            alert_service.get_alert(stored[0].alert_id)
+    
+    def test_column_rows_expire_in_chunks_without_sorting(self):
+        """Each drop examines at most a chunk; unsorted columns are not re-sorted under the lock."""
+        columns = ColumnStore()
+        epochs = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 2.5, 9.0])  # 2.5 arrived late
+        columns.add_many("TANK-1", epochs, np.zeros(7), np.zeros(7))
+        
+        assert columns.drop_before("TANK-1", 6.0, 2) == (2, False)
+        assert columns.drop_before("TANK-1", 6.0, 2) == (2, False)
+        assert columns.drop_before("TANK-1", 6.0, 2) == (2, False)
+        assert columns.drop_before("TANK-1", 6.0, 2) == (0, True)
+        assert len(columns) == 1
+        
+        columns.add_many("TANK-2", epochs, np.zeros(7), np.zeros(7))
+        assert columns.drop_before("TANK-2", 4.5, 10) == (4, True)
+        # The late row goes once a query has sorted the columns
+        assert columns.range("TANK-2", 0, 10)[0].tolist() == [2.5, 5.0, 9.0]
+        assert columns.drop_before("TANK-2", 4.5, 10) == (1, True)
+    
+    def test_alert_lookups_follow_expiry_and_restore(self):
+        """Alerts are found by id through an index kept in step with the store."""
+        alert_service = AlertService()
+        for _ in range(3):
+            alert_service.analyze_reading(_reading(97.0, 5.0))
+        stored = list(alert_service._alerts)
+        stored[0].epoch = self.NOW - 60 * self.DAY
+        alert_service.expire_alerts(self.NOW - self.DAY, 10)
+        
+        restored = AlertService()
+        restored.restore_state(alert_service.export_state())
+        
+        for service in (alert_service, restored):
+            assert [service.get_alert(a.alert_id).alert_id for a in stored[1:]] == [2, 3]
+            with pytest.raises(NotFoundError):
+                service.get_alert(stored[0].alert_id)
+    
+    def test_document_ids_stay_unique_after_expiry(self, db):
+        """Ids come from a counter, not the collection size."""
+        self._compactor(db).run_cycle()
+        ids = {db.add("sensor_readings", dict(_reading(50.0, 1.0), timestamp="2024-01-14T00:00:00Z")) for _ in range(3)}
+        
+        assert len(ids) == 3
+        assert "doc_800" in ids
+
+
+class TestPersistence:
+    """Tests for write-ahead log recovery and snapshots."""
+    
+    def _add_readings(self, db, tank_id, count, level=50.0):
+        for i in range(count):
+            db.add("sensor_readings", _reading(level, 1.0 + i, tank_id=tank_id, timestamp=f"2024-01-15T10:{i:02d}:00Z"))
+    
+    def _reopen(self, data_dir):
+        db = MockFirebaseDB(seed=False)
+        alert_service = AlertService()
+        persistence = Persistence(data_dir=str(data_dir), commit_interval_ms=0)
+        persistence.open(db, alert_service)
+        return persistence, db, alert_service
+    
+    def test_recovers_snapshot_and_log_tail(self, tmp_path):
+        """A restart restores snapshotted and logged writes, alerts and acks included."""
+        persistence, db, alert_service = self._reopen(tmp_path)
+        self._add_readings(db, "TANK-P", 5)
+        persistence.snapshot()
+        self._add_readings(db, "TANK-Q", 3)
+        db.set("tanks", "TANK-Q", {"tank_id": "TANK-Q", "capacity_liters": 1500.0})
+        alert_service.analyze_reading(_reading(97.0, 2.0, tank_id="TANK-Q"))
+        alert_id = alert_service.get_all_alerts()[0].alert_id
+        alert_service.acknowledge(alert_id)
+        persistence._wal.close()  # Simulate a crash: no final snapshot
+        
+        persistence, restored, restored_alerts = self._reopen(tmp_path)
+        
+        assert restored.count("sensor_readings") == 8
+        assert restored.get("tanks", "TANK-Q")["capacity_liters"] == 1500.0
+        assert len(restored.columns.range("TANK-P", 0, float("inf"))[0]) == 5
+        assert restored.rollups.version == db.rollups.version
+        assert restored_alerts.get_alert(alert_id).acknowledged is True
+        assert restored.add("sensor_readings", _reading(50.0, 1.0)) == "doc_8"
+        persistence.close()
+    
+    def test_log_overlapping_snapshot_is_not_applied_twice(self, tmp_path):
+        """Records the snapshot already covers are skipped during replay."""
+        persistence, db, _ = self._reopen(tmp_path)
+        self._add_readings(db, "TANK-P", 4)
+        persistence.snapshot()
+        # A writer that logged just after the log rotated, while the snapshot captured its reading
+        persistence._wal.log_add("sensor_readings", db.get_latest("sensor_readings")[0])
+        persistence._wal.close()
+        
+        _, restored, _ = self._reopen(tmp_path)
+        
+        assert restored.count("sensor_readings") == 4
+    
+    def test_torn_log_tail_is_discarded(self, tmp_path):
+        """A record cut short by a crash is dropped; earlier records survive."""
+        log = WriteAheadLog(str(tmp_path), commit_interval_ms=0)
+        log.open()
+        for number in range(3):
+            log.log_add("sensor_readings", dict(_reading(50.0, 1.0), _id=f"doc_{number}", created_at="x"))
+        log.close()
+        path = os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0])
+        with open(path, "r+b") as handle:
+            handle.truncate(os.path.getsize(path) - 5)
+        
+        records = list(replay(str(tmp_path)))
+        
+        assert [decode_reading(payload)["_id"] for _, payload in records] == ["doc_0", "doc_1"]
+        assert list(replay(str(tmp_path))) == records
+
+    
+    def test_alerts_raised_together_share_one_commit(self, tmp_path):
+        """A reading that fires several rules waits for a single fsync."""
+        log = WriteAheadLog(str(tmp_path), commit_interval_ms=0)
+        log.open()
+        alert_service = AlertService()
+        alert_service.journal = log
+        
+        result = alert_service.analyze_reading(_reading(97.0, 60.0))
+        log.close()
+        
+        assert result["alerts_count"] >= 2
+        assert log.stats == {"records": result["alerts_count"], "bytes": log.stats["bytes"], "commits": 1}
+        assert [decode_json(payload)["id"] for _, payload in replay(str(tmp_path))] == [
+            alert.alert_id for alert in result["alerts"]
+        ]
+    
+    def test_segment_is_read_one_record_at_a_time(self, tmp_path, monkeypatch):
+        """Recovery never reads a whole segment into memory."""
+        log = WriteAheadLog(str(tmp_path), commit_interval_ms=0)
+        log.open()
+        log.log_add_many("sensor_readings", [
+            dict(_reading(50.0, 1.0), _id=f"doc_{number}", created_at="x") for number in range(50)
+        ])
+        log.close()
+        sizes = []
+        real_open = open
+        
+        class Recording:
+            def __init__(self, handle):
+                self._handle = handle
+            
+            def read(self, size=-1):
+                sizes.append(size)
+                return self._handle.read(size)
+            
+            def __getattr__(self, name):
+                return getattr(self._handle, name)
+            
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *exc):
+                return self._handle.__exit__(*exc)
+        
+        monkeypatch.setattr(wal, "open", lambda *args, **kwargs: Recording(real_open(*args, **kwargs)), raising=False)
+        records = list(replay(str(tmp_path)))
+        
+        assert len(records) == 50
+        assert sizes and max(sizes) <= max(len(payload) for _, payload in records)
+        assert -1 not in sizes
+
+class TestSegmentStore:
+    """Tests for sealing history into memory-mapped day segments."""
+    
+    NOW = 1_705_276_800.0  # 2024-01-15T00:00:00Z
+    DAY = 86400
+    
+    def _db(self, directory, days=5):
+        db = MockFirebaseDB(seed=False)
+        db.attach_segments(SegmentStore(str(directory)).open())
+        for day in range(days, 0, -1):
+            for hour in (3, 15):
+                self._add(db, self.NOW - day * self.DAY + hour * 3600, level=float(day))
+        return db
+    
+    def _add(self, db, epoch, level=50.0):
+        db.add("sensor_readings", dict(_reading(level, 2.0, tank_id="TANK-S"), timestamp=time.strftime(
+            "%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))))
+    
+    def _compact(self, db):
+        policy = RetentionPolicy(raw_seconds=None, hourly_seconds=None, daily_seconds=None,
+                                 alert_seconds=None, active_seconds=2 * self.DAY)
+        compactor = Compactor(policy=policy, clock=lambda: self.NOW)
+        compactor.configure(db)
+        return compactor.run_cycle()
+    
+    def test_sealing_moves_old_days_out_of_memory(self, tmp_path):
+        """Days before the active window are served from mapped segments."""
+        db = self._db(tmp_path)
+        before = db.columns.range("TANK-S", 0, float("inf"))
+        
+        stats = self._compact(db)
+        
+        assert stats["readings_sealed"] == 6
+        assert db.count("sensor_readings") == 4
+        after = db.columns.range("TANK-S", 0, float("inf"))
+        assert all(np.array_equal(a, b) for a, b in zip(before, after))
+        sealed = next(db.segments.iter_range("TANK-S", 0, self.NOW))
+        assert isinstance(sealed[0].base, np.memmap) or isinstance(sealed[0], np.memmap)
+        window = db.get_by_date_range(
+            "sensor_readings", datetime(2024, 1, 10), datetime(2024, 1, 12, 23, 59)
+        )
+        assert [r["water_level_percent"] for r in window] == [5.0, 5.0, 4.0, 4.0, 3.0, 3.0]
+    
+    def test_detach_walks_in_chunks_while_readings_arrive(self, tmp_path):
+        """Each chunk is a short lock hold; readings added mid-pass are kept once, in order."""
+        db = self._db(tmp_path)  # 10 readings, 6 before the active window
+        cutoff_day = int((self.NOW - 2 * self.DAY) // self.DAY)
+        
+        detach = db.detach_sealable(cutoff_day, chunk_size=3)
+        next(detach)
+        assert db.count("sensor_readings") + len(db._sealing) == 10
+        self._add(db, self.NOW + 3600)  # Arrives between chunks
+        pauses = 1
+        try:
+            while True:
+                next(detach)
+                pauses += 1
+        except StopIteration as stop:
+            groups = stop.value
+        
+        assert pauses == 3  # Four chunks of at most 3 readings
+        assert sum(len(docs) for docs in groups.values()) == 6
+        kept = list(db._collections["sensor_readings"])
+        assert [d["_id"] for d in kept] == ["doc_6", "doc_7", "doc_8", "doc_9", "doc_10"]
+        assert db.count("sensor_readings") == 5
+    
+    def test_reopen_reads_sealed_history(self, tmp_path):
+        """A new process sees sealed days from the manifests alone."""
+        self._compact(self._db(tmp_path))
+        
+        db = MockFirebaseDB(seed=True)
+        db.attach_segments(SegmentStore(str(tmp_path)).open())
+        
+        assert db.count("sensor_readings") == 0  # Sample data is dropped over real history
+        assert db.columns.count_between("TANK-S", 0, self.NOW) == 6
+        assert db.add("sensor_readings", _reading(50.0, 1.0)) == "doc_6"  # Numbering continues
+    
+    def test_late_reading_is_merged_once(self, tmp_path):
+        """Late readings join their sealed day; re-sealing never duplicates rows."""
+        db = self._db(tmp_path)
+        self._compact(db)
+        self._add(db, self.NOW - 4 * self.DAY + 6 * 3600)
+        
+        self._compact(db)  # Same day: sealing waits for the next rollover
+        assert db.segments.row_count() == 6
+        self._compact_next_day(db)
+        
+        assert db.segments.row_count() == 9
+        assert db.columns.count_between("TANK-S", 0, self.NOW) == 11
+        readings = db.get_by_date_range("sensor_readings", datetime(2024, 1, 1), datetime(2024, 1, 20))
+        assert len(readings) == len({r["_id"] for r in readings}) == 11  # 9 sealed + 2 in memory
+    
+    def test_range_query_uses_event_time_before_and_after_sealing(self, tmp_path):
+        """A late reading is found by its timestamp whether or not its day is sealed yet."""
+        db = self._db(tmp_path)
+        self._compact(db)
+        self._add(db, self.NOW - 4 * self.DAY + 6 * 3600)  # Late reading for a sealed day, still in memory
+        window = (datetime(2024, 1, 11), datetime(2024, 1, 11, 23, 59, 59))
+        
+        before = db.get_by_date_range("sensor_readings", *window)
+        self._compact_next_day(db)
+        after = db.get_by_date_range("sensor_readings", *window)
+        
+        expected = ["2024-01-11T03:00:00Z", "2024-01-11T06:00:00Z", "2024-01-11T15:00:00Z"]
+        assert [r["timestamp"] for r in before] == [r["timestamp"] for r in after] == expected
+        assert [r["_id"] for r in before] == [r["_id"] for r in after]
+        assert db.segments.row_count() == 9  # The late reading now lives in a segment
+    
+    def test_export_rows_merge_sealed_and_live_in_time_order(self, tmp_path):
+        """Sealed days and in-memory readings stream as one ordered sequence."""
+        db = self._db(tmp_path)
+        self._compact(db)
+        self._add(db, self.NOW - 4 * self.DAY + 6 * 3600)  # Late reading for a sealed day
+        
+        rows = list(db.iter_readings(0, float("inf")))
+        
+        assert len(rows) == 11
+        assert [r[0] for r in rows] == sorted(r[0] for r in rows)
+        assert rows[3][1:] == ("2024-01-11T06:00:00Z", "SENSOR-001", "TANK-S", 50.0, 2.0)
+    
+    def test_column_batches_pass_sealed_buffers_through(self, tmp_path):
+        """Sealed batches are views of the mapped segments, not copies."""
+        db = self._db(tmp_path)
+        self._compact(db)
+        
+        batches = list(db.iter_column_batches(0, float("inf"), "TANK-S"))
+        
+        assert sum(len(epochs) for _, epochs, *_ in batches) == 10
+        _, epochs, levels, _, codes, devices = batches[0]
+        assert np.shares_memory(levels, next(db.segments.iter_range("TANK-S", 0, self.NOW))[1])
+        assert [devices[c] for c in codes] == ["SENSOR-001", "SENSOR-001"]
+    
+    def _compact_next_day(self, db):
+        self.NOW += self.DAY
+        try:
+            self._compact(db)
+        finally:
+            self.NOW -= self.DAY
+
+
+class TestBulkImport:
+    """Tests for batch validation and the bulk import path."""
+    
+    def test_batch_validation_matches_single_rules(self):
+        """Bad records are reported by index; good ones are normalized."""
+        records = [
+            _reading("42.567", "3.1"),
+            _reading(150, 2.0),
+            dict(_reading(50, 2.0), device_id=None),
+            _reading(50, "fast"),
+            dict(_reading(50, 2.0), timestamp="2024-01-15T12:30:00+00:00"),
+        ]
+        
+        valid, errors = validate_sensor_batch(records)
+        
+        assert [r["water_level_percent"] for r in valid] == [42.57, 50.0]
+        assert valid[1]["timestamp"] == "2024-01-15T12:30:00Z"
+        assert [index for index, _ in errors] == [1, 2, 3]
+        assert "between" in errors[0][1] and "required" in errors[1][1]
+    
+    def test_add_many_matches_single_adds(self):
+        """The bulk write path builds the same columns and rollups as add()."""
+        readings = [
+            _reading(50 - i, 1.0 + i % 3, tank_id=f"TANK-{i % 2}", timestamp=f"2024-01-15T{i:02d}:10:00Z")
+            for i in range(20)
+        ]
+        single = MockFirebaseDB(seed=False)
+        for reading in readings:
+            single.add("sensor_readings", dict(reading))
+        bulk = MockFirebaseDB(seed=False)
+        
+        ids = bulk.add_many("sensor_readings", [dict(r) for r in readings])
+        
+        assert ids == [f"doc_{i}" for i in range(20)]
+        for tank_id in ("TANK-0", "TANK-1"):
+            for a, b in zip(single.columns.range(tank_id, 0, 2e9), bulk.columns.range(tank_id, 0, 2e9)):
+                assert np.array_equal(a, b)
+        expected, actual = single.rollups.export_arrays(), bulk.rollups.export_arrays()
+        assert all(np.array_equal(expected[key], actual[key]) for key in expected)
+    
+    def test_bulk_readings_are_filed_under_their_event_date(self):
+        """Historical batches show up on their own dates, not as today's data."""
+        db = MockFirebaseDB(seed=False)
+        db.add_many("sensor_readings", [
+            _reading(50.0, 1.0, timestamp="2024-01-15T10:30:00.250Z"),
+            _reading(49.0, 1.0, timestamp="2024-01-16T23:59:59Z"),
+        ])
+        
+        day = db.get_by_date_range("sensor_readings", datetime(2024, 1, 15), datetime(2024, 1, 15, 23, 59, 59))
+        today = db.get_by_date_range("sensor_readings", datetime.utcnow().replace(hour=0), datetime.utcnow())
+        
+        assert [r["timestamp"] for r in day] == ["2024-01-15T10:30:00.250Z"]
+        assert today == []
+    
+    def test_add_and_add_many_agree_on_created_at_and_event_time(self):
+        """Both write paths stamp the store time and are windowed by reading time."""
+        db = MockFirebaseDB(seed=False)
+        before = datetime.utcnow().isoformat()
+        db.add("sensor_readings", _reading(50.0, 1.0, timestamp="2024-01-15T08:00:00Z"))
+        db.add_many("sensor_readings", [
+            _reading(49.0, 1.0, timestamp="2024-01-15T09:00:00Z"),
+            _reading(48.0, 1.0, timestamp="2024-01-14T09:00:00Z"),
+        ])
+        after = datetime.utcnow().isoformat()
+        
+        day = db.get_by_date_range("sensor_readings", datetime(2024, 1, 15), datetime(2024, 1, 15, 23, 59, 59))
+        latest = db.get_latest("sensor_readings", limit=3)
+        
+        assert [r["water_level_percent"] for r in day] == [50.0, 49.0]
+        assert all(before <= r["created_at"] <= after for r in latest)
+        assert latest[0]["water_level_percent"] == 49.0  # Newest reading of the newest batch
+    
+    @pytest.mark.parametrize("workers", [0, 2])
+    def test_import_streams_csv_and_ndjson(self, tmp_path, workers):
+        """Files are imported in chunks; rejected lines are counted, not stored."""
+        csv_path = tmp_path / "history.csv"
+        rows = [f"SENSOR-001,TANK-H,{i % 100},2.5,2024-01-0{1 + i // 24}T{i % 24:02d}:00:00Z" for i in range(48)]
+        csv_path.write_text("device_id,tank_id,water_level_percent,flow_rate_lpm,timestamp\n"
+                            + "\n".join(rows) + "\nSENSOR-001,TANK-H,,2.5,\n")
+        ndjson_path = tmp_path / "more.ndjson"
+        ndjson_path.write_text('{"device_id": "SENSOR-002", "tank_id": "TANK-H", "water_level_percent": 40, '
+                               '"flow_rate_lpm": 1.0, "timestamp": "2024-01-03T00:00:00Z"}\nnot json\n')
+        db = MockFirebaseDB(seed=False)
+        progress = []
+        
+        stats = BulkImporter(db, chunk_size=10, workers=workers, progress=progress.append).import_files(
+            [str(csv_path), str(ndjson_path)]
+        )
+        
+        assert stats["rows_imported"] == 49 and stats["rows_rejected"] == 2
+        assert [e["line"] for e in stats["errors"]] == [50, 2]
+        assert db.count("sensor_readings") == 49
+        assert db.columns.count_between("TANK-H", 0, 2e9) == 49
+        assert len(progress) == stats["chunks"] == 6
+    
+    def test_bulk_writes_are_journaled(self, tmp_path):
+        """A crash after add_many loses nothing: the batch is in the log."""
+        db = MockFirebaseDB(seed=False)
+        persistence = Persistence(data_dir=str(tmp_path), commit_interval_ms=0)
+        persistence.open(db)
+        db.add_many("sensor_readings", [_reading(40.0 + i, 1.0, timestamp=f"2024-01-15T10:{i:02d}:00Z")
+                                        for i in range(6)])
+        persistence._wal.close()  # Simulate a crash: no final snapshot
+        
+        restored = MockFirebaseDB(seed=False)
+        persistence = Persistence(data_dir=str(tmp_path), commit_interval_ms=0)
+        persistence.open(restored)
+        
+        assert restored.count("sensor_readings") == 6
+        assert restored.rollups.version == db.rollups.version
+        persistence.close()
+    
+    def test_historical_rows_go_straight_to_segments(self, tmp_path):
+        """Readings of sealed days skip the heap but still reach the rollups."""
+        db = MockFirebaseDB(seed=False)
+        db.attach_segments(SegmentStore(str(tmp_path)).open())
+        db.finish_sealing(int(parse_timestamp("2024-01-10T00:00:00Z") // 86400), [])
+        
+        db.add_many("sensor_readings", [
+            _reading(30.0, 1.0, timestamp="2024-01-05T10:00:00Z"),
+            _reading(31.0, 1.0, timestamp="2024-01-12T10:00:00Z"),
+        ])
+        
+        assert db.count("sensor_readings") == 1
+        assert db.segments.row_count() == 1
+        assert db.columns.count_between("TANK-001", 0, 2e9) == 2
+        assert len(list(db.rollups.daily_buckets("TANK-001", 0, 10**6))) == 2
+
+
+class TestBenchmarks:
+    """Tests for the benchmark harness."""
+    
+    def test_suite_reports_every_benchmark_per_backend(self):
+        """A tiny run covers every benchmark on both backends and serializes to JSON."""
+        report = run_suite(sizes=[500], budget_seconds=0)
+        
+        names = {r["benchmark"] for r in report["results"]}
+        assert {"ingest_reading", "get_daily_analytics", "analyze_reading", "http_alerts"} <= names
+        assert {r["backend"] for r in report["results"]} == {"memory", "segments"}
+        assert all(r["rounds"] >= 3 and r["p50_us"] > 0 for r in report["results"])
+        assert json.loads(json.dumps(report))["meta"]["python"]
+    
+    def test_compare_flags_regressions(self):
+        """Only benchmarks slower than the threshold are reported."""
+        def report(p50):
+            return {"results": [
+                {"backend": "memory", "size": 10, "benchmark": name, "p50_us": value}
+                for name, value in p50.items()
+            ]}
+        
+        regressions = compare(report({"a": 100.0, "b": 100.0}), report({"a": 110.0, "b": 200.0}), 1.25)
+        
+        assert len(regressions) == 1 and " b " in regressions[0]
+
+
+class TestMetrics:
+    """Tests for the per-thread metric series."""
+    
+    def test_histogram_merges_thread_shards(self):
+        """Observations from finished threads survive in the totals."""
+        histogram = Histogram((0.01, 0.1))
+        
+        def record():
+            for _ in range(100):
+                histogram.observe(("/a",), 0.05)
+        
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        histogram.observe(("/a",), 0.001)
+        histogram.observe(("/a",), 1.0)
+        
+        values = histogram.snapshot()[("/a",)]
+        
+        assert values[:3] == [1, 400, 1]
+        assert values[-1] == pytest.approx(21.001)
+        assert len(histogram._shards) == 1  # Dead threads were retired
+    
+    def test_render_cumulative_buckets_and_escaping(self):
+        """Buckets are cumulative and label values are escaped."""
+        histogram = Histogram((0.1, 1.0))
+        histogram.observe(('say "hi"',), 0.05)
+        histogram.observe(('say "hi"',), 0.5)
+        
+        text = render([
+            histogram_family("latency_seconds", "Latency.", ("route",), histogram),
+            MetricFamily("queue_depth", "gauge", "Queued.", [("", {}, 3)]),
+        ])
+        
+        assert 'latency_seconds_bucket{route="say \\"hi\\"",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{route="say \\"hi\\"",le="+Inf"} 2' in text
+        assert 'latency_seconds_count{route="say \\"hi\\"",le' not in text
+        assert "# TYPE queue_depth gauge\nqueue_depth 3\n" in text
+
+
+class TestTracing:
+    """Tests for request tracing spans."""
+    
+    def test_span_is_noop_without_trace(self):
+        """Outside a traced request span() records nothing."""
+        assert current_trace() is None
+        with span("validation"):
+            pass
+        assert current_trace() is None
+    
+    def test_nested_spans_record_depth(self):
+        """Spans record their nesting depth and offsets within the trace."""
+        token = start_trace()
+        try:
+            with span("aggregation"):
+                with span("store_read"):
+                    pass
+            trace = current_trace()
+        finally:
+            end_trace(token)
+        
+        spans = {s["name"]: s for s in trace.spans}
+        assert spans["aggregation"]["depth"] == 0
+        assert spans["store_read"]["depth"] == 1
+        assert spans["store_read"]["start_ms"] >= spans["aggregation"]["start_ms"]
+        assert current_trace() is None
+
+
+class ListHandler(logging.Handler):
+    """Collects records for assertions."""
+    
+    def __init__(self):
+        super().__init__()
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _isolated_logger(name, handler):
+    test_logger = logging.getLogger(name)
+    test_logger.handlers = [handler]
+    test_logger.propagate = False
+    test_logger.setLevel(logging.INFO)
+    return test_logger
+
+
+class TestLogging:
+    """Tests for sampled and queued logging."""
+    
+    def test_sampled_logger_rate_limits_and_reports_suppressed(self):
+        """Beyond the burst, records are counted instead of logged."""
+        handler = ListHandler()
+        sampled = SampledLogger(_isolated_logger("test.sampled", handler), per_second=0.001, burst=2)
+        
+        for i in range(10):
+            sampled.info("Ingested reading", device_id=f"D-{i}")
+        sampled._tokens = 1.0  # Refill as if time had passed
+        sampled.info("Ingested reading", device_id="D-last")
+        
+        assert [r.fields["device_id"] for r in handler.records] == ["D-0", "D-1", "D-last"]
+        assert handler.records[-1].fields["suppressed"] == 8
+    
+    def test_queue_handler_defers_formatting(self):
+        """Messages and lazy fields are only rendered by the writer."""
+        calls = []
+        handler = DeferredQueueHandler(queue.Queue(maxsize=1))
+        test_logger = _isolated_logger("test.deferred", handler)
+        
+        test_logger.warning("Alerts for %s", "D-1", extra={"fields": {"types": Lazy(lambda: calls.append(1) or ["overflow"])}})
+        test_logger.warning("Dropped")  # Queue is full
+        
+        record = handler.queue.get_nowait()
+        assert calls == [] and record.args == ("D-1",)
+        assert handler.dropped == 1
+        entry = json.loads(JsonFormatter().format(record))
+        assert entry["message"] == "Alerts for D-1"
+        assert entry["types"] == ["overflow"] and entry["level"] == "WARNING"
+    
+    def test_service_logs_carry_fields_not_formatted_text(self):
+        """Service messages are constant; their values travel as structured fields."""
+        handler = ListHandler()
+        service_logger = logging.getLogger(MockFirebaseDB.__module__)
+        level = service_logger.level
+        service_logger.addHandler(handler)
+        service_logger.setLevel(logging.INFO)
+        try:
+            seed_database(MockFirebaseDB(seed=False), "sample", days=1, tanks=2)
+        finally:
+            service_logger.removeHandler(handler)
+            service_logger.setLevel(level)
+        
+        record = handler.records[-1]
+        assert record.getMessage() == "Seeded sample readings"
+        assert record.fields == {"readings": 48, "tanks": 2}
+
+
+class TestSeeding:
+    """Tests for startup seeding modes and the startup report."""
+    
+    def test_sample_seed_covers_every_tank_in_time_order(self):
+        """Sample mode writes hourly readings per tank, event times backdated and interleaved."""
+        db = MockFirebaseDB(seed=False)
+        seed_database(db, "sample", days=1, tanks=3)
+        
+        readings = db.get_latest("sensor_readings", limit=100)
+        epochs = [parse_timestamp(r["timestamp"]) for r in reversed(readings)]
+        assert db.count("sensor_readings") == 72
+        assert {r["tank_id"] for r in readings} == {"TANK-MAIN", "TANK-002", "TANK-003"}
+        assert epochs == sorted(epochs)
+        assert len({r["created_at"] for r in readings}) == 1  # Stored as one batch
+        assert len(db.columns.range("TANK-002", 0, float("inf"))[0]) == 24
+    
+    def test_snapshot_seed_restores_exported_state(self, tmp_path):
+        """Snapshot mode loads a persistence snapshot instead of generating data."""
+        source = MockFirebaseDB(seed=False)
+        seed_database(source, "sample", days=2, tanks=2)
+        path = str(tmp_path / "snapshot.npz")
+        write_snapshot(path, *source.export_state())
+        
+        db = MockFirebaseDB(seed=False)
+        seed_database(db, "snapshot", days=0, tanks=0, snapshot_path=path)
+        empty = MockFirebaseDB(seed=False)
+        seed_database(empty, "none", days=7, tanks=1)
+        
+        assert db.count("sensor_readings") == 96
+        assert db.next_ids() == source.next_ids()
+        assert empty.count("sensor_readings") == 0
+    
+    def test_configure_seeding_rejects_bad_settings(self):
+        """Unknown modes and snapshot mode without a path are refused."""
+        with pytest.raises(ValueError):
+            configure_seeding("random")
+        with pytest.raises(ValueError):
+            configure_seeding("snapshot")
+    
+    def test_startup_report_orders_phases(self):
+        """Phases are kept in run order; the summary lists the slowest first."""
+        report = StartupReport()
+        report.add("imports", 0.002)
+        with report.phase("seed"):
+            pass
+        report.add("extensions", 0.005)
+        
+        assert [p["name"] for p in report.to_dict()["phases"]] == ["imports", "seed", "extensions"]
+        assert report.total_ms >= 7.0
+        assert report.summary().startswith("Startup took") and "(extensions 5.0, imports 2.0" in report.summary()
+
+
+class TestSimulator:
+    """Tests for the synthetic fleet simulator."""
+    
+    def test_same_seed_same_fleet(self):
+        """A fleet is determined by its profile, so workers can share it."""
+        profile = FleetProfile(tanks=8, devices_per_tank=2, seed=7)
+        first = FleetSimulator(profile, start=0)
+        second = FleetSimulator(profile, start=0)
+        
+        epoch, levels, flows = first.step()
+        assert epoch == 0 and np.array_equal(levels, second.step()[1])
+        assert len(first.documents(epoch, levels, flows)) == 16
+        mask = np.arange(8) % 3 == 1
+        selected = first.documents(epoch, levels, flows, mask)
+        assert [d["device_id"] for d in selected] == [
+            "SIM-00001-0", "SIM-00001-1", "SIM-00004-0", "SIM-00004-1", "SIM-00007-0", "SIM-00007-1",
+        ]
+        assert {d["tank_id"] for d in selected} == {"SIM-TANK-00001", "SIM-TANK-00004", "SIM-TANK-00007"}
+    
+    def test_faults_show_up_in_readings(self):
+        """Leaking tanks keep flowing at night; overfilling tanks pass the overflow level."""
+        profile = FleetProfile(tanks=40, leak_fraction=0.2, overflow_fraction=0.2)
+        simulator = FleetSimulator(profile, start=0)
+        night_flows, peak_levels = [], np.zeros(40)
+        for _ in range(2 * 24 * 60):
+            epoch, levels, flows = simulator.step()
+            peak_levels = np.maximum(peak_levels, levels)
+            if 2 <= (epoch // 3600) % 24 < 4:
+                night_flows.append(flows)
+        night = np.min(night_flows, axis=0)
+        
+        assert simulator.leaking.any() and simulator.overfilling.any()
+        assert (night[simulator.leaking] >= profile.leak_lpm).all()
+        assert (night[~simulator.leaking] < 0.5).all()
+        assert (peak_levels[simulator.overfilling] > 95).all()
+        assert (peak_levels[~simulator.overfilling] < 85).all()
+    
+    def test_write_fleet_stores_readings_and_tanks(self):
+        """Store mode writes every device's readings and the tank capacities."""
+        db = MockFirebaseDB(seed=False)
+        simulator = FleetSimulator(FleetProfile(tanks=5, devices_per_tank=2), start=time.time() - 3600)
+        
+        stats = write_fleet(db, simulator, steps=60, batch_size=100)
+        
+        assert stats["readings_written"] == db.count("sensor_readings") == 600
+        assert len(db.columns.range("SIM-TANK-00003", 0, float("inf"))[0]) == 120
+        assert db.get("tanks", "SIM-TANK-00003")["capacity_liters"] == simulator.capacities[3]
+    
+    def test_drive_http_paces_requests(self):
+        """HTTP mode registers tanks and posts readings to a live server."""
+        from werkzeug.serving import make_server
+        from src.smart_water_api.app_factory import create_app
+        
+        app = create_app({"TESTING": True, "SCHEDULER_ENABLED": False, "COMPACTION_ENABLED": False})
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            stats = drive_http(f"http://127.0.0.1:{server.server_port}", FleetProfile(tanks=3), rate=50, duration_seconds=0.5)
+        finally:
+            server.shutdown()
+        
+        assert stats["errors"] == 0 and stats["statuses"] == {"201": stats["sent"]}
+        assert 15 <= stats["sent"] <= 26
+        assert app.test_client().get("/api/v1/tanks/SIM-TANK-00002").get_json()["capacity_liters"] > 0
+        reset_mock_db()
+
+
+def _slow_total(columns, delay):
+    time.sleep(delay)
+    return float(columns["values"].sum())
+
+
+class TestAnalyticsService:
+    """Tests for column-based analytics."""
+    
+    def test_hourly_pattern_buckets_reading_time(self):
+        """Flows are averaged per UTC hour of the reading time, from the columns."""
+        reset_mock_db()
+        configure_seeding(mode="none")
+        try:
+            sensor_service = SensorService()
+            day = (int(time.time()) // 86400 - 2) * 86400
+            stamps = [day + 3 * 3600, day + 3 * 3600 + 1800, day + 15 * 3600]
+            sensor_service.db.add_many("sensor_readings", [
+                _reading(50.0, flow, timestamp=datetime.utcfromtimestamp(stamp).strftime("%Y-%m-%dT%H:%M:%SZ"))
+                for stamp, flow in zip(stamps, (2.0, 4.0, 7.0))
+            ])
+            pattern = AnalyticsService(sensor_service).get_hourly_pattern()["hourly_pattern"]
+        finally:
+            configure_seeding()
+            reset_mock_db()
+        
+        averages = {row["hour"]: row["average_flow_lpm"] for row in pattern if row["average_flow_lpm"]}
+        assert averages == {3: 3.0, 15: 7.0}
+        assert [row["hour_label"] for row in pattern][:2] == ["00:00", "01:00"]
+
+
+class TestAnalyticsPool:
+    """Tests for offloading analytics to worker processes."""
+    
+    @pytest.fixture
+    def pool(self):
+        pool = AnalyticsPool(workers=2, timeout_seconds=5)
+        pool.start()
+        yield pool
+        pool.stop()
+    
+    def test_columns_round_trip_through_shared_memory(self):
+        """Attached columns view the shared block with their dtype and shape."""
+        columns = {"epochs": np.arange(5, dtype=np.float64), "codes": np.arange(6, dtype=np.int32).reshape(2, 3)}
+        block, specs = share_columns(columns)
+        try:
+            attached, views = attach_columns(block.name, specs)
+            assert np.array_equal(views["epochs"], columns["epochs"])
+            assert views["codes"].dtype == np.int32 and views["codes"].shape == (2, 3)
+            views = None
+            attached.close()
+        finally:
+            block.close()
+            block.unlink()
+    
+    def test_offloaded_daily_analytics_match_inline(self, pool):
+        """A 30-day window computed in a worker matches the in-thread aggregation."""
+        reset_mock_db()
+        configure_seeding(mode="sample", days=30, tanks=3)
+        try:
+            sensor_service = SensorService()
+            inline = AnalyticsService(sensor_service).get_daily_analytics(days=30)
+            offloaded = AnalyticsService(sensor_service, pool=pool).get_daily_analytics(days=30)
+        finally:
+            configure_seeding()
+            reset_mock_db()
+        
+        assert pool.stats["submitted"] == 1
+        assert offloaded == inline
+    
+    def test_app_pool_matches_inline_for_late_readings(self, sample_sensor_data):
+        """Through the app, a pooled window counts the same readings as the inline path."""
+        from src.smart_water_api.app_factory import create_app
+        from src.smart_water_api.extensions import analytics_pool
+        
+        app = create_app({"TESTING": True, "ANALYTICS_POOL_WORKERS": 2, "SCHEDULER_ENABLED": False})
+        client = app.test_client()
+        # Arrives now but was taken long before the window
+        client.post("/api/v1/sensors/ingest", json=sample_sensor_data)
+        analytics_pool.start()  # Not started under testing
+        try:
+            submitted = analytics_pool.stats["submitted"]
+            pooled = client.get("/api/v1/analytics/daily?days=14").get_json()
+            assert analytics_pool.stats["submitted"] == submitted + 1
+        finally:
+            analytics_pool.stop()
+        try:
+            inline = client.get("/api/v1/analytics/daily?days=14").get_json()
+        finally:
+            reset_mock_db()
+        
+        assert pooled == inline
+        assert sample_sensor_data["timestamp"][:10] not in [d["date"] for d in pooled["daily_data"]]
+    
+    def test_identical_concurrent_requests_share_one_job(self, pool):
+        """Callers asking for the same key while it runs get the same result."""
+        loads = []
+        
+        def load():
+            loads.append(1)
+            return {"values": np.arange(1000, dtype=np.float64)}
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(pool.run("total", _slow_total, load, 0.3)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert results == [499500.0] * 5
+        assert len(loads) == 1 and pool.stats["submitted"] == 1 and pool.stats["coalesced"] == 4
+        assert pool.pending == 0
+    
+    def test_timeout_gives_up_and_frees_the_key(self, pool):
+        """A caller that times out gets a 503 and the next caller starts a fresh job."""
+        load = lambda: {"values": np.ones(10)}
+        with pytest.raises(AnalyticsUnavailableError) as error:
+            pool.run("slow", _slow_total, load, 1.0, timeout=0.1)
+        
+        assert error.value.status_code == 503 and error.value.reason == "timeout"
+        assert pool.pending == 0
+        assert pool.run("slow", _slow_total, load, 0.0) == 10.0
+    
+    def test_refuses_work_beyond_max_pending(self):
+        """Distinct computations beyond the bound are refused as busy."""
+        pool = AnalyticsPool(workers=0, max_pending=0)
+        with pytest.raises(AnalyticsUnavailableError) as error:
+            pool.run("any", _slow_total, lambda: {"values": np.ones(1)}, 0.0)
+        
+        assert error.value.reason == "busy"
+        assert AnalyticsPool(workers=0).run("any", _slow_total, lambda: {"values": np.ones(3)}, 0.0) == 3.0
+
+
+class TestSingleFlight:
+    """Tests for coalescing identical concurrent calls."""
+    
+    @staticmethod
+    def _concurrently(count, target):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+    
+    @staticmethod
+    def _wait_until(condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.001)
+    
+    def test_concurrent_callers_share_one_execution(self):
+        """Callers arriving while the leader runs get its result."""
+        flights = SingleFlight()
+        release = threading.Event()
+        calls, results = [], []
+        
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return {"value": 42}
+        
+        threads = self._concurrently(6, lambda: results.append(flights.do("key", compute)))
+        self._wait_until(lambda: flights.shared >= 5)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert len(calls) == 1 and flights.executions == 1
+        assert all(result is results[0] for result in results) and len(results) == 6
+        assert flights.in_flight == 0
+        assert flights.do("key", lambda: "fresh") == "fresh"  # Nothing is cached
+    
+    def test_errors_are_shared_and_the_key_freed(self):
+        """Waiters see the leader's exception; the next call runs again."""
+        flights = SingleFlight()
+        release = threading.Event()
+        errors = []
+        
+        def fail():
+            release.wait(5)
+            raise ValueError("store unavailable")
+        
+        def call():
+            try:
+                flights.do("key", fail)
+            except ValueError as e:
+                errors.append(e)
+        
+        threads = self._concurrently(3, call)
+        self._wait_until(lambda: flights.shared >= 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert len(errors) == 3 and flights.executions == 1
+        assert flights.do("key", lambda: "ok") == "ok"
+    
+    def test_daily_analytics_polled_together_are_computed_once(self):
+        """Dashboard clients polling at the same moment trigger one aggregation."""
+        service = AnalyticsService(SensorService())
+        read = service._window_columns
+        release = threading.Event()
+        reads = []
+        
+        def slow_read(start_date, end_date):
+            reads.append(1)
+            release.wait(5)
+            return read(start_date, end_date)
+        
+        service._window_columns = slow_read
+        results = []
+        threads = self._concurrently(4, lambda: results.append(service.get_daily_analytics(days=7)))
+        self._wait_until(lambda: service.flights.shared >= 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+        
+        assert len(reads) == 1 and len(results) == 4
+        assert results[0]["summary"]["total_readings"] > 0
+
+
+class TestIngestListener:
+    """Tests for line-protocol ingest over TCP and UDP."""
+    
+    @pytest.fixture
+    def listener(self):
+        sensor_service = SensorService(offline_monitor=OfflineMonitor())
+        sensor_service._db = MockFirebaseDB(seed=False)
+        listener = IngestListener(host="127.0.0.1", tcp_port=None, udp_port=None, batch_size=100, flush_ms=10)
+        notified = []
+        listener.configure(sensor_service, AlertService(), on_ingest=lambda: notified.append(1))
+        listener.start()
+        listener.notified = notified
+        yield listener
+        listener.stop(timeout=5)
+    
+    @staticmethod
+    def _wait_until(condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.005)
+    
+    def test_parse_lines_timestamps(self):
+        """Epoch and ISO timestamps are accepted; missing ones use the receive time."""
+        text = (
+            "S-1,T-1,50,2.5,1705314600.9\n"
+            "S-1,T-1,51,2.5,2024-01-15T10:31:00Z\n"
+            "# comment\n"
+            "\n"
+            "S-1,T-1,52,2.5\n"
+            "S-1,T-1,52\n"
+        )
+        
+        records, epochs, malformed = parse_lines(text, received_at=1705314720.5)
+        
+        assert [r["timestamp"] for r in records] == [
+            "2024-01-15T10:30:00Z", "2024-01-15T10:31:00Z", "2024-01-15T10:32:00Z",
+        ]
+        assert epochs == [1705314600.0, None, 1705314720.0]
+        assert [line for line, _ in malformed] == ["S-1,T-1,52"]
+    
+    def test_tcp_lines_stored_in_batches(self, listener):
+        """Lines from a connection are validated and written; bad ones are counted."""
+        lines = [f"S-{i % 3},T-{i % 2},{40 + i % 10},1.5,{1705314600 + i}" for i in range(250)]
+        lines.insert(10, "S-1,T-1,150,1.5")  # Level out of range
+        lines.insert(20, "not a reading")
+        with socket.create_connection(listener.tcp_address) as conn:
+            payload = ("\n".join(lines) + "\n").encode()
+            conn.sendall(payload[:1000])  # Split mid-line
+            conn.sendall(payload[1000:])
+        
+        self._wait_until(lambda: listener.stats["accepted"] + listener.stats["rejected"] >= 252)
+        self._wait_until(lambda: listener.notified)
+        
+        db = listener._sensor_service.db
+        assert listener.stats["accepted"] == 250 and listener.stats["rejected"] == 2
+        assert db.count("sensor_readings") == 250
+        assert listener.stats["batches"] >= 1 and listener.notified
+        assert {e["line"] for e in listener.errors} == {"S-1,T-1,150,1.5", "not a reading"}
+    
+    def test_udp_datagrams_stored(self, listener):
+        """Each datagram may carry several lines; a batch is flushed after flush_ms."""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(b"S-1,T-9,12,0.5\nS-2,T-9,13,0.5", listener.udp_address)
+            sock.sendto(b"S-3,T-9,14,0.5\n", listener.udp_address)
+        
+        self._wait_until(lambda: listener.stats["alerts_raised"] >= 3)
+        
+        readings = listener._sensor_service.db.get_latest("sensor_readings", limit=10)
+        assert sorted(r["device_id"] for r in readings) == ["S-1", "S-2", "S-3"]
+        assert listener.stats["alerts_raised"] >= 3  # Low level on every reading
+    
+    def test_loop_keeps_reading_while_a_batch_is_stored(self, listener):
+        """A slow store holds up only the writer; the loop parses new lines and pauses TCP when behind."""
+        sensor_service = listener._sensor_service
+        store = sensor_service.ingest_batch
+        storing, release = threading.Event(), threading.Event()
+        
+        def slow_store(readings, epochs):
+            storing.set()
+            release.wait(5)
+            return store(readings, epochs)
+        
+        sensor_service.ingest_batch = slow_store
+        listener.max_pending_batches = 2
+        try:
+            with socket.create_connection(listener.tcp_address) as conn:
+                conn.sendall(b"S-1,T-1,50,1.0\n")
+                assert storing.wait(5)
+                conn.sendall(b"S-1,T-1,51,1.0\n")
+                self._wait_until(lambda: listener.stats["lines"] == 2)
+                
+                assert listener.stats["lines"] == 2 and listener.pending_batches == 2
+                assert listener._paused and listener.stats["batches"] == 0
+                release.set()
+                self._wait_until(lambda: listener.stats["accepted"] == 2)
+                self._wait_until(lambda: not listener._paused)
+                conn.sendall(b"S-1,T-1,52,1.0\n")
+                self._wait_until(lambda: listener.stats["accepted"] == 3)
+        finally:
+            release.set()
+        
+        assert listener.stats["batches"] == 3 and not listener._paused
+        assert sensor_service.db.count("sensor_readings") == 3
+    
+    def test_connection_limit_and_long_lines(self, listener):
+        """Connections over the limit are refused; over-long lines are dropped, not buffered."""
+        listener.max_connections = 1
+        with socket.create_connection(listener.tcp_address) as first:
+            first.sendall(b"S-1,T-1,50,1.0\n")
+            self._wait_until(lambda: listener.connections == 1)
+            with socket.create_connection(listener.tcp_address) as second:
+                self._wait_until(lambda: listener.stats["connections_refused"] == 1)
+            first.sendall(b"x" * (listener.max_line_bytes + 1))
+            first.sendall(b"still the long line\nS-1,T-1,51,1.0\n")
+        
+        self._wait_until(lambda: listener.stats["accepted"] >= 2)
+        
+        assert listener.stats["connections_refused"] == 1
+        assert listener.stats["accepted"] == 2 and listener.stats["rejected"] == 1
+        assert listener.errors[-1]["message"] == "line too long"